@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of the RFC822 parsers.
+
+Compares the line-based parser with the fast, tokenizer-based parser on
+provider unit files (the providers shipped in this repository, when found,
+and a synthetic provider) and on synthetic resource job output. Results
+are printed as JSON.
+
+Usage::
+
+    python3 benchmarks/bench_rfc822.py [--repeat N] [--records K]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+
+from plainbox.impl.secure.origin import UnknownTextSource
+from plainbox.impl.secure.rfc822 import _gen_rfc822_records_from_lines
+from plainbox.impl.secure.rfc822 import gen_rfc822_records_from_text
+
+PROVIDERS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'providers')
+
+
+def make_provider_text(num_units):
+    """Generate the text of a synthetic provider unit file."""
+    unit = (
+        "id: synthetic/job-{0}\n"
+        "_summary: Synthetic job number {0}\n"
+        "plugin: shell\n"
+        "category_id: com.canonical.plainbox::miscellanea\n"
+        "estimated_duration: 1.0\n"
+        "requires:\n"
+        " package.name == 'synthetic-{0}'\n"
+        " executable.name == 'true'\n"
+        "command:\n"
+        "  set -e\n"
+        "  echo 'running job {0}'\n"
+        "  true\n"
+        "_description:\n"
+        " First paragraph of the description of job {0}.\n"
+        " .\n"
+        " Second paragraph.\n"
+        "\n")
+    return ''.join(unit.format(index) for index in range(num_units))
+
+
+def make_resource_text(num_records):
+    """Generate synthetic resource job output (dpkg-query like)."""
+    record = (
+        "name: package-{0}\n"
+        "version: 1.{0}-0ubuntu1\n"
+        "description:\n"
+        " Synthetic package {0}\n"
+        " with a multi-line description\n"
+        "\n")
+    return ''.join(record.format(index) for index in range(num_records))
+
+
+def load_repository_providers():
+    """Concatenate the unit files of the providers in this repository."""
+    text_list = []
+    for filename in sorted(glob.glob(os.path.join(
+            PROVIDERS_DIR, '**', '*.pxu'), recursive=True)):
+        with open(filename, encoding='UTF-8') as stream:
+            text_list.append(stream.read())
+    return text_list
+
+
+def parse_line_by_line(text_list):
+    source = UnknownTextSource()
+    for text in text_list:
+        for record in _gen_rfc822_records_from_lines(
+                text.splitlines(True), dict, source):
+            record.data
+
+
+def parse_fast(text_list):
+    source = UnknownTextSource()
+    for text in text_list:
+        for record in gen_rfc822_records_from_text(text, dict, source):
+            record.data
+
+
+def bench(text_list, repeat):
+    result = {
+        'bytes': sum(len(text) for text in text_list),
+        'files': len(text_list),
+    }
+    for name, func in [('line_by_line', parse_line_by_line),
+                       ('fast', parse_fast)]:
+        timings = timeit.repeat(
+            lambda: func(text_list), number=1, repeat=repeat)
+        result[name] = min(timings)
+    result['speedup'] = result['line_by_line'] / result['fast']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="number of timed runs, the best one is kept")
+    parser.add_argument('--records', type=int, default=20000,
+                        help="number of synthetic resource records")
+    parser.add_argument('--units', type=int, default=2000,
+                        help="number of synthetic provider units")
+    args = parser.parse_args(argv)
+    results = {
+        'synthetic_provider': bench(
+            [make_provider_text(args.units)], args.repeat),
+        'resource_output': bench(
+            [make_resource_text(args.records)], args.repeat),
+    }
+    repository_providers = load_repository_providers()
+    if repository_providers:
+        results['repository_providers'] = bench(
+            repository_providers, args.repeat)
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    main()
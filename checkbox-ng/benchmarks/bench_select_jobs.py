@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of the job selection engine.
+
+Selects jobs from a synthetic session with the qualifiers of a synthetic
+test plan (include patterns, exact ids and exclusions), using both the
+indexed selector and the plain "each qualifier votes on each job" loop.
+Results are printed as JSON.
+
+Usage::
+
+    python3 benchmarks/bench_select_jobs.py [--jobs N] [--patterns K]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+
+from plainbox.abc import IJobQualifier
+from plainbox.impl.secure.origin import Origin
+from plainbox.impl.secure.origin import UnknownTextSource
+from plainbox.impl.secure.qualifiers import get_flat_primitive_qualifier_list
+from plainbox.impl.secure.qualifiers import select_jobs
+from plainbox.impl.unit.testplan import TestPlanUnit
+from plainbox.impl.unit.job import JobDefinition
+
+NAMESPACE = 'com.canonical.certification'
+
+
+class _Provider:
+    namespace = NAMESPACE
+
+
+def make_job_list(num_jobs):
+    return [JobDefinition({
+        'id': 'group-{}/job-{}'.format(index % 100, index),
+        'plugin': 'shell',
+    }, origin=Origin(UnknownTextSource()), provider=_Provider)
+        for index in range(num_jobs)]
+
+
+def make_qualifier_list(num_patterns):
+    include = []
+    for index in range(num_patterns):
+        if index % 3 == 0:
+            include.append('group-{}/.*'.format(index % 100))
+        elif index % 3 == 1:
+            include.append('.*-{}$'.format(index))
+        else:
+            include.append('group-{}/job-{}'.format(index % 100, index))
+    exclude = ['group-{}/job-.*7$'.format(index) for index in range(10)]
+    unit = TestPlanUnit({
+        'id': 'synthetic',
+        'unit': 'test plan',
+        'include': '\n'.join(include),
+        'exclude': '\n'.join(exclude),
+    }, origin=Origin(UnknownTextSource()), provider=_Provider)
+    return [unit.get_qualifier()]
+
+
+def naive_select_jobs(job_list, qualifier_list):
+    included_list = []
+    included_set = set()
+    excluded_set = set()
+    for qualifier in get_flat_primitive_qualifier_list(qualifier_list):
+        for j_index, job in enumerate(job_list):
+            vote = qualifier.get_vote(job)
+            if vote == IJobQualifier.VOTE_INCLUDE:
+                if j_index not in included_set:
+                    included_set.add(j_index)
+                    included_list.append(j_index)
+            elif vote == IJobQualifier.VOTE_EXCLUDE:
+                excluded_set.add(j_index)
+    return [job_list[j_index] for j_index in included_list
+            if j_index not in excluded_set]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--jobs', type=int, default=5000,
+                        help="number of jobs in the session")
+    parser.add_argument('--patterns', type=int, default=300,
+                        help="number of include lines of the test plan")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="number of timed runs, the best one is kept")
+    args = parser.parse_args(argv)
+    job_list = make_job_list(args.jobs)
+    qualifier_list = make_qualifier_list(args.patterns)
+    selected = select_jobs(job_list, qualifier_list)
+    assert selected == naive_select_jobs(job_list, qualifier_list)
+    result = {'jobs': args.jobs, 'patterns': args.patterns,
+              'selected': len(selected)}
+    for name, func in [('naive', naive_select_jobs),
+                       ('indexed', select_jobs)]:
+        result[name] = min(timeit.repeat(
+            lambda: func(job_list, qualifier_list), number=1,
+            repeat=args.repeat))
+    result['speedup'] = result['naive'] / result['indexed']
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    main()
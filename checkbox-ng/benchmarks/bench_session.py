@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of a whole session driven by the session assistant.
+
+Generates a synthetic provider (plain jobs in dependency chains, job
+templates instantiated from the records of a resource job and a test plan
+including all of them) and goes through a complete session the way
+``checkbox-cli`` does: loading providers, selecting the test plan,
+bootstrapping, selecting jobs, running all the jobs, saving a checkpoint,
+resuming the session in a new session assistant and exporting the results
+with every exporter.
+
+Job commands are never executed, a synthetic runner feeds the I/O log of
+each job with generated output instead, so the benchmark runs offline. The
+session repository lives in a temporary directory.
+
+The time spent in each phase and the peak resident memory of the process
+after it are printed as JSON. With ``--tracemalloc`` the memory allocated
+in each phase is reported too (this makes everything slower).
+
+Usage::
+
+    python3 benchmarks/bench_session.py [--jobs N] [--templates M]
+        [--records K] [--depth D] [--io-lines L] [--tracemalloc]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from plainbox.impl.execution import UnifiedRunner
+from plainbox.impl.session.assistant import SessionAssistant
+from plainbox.impl.session.storage import SessionStorage
+from plainbox.impl.session.storage import WellKnownDirsHelper
+
+APP_ID = 'com.canonical.certification:bench-session'
+NAMESPACE = 'com.canonical.certification'
+TEST_PLAN_ID = NAMESPACE + '::synthetic'
+
+PROVIDER = (
+    "[PlainBox Provider]\n"
+    "name = {namespace}:synthetic\n"
+    "version = 1.0\n"
+    "description = Synthetic provider for benchmarks\n"
+    "location = {location}\n")
+
+RESOURCE_JOB = (
+    "id: synthetic_resource\n"
+    "plugin: resource\n"
+    "_summary: Enumerate synthetic devices\n"
+    "command: synthetic_resource.py\n"
+    "estimated_duration: 1.0\n"
+    "\n")
+
+TEMPLATE = (
+    "unit: template\n"
+    "template-resource: synthetic_resource\n"
+    "template-unit: job\n"
+    "id: synthetic/template-{0}/{{index}}\n"
+    "plugin: shell\n"
+    "_summary: Check synthetic device {{index}} ({0})\n"
+    "_description:\n"
+    " Check that the {{product}} device made by {{vendor}} works as\n"
+    " expected.\n"
+    "requires: synthetic_resource.kind == 'device'\n"
+    "command: synthetic_test.py --check {0} --path {{path}}\n"
+    "estimated_duration: 1.0\n"
+    "\n")
+
+JOB = (
+    "id: synthetic/job-{0}\n"
+    "plugin: {1}\n"
+    "_summary: Synthetic job {0}\n"
+    "requires: synthetic_resource.kind == 'device'\n"
+    "{2}"
+    "command: synthetic_test.py --job {0}\n"
+    "estimated_duration: 1.0\n"
+    "\n")
+
+TEST_PLAN = (
+    "unit: test plan\n"
+    "id: synthetic\n"
+    "_name: Synthetic test plan\n"
+    "include:\n"
+    " synthetic/.*\n"
+    "bootstrap_include:\n"
+    " synthetic_resource\n"
+    "\n")
+
+
+def make_units_text(num_jobs, num_templates, depth):
+    """Generate the text of the unit file of the synthetic provider."""
+    text_list = [RESOURCE_JOB, TEST_PLAN]
+    for index in range(num_templates):
+        text_list.append(TEMPLATE.format(index))
+    for index in range(num_jobs):
+        plugin = 'attachment' if index % 10 == 9 else 'shell'
+        depends = ''
+        if index % depth:
+            depends = "depends: synthetic/job-{}\n".format(index - 1)
+        text_list.append(JOB.format(index, plugin, depends))
+    return ''.join(text_list)
+
+
+def make_provider(root, num_jobs, num_templates, depth):
+    """
+    Write the synthetic provider.
+
+    :returns:
+        The directory to use as PROVIDERPATH
+    """
+    provider_path = os.path.join(root, 'providers')
+    location = os.path.join(root, 'synthetic')
+    os.makedirs(provider_path)
+    os.makedirs(os.path.join(location, 'units'))
+    with open(os.path.join(provider_path, 'synthetic.provider'), 'wt',
+              encoding='UTF-8') as stream:
+        stream.write(PROVIDER.format(namespace=NAMESPACE, location=location))
+    with open(os.path.join(location, 'units', 'synthetic.pxu'), 'wt',
+              encoding='UTF-8') as stream:
+        stream.write(make_units_text(num_jobs, num_templates, depth))
+    return provider_path
+
+
+class SyntheticRunner(UnifiedRunner):
+    """Runner producing synthetic output instead of running commands."""
+
+    def __init__(self, *args, num_records=0, io_lines=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._num_records = num_records
+        self._io_lines = io_lines
+
+    def execute_job(self, job, environ, extcmd_popen, stdin=None):
+        delegate = extcmd_popen._delegate
+        delegate.on_begin((job.command,), {})
+        if job.plugin == 'resource':
+            for index in range(self._num_records):
+                for line in (
+                        "index: {}\n".format(index),
+                        "path: /devices/synthetic/{}\n".format(index),
+                        "kind: device\n",
+                        "product: Synthetic Device {}\n".format(index),
+                        "vendor: ACME\n",
+                        "\n"):
+                    delegate.on_line('stdout', line.encode('UTF-8'))
+        else:
+            for index in range(self._io_lines):
+                stream_name = 'stderr' if index % 20 == 19 else 'stdout'
+                delegate.on_line(stream_name, "{}: line {} of {}\n".format(
+                    stream_name, index, job.id).encode('UTF-8'))
+        delegate.on_end(0)
+        return 0
+
+
+class Phases:
+    """Recorder of the time and memory used by each benchmarked phase."""
+
+    def __init__(self, use_tracemalloc):
+        self.use_tracemalloc = use_tracemalloc
+        self.results = {}
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        result = self.results[name] = {}
+        if self.use_tracemalloc:
+            tracemalloc.reset_peak()
+            start_size = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - start
+        if self.use_tracemalloc:
+            size, peak_size = tracemalloc.get_traced_memory()
+            result['allocated_bytes'] = size - start_size
+            result['peak_bytes'] = peak_size
+        result['max_rss_bytes'] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def run_session(phases, runner_kwargs):
+    with phases.measure('load_providers') as result:
+        sa = SessionAssistant(APP_ID, '0.99', '0.99', ['restartable'])
+        provider_list = sa.get_selected_providers()
+        result['units'] = sum(len(p.unit_list) for p in provider_list)
+    with phases.measure('start_new_session'):
+        sa.start_new_session(
+            'bench', runner_cls=SyntheticRunner,
+            runner_kwargs=dict(runner_kwargs))
+        session_id = sa.get_session_id()
+    with phases.measure('select_test_plan'):
+        sa.select_test_plan(TEST_PLAN_ID)
+        sa.update_app_blob(json.dumps(
+            {'testplan_id': TEST_PLAN_ID}).encode('UTF-8'))
+    with phases.measure('bootstrap'):
+        sa.bootstrap()
+    with phases.measure('update_desired_job_list') as result:
+        job_id_list = sa.get_static_todo_list()
+        sa.use_alternate_selection(job_id_list)
+        result['jobs'] = len(job_id_list)
+    with phases.measure('run_jobs') as result:
+        todo_list = sa.get_dynamic_todo_list()
+        for job_id in todo_list:
+            builder = sa.run_job(job_id, 'silent', False)
+            sa.use_job_result(job_id, builder.get_result())
+        result['jobs'] = len(todo_list)
+    with phases.measure('checkpoint') as result:
+        sa.update_app_blob(json.dumps(
+            {'testplan_id': TEST_PLAN_ID, 'done': True}).encode('UTF-8'))
+    result['bytes'] = os.stat(SessionStorage(session_id).session_file).st_size
+    with phases.measure('resume') as result:
+        sa = SessionAssistant(APP_ID, '0.99', '0.99', ['restartable'])
+        list(sa.get_resumable_sessions())
+        metadata = sa.resume_session(session_id, runner_cls=SyntheticRunner,
+                                     runner_kwargs=dict(runner_kwargs))
+        app_blob = json.loads(metadata.app_blob.decode('UTF-8'))
+        sa.select_test_plan(app_blob['testplan_id'])
+        sa.bootstrap()
+        result['remaining_jobs'] = len(sa.get_dynamic_todo_list())
+    with phases.measure('finalize_session'):
+        sa.finalize_session()
+    exporter_id_list = sorted(
+        unit.id for provider in sa.get_selected_providers()
+        for unit in provider.unit_list if unit.Meta.name == 'exporter')
+    for exporter_id in exporter_id_list:
+        # NOTE: the first export also saves a checkpoint, to flag the
+        # session as submitted
+        with tempfile.TemporaryFile() as stream, phases.measure(
+                'export:' + exporter_id) as result:
+            try:
+                sa.export_to_stream(exporter_id, [], stream)
+            except Exception as exc:
+                result['error'] = '{}: {}'.format(type(exc).__name__, exc)
+            else:
+                result['bytes'] = stream.tell()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--jobs', type=int, default=2000,
+                        help="number of plain jobs")
+    parser.add_argument('--templates', type=int, default=10,
+                        help="number of job templates")
+    parser.add_argument('--records', type=int, default=200,
+                        help="number of records of the resource job")
+    parser.add_argument('--depth', type=int, default=20,
+                        help="length of the dependency chains of plain jobs")
+    parser.add_argument('--io-lines', type=int, default=200,
+                        help="number of lines of output of each job")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="measure the memory allocated in each phase")
+    args = parser.parse_args(argv)
+    phases = Phases(args.tracemalloc)
+    with tempfile.TemporaryDirectory() as root:
+        os.environ['PROVIDERPATH'] = make_provider(
+            root, args.jobs, args.templates, args.depth)
+        WellKnownDirsHelper.base_of_everything = os.path.join(
+            root, 'checkbox-ng')
+        if args.tracemalloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        # keep stdout for the results
+        with contextlib.redirect_stdout(sys.stderr):
+            run_session(phases, {
+                'num_records': args.records,
+                'io_lines': args.io_lines,
+            })
+        duration = time.perf_counter() - start
+    run_jobs = phases.results['run_jobs']
+    run_jobs['seconds_per_job'] = (
+        run_jobs['seconds'] / run_jobs['jobs'] if run_jobs['jobs'] else None)
+    results = {
+        'parameters': {
+            'jobs': args.jobs,
+            'templates': args.templates,
+            'records': args.records,
+            'depth': args.depth,
+            'io_lines': args.io_lines,
+        },
+        'phases': phases.results,
+        'seconds': duration,
+        'max_rss_bytes': (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024),
+    }
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of the memory used by template-generated units.
+
+Parses synthetic resource job output, instantiates a job template once for
+each resource record and then accesses the fields and methods a session
+typically uses. The memory allocated for the units (as seen by tracemalloc)
+is printed as JSON, in total and per unit.
+
+Usage::
+
+    python3 benchmarks/bench_unit_memory.py [--records N]
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from plainbox.impl.resource import Resource
+from plainbox.impl.secure.origin import UnknownTextSource
+from plainbox.impl.secure.rfc822 import gen_rfc822_records
+from plainbox.impl.unit.template import TemplateUnit
+
+TEMPLATE = {
+    'unit': 'template',
+    'template-resource': 'device',
+    'template-unit': 'job',
+    'plugin': 'shell',
+    'category_id': 'com.canonical.plainbox::miscellanea',
+    'id': 'synthetic/{path}',
+    '_summary': 'Synthetic test of {product} ({path})',
+    '_description': (
+        'Check that the {product} device made by {vendor}\n'
+        'works as expected.'),
+    'requires': "package.name == 'synthetic'",
+    'depends': 'synthetic/setup',
+    'flags': 'also-after-suspend',
+    'estimated_duration': '1.0',
+    'command': 'synthetic_test.py --path {path}',
+}
+
+
+def make_resource_text(num_records):
+    """Generate synthetic output of a device resource job."""
+    record = (
+        "path: /devices/pci0000:00/0000:00:{0:04x}\n"
+        "bus: pci\n"
+        "category: NETWORK\n"
+        "driver: synthetic\n"
+        "product: Synthetic Adapter {0}\n"
+        "vendor: ACME\n"
+        "\n")
+    return ''.join(record.format(index) for index in range(num_records))
+
+
+def touch(unit):
+    """Access what a session typically needs from a job."""
+    unit.id
+    unit.partial_id
+    unit.summary
+    unit.tr_summary()
+    unit.tr_description()
+    unit.plugin
+    unit.get_flag_set()
+    unit.get_direct_dependencies()
+    unit.get_resource_dependencies()
+    unit.get_category_id()
+    unit.checksum
+
+
+def measure(num_records):
+    template = TemplateUnit(dict(TEMPLATE))
+    text = make_resource_text(num_records)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    resource_list = [
+        Resource(record.data) for record in
+        gen_rfc822_records(text, source=UnknownTextSource())]
+    resources_size = tracemalloc.get_traced_memory()[0]
+    unit_list = template.instantiate_all(resource_list)
+    for unit in unit_list:
+        touch(unit)
+    duration = time.perf_counter() - start
+    gc.collect()
+    total_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    units_size = total_size - resources_size
+    return {
+        'units': len(unit_list),
+        'resources_bytes': resources_size,
+        'units_bytes': units_size,
+        'bytes_per_resource': resources_size / len(resource_list),
+        'bytes_per_unit': units_size / len(unit_list),
+        'peak_bytes': peak_size,
+        'seconds': duration,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=10000,
+                        help="number of resource records (and units)")
+    args = parser.parse_args(argv)
+    json.dump(measure(args.records), sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    main()
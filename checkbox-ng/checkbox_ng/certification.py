@@ -24,21 +24,88 @@
 
 This module contains a PlainBox transport that knows how to send the
 certification tarball to the Canonical certification database.
+
+The tarball is streamed from its file and the transient failures are
+retried with an exponential backoff. A whole submission is only sent again
+when the server cannot have stored it: the connection could not be
+established, or the server replied 429 or 503. Servers that advertise
+resumable uploads, with the ``X-Resumable-Upload: 1`` header of their reply
+to ``OPTIONS``, receive the tarball in chunks, which are also sent again
+after lost connections, timeouts and 5xx replies:
+
+- each chunk is POSTed with a ``Content-Range: bytes START-END/TOTAL``
+  header and the ``X-Upload-Id`` header identifying the upload,
+- the server replies 202 with a ``Range: bytes=0-LAST`` header telling the
+  last byte it has received, until it receives the last byte and replies
+  like to a whole submission,
+- after a failure the upload resumes from the last acknowledged byte, so
+  the server has to accept chunks overlapping the data it has already.
+
+The server can suggest the size of the chunks with the
+``X-Upload-Chunk-Size`` header.
 """
 
 from gettext import gettext as _
 from logging import getLogger
+import io
 import re
+import time
+import uuid
 
 from plainbox.impl.transport import InvalidSecureIDError
 from plainbox.impl.transport import SECURE_ID_PATTERN
 from plainbox.impl.transport import TransportBase
 from plainbox.impl.transport import TransportError
 import requests
+from urllib3.exceptions import NewConnectionError
 
 
 logger = getLogger("checkbox.ng.certification")
 
+# replies worth sending a chunk again
+TRANSIENT_STATUS_CODES = frozenset([408, 429, 500, 502, 503, 504])
+# replies telling the request was not processed, worth sending a whole
+# submission again
+REFUSED_STATUS_CODES = frozenset([429, 503])
+
+
+def _not_connected(exc):
+    """Tell if a request failed before the connection was established."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0] if exc.args else None, 'reason', None)
+    return isinstance(reason, NewConnectionError)
+
+
+class _UploadReader:
+    """
+    Range of a stream, read by requests as the body of a request.
+
+    requests sends objects with a ``read`` method block by block, their
+    content is never loaded in memory as a whole.
+    """
+
+    def __init__(self, stream, start, length, progress=None):
+        self._stream = stream
+        self._length = length
+        self._remaining = length
+        self._position = start
+        self._progress = progress
+        stream.seek(start)
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._stream.read(size)
+        self._remaining -= len(data)
+        self._position += len(data)
+        if self._progress:
+            self._progress(self._position)
+        return data
+
 
 class SubmissionServiceTransport(TransportBase):
     """
@@ -49,17 +116,32 @@ class SubmissionServiceTransport(TransportBase):
           from checkbox.
    """
 
+    DEFAULT_RETRIES = 5
+    DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+    # seconds, doubled after each failure
+    RETRY_DELAY = 1
+    MAX_RETRY_DELAY = 60
+    # seconds to connect and between two reads of the reply
+    TIMEOUT = (30, 300)
+
     def __init__(self, where, options):
         """
         Initialize the Certification Transport.
 
         The options string may contain 'secure_id' which must be
-        a 15-character (or longer)  alphanumeric ID for the system.
+        a 15-character (or longer)  alphanumeric ID for the system,
+        'retries', the number of times failed requests are sent again, and
+        'chunk_size', the size in bytes of the chunks of resumable uploads.
         """
         super().__init__(where, options)
         self._secure_id = self.options.get('secure_id')
         if self._secure_id is not None:
             self._validate_secure_id(self._secure_id)
+        self._retries = int(self.options.get('retries', self.DEFAULT_RETRIES))
+        self._chunk_size = int(
+            self.options.get('chunk_size', self.DEFAULT_CHUNK_SIZE))
+        # called with the number of bytes sent and the size of the data
+        self.progress_callback = None
 
     def send(self, data, config=None, session_state=None):
         """
@@ -67,9 +149,10 @@ class SubmissionServiceTransport(TransportBase):
 
         :param data:
             Data containing the session dump to be sent to the server. This
-            can be either bytes or a file-like object (BytesIO works fine too).
-            If this is a file-like object, it will be read and streamed "on
-            the fly".
+            can be either bytes or a seekable file-like object (BytesIO works
+            fine too). If this is a file-like object, it will be read and
+            streamed "on the fly", from its current position, and read again
+            to retry or resume the upload after transient failures.
         :param config:
             This is here only to to implement the interface.
         :param session_state:
@@ -80,12 +163,9 @@ class SubmissionServiceTransport(TransportBase):
             the server response may change, so the only guarantee
             we make is that this will be non-False if the server
             accepted the data. Returns empty dictionary otherwise.
-        :raises requests.exceptions.Timeout:
-            If sending timed out.
-        :raises requests.exceptions.ConnectionError:
-            If connection failed outright.
-        :raises requests.exceptions.HTTPError:
-            If the server returned a non-success result code
+        :raises TransportError:
+            If sending timed out, the connection failed, or the server
+            returned a non-success result code.
         """
         secure_id = self._secure_id
         if secure_id is None:
@@ -93,17 +173,17 @@ class SubmissionServiceTransport(TransportBase):
         self._validate_secure_id(secure_id)
         logger.debug(
             _("Sending to %s, Secure ID is %s"), self.url, secure_id)
-        try:
-            response = requests.post(self.url, data=data)
-        except requests.exceptions.Timeout as exc:
-            raise TransportError(
-                _("Request to {0} timed out: {1}").format(self.url, exc))
-        except requests.exceptions.InvalidSchema as exc:
-            raise TransportError(
-                _("Invalid destination URL: {0}").format(exc))
-        except requests.exceptions.ConnectionError as exc:
-            raise TransportError(
-                _("Unable to connect to {0}: {1}").format(self.url, exc))
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+        origin = data.tell()
+        total = data.seek(0, io.SEEK_END) - origin
+        chunk_size = self._resumable_chunk_size() if total else None
+        if chunk_size:
+            response = self._send_chunks(data, origin, total, chunk_size)
+        else:
+            response = self._send_with_retries(
+                lambda: _UploadReader(
+                    data, origin, total, self._progress(origin, total)))
         if response is not None:
             try:
                 # This will raise HTTPError for status != 20x
@@ -119,6 +199,116 @@ class SubmissionServiceTransport(TransportBase):
         # ISessionStateTransport.send must return dictionary
         return {}
 
+    def _progress(self, origin, total):
+        if self.progress_callback is None:
+            return None
+        return lambda position: self.progress_callback(
+            position - origin, total)
+
+    def _resumable_chunk_size(self):
+        """
+        Return the size of the chunks to send if the server supports
+        resumable uploads, None otherwise.
+        """
+        try:
+            response = requests.options(self.url, timeout=self.TIMEOUT)
+        except requests.exceptions.RequestException:
+            return None
+        if response.headers.get('X-Resumable-Upload') != '1':
+            return None
+        try:
+            return int(response.headers['X-Upload-Chunk-Size'])
+        except (KeyError, ValueError):
+            return self._chunk_size
+
+    def _send_with_retries(self, make_body, headers=None, idempotent=False):
+        """
+        POST the body returned by make_body, again after transient failures.
+
+        Unless the request is idempotent, it is only sent again when the
+        server did not receive it or refused to process it, so that a
+        submission is never stored twice.
+
+        :returns: the last response of the server
+        :raises TransportError: if all the attempts fail to get a response
+        """
+        delay = self.RETRY_DELAY
+        attempt = 0
+        while True:
+            try:
+                response = requests.post(
+                    self.url, data=make_body(), headers=headers,
+                    timeout=self.TIMEOUT)
+            except requests.exceptions.Timeout as exc:
+                if attempt >= self._retries or not (
+                        idempotent or _not_connected(exc)):
+                    raise TransportError(
+                        _("Request to {0} timed out: {1}").format(
+                            self.url, exc))
+                error = exc
+            except requests.exceptions.InvalidSchema as exc:
+                raise TransportError(
+                    _("Invalid destination URL: {0}").format(exc))
+            except requests.exceptions.ConnectionError as exc:
+                if attempt >= self._retries or not (
+                        idempotent or _not_connected(exc)):
+                    raise TransportError(
+                        _("Unable to connect to {0}: {1}").format(
+                            self.url, exc))
+                error = exc
+            else:
+                retried = (TRANSIENT_STATUS_CODES if idempotent
+                           else REFUSED_STATUS_CODES)
+                if (response.status_code not in retried or
+                        attempt >= self._retries):
+                    return response
+                error = response.status_code
+            attempt += 1
+            logger.warning(
+                _("Sending to %s failed (%s), retrying in %s seconds"),
+                self.url, error, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, self.MAX_RETRY_DELAY)
+
+    def _send_chunks(self, stream, origin, total, chunk_size):
+        """Send the data in chunks, resuming after failures."""
+        upload_id = uuid.uuid4().hex
+        progress = self._progress(origin, total)
+        offset = 0
+        while offset < total:
+            length = min(chunk_size, total - offset)
+            headers = {
+                'Content-Range': 'bytes {}-{}/{}'.format(
+                    offset, offset + length - 1, total),
+                'X-Upload-Id': upload_id,
+            }
+            response = self._send_with_retries(
+                lambda: _UploadReader(
+                    stream, origin + offset, length, progress), headers,
+                idempotent=True)
+            if response.status_code != 202:
+                return response
+            acknowledged = self._acknowledged(response)
+            if acknowledged <= offset:
+                raise TransportError(
+                    _("{0} did not acknowledge the data sent").format(
+                        self.url))
+            logger.debug("%s acknowledged %s/%s bytes",
+                         self.url, acknowledged, total)
+            offset = acknowledged
+        raise TransportError(
+            _("{0} received the whole upload but did not accept it").format(
+                self.url))
+
+    @staticmethod
+    def _acknowledged(response):
+        """Return the number of bytes acknowledged by a 202 response."""
+        match = re.match(
+            r'bytes=0-(\d+)$', response.headers.get('Range', ''))
+        if match:
+            return int(match.group(1)) + 1
+        return 0
+
     def _validate_secure_id(self, secure_id):
         if not re.match(SECURE_ID_PATTERN, secure_id):
             raise InvalidSecureIDError(
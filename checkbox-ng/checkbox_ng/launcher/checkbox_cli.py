@@ -21,56 +21,71 @@ Checkbox Launcher Interpreter Application
 """
 
 import gettext
+import importlib
 import logging
 import os
 import subprocess
 import sys
 
-from plainbox.impl.jobcache import ResourceJobCache
-from plainbox.impl.launcher import DefaultLauncherDefinition
-from plainbox.impl.launcher import LauncherDefinition
-from plainbox.impl.session.assistant import SessionAssistant
-
-from checkbox_ng.config import load_configs
-from checkbox_ng.launcher.subcommands import (
-    Launcher, List, Run, StartProvider, Submit, ListBootstrapped,
-    TestPlanExport, Show
-)
-from checkbox_ng.launcher.check_config import CheckConfig
-from checkbox_ng.launcher.merge_reports import MergeReports
-from checkbox_ng.launcher.merge_submissions import MergeSubmissions
-from checkbox_ng.launcher.master import RemoteMaster
-from checkbox_ng.launcher.slave import RemoteSlave
+from plainbox.impl.logging import is_asynchronous_logging_enabled
+from plainbox.impl.logging import make_asynchronous
 
 
 _ = gettext.gettext
 
 _logger = logging.getLogger("checkbox-cli")
 
+# Sub-commands, as "module:class". The module of a sub-command is only
+# imported when it is invoked, so that short commands do not pay for the
+# dependencies of the others (urwid, rpyc, the exporters...)
+COMMANDS = {
+    'check-config': 'checkbox_ng.launcher.check_config:CheckConfig',
+    'compare-metrics': 'checkbox_ng.launcher.compare_metrics:CompareMetrics',
+    'launcher': 'checkbox_ng.launcher.subcommands:Launcher',
+    'list': 'checkbox_ng.launcher.subcommands:List',
+    'run': 'checkbox_ng.launcher.subcommands:Run',
+    'startprovider': 'checkbox_ng.launcher.subcommands:StartProvider',
+    'submit': 'checkbox_ng.launcher.subcommands:Submit',
+    'show': 'checkbox_ng.launcher.subcommands:Show',
+    'list-bootstrapped': 'checkbox_ng.launcher.subcommands:ListBootstrapped',
+    'merge-reports': 'checkbox_ng.launcher.merge_reports:MergeReports',
+    'merge-submissions':
+        'checkbox_ng.launcher.merge_submissions:MergeSubmissions',
+    'tp-export': 'checkbox_ng.launcher.subcommands:TestPlanExport',
+    'service': 'checkbox_ng.launcher.slave:RemoteSlave',
+    'remote': 'checkbox_ng.launcher.master:RemoteMaster',
+}
+
+
+def load_command(name):
+    """Import the module of a sub-command and return its class."""
+    module_name, cls_name = COMMANDS[name].split(':')
+    return getattr(importlib.import_module(module_name), cls_name)
+
 
 class Context:
-    def __init__(self, args, sa):
+    def __init__(self, args, sa=None):
         self.args = args
-        self.sa = sa
+        self._sa = sa
+
+    @property
+    def sa(self):
+        # The session assistant (and the session stack behind it) is only
+        # set up when a sub-command needs it
+        if self._sa is None:
+            from plainbox.impl.session.assistant import SessionAssistant
+            self._sa = SessionAssistant(
+                "com.canonical:checkbox-cli",
+                "0.99",
+                "0.99",
+                ["restartable"],
+            )
+        return self._sa
 
 
 def main():
     import argparse
-    commands = {
-        'check-config': CheckConfig,
-        'launcher': Launcher,
-        'list': List,
-        'run': Run,
-        'startprovider': StartProvider,
-        'submit': Submit,
-        'show': Show,
-        'list-bootstrapped': ListBootstrapped,
-        'merge-reports': MergeReports,
-        'merge-submissions': MergeSubmissions,
-        'tp-export': TestPlanExport,
-        'service': RemoteSlave,
-        'remote': RemoteMaster,
-    }
+    commands = COMMANDS
     deprecated_commands = {
         'slave': 'service',
         'master': 'remote',
@@ -112,29 +127,27 @@ def main():
             break
     args = top_parser.parse_args(sys.argv[1:subcmd_index + 1])
     subcmd_parser = argparse.ArgumentParser()
-    subcmd = commands[args.subcommand]()
+    subcmd = load_command(args.subcommand)()
     subcmd.register_arguments(subcmd_parser)
     sub_args = subcmd_parser.parse_args(sys.argv[subcmd_index + 1:])
-    sa = SessionAssistant(
-        "com.canonical:checkbox-cli",
-        "0.99",
-        "0.99",
-        ["restartable"],
-    )
-    ctx = Context(sub_args, sa)
+    ctx = Context(sub_args)
     try:
         socket.getaddrinfo('localhost', 443)  # 443 for HTTPS
     except Exception:
         pass
     if '--clear-cache' in sys.argv:
+        from plainbox.impl.jobcache import ResourceJobCache
         ResourceJobCache().clear()
     if '--clear-old-sessions' in sys.argv:
-        old_sessions = [s[0] for s in sa.get_old_sessions()]
-        sa.delete_sessions(old_sessions)
+        old_sessions = [s[0] for s in ctx.sa.get_old_sessions()]
+        ctx.sa.delete_sessions(old_sessions)
     if args.verbose:
         logging_level = logging.INFO
         logging.basicConfig(level=logging_level)
     if args.debug:
         logging_level = logging.DEBUG
         logging.basicConfig(level=logging_level)
+    # do not slow down job execution with verbose logging
+    if is_asynchronous_logging_enabled():
+        make_asynchronous(logging.getLogger())
     subcmd.invoked(ctx)
@@ -0,0 +1,103 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`checkbox-ng.launcher.compare_metrics` -- compare-metrics sub-command
+==========================================================================
+"""
+from gettext import gettext as _
+import os
+import tarfile
+
+from plainbox.impl.color import Colorizer
+from plainbox.impl.metrics import compare_metrics
+from plainbox.impl.metrics import load_session_metrics
+from plainbox.impl.metrics import load_submission_metrics
+from plainbox.impl.session.resume import SessionResumeError
+from plainbox.impl.session.storage import SessionStorage
+
+
+class CompareMetrics():
+    """
+    Compare the metrics reported by benchmark jobs in two sessions.
+
+    The exit code is 1 if any metric got worse by more than the threshold.
+    """
+
+    def register_arguments(self, parser):
+        parser.add_argument(
+            'old', metavar='OLD',
+            help=_("baseline: a submission tarball, a submission.json file"
+                   " or the id of a stored session"))
+        parser.add_argument(
+            'new', metavar='NEW',
+            help=_("submission or session to compare with the baseline"))
+        parser.add_argument(
+            '-t', '--threshold', type=float, default=5.0, metavar='PERCENT',
+            help=_("relative change a metric has to get worse by to be"
+                   " reported as a regression (default: %(default)s)"))
+        parser.add_argument(
+            '-a', '--all', action='store_true',
+            help=_("show all the metrics, not only the regressions"))
+
+    def invoked(self, ctx):
+        old_map = self._load(ctx.args.old)
+        new_map = self._load(ctx.args.new)
+        comparison_list = compare_metrics(
+            old_map, new_map, ctx.args.threshold)
+        if not comparison_list:
+            print(_("No metrics to compare"))
+            return
+        c = Colorizer()
+        regression_count = 0
+        for comparison in comparison_list:
+            regression_count += comparison.regression
+            if not (ctx.args.all or comparison.regression):
+                continue
+            line = "{}: {} {} -> {} {}{}".format(
+                comparison.job_id, comparison.name,
+                self._format_value(comparison.old),
+                self._format_value(comparison.new), comparison.unit,
+                "" if comparison.change is None else " ({:+.1f}%)".format(
+                    comparison.change)).rstrip()
+            if comparison.regression:
+                line = c.RED(_("REGRESSION")) + " " + line
+            print(line)
+        print(_("{} metrics compared, {} regressions (threshold: {}%)").format(
+            len(comparison_list), regression_count, ctx.args.threshold))
+        if regression_count:
+            raise SystemExit(1)
+
+    def _format_value(self, value):
+        return '-' if value is None else '{:g}'.format(value)
+
+    def _load(self, name):
+        """Load the metrics of a submission or a stored session."""
+        if os.path.isfile(name):
+            try:
+                return load_submission_metrics(name)
+            except (OSError, ValueError, KeyError, tarfile.TarError) as exc:
+                raise SystemExit(_("Cannot load metrics from {}: {}").format(
+                    name, exc))
+        storage = SessionStorage(name)
+        if not os.path.isfile(storage.session_file):
+            raise SystemExit(_("No such submission or session: {}").format(
+                name))
+        try:
+            return load_session_metrics(storage)
+        except (OSError, SessionResumeError) as exc:
+            raise SystemExit(_("Cannot load metrics from session {}: {}")
+                             .format(name, exc))
@@ -48,6 +48,7 @@ from plainbox.impl.session.assistant import SA_RESTARTABLE
 from plainbox.impl.session.restart import detect_restart_strategy
 from plainbox.impl.session.restart import get_strategy_by_name
 from plainbox.impl.session.storage import WellKnownDirsHelper
+from plainbox.impl.tracing import enable_tracing
 from plainbox.impl.transport import TransportError
 from plainbox.impl.transport import get_all_transports
 from plainbox.impl.transport import SECURE_ID_PATTERN
@@ -58,10 +59,6 @@ from checkbox_ng.launcher.startprovider import (
     EmptyProviderSkeleton, IQN, ProviderSkeleton)
 from checkbox_ng.launcher.run import Action
 from checkbox_ng.launcher.run import NormalUI
-from checkbox_ng.urwid_ui import CategoryBrowser
-from checkbox_ng.urwid_ui import ManifestBrowser
-from checkbox_ng.urwid_ui import ReRunBrowser
-from checkbox_ng.urwid_ui import TestPlanBrowser
 
 _ = gettext.gettext
 
@@ -118,8 +115,18 @@ class Submit():
             with tarfile.open(new_subm_file, mode='w:xz') as tar:
                 tar.add(tmpdir.name, arcname='')
             submission_file = new_subm_file
+        from tqdm import tqdm
         try:
-            with open(submission_file, mode) as subm_file:
+            with open(submission_file, mode) as subm_file, tqdm(
+                total=os.fstat(subm_file.fileno()).st_size,
+                unit='B',
+                unit_scale=True,
+                unit_divisor=1024,
+                disable=not sys.stdout.isatty()
+            ) as pbar:
+                # the count goes back when a failed request is sent again
+                transport.progress_callback = (
+                    lambda sent, total: pbar.update(sent - pbar.n))
                 result = transport.send(subm_file)
         except (TransportError, OSError) as exc:
             raise SystemExit(exc)
@@ -193,6 +200,8 @@ class Launcher(MainLoopStage, ReportsStage):
         if not ctx.args.verbose and not ctx.args.debug:
             # Command line args take precendence
             logging.basicConfig(level=logging_level)
+        if self.launcher.trace:
+            enable_tracing()
         try:
             self._C = Colorizer()
             self.ctx = ctx
@@ -386,6 +395,8 @@ class Launcher(MainLoopStage, ReportsStage):
         if not tp_info_list:
             print(self.C.RED(_("There were no test plans to select from!")))
             return
+        # urwid is only needed by interactive sessions
+        from checkbox_ng.urwid_ui import TestPlanBrowser
         selected_tp = TestPlanBrowser(
             _("Select test plan"), tp_info_list,
             self.launcher.test_plan_default_selection).run()
@@ -410,6 +421,8 @@ class Launcher(MainLoopStage, ReportsStage):
             print(self.C.RED(_("There were no tests to select from!")))
             return
         test_info_list = self._generate_job_infos(job_list)
+        from checkbox_ng.urwid_ui import CategoryBrowser
+        from checkbox_ng.urwid_ui import ManifestBrowser
         wanted_set = CategoryBrowser(
             _("Choose tests to run on your system:"), test_info_list).run()
         manifest_repr = self.ctx.sa.get_manifest_repr()
@@ -507,6 +520,7 @@ class Launcher(MainLoopStage, ReportsStage):
         if not rerun_candidates:
             return False
         test_info_list = self._generate_job_infos(rerun_candidates)
+        from checkbox_ng.urwid_ui import ReRunBrowser
         wanted_set = ReRunBrowser(
             _("Select jobs to re-run"), test_info_list, rerun_candidates).run()
         if not wanted_set:
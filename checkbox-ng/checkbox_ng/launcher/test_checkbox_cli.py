@@ -0,0 +1,87 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_ng.launcher.test_checkbox_cli
+======================================
+
+Test definitions for checkbox_ng.launcher.checkbox_cli module
+"""
+
+from unittest import TestCase
+from unittest import skipUnless
+import os
+import subprocess
+import sys
+
+from checkbox_ng.launcher.checkbox_cli import COMMANDS
+from checkbox_ng.launcher.checkbox_cli import load_command
+
+
+def get_import_times(statement):
+    """
+    Run a statement in a new interpreter with ``-X importtime``.
+
+    :returns:
+        A dictionary mapping the names of the imported modules to their
+        cumulative import time in microseconds
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT, universal_newlines=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    import_times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _self, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+class StartupTests(TestCase):
+
+    #: Modules only needed by some of the sub-commands
+    HEAVY_MODULES = (
+        'jinja2', 'plainbox.impl.session', 'requests', 'rpyc', 'urwid',
+        'xlsxwriter',
+    )
+
+    def test_startup_imports(self):
+        import_times = get_import_times(
+            'import checkbox_ng.launcher.checkbox_cli')
+        for name in import_times:
+            for heavy_name in self.HEAVY_MODULES:
+                self.assertFalse(
+                    name == heavy_name or name.startswith(heavy_name + '.'),
+                    "{} imported at start".format(name))
+
+    @skipUnless(os.getenv('CHECKBOX_STARTUP_BUDGET'),
+                "set CHECKBOX_STARTUP_BUDGET to a time in milliseconds")
+    def test_startup_time(self):
+        # import times depend on the machine, so the budget is opt-in
+        budget = float(os.getenv('CHECKBOX_STARTUP_BUDGET'))
+        import_times = get_import_times(
+            'import checkbox_ng.launcher.checkbox_cli')
+        self.assertLess(
+            import_times['checkbox_ng.launcher.checkbox_cli'] / 1000, budget)
+
+    def test_all_commands_load(self):
+        for name in COMMANDS:
+            cls = load_command(name)
+            self.assertTrue(hasattr(cls, 'register_arguments'), name)
+            self.assertTrue(hasattr(cls, 'invoked'), name)
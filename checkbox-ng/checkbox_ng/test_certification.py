@@ -25,8 +25,16 @@ plainbox.impl.transport.test_certification
 Test definitions for plainbox.impl.certification module
 """
 
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from io import BytesIO
+from tempfile import TemporaryFile
 from unittest import TestCase
+import hashlib
+import json
+import re
+import socketserver
+import threading
+import tracemalloc
 
 from pkg_resources import resource_string
 from plainbox.impl.transport import InvalidSecureIDError
@@ -34,6 +42,8 @@ from plainbox.impl.transport import TransportError
 from plainbox.vendor import mock
 from plainbox.vendor.mock import MagicMock
 from requests.exceptions import ConnectionError, InvalidSchema, HTTPError
+from requests.exceptions import ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 import requests
 
 from checkbox_ng.certification import SubmissionServiceTransport
@@ -55,6 +65,11 @@ class SubmissionServiceTransportTests(TestCase):
         ))
         self.patcher = mock.patch('requests.post')
         self.mock_requests = self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        # no resumable uploads
+        options_patcher = mock.patch('requests.options')
+        options_patcher.start().return_value.headers = {}
+        self.addCleanup(options_patcher.stop)
 
     def test_parameter_parsing(self):
         # Makes sense since I'm overriding the base class's constructor.
@@ -85,20 +100,52 @@ class SubmissionServiceTransportTests(TestCase):
         with self.assertRaises(TransportError):
             result = transport.send(dummy_data)
             self.assertIsNotNone(result)
-        requests.post.assert_called_with(
-            self.invalid_url, data=dummy_data)
+        requests.post.assert_called_once_with(
+            self.invalid_url, data=mock.ANY, headers=None,
+            timeout=transport.TIMEOUT)
 
+    @mock.patch('checkbox_ng.certification.time.sleep')
     @mock.patch('checkbox_ng.certification.logger')
-    def test_valid_url_cant_connect(self, mock_logger):
+    def test_valid_url_cant_connect(self, mock_logger, mock_sleep):
         transport = SubmissionServiceTransport(
             self.unreachable_url, self.valid_option_string)
         dummy_data = BytesIO(b"some data to send")
-        requests.post.side_effect = ConnectionError
+        requests.post.side_effect = ConnectionError(MaxRetryError(
+            None, self.unreachable_url,
+            NewConnectionError(None, "Name or service not known")))
         with self.assertRaises(TransportError):
             result = transport.send(dummy_data)
             self.assertIsNotNone(result)
-        requests.post.assert_called_with(self.unreachable_url,
-                                         data=dummy_data)
+        requests.post.assert_called_with(
+            self.unreachable_url, data=mock.ANY, headers=None,
+            timeout=transport.TIMEOUT)
+        # sent again after 1, 2, 4, 8 and 16 seconds
+        self.assertEqual(requests.post.call_count, 6)
+        self.assertEqual(mock_sleep.call_args_list,
+                         [mock.call(delay) for delay in (1, 2, 4, 8, 16)])
+
+    @mock.patch('checkbox_ng.certification.time.sleep')
+    def test_submission_not_sent_twice(self, mock_sleep):
+        transport = SubmissionServiceTransport(
+            self.valid_url, self.valid_option_string)
+        # the server may have received the whole submission
+        for side_effect in (ConnectionError("Connection aborted."),
+                            ReadTimeout("Read timed out.")):
+            requests.post.reset_mock()
+            requests.post.side_effect = side_effect
+            with self.assertRaises(TransportError):
+                transport.send(BytesIO(b"some data to send"))
+            self.assertEqual(requests.post.call_count, 1)
+        requests.post.reset_mock()
+        requests.post.side_effect = None
+        requests.post.return_value.status_code = 502
+        requests.post.return_value.text = 'Bad Gateway'
+        requests.post.return_value.raise_for_status.side_effect = HTTPError(
+            response=requests.post.return_value)
+        with self.assertRaises(TransportError):
+            transport.send(BytesIO(b"some data to send"))
+        self.assertEqual(requests.post.call_count, 1)
+        mock_sleep.assert_not_called()
 
     def test_send_success(self):
         transport = SubmissionServiceTransport(
@@ -123,3 +170,199 @@ class SubmissionServiceTransportTests(TestCase):
             side_effect=error)
         with self.assertRaises(TransportError):
             transport.send(self.sample_archive)
+
+
+class SubmissionServer(socketserver.ThreadingMixIn, HTTPServer):
+
+    """
+    Stand-in for the certification server.
+
+    The submissions are hashed as they are received, so that they take no
+    memory. With ``resumable`` set, the server accepts chunked uploads.
+    ``failures`` are the number of requests to answer with 503 and
+    ``interruptions`` the number of chunk uploads to cut in the middle.
+    With ``keep_uploads`` set, the server never accepts chunked uploads.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, resumable=False):
+        super().__init__(('127.0.0.1', 0), SubmissionHandler)
+        self.resumable = resumable
+        self.failures = 0
+        self.interruptions = 0
+        self.keep_uploads = False
+        self.received = 0
+        self.uploads = {}
+        self.submissions = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/submission/'.format(self.server_port)
+
+
+class SubmissionHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status_code, body=None, headers=()):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status_code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read(self, length, upload, skip=0):
+        """Hash the body, skipping the bytes the upload already has."""
+        while length:
+            data = self.rfile.read(min(length, 65536))
+            if not data:
+                break
+            length -= len(data)
+            self.server.received += len(data)
+            data = data[skip:]
+            skip = max(skip - 65536, 0)
+            upload['sha256'].update(data)
+            upload['size'] += len(data)
+
+    def _submitted(self, upload):
+        self.server.submissions.append(
+            (upload['sha256'].hexdigest(), upload['size']))
+        self._reply(200, {'id': len(self.server.submissions),
+                          'url': 'https://example.com/submission'})
+
+    def do_OPTIONS(self):
+        headers = [('Allow', 'OPTIONS, POST')]
+        if self.server.resumable:
+            headers.append(('X-Resumable-Upload', '1'))
+            headers.append(('X-Upload-Chunk-Size', str(1024 * 1024)))
+        self._reply(200, headers=headers)
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        if self.server.failures:
+            self.server.failures -= 1
+            self.rfile.read(length)
+            self._reply(503, {'error': 'try again'})
+            return
+        content_range = self.headers.get('Content-Range')
+        if not content_range:
+            upload = {'sha256': hashlib.sha256(), 'size': 0}
+            self._read(length, upload)
+            self._submitted(upload)
+            return
+        start, end, total = map(int, re.match(
+            r'bytes (\d+)-(\d+)/(\d+)$', content_range).groups())
+        upload = self.server.uploads.setdefault(
+            self.headers['X-Upload-Id'],
+            {'sha256': hashlib.sha256(), 'size': 0})
+        if start > upload['size']:
+            self._reply(416, {'error': 'missing data'})
+            return
+        if self.server.interruptions:
+            # receive half of the chunk and drop the connection
+            self.server.interruptions -= 1
+            self._read(length // 2, upload, upload['size'] - start)
+            self.close_connection = True
+            return
+        self._read(length, upload, upload['size'] - start)
+        if length == 0:
+            self._reply(400, {'error': 'empty chunk'})
+        elif upload['size'] == total and not self.server.keep_uploads:
+            self._submitted(upload)
+        else:
+            self._reply(202, headers=[
+                ('Range', 'bytes=0-{}'.format(upload['size'] - 1))])
+
+
+class SubmissionServiceTransportServerTests(TestCase):
+
+    valid_option_string = "secure_id=a00D000000Kkk5j"
+
+    def setUp(self):
+        self.tmp_file = TemporaryFile()
+        self.addCleanup(self.tmp_file.close)
+        sha256 = hashlib.sha256()
+        for index in range(16):
+            block = hashlib.sha256(bytes([index])).digest() * 32768
+            sha256.update(block)
+            self.tmp_file.write(block)
+        self.size = 16 * 32 * 32768
+        self.sha256 = sha256.hexdigest()
+        self.tmp_file.seek(0)
+        sleep_patcher = mock.patch('checkbox_ng.certification.time.sleep')
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def start_server(self, **kwargs):
+        server = SubmissionServer(**kwargs)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def send(self, server):
+        transport = SubmissionServiceTransport(
+            server.url, self.valid_option_string)
+        progress = []
+        transport.progress_callback = (
+            lambda sent, total: progress.append((sent, total)))
+        result = transport.send(self.tmp_file)
+        self.assertEqual(progress[-1], (self.size, self.size))
+        return result
+
+    def test_streaming(self):
+        server = self.start_server()
+        tracemalloc.start()
+        try:
+            result = self.send(server)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(result['id'], 1)
+        self.assertEqual(server.submissions, [(self.sha256, self.size)])
+        # the 16 MiB of the file are never in memory
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+    def test_retry(self):
+        server = self.start_server()
+        server.failures = 2
+        self.assertEqual(self.send(server)['id'], 1)
+        self.assertEqual(server.submissions, [(self.sha256, self.size)])
+        self.assertEqual(self.mock_sleep.call_args_list,
+                         [mock.call(1), mock.call(2)])
+
+    def test_resume(self):
+        server = self.start_server(resumable=True)
+        server.interruptions = 2
+        self.assertEqual(self.send(server)['id'], 1)
+        self.assertEqual(server.submissions, [(self.sha256, self.size)])
+        # only the two half chunks cut off are sent again
+        self.assertEqual(server.received, self.size + 1024 * 1024)
+        self.assertEqual(self.mock_sleep.call_count, 2)
+
+    def test_whole_upload_not_accepted(self):
+        server = self.start_server(resumable=True)
+        server.keep_uploads = True
+        transport = SubmissionServiceTransport(
+            server.url, self.valid_option_string)
+        with self.assertRaisesRegex(TransportError, 'did not accept it'):
+            transport.send(self.tmp_file)
+        # no empty chunk once every byte is acknowledged
+        self.assertEqual(server.received, self.size)
+
+    def test_give_up(self):
+        server = self.start_server()
+        server.failures = 10
+        transport = SubmissionServiceTransport(
+            server.url, self.valid_option_string + ',retries=2')
+        with self.assertRaises(TransportError):
+            transport.send(self.tmp_file)
+        self.assertEqual(server.failures, 7)
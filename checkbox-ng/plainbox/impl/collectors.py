@@ -0,0 +1,132 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.collectors` -- in-process resource collectors
+=================================================================
+
+Most resource jobs run a small Python script that imports a parser from
+``checkbox_support`` and prints a handful of RFC822 records. Starting a new
+interpreter for each of them dominates the cost of bootstrapping a session.
+
+A resource collector is a plain callable, registered with the
+``plainbox.resource_collector`` entry point, that produces the same records
+directly inside the running process. The name of the entry point is the
+command it replaces, for example ``uname_resource.py``. It is called with
+the execution environment the job command would have received and returns
+an iterable of mappings, one per resource record.
+
+Only the jobs of the providers in :data:`COLLECTOR_NAMESPACES`, which ship
+the scripts the collectors replace, are collected in-process. When no
+collector matches the command of such a resource job, or when the job has
+to run as another user, the command is executed as usual.
+"""
+
+import inspect
+import logging
+import os
+
+from plainbox.impl.secure.plugins import PkgResourcesPlugInCollection, PlugIn
+
+
+logger = logging.getLogger("plainbox.collectors")
+
+#: Namespaces of the providers whose resource scripts have collectors, other
+#: providers may ship different scripts with the same names
+COLLECTOR_NAMESPACES = frozenset(['com.canonical.certification'])
+
+
+class ResourceCollectorPlugIn(PlugIn):
+    """PlugIn wrapping a resource collector function."""
+
+    @property
+    def name(self):
+        """command replaced by the collector"""
+        return self.plugin_name
+
+    @property
+    def summary(self):
+        """first line of the docstring of the collector"""
+        doc = inspect.getdoc(self.plugin_object) or ''
+        return doc.split('\n', 1)[0]
+
+    def collect(self, environ):
+        """
+        Run the collector.
+
+        :param environ:
+            Execution environment of the job
+        :returns:
+            List of dictionaries, one per resource record
+        """
+        return [dict(record) for record in self.plugin_object(environ)]
+
+
+# Collection of all resource collectors
+all_collectors = PkgResourcesPlugInCollection(
+    'plainbox.resource_collector', wrapper=ResourceCollectorPlugIn)
+
+
+def collectors_enabled():
+    """Check if in-process collectors were not disabled by the operator."""
+    return not os.getenv("PLAINBOX_NO_RESOURCE_COLLECTORS", "")
+
+
+def get_collector_for_job(job):
+    """
+    Get the collector that can replace the command of a resource job.
+
+    :returns:
+        A :class:`ResourceCollectorPlugIn` or None
+    """
+    if job.plugin != 'resource' or not job.command:
+        return None
+    if job.provider is None or (
+            job.provider.namespace not in COLLECTOR_NAMESPACES):
+        return None
+    all_collectors.load()
+    try:
+        return all_collectors.get_by_name(job.command.strip())
+    except KeyError:
+        return None
+
+
+def gen_rfc822_lines(record_list):
+    """
+    Render resource records the same way resource scripts print them.
+
+    Multi-line values are written as continuation lines, blank lines of
+    such values are protected with the dot marker, so that parsing the
+    output yields the original (normalized) values back.
+
+    :param record_list:
+        List of mappings produced by a collector
+    :returns:
+        A generator of UTF-8 encoded lines
+    """
+    for index, record in enumerate(record_list):
+        if index:
+            yield b'\n'
+        for key, value in record.items():
+            value = str(value)
+            if '\n' not in value:
+                yield '{}: {}\n'.format(key, value).encode('UTF-8')
+                continue
+            yield '{}:\n'.format(key).encode('UTF-8')
+            for line in value.splitlines():
+                if not line.strip():
+                    line += '.'
+                yield ' {}\n'.format(line).encode('UTF-8')
@@ -40,6 +40,7 @@ try:
     import grp
 except ImportError:
     grp = None
+import io
 import itertools
 import json
 import logging
@@ -58,7 +59,6 @@ from plainbox.impl.depmgr import DependencyDuplicateError
 from plainbox.impl.depmgr import DependencyMissingError
 from plainbox.impl.resource import ExpressionCannotEvaluateError
 from plainbox.impl.resource import ExpressionFailedError
-from plainbox.impl.resource import ResourceProgramError
 from plainbox.impl.resource import Resource
 from plainbox.impl.secure.config import Unset
 from plainbox.impl.secure.origin import JobOutputTextSource
@@ -67,6 +67,7 @@ from plainbox.impl.secure.rfc822 import RFC822SyntaxError
 from plainbox.impl.secure.rfc822 import gen_rfc822_records
 from plainbox.impl.session.jobs import InhibitionCause
 from plainbox.impl.session.jobs import JobReadinessInhibitor
+from plainbox.impl.tracing import span
 from plainbox.impl.unit.job import JobDefinition
 from plainbox.impl.unit.template import TemplateUnit
 from plainbox.impl.unit.unit import MissingParam
@@ -119,16 +120,11 @@ class CheckBoxSessionStateController(ISessionStateController):
         direct = DependencyMissingError.DEP_TYPE_DIRECT
         ordering = DependencyMissingError.DEP_TYPE_ORDERING
         resource = DependencyMissingError.DEP_TYPE_RESOURCE
-        direct_deps = job.get_direct_dependencies()
-        after_deps = job.get_after_dependencies()
-        try:
-            resource_deps = job.get_resource_dependencies()
-        except ResourceProgramError:
-            resource_deps = ()
+        metadata = job.get_metadata()
         result = set(itertools.chain(
-            zip(itertools.repeat(direct), direct_deps),
-            zip(itertools.repeat(resource), resource_deps),
-            zip(itertools.repeat(ordering), after_deps)))
+            zip(itertools.repeat(direct), metadata.direct_deps),
+            zip(itertools.repeat(resource), metadata.resource_deps),
+            zip(itertools.repeat(ordering), metadata.after_deps)))
         return result
 
     def get_inhibitor_list(self, session_state, job):
@@ -146,8 +142,11 @@ class CheckBoxSessionStateController(ISessionStateController):
             List of JobReadinessInhibitor
         """
         inhibitors = []
+        metadata = job.get_metadata()
+        if metadata.resource_program_error is not None:
+            raise metadata.resource_program_error.with_traceback(None)
         # Check if all job resource requirements are met
-        prog = job.get_resource_program()
+        prog = metadata.resource_program
         if prog is not None:
             try:
                 prog.evaluate_or_raise(session_state.resource_map)
@@ -188,7 +187,7 @@ class CheckBoxSessionStateController(ISessionStateController):
                         related_expression=exc.expression)
                     inhibitors.append(inhibitor)
         # Check if all job dependencies ran successfully
-        for dep_id in sorted(job.get_direct_dependencies()):
+        for dep_id in sorted(metadata.direct_deps):
             dep_job_state = session_state.job_state_map[dep_id]
             # If the dependency did not have a chance to run yet add the
             # PENDING_DEP inhibitor.
@@ -208,7 +207,7 @@ class CheckBoxSessionStateController(ISessionStateController):
                     related_job=dep_job_state.job)
                 inhibitors.append(inhibitor)
         # Check if all "after" dependencies ran yet
-        for dep_id in sorted(job.get_after_dependencies()):
+        for dep_id in sorted(metadata.after_deps):
             dep_job_state = session_state.job_state_map[dep_id]
             # If the dependency did not have a chance to run yet add the
             # PENDING_DEP inhibitor.
@@ -217,7 +216,7 @@ class CheckBoxSessionStateController(ISessionStateController):
                     cause=InhibitionCause.PENDING_DEP,
                     related_job=dep_job_state.job)
                 inhibitors.append(inhibitor)
-        for dep_id in sorted(job.get_salvage_dependencies()):
+        for dep_id in sorted(metadata.salvage_deps):
             dep_job_state = session_state.job_state_map[dep_id]
             if dep_job_state.result.outcome != IJobResult.OUTCOME_FAIL:
                 inhibitor = JobReadinessInhibitor(
@@ -312,41 +311,48 @@ class CheckBoxSessionStateController(ISessionStateController):
         for unit in session_state.unit_list:
             if isinstance(unit, TemplateUnit) and unit.resource_id == job.id:
                 logger.info(_("Instantiating unit: %s"), unit)
-                for new_unit in unit.instantiate_all(
-                        session_state.resource_map[job.id], fake_resources):
-                    try:
-                        check_result = new_unit.check()
-                    except MissingParam as m:
-                        logger.debug(_("Ignoring %s with missing "
-                                         "template parameter %s"),
-                                         new_unit._raw_data.get('id'),
-                                         m.parameter)
-                        continue
-                    # Only ignore jobs for which check() returns an error
-                    if [c for c in check_result
-                            if c.severity == Severity.error]:
-                        logger.error(_("Ignoring invalid generated job %s"),
-                                     new_unit.id)
-                    else:
-                        session_state.add_unit(new_unit, via=job, recompute=False)
+                with span('instantiate template', category='session',
+                          template=unit.id):
+                    self._instantiate_template(
+                        session_state, job, unit, fake_resources)
         session_state._recompute_job_readiness()
 
+    def _instantiate_template(self, session_state, job, template,
+                              fake_resources):
+        for new_unit in template.instantiate_all(
+                session_state.resource_map[job.id], fake_resources):
+            try:
+                check_result = new_unit.check()
+            except MissingParam as m:
+                logger.debug(_("Ignoring %s with missing "
+                               "template parameter %s"),
+                             new_unit._raw_data.get('id'),
+                             m.parameter)
+                continue
+            # Only ignore jobs for which check() returns an error
+            if [c for c in check_result
+                    if c.severity == Severity.error]:
+                logger.error(_("Ignoring invalid generated job %s"),
+                             new_unit.id)
+            else:
+                session_state.add_unit(new_unit, via=job, recompute=False)
+
 
 def gen_rfc822_records_from_io_log(job, result):
     """
     Convert io_log from a job result to a sequence of rfc822 records
     """
     logger.debug(_("processing output from a job: %r"), job)
-    # Select all stdout lines from the io log
-    line_gen = (record[2].decode('UTF-8', errors='replace')
-                for record in result.get_io_log()
-                if record[1] == 'stdout')
+    # Select all stdout lines from the io log and parse them in one go
+    stream = io.StringIO(b''.join(
+        record[2] for record in result.get_io_log()
+        if record[1] == 'stdout').decode('UTF-8', errors='replace'))
     # Allow the generated records to be traced back to the job that defined
     # the command which produced (printed) them.
     source = JobOutputTextSource(job)
     try:
         # Parse rfc822 records from the subsequent lines
-        for record in gen_rfc822_records(line_gen, source=source):
+        for record in gen_rfc822_records(stream, source=source):
             yield record
     except RFC822SyntaxError as exc:
         # When this exception happens we will _still_ store all the
@@ -27,28 +27,51 @@ __all__ = ['raises']
 _bug_logger = logging.getLogger("plainbox.bug")
 
 
+# Separates positional from keyword arguments in method cache keys
+_KWARGS_MARK = object()
+
+
 def instance_method_lru_cache(*cache_args, **cache_kwargs):
     '''
     Just like functools.lru_cache, but a new cache is created for each instance
     of the class that owns the method this is applied to.
-    See https://gist.github.com/z0u/9df24dda2b1fe0613a85e7349d5f7d62
+
+    All the cached methods of an instance share one dictionary, stored in the
+    ``_method_cache`` attribute of the instance, instead of each getting their
+    own ``functools.lru_cache`` object. This keeps objects that are created
+    in large numbers (such as units) small. Since the cache is never trimmed
+    the arguments of the decorator are accepted for compatibility only. Use
+    :func:`clear_instance_method_cache()` to forget the cached values.
     '''
     def cache_decorator(func):
         @functools.wraps(func)
-        def cache_factory(self, *args, **kwargs):
-            # Wrap the function in a cache by calling the decorator
-            instance_cache = functools.lru_cache(*cache_args, **cache_kwargs)(func)
-            # Bind the decorated function to the instance to make it a method
-            instance_cache = instance_cache.__get__(self, self.__class__)
-            setattr(self, func.__name__, instance_cache)
-            # Call the instance cache now. Next time the method is called, the
-            # call will go directly to the instance cache and not via this
-            # decorator.
-            return instance_cache(*args, **kwargs)
-        return cache_factory
+        def cached_method(self, *args, **kwargs):
+            if kwargs:
+                key = ((func,) + args + (_KWARGS_MARK,) +
+                       tuple(sorted(kwargs.items())))
+            else:
+                key = (func,) + args
+            try:
+                cache = self.__dict__['_method_cache']
+            except KeyError:
+                cache = self.__dict__['_method_cache'] = {}
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            value = cache[key] = func(self, *args, **kwargs)
+            return value
+        return cached_method
     return cache_decorator
 
 
+def clear_instance_method_cache(instance):
+    """
+    Forget all the values cached by :func:`instance_method_lru_cache()`.
+    """
+    instance.__dict__.pop('_method_cache', None)
+
+
 class cached_property(object):
     """
     Decorator that converts a method with a single self argument into a
@@ -34,6 +34,7 @@ from logging import getLogger
 import enum
 
 from plainbox.i18n import gettext as _
+from plainbox.impl.tracing import traced
 
 
 logger = getLogger("plainbox.depmgr")
@@ -287,6 +288,7 @@ class DependencySolver:
     COLOR_BLACK = Color.BLACK
 
     @classmethod
+    @traced('resolve dependencies', category='session')
     def resolve_dependencies(cls, job_list, visit_list=None):
         """
         Solve the dependency graph expressed as a list of job definitions.
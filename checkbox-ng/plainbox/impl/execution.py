@@ -35,7 +35,12 @@ import time
 
 from plainbox.abc import IJobResult, IJobRunner
 from plainbox.i18n import gettext as _
+from plainbox.impl.collectors import collectors_enabled
+from plainbox.impl.collectors import gen_rfc822_lines
+from plainbox.impl.collectors import get_collector_for_job
 from plainbox.impl.color import Colorizer
+from plainbox.impl.metrics import METRICS_FILE_ENV
+from plainbox.impl.metrics import load_metrics_file
 from plainbox.impl.unit.job import supported_plugins
 from plainbox.impl.unit.unit import on_ubuntucore
 from plainbox.impl.result import IOLogRecordWriter
@@ -45,8 +50,12 @@ from plainbox.impl.runner import IOLogRecordGenerator
 from plainbox.impl.runner import JobRunnerUIDelegate
 from plainbox.impl.runner import slugify
 from plainbox.impl.jobcache import ResourceJobCache
+from plainbox.impl.secure.root_broker import RootBrokerClient
+from plainbox.impl.secure.root_broker import RootBrokerError
+from plainbox.impl.secure.root_broker import root_broker_enabled
 from plainbox.impl.secure.sudo_broker import sudo_password_provider
 from plainbox.impl.session.storage import WellKnownDirsHelper
+from plainbox.impl.tracing import span
 from plainbox.vendor import extcmd
 
 logger = logging.getLogger("plainbox.unified")
@@ -80,6 +89,8 @@ class UnifiedRunner(IJobRunner):
         self._password_provider = password_provider
         self._stdin = stdin
         self._running_jobs_pid = None
+        self._running_brokered_process = None
+        self._root_broker = None
         self._extra_env = extra_env
 
     def run_job(self, job, job_state, environ=None, ui=None):
@@ -102,10 +113,13 @@ class UnifiedRunner(IJobRunner):
 
         # for cached resource jobs we get the result using cache
         # if it's not in the cache, ordinary "_run_command" will be run
-        if job.plugin == 'resource' and 'cachable' in job.get_flag_set():
+        if job.plugin == 'resource' and (
+                'cachable' in job.get_flag_set() or job.cache_probes):
             from_cache, result = self._resource_cache.get(
-                job.checksum, lambda: self._run_command(
-                    job, environ).get_result())
+                job, lambda: self._run_command(
+                    job, environ).get_result(),
+                self.get_record_path_for_job(job),
+                self._get_nested_bin_dir_list(job))
             if from_cache:
                 print(Colorizer().header(_("Using cached data!")))
                 jrud = self._job_runner_ui_delegate
@@ -146,7 +160,46 @@ class UnifiedRunner(IJobRunner):
         return []
 
     def _run_command(self, job, environ):
+        collector = self._get_collector(job)
+        if collector is not None:
+            result_builder = self._run_collector(job, environ, collector)
+            if result_builder is not None:
+                return result_builder
+        # don't pick up the metrics of a previous run of the job
+        metrics_path = self.get_metrics_path_for_job(job)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(metrics_path)
         start_time = time.time()
+        with self._io_log_delegate(job) as (delegate, log):
+            ecmd = extcmd.ExternalCommandWithDelegate(delegate)
+            return_code = self.execute_job(job, environ, ecmd, self._stdin)
+        if return_code == 0:
+            outcome = IJobResult.OUTCOME_PASS
+        elif return_code < 0:
+            outcome = IJobResult.OUTCOME_CRASH
+        else:
+            outcome = IJobResult.OUTCOME_FAIL
+        result_builder = JobResultBuilder(
+            outcome=outcome,
+            return_code=return_code,
+            io_log_filename=log,
+            execution_duration=time.time() - start_time)
+        metric_list = load_metrics_file(metrics_path)
+        if metric_list:
+            logger.debug(_("job[%s] reported %d metrics"),
+                         job.id, len(metric_list))
+            result_builder.metrics = metric_list
+        return result_builder
+
+    @contextlib.contextmanager
+    def _io_log_delegate(self, job):
+        """
+        Context manager with the delegate recording the output of a job.
+
+        :returns:
+            A tuple with the extcmd delegate and the pathname of the
+            structured I/O log it writes to
+        """
         slug = slugify(job.id)
         output_writer = CommandOutputWriter(
             stdout_path=os.path.join(
@@ -162,26 +215,112 @@ class UnifiedRunner(IJobRunner):
             delegate = extcmd.Chain([
                 self._job_runner_ui_delegate, io_log_gen,
                 self._command_io_delegate, output_writer])
-            ecmd = extcmd.ExternalCommandWithDelegate(delegate)
-            return_code = self.execute_job(job, environ, ecmd, self._stdin)
-            io_log_gen.on_new_record.disconnect(writer.write_record)
-        if return_code == 0:
-            outcome = IJobResult.OUTCOME_PASS
-        elif return_code < 0:
-            outcome = IJobResult.OUTCOME_CRASH
-        else:
-            outcome = IJobResult.OUTCOME_FAIL
+            try:
+                yield delegate, log
+            finally:
+                io_log_gen.on_new_record.disconnect(writer.write_record)
+
+    def _get_collector(self, job):
+        """Get the in-process collector to use for a job, if any."""
+        if not collectors_enabled():
+            return None
+        # collectors run in this process, so they can only stand in for
+        # commands that would run as the current user
+        target_user = job.user or self._user_provider()
+        if target_user and target_user != getpass.getuser():
+            return None
+        return get_collector_for_job(job)
+
+    def _run_collector(self, job, environ, collector):
+        """
+        Produce the output of a resource job with an in-process collector.
+
+        The records are written to the I/O log exactly as the equivalent
+        resource script would print them, so the result is indistinguishable
+        from the one of the command.
+
+        :returns:
+            A JobResultBuilder or None if the collector failed and the command
+            should be executed instead
+        """
+        start_time = time.time()
+        with self.configured_filesystem(job) as nest_dir:
+            env = get_execution_environment(
+                job, environ, self._session_id, nest_dir)
+            try:
+                with span('collect', category='execution',
+                          collector=collector.name):
+                    record_list = collector.collect(env)
+            except Exception as exc:
+                logger.warning(
+                    _("Resource collector %s failed (%s), running the"
+                      " command instead"), collector.name, exc)
+                return None
+        logger.debug(_("job[%s] collected %d records in-process"),
+                     job.id, len(record_list))
+        with self._io_log_delegate(job) as (delegate, log):
+            delegate.on_begin((collector.name,), {})
+            for line in gen_rfc822_lines(record_list):
+                delegate.on_line('stdout', line)
+            delegate.on_end(0)
         return JobResultBuilder(
-            outcome=outcome,
-            return_code=return_code,
+            outcome=IJobResult.OUTCOME_PASS,
+            return_code=0,
             io_log_filename=log,
             execution_duration=time.time() - start_time)
 
+    def _get_root_broker(self):
+        """
+        Get the privileged runner broker, starting it on first use.
+
+        :returns:
+            A running :class:`RootBrokerClient` or None if root jobs have to
+            be started with sudo (the broker is disabled or cannot start)
+        """
+        if self._root_broker is None:
+            self._root_broker = False
+            if root_broker_enabled():
+                broker = RootBrokerClient(self._password_provider)
+                try:
+                    broker.start()
+                except RootBrokerError as exc:
+                    logger.warning(
+                        _("Cannot start the privileged runner broker (%s),"
+                          " using sudo for each job"), exc)
+                else:
+                    self._root_broker = broker
+        if self._root_broker and not self._root_broker.is_running:
+            logger.warning(_("The privileged runner broker stopped, using"
+                             " sudo for each job"))
+            self._root_broker = False
+        return self._root_broker or None
+
     def execute_job(self, job, environ, extcmd_popen, stdin=None):
         """Run the 'binary' associated with the job."""
         target_user = job.user or self._user_provider()
         if target_user == getpass.getuser():
             target_user = None
+        # Root jobs are started by the broker, which is authenticated once
+        # per session, instead of going through sudo each time
+        if target_user == 'root':
+            broker = self._get_root_broker()
+            if broker:
+                try:
+                    return self._execute_job(
+                        job, environ, extcmd_popen, stdin, target_user,
+                        broker)
+                except RootBrokerError as exc:
+                    logger.warning(
+                        _("job[%s] cannot be started by the privileged"
+                          " runner broker (%s), using sudo for each job"),
+                        job.id, exc)
+                    broker.stop()
+                    self._root_broker = False
+        return self._execute_job(
+            job, environ, extcmd_popen, stdin, target_user)
+
+    def _execute_job(self, job, environ, extcmd_popen, stdin, target_user,
+                     broker=None):
 
         def call(extcmd_popen, *args, **kwargs):
             """Handle low-level subprocess stuff."""
@@ -198,7 +337,7 @@ class UnifiedRunner(IJobRunner):
             # we need it only if the target user differs from the one that
             # started checkbox and when changing the user (sudo) requires
             # password
-            if target_user and self._password_provider:
+            if target_user and self._password_provider and not broker:
                 password = self._password_provider()
                 if password:
                     os.write(in_w, password + b'\n')
@@ -219,62 +358,97 @@ class UnifiedRunner(IJobRunner):
                 except BrokenPipeError:
                     pass
                 os.close(in_w)
-            forwarder_thread = threading.Thread(
-                target=stdin_forwarder, args=(stdin,))
-            forwarder_thread.start()
-            kwargs['stdin'] = in_r
-
-            # Start the process
-            proc = extcmd_popen._popen(*args, **kwargs)
-            self._running_jobs_pid = proc.pid
-            # Setup all worker threads. By now the pipes have been created and
-            # proc.stdout/proc.stderr point to open pipe objects.
-            stdout_reader = threading.Thread(
-                target=extcmd_popen._read_stream, args=(proc.stdout, "stdout"))
-            stderr_reader = threading.Thread(
-                target=extcmd_popen._read_stream, args=(proc.stderr, "stderr"))
-            queue_worker = threading.Thread(target=extcmd_popen._drain_queue)
-            # Start all workers
-            queue_worker.start()
-            stdout_reader.start()
-            stderr_reader.start()
-            try:
-                while True:
+            with span('spawn', category='execution'):
+                forwarder_thread = threading.Thread(
+                    target=stdin_forwarder, args=(stdin,))
+                forwarder_thread.start()
+                kwargs['stdin'] = in_r
+
+                # Start the process
+                if broker:
                     try:
-                        proc.wait()
-                        break
-                    except KeyboardInterrupt:
+                        proc = broker.spawn(
+                            *args, env=kwargs['env'], cwd=kwargs.get('cwd'),
+                            stdin=in_r)
+                    except RootBrokerError:
+                        # execute_job starts the job with sudo instead
                         is_alive = False
-                        import signal
-                        self.send_signal(signal.SIGKILL, target_user)
-                        # And send a notification about this
-                        extcmd_popen._delegate.on_interrupt()
-            finally:
-                self._running_jobs_pid = None
-                # Wait until all worker threads shut down
-                stdout_reader.join()
-                proc.stdout.close()
-                stderr_reader.join()
-                proc.stderr.close()
-                # Tell the queue worker to shut down
-                extcmd_popen._queue.put(None)
-                queue_worker.join()
-                os.close(in_r)
-                is_alive = False
-                forwarder_thread.join()
+                        forwarder_thread.join()
+                        os.close(in_r)
+                        raise
+                    self._running_brokered_process = proc
+                else:
+                    proc = extcmd_popen._popen(*args, **kwargs)
+                self._running_jobs_pid = proc.pid
+                # Setup all worker threads. By now the pipes have been created
+                # and proc.stdout/proc.stderr point to open pipe objects.
+                stdout_reader = threading.Thread(
+                    target=extcmd_popen._read_stream,
+                    args=(proc.stdout, "stdout"))
+                stderr_reader = threading.Thread(
+                    target=extcmd_popen._read_stream,
+                    args=(proc.stderr, "stderr"))
+                queue_worker = threading.Thread(
+                    target=extcmd_popen._drain_queue)
+                # Start all workers
+                queue_worker.start()
+                stdout_reader.start()
+                stderr_reader.start()
+            with span('I/O', category='execution'):
+                try:
+                    while True:
+                        try:
+                            proc.wait()
+                            break
+                        except KeyboardInterrupt:
+                            is_alive = False
+                            import signal
+                            self.send_signal(signal.SIGKILL, target_user)
+                            # And send a notification about this
+                            extcmd_popen._delegate.on_interrupt()
+                finally:
+                    self._running_jobs_pid = None
+                    self._running_brokered_process = None
+                    # Wait until all worker threads shut down
+                    stdout_reader.join()
+                    proc.stdout.close()
+                    stderr_reader.join()
+                    proc.stderr.close()
+                    # Tell the queue worker to shut down
+                    extcmd_popen._queue.put(None)
+                    queue_worker.join()
+                    os.close(in_r)
+                    is_alive = False
+                    forwarder_thread.join()
             # Notify that the process has finished
             extcmd_popen._delegate.on_end(proc.returncode)
             return proc.returncode
+        metrics_path = self.get_metrics_path_for_job(job)
+
+        def extra_env():
+            """Get the extra environment, it is preserved by sudo."""
+            env = dict(self._extra_env() or {}) if self._extra_env else {}
+            env[METRICS_FILE_ENV] = metrics_path
+            return env
+
         # Setup the executable nest directory
         with self.configured_filesystem(job) as nest_dir:
             # Get the command and the environment.
             # of this execution controller
-            cmd = get_execution_command(job, environ, self._session_id,
-                                        nest_dir, target_user, self._extra_env)
-            env = get_execution_environment(job, environ, self._session_id,
-                                            nest_dir)
-            if self._user_provider():
-                env['NORMAL_USER'] = self._user_provider()
+            if broker:
+                # The environment is applied on top of the one sudo gave
+                # to the broker, like the one on the sudo command line
+                cmd = get_shell_command(job)
+                env = get_differential_execution_environment(
+                    job, environ, self._session_id, nest_dir, extra_env)
+            else:
+                cmd = get_execution_command(job, environ, self._session_id,
+                                            nest_dir, target_user, extra_env)
+                env = get_execution_environment(
+                    job, environ, self._session_id, nest_dir)
+                env[METRICS_FILE_ENV] = metrics_path
+                if self._user_provider():
+                    env['NORMAL_USER'] = self._user_provider()
             # run the command
             logger.debug(_("job[%(ID)s] executing %(CMD)r with env %(ENV)r"),
                          {"ID": job.id, "CMD": cmd,
@@ -292,6 +466,15 @@ class UnifiedRunner(IJobRunner):
                 signal.pause()
             return return_code
 
+    def _get_nested_bin_dir_list(self, job):
+        """
+        Get the bin directories of the providers which executables are put
+        in the nest of the job, see :meth:`configured_filesystem()`.
+        """
+        return [provider.bin_dir for provider in self._provider_list
+                if provider.namespace == job.provider.namespace and
+                provider.bin_dir is not None]
+
     @contextlib.contextmanager
     def configured_filesystem(self, job):
         """
@@ -305,16 +488,23 @@ class UnifiedRunner(IJobRunner):
         # Create a nest for all the private executables needed for execution
         prefix = 'nest-'
         suffix = '.{}'.format(job.checksum)
-        with tempfile.TemporaryDirectory(suffix, prefix) as nest_dir:
-            os.chmod(nest_dir, 0o777)
-            logger.debug(_("Symlink nest for executables: %s"), nest_dir)
-            from plainbox.impl.ctrl import SymLinkNest
-            nest = SymLinkNest(nest_dir)
-            # Add all providers sharing namespace with the current job to PATH
-            for provider in self._provider_list:
-                if job.provider.namespace == provider.namespace:
-                    nest.add_provider(provider)
+        nest_tmp_dir = tempfile.TemporaryDirectory(suffix, prefix)
+        try:
+            with span('nest setup', category='execution'):
+                nest_dir = nest_tmp_dir.name
+                os.chmod(nest_dir, 0o777)
+                logger.debug(_("Symlink nest for executables: %s"), nest_dir)
+                from plainbox.impl.ctrl import SymLinkNest
+                nest = SymLinkNest(nest_dir)
+                # Add all providers sharing namespace with the current job to
+                # PATH
+                for provider in self._provider_list:
+                    if job.provider.namespace == provider.namespace:
+                        nest.add_provider(provider)
             yield nest_dir
+        finally:
+            with span('nest teardown', category='execution'):
+                nest_tmp_dir.cleanup()
 
     @contextlib.contextmanager
     def temporary_cwd(self, job):
@@ -369,8 +559,15 @@ class UnifiedRunner(IJobRunner):
         return os.path.join(self._jobs_io_log_dir,
                             "{}.record.gz".format(slugify(job.id)))
 
+    def get_metrics_path_for_job(self, job):
+        return os.path.join(self._jobs_io_log_dir,
+                            "{}.metrics".format(slugify(job.id)))
+
     def send_signal(self, signal, target_user):
-        if not target_user:
+        if self._running_brokered_process:
+            # the broker runs as root, it can kill the process
+            self._running_brokered_process.send_signal(signal)
+        elif not target_user:
             os.kill(self._running_jobs_pid, signal)
         else:
             # process used sudo, so sudo is needed to kill it
@@ -569,6 +766,13 @@ def get_execution_command(job, environ, session_id,
             env.update(extra_env())
     cmd += ["{key}={value}".format(key=key, value=value)
             for key, value in sorted(env.items())]
+    cmd += get_shell_command(job)
+    return cmd
+
+
+def get_shell_command(job):
+    """Generate the argv running the command of a job in its shell."""
+    cmd = []
     # Run the command unconfined on ubuntu core because of snap-confine fixes
     # related to https://ubuntu.com/security/CVE-2021-44731
     if on_ubuntucore():
@@ -192,7 +192,7 @@ class SessionStateExporterBase(ISessionStateExporter):
         self.dump(self.get_session_data_subset(
             self._trim_session_manager(session_manager)), stream)
 
-    def get_session_data_subset(self, session_manager):
+    def get_session_data_subset(self, session_manager, with_io_logs=True):
         """
         Compute a subset of session data.
 
@@ -202,11 +202,20 @@ class SessionStateExporterBase(ISessionStateExporter):
         Must return a collection that can be handled by :meth:`dump()`.
         Special care must be taken when processing io_log (and in the future,
         attachments) as those can be arbitrarily large.
+
+        :param with_io_logs:
+            If False, the I/O logs and attachments are left out even when
+            the options ask for them, for exporters reading them from the
+            job results instead.
         """
         data = {
             'result_map': {}
         }
         session = session_manager.state
+        with_io_log = (
+            with_io_logs and self.OPTION_WITH_IO_LOG in self._option_list)
+        with_attachments = (
+            with_io_logs and self.OPTION_WITH_ATTACHMENTS in self._option_list)
         if self.OPTION_WITH_JOB_LIST in self._option_list:
             data['job_list'] = [job.id for job in session.job_list]
         if self.OPTION_WITH_RUN_LIST in self._option_list:
@@ -227,7 +236,7 @@ class SessionStateExporterBase(ISessionStateExporter):
                 for resource_name, resource_list
                 in session._resource_map.items()
             }
-        if self.OPTION_WITH_ATTACHMENTS in self._option_list:
+        if with_attachments:
             data['attachment_map'] = {}
         if self.OPTION_WITH_CATEGORY_MAP in self._option_list:
             wanted_category_ids = frozenset({
@@ -256,6 +265,9 @@ class SessionStateExporterBase(ISessionStateExporter):
             if job_state.result.execution_duration:
                 data['result_map'][job_id]['execution_duration'] = \
                     job_state.result.execution_duration
+            if job_state.result.metrics:
+                data['result_map'][job_id]['metrics'] = [
+                    metric._asdict() for metric in job_state.result.metrics]
             if self.OPTION_WITH_COMMENTS in self._option_list:
                 data['result_map'][job_id]['comments'] = \
                     job_state.result.comments
@@ -279,12 +291,12 @@ class SessionStateExporterBase(ISessionStateExporter):
 
             # Add Attachments if requested
             if job_state.job.plugin == 'attachment':
-                if self.OPTION_WITH_ATTACHMENTS in self._option_list:
+                if with_attachments:
                     self._build_attachment_map(data, job_id, job_state)
                 continue  # Don't add attachments IO logs to the result_map
 
             # Add IO log if requested
-            if self.OPTION_WITH_IO_LOG in self._option_list:
+            if with_io_log:
                 # If requested, squash the IO log so that only textual data is
                 # saved, discarding stream name and the relative timestamp.
                 if self.OPTION_SQUASH_IO_LOG in self._option_list:
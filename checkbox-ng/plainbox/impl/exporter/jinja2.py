@@ -28,6 +28,7 @@
 import json
 import re
 from collections import OrderedDict
+from collections import defaultdict
 from datetime import datetime
 
 from jinja2 import Environment
@@ -38,7 +39,9 @@ from jinja2 import escape
 
 from plainbox import get_version_string
 from plainbox.abc import ISessionStateExporter
+from plainbox.impl.decorators import cached_property
 from plainbox.impl.exporter import SessionStateExporterBase
+from plainbox.impl.result import IJobResult
 from plainbox.impl.result import OUTCOME_METADATA_MAP
 from plainbox.impl.unit.exporter import ExporterError
 
@@ -74,6 +77,158 @@ def highlight_keys(text):
     return re.sub('(\w+:\s)', r'<b>\1</b>', text)
 
 
+def global_outcome(outcome_list):
+    """
+    Compute the outcome summarizing a group of results.
+
+    The group fails if any result failed or crashed, it passes if any result
+    passed and is skipped otherwise.
+    """
+    outcome_set = frozenset(outcome_list)
+    if outcome_set & {IJobResult.OUTCOME_FAIL, IJobResult.OUTCOME_CRASH}:
+        return IJobResult.OUTCOME_FAIL
+    if IJobResult.OUTCOME_PASS in outcome_set:
+        return IJobResult.OUTCOME_PASS
+    return IJobResult.OUTCOME_SKIP
+
+
+class ReportJob:
+
+    """
+    A job with a result, as presented in reports.
+
+    The I/O log of a result is stored compressed on disk and each access to
+    the ``io_log_as_*`` properties of the result decodes it again. This class
+    decodes it the first time it is needed and keeps the text for the rest of
+    the rendering.
+    """
+
+    def __init__(self, job_id, job_state):
+        self.id = job_id
+        self.job = job_state.job
+        self.result = job_state.result
+        self.plugin = job_state.job.plugin
+        self.category_id = job_state.effective_category_id
+        self.certification_status = (
+            job_state.effective_certification_status)
+
+    @cached_property
+    def outcome_meta(self):
+        return self.result.outcome_meta()
+
+    @cached_property
+    def io_log_as_flat_text(self):
+        return self.result.io_log_as_flat_text
+
+    @cached_property
+    def io_log_as_text_attachment(self):
+        return self.result.io_log_as_text_attachment
+
+    @cached_property
+    def img_type(self):
+        return self.result.img_type
+
+
+class ReportCategory:
+
+    """A category of a report with the test jobs it contains."""
+
+    def __init__(self, category_id, name, job_list):
+        self.id = category_id
+        self.name = name
+        self.job_list = job_list
+        self.outcome = global_outcome(
+            job.result.outcome for job in job_list)
+
+
+class ReportViewModel:
+
+    """
+    Session data precomputed for the templates.
+
+    Only jobs with a result are part of the report. Jobs are sorted by id and
+    categories by name, so that templates can render them with single loops
+    instead of filtering the whole job state map over and over. Everything
+    is computed the first time a template needs it.
+    """
+
+    def __init__(self, state):
+        self._state = state
+
+    @cached_property
+    def job_map(self):
+        """Mapping from job id to :class:`ReportJob`, sorted by job id."""
+        return OrderedDict(
+            (job_id, ReportJob(job_id, job_state))
+            for job_id, job_state in sorted(
+                self._state.job_state_map.items())
+            if job_state.result.outcome is not None)
+
+    @cached_property
+    def _plugin_map(self):
+        plugin_map = {'resource': [], 'attachment': [], 'test': []}
+        for job in self.job_map.values():
+            plugin_map.get(job.plugin, plugin_map['test']).append(job)
+        return plugin_map
+
+    @property
+    def test_list(self):
+        """Jobs that are neither resources nor attachments."""
+        return self._plugin_map['test']
+
+    @property
+    def resource_list(self):
+        """Resource jobs."""
+        return self._plugin_map['resource']
+
+    @property
+    def attachment_list(self):
+        """Attachment jobs."""
+        return self._plugin_map['attachment']
+
+    @cached_property
+    def category_map(self):
+        """Mapping from category id to the name of the used categories."""
+        used_category_ids = frozenset(
+            job.category_id for job in self.job_map.values())
+        return {
+            unit.id: unit.tr_name()
+            for unit in self._state.unit_list
+            if unit.Meta.name == 'category'
+            and unit.id in used_category_ids
+        }
+
+    @cached_property
+    def category_list(self):
+        """Categories of the test jobs, as :class:`ReportCategory`."""
+        job_list_map = defaultdict(list)
+        for job in self.test_list:
+            job_list_map[job.category_id].append(job)
+        category_list = [
+            ReportCategory(category_id, name, job_list_map[category_id])
+            for category_id, name in self.category_map.items()
+            if category_id in job_list_map]
+        category_list.sort(key=lambda category: category.name.lower())
+        return category_list
+
+    @cached_property
+    def outcome_stats(self):
+        """Mapping from outcome to the number of test jobs with it."""
+        stats = defaultdict(int)
+        for job in self.test_list:
+            stats[job.result.outcome] += 1
+        return stats
+
+    @cached_property
+    def resource_outcome(self):
+        return global_outcome(job.result.outcome for job in self.resource_list)
+
+    @cached_property
+    def attachment_outcome(self):
+        return global_outcome(
+            job.result.outcome for job in self.attachment_list)
+
+
 class Jinja2SessionStateExporter(SessionStateExporterBase):
 
     """Session state exporter that renders output using jinja2 template."""
@@ -175,6 +330,7 @@ class Jinja2SessionStateExporter(SessionStateExporterBase):
             'client_name': self._client_name,
             'client_version': self._client_version,
             'manager': session_manager,
+            'report': ReportViewModel(session_manager.state),
             'app_blob': app_blob_data,
             'options': self.option_list,
             'system_id': self._system_id,
@@ -200,6 +356,9 @@ class Jinja2SessionStateExporter(SessionStateExporterBase):
             'client_name': self._client_name,
             'client_version': self._client_version,
             'manager_list': session_manager_list,
+            'report_list': [
+                ReportViewModel(session_manager.state)
+                for session_manager in session_manager_list],
             'app_blob': {},
             'options': self.option_list,
             'system_id': self._system_id,
@@ -25,6 +25,10 @@
     THIS MODULE DOES NOT HAVE STABLE PUBLIC API
 """
 
+import base64
+import gzip
+import io
+import json
 import os
 import tarfile
 import time
@@ -32,14 +36,35 @@ from tempfile import SpooledTemporaryFile
 
 from plainbox.impl.exporter import SessionStateExporterBase
 from plainbox.impl.exporter.jinja2 import Jinja2SessionStateExporter
+from plainbox.impl.exporter.jinja2 import ReportViewModel
 from plainbox.impl.providers import get_providers
 from plainbox.impl.unit.exporter import ExporterUnitSupport
 
 
 class TARSessionStateExporter(SessionStateExporterBase):
-    """Session state exporter creating Tar archives."""
+    """
+    Session state exporter creating Tar archives.
 
-    SUPPORTED_OPTION_LIST = ()
+    With the ``paged-html`` option, ``submission.html`` only holds the
+    summary of the session. The static files it uses are stored once in
+    ``report/assets`` and the tables of each category and the log of each job
+    are stored as separate compressed fragments in ``report/fragments``, that
+    the page loads when they are displayed.
+    """
+
+    OPTION_PAGED_HTML = 'paged-html'
+
+    SUPPORTED_OPTION_LIST = (OPTION_PAGED_HTML,)
+
+    #: Files of the exporters provider used by the paged HTML report
+    PAGED_HTML_ASSET_LIST = (
+        'jquery.mobile.min.css',
+        'checkbox.css',
+        'jquery.min.js',
+        'jquery-mobile.min.js',
+        'Chart.min.js',
+        'checkbox-paged.js',
+    )
 
     def dump_from_session_manager(self, manager, stream):
         """
@@ -63,12 +88,16 @@ class TARSessionStateExporter(SessionStateExporterBase):
         if mem_mib < 1200:
             preset = 0
 
+        paged_html = self.OPTION_PAGED_HTML in self._option_list
         job_state_map = manager.default_device_context.state.job_state_map
         with tarfile.TarFile.open(None, 'w:xz', stream, preset=preset) as tar:
             for fmt in ('html', 'json', 'junit'):
                 unit = self._get_all_exporter_units()[
                     'com.canonical.plainbox::{}'.format(fmt)]
                 exporter = Jinja2SessionStateExporter(exporter_unit=unit)
+                if fmt == 'html' and paged_html:
+                    exporter.template = exporter.template.environment\
+                        .get_template('checkbox-paged.html')
                 with SpooledTemporaryFile(max_size=102400, mode='w+b') as _s:
                     exporter.dump_from_session_manager(manager, _s)
                     tarinfo = tarfile.TarInfo(name="submission.{}".format(fmt))
@@ -76,6 +105,11 @@ class TARSessionStateExporter(SessionStateExporterBase):
                     tarinfo.mtime = time.time()
                     _s.seek(0)  # Need to rewind the file, puagh
                     tar.addfile(tarinfo, _s)
+                if fmt == 'html' and paged_html:
+                    # the summary page and the fragments are both built
+                    # from a ReportViewModel of the session, their names
+                    # match
+                    self._add_paged_html_files(tar, unit.data_dir, manager)
             for job_id in manager.default_device_context.state.job_state_map:
                 job_state = job_state_map[job_id]
                 try:
@@ -97,6 +131,83 @@ class TARSessionStateExporter(SessionStateExporterBase):
     def dump(self, session, stream):
         pass
 
+    def _add_paged_html_files(self, tar, data_dir, manager):
+        """Add the assets and the fragments of the paged HTML report."""
+        for name in self.PAGED_HTML_ASSET_LIST:
+            tar.add(os.path.join(data_dir, name),
+                    'report/assets/{}'.format(name), recursive=False)
+        report = ReportViewModel(manager.state)
+        for index, category in enumerate(report.category_list, 1):
+            self._add_fragment(tar, 'category-{}'.format(index), [
+                self._add_job_fragment(
+                    tar, job, '{}-{}'.format(index, job_index))
+                for job_index, job in enumerate(category.job_list, 1)])
+        self._add_fragment(tar, 'resources', [
+            self._add_job_fragment(tar, job, 'resource-{}'.format(index))
+            for index, job in enumerate(report.resource_list, 1)])
+        self._add_fragment(tar, 'attachments', [
+            self._add_job_fragment(tar, job, 'attachment-{}'.format(index))
+            for index, job in enumerate(report.attachment_list, 1)])
+
+    def _add_job_fragment(self, tar, job, name):
+        """
+        Add the fragment with the log of a job.
+
+        The log is read from the result directly, so that it is not kept in
+        memory once added.
+
+        :returns:
+            The row of the job in the table of its category
+        """
+        result = job.result
+        log = {'title': job.job.tr_summary()}
+        if job.plugin == 'attachment':
+            link = 'View'
+            img_type = result.img_type
+            if img_type:
+                log['image_type'] = img_type
+                log['image'] = result.io_log_as_base64
+            else:
+                log['text'] = result.io_log_as_text_attachment
+        else:
+            link = 'I/O log'
+            log['text'] = result.io_log_as_flat_text
+        has_log = bool(log.get('image') or log.get('text'))
+        if has_log:
+            self._add_fragment(tar, name, log)
+        certification_status = job.certification_status
+        if certification_status == 'unspecified':
+            certification_status = ''
+        return {
+            'id': job.id.split('::')[-1],
+            'outcome': job.outcome_meta.tr_label,
+            'color': job.outcome_meta.color_hex,
+            'certification_status': certification_status,
+            'comments': result.comments or '',
+            'log': name if has_log else None,
+            'link': link,
+        }
+
+    def _add_fragment(self, tar, name, payload):
+        """
+        Add a fragment of the paged HTML report.
+
+        The JSON payload is compressed and wrapped in a script that hands it
+        to the report page, see ``checkbox-paged.js``.
+        """
+        compressed = io.BytesIO()
+        # a fixed mtime keeps the fragments of a session reproducible
+        with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as gz:
+            gz.write(json.dumps(payload).encode('UTF-8'))
+        data = base64.b64encode(compressed.getvalue()).decode('ASCII')
+        script = 'checkboxReport.fragmentLoaded({}, "{}");\n'.format(
+            json.dumps(name), data).encode('UTF-8')
+        tarinfo = tarfile.TarInfo(
+            name='report/fragments/{}.js'.format(name))
+        tarinfo.size = len(script)
+        tarinfo.mtime = time.time()
+        tar.addfile(tarinfo, io.BytesIO(script))
+
     def _get_all_exporter_units(self):
         exporter_map = {}
         for provider in get_providers():
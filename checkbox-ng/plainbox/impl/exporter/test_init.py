@@ -252,6 +252,22 @@ class SessionStateExporterBaseTests(TestCase):
         # This is to make sure we didn't miss anything by being too smart
         self.assertEqual(data, expected_data)
 
+    def test_without_io_logs(self):
+        # I/O logs and attachments can be left out whatever the options
+        with TemporaryDirectory() as scratch_dir:
+            exporter = self.TestSessionStateExporter(
+                self.TestSessionStateExporter.supported_option_list)
+            option_list = list(exporter._option_list)
+            session_manager = mock.Mock(
+                spec_set=SessionManager,
+                state=self.make_realistic_test_session(scratch_dir))
+            data = exporter.get_session_data_subset(
+                session_manager, with_io_logs=False)
+        self.assertNotIn('attachment_map', data)
+        for result in data['result_map'].values():
+            self.assertNotIn('io_log', result)
+        self.assertEqual(exporter._option_list, option_list)
+
     def test_io_log_processors(self):
         # Test all of the io_log processors that are built into
         # the base SessionStateExporter class
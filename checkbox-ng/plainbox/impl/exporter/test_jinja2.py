@@ -30,8 +30,12 @@ from unittest import TestCase
 import os
 
 from plainbox.impl.exporter.jinja2 import Jinja2SessionStateExporter
+from plainbox.impl.exporter.jinja2 import ReportViewModel
+from plainbox.impl.result import IOLogRecord
 from plainbox.impl.result import MemoryJobResult
 from plainbox.impl.session.state import SessionMetaData
+from plainbox.impl.session.state import SessionState
+from plainbox.impl.unit.category import CategoryUnit
 from plainbox.impl.unit.exporter import ExporterError
 from plainbox.impl.unit.exporter import ExporterUnitSupport
 from plainbox.impl.unit.job import JobDefinition
@@ -134,3 +138,94 @@ class Jinja2SessionStateExporterTests(TestCase):
             with self.assertRaises(ExporterError):
                 exporter.dump_from_session_manager(
                     self.manager_single_job, stream)
+
+
+class ReportViewModelTests(TestCase):
+
+    def setUp(self):
+        provider = mock.Mock(namespace='ns', gettext_domain=None)
+        provider.get_translated_data.side_effect = lambda msg: msg
+        unit_list = [
+            CategoryUnit({'id': 'c1', '_name': 'beta'}, provider=provider),
+            CategoryUnit({'id': 'c2', '_name': 'Alpha'}, provider=provider),
+            CategoryUnit({'id': 'c3', '_name': 'unused'}, provider=provider),
+        ]
+        job_spec_list = [
+            ('d', 'shell', 'c1', 'pass'),
+            ('a', 'shell', 'c1', 'fail'),
+            ('b', 'manual', 'c2', 'skip'),
+            ('e', 'resource', 'c2', 'pass'),
+            ('f', 'attachment', 'c1', 'pass'),
+            ('c', 'shell', 'c2', None),
+        ]
+        job_list = []
+        for job_id, plugin, category_id, outcome in job_spec_list:
+            job_list.append(JobDefinition({
+                'id': job_id, 'plugin': plugin, 'command': 'true',
+                'category_id': 'ns::' + category_id}, provider=provider))
+        self.state = SessionState(unit_list + job_list)
+        for job, (job_id, plugin, category_id, outcome) in zip(
+                job_list, job_spec_list):
+            if outcome:
+                self.state.update_job_result(job, MemoryJobResult({
+                    'outcome': outcome,
+                    'io_log': [IOLogRecord(0, 'stdout', b'hello')]}))
+
+    def test_grouping(self):
+        report = ReportViewModel(self.state)
+        self.assertEqual(list(report.job_map),
+                         ['ns::a', 'ns::b', 'ns::d', 'ns::e', 'ns::f'])
+        self.assertEqual([job.id for job in report.test_list],
+                         ['ns::a', 'ns::b', 'ns::d'])
+        self.assertEqual([job.id for job in report.resource_list], ['ns::e'])
+        self.assertEqual([job.id for job in report.attachment_list],
+                         ['ns::f'])
+        self.assertEqual(
+            [(category.id, category.outcome,
+              [job.id for job in category.job_list])
+             for category in report.category_list],
+            [('ns::c2', 'skip', ['ns::b']),
+             ('ns::c1', 'fail', ['ns::a', 'ns::d'])])
+        self.assertEqual(report.category_map,
+                         {'ns::c1': 'beta', 'ns::c2': 'Alpha'})
+        self.assertEqual(report.outcome_stats,
+                         {'pass': 1, 'fail': 1, 'skip': 1})
+        self.assertEqual(report.resource_outcome, 'pass')
+        self.assertEqual(report.attachment_outcome, 'pass')
+
+    def test_matches_session_state(self):
+        report = ReportViewModel(self.state)
+        self.assertEqual(report.outcome_stats,
+                         self.state.get_test_outcome_stats())
+        self.assertEqual(report.category_map, self.state.category_map)
+        self.assertEqual(
+            {category.id: category.outcome
+             for category in report.category_list},
+            self.state.category_outcome_map)
+        self.assertEqual(report.resource_outcome,
+                         self.state.resource_global_outcome)
+
+    def test_io_log_decoded_once(self):
+        with TemporaryDirectory() as tmp:
+            template_filename = 'template.txt'
+            with open(os.path.join(tmp, template_filename), 'w') as f:
+                f.write(
+                    "{% for job in report.test_list %}"
+                    "{% if job.io_log_as_flat_text %}"
+                    "{{ job.io_log_as_flat_text }}{% endif %}"
+                    "{% endfor %}"
+                    "{% for job in report.test_list %}"
+                    "{{ job.io_log_as_flat_text }}"
+                    "{% endfor %}")
+            exporter_unit = mock.Mock(
+                spec=ExporterUnitSupport, data={}, file_extension='txt',
+                data_dir=tmp, template=template_filename, option_list=())
+            exporter = Jinja2SessionStateExporter(exporter_unit=exporter_unit)
+            manager = mock.Mock(state=self.state)
+            stream = BytesIO()
+            with mock.patch.object(
+                    MemoryJobResult, 'get_io_log', autospec=True,
+                    side_effect=MemoryJobResult.get_io_log) as get_io_log:
+                exporter.dump_from_session_manager(manager, stream)
+        self.assertEqual(stream.getvalue(), b'hello' * 6)
+        self.assertEqual(get_io_log.call_count, 3)
@@ -0,0 +1,129 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+plainbox.impl.exporter.test_tar
+===============================
+
+Test definitions for plainbox.impl.exporter.tar module
+"""
+
+from unittest import TestCase
+import base64
+import gzip
+import io
+import json
+import re
+import tarfile
+
+from plainbox.abc import IJobResult
+from plainbox.impl.exporter.tar import TARSessionStateExporter
+from plainbox.impl.providers.special import get_categories
+from plainbox.impl.result import MemoryJobResult
+from plainbox.impl.session import SessionManager
+from plainbox.impl.unit.job import JobDefinition
+
+
+class TARExporterTests(TestCase):
+
+    def setUp(self):
+        self.session_manager = SessionManager.create()
+        self.addCleanup(self.session_manager.destroy)
+        self.session_manager.add_local_device_context()
+        state = self.session_manager.default_device_context.state
+        for unit in get_categories().unit_list:
+            state.add_unit(unit)
+        job_list = [
+            JobDefinition({'id': 'job_id1', '_summary': 'job 1'}),
+            JobDefinition({'id': 'job_id2', '_summary': 'job 2'}),
+            JobDefinition({'id': 'lsb', 'plugin': 'resource'}),
+            JobDefinition({'id': 'dmesg', 'plugin': 'attachment'}),
+        ]
+        result_list = [
+            MemoryJobResult({
+                'outcome': IJobResult.OUTCOME_FAIL,
+                'io_log': [(0, 'stderr', b'FATAL ERROR\n')],
+                'comments': 'blah blah'}),
+            MemoryJobResult({'outcome': IJobResult.OUTCOME_SKIP}),
+            MemoryJobResult({
+                'outcome': IJobResult.OUTCOME_PASS,
+                'io_log': [(0, 'stdout', b'description: Ubuntu\n')]}),
+            MemoryJobResult({
+                'outcome': IJobResult.OUTCOME_PASS,
+                'io_log': [(0, 'stdout', b'bar\n'), (0, 'stderr', b'err\n')]}),
+        ]
+        for job, result in zip(job_list, result_list):
+            state.add_unit(job)
+            state.update_job_result(job, result)
+
+    def _export(self, option_list):
+        stream = io.BytesIO()
+        TARSessionStateExporter(option_list).dump_from_session_manager(
+            self.session_manager, stream)
+        stream.seek(0)
+        with tarfile.open(fileobj=stream) as tar:
+            return {
+                member.name: tar.extractfile(member).read()
+                for member in tar.getmembers()}
+
+    def _fragment(self, file_map, name):
+        match = re.fullmatch(
+            r'checkboxReport\.fragmentLoaded\("(.+)", "(.+)"\);\n',
+            file_map['report/fragments/{}.js'.format(name)].decode('UTF-8'))
+        self.assertEqual(match.group(1), name)
+        return json.loads(gzip.decompress(base64.b64decode(match.group(2))))
+
+    def test_single_page_html(self):
+        file_map = self._export([])
+        self.assertEqual(
+            sorted(file_map),
+            ['submission.html', 'submission.json', 'submission.junit'])
+        self.assertIn(b'FATAL ERROR', file_map['submission.html'])
+
+    def test_paged_html(self):
+        file_map = self._export(['paged-html'])
+        html = file_map['submission.html']
+        self.assertNotIn(b'FATAL ERROR', html)
+        self.assertIn(b'src="report/assets/jquery.min.js"', html)
+        self.assertIn(b'data-fragment="category-1"', html)
+        for name in TARSessionStateExporter.PAGED_HTML_ASSET_LIST:
+            self.assertIn('report/assets/' + name, file_map)
+        self.assertEqual(sorted(
+            name for name in file_map if name.startswith('report/fragments')
+        ), [
+            'report/fragments/1-1.js',
+            'report/fragments/attachment-1.js',
+            'report/fragments/attachments.js',
+            'report/fragments/category-1.js',
+            'report/fragments/resource-1.js',
+            'report/fragments/resources.js',
+        ])
+        self.assertEqual(self._fragment(file_map, 'category-1'), [{
+            'id': 'job_id1', 'outcome': 'failed', 'color': '#DC3912',
+            'certification_status': '', 'comments': 'blah blah',
+            'log': '1-1', 'link': 'I/O log',
+        }, {
+            'id': 'job_id2', 'outcome': 'skipped', 'color': '#FF9900',
+            'certification_status': '', 'comments': '',
+            'log': None, 'link': 'I/O log',
+        }])
+        self.assertEqual(self._fragment(file_map, '1-1'), {
+            'title': 'job 1', 'text': 'FATAL ERROR\n'})
+        self.assertEqual(self._fragment(file_map, 'attachment-1'), {
+            'title': 'dmesg', 'text': 'bar\n'})
+        # the JSON submission is not affected
+        submission = json.loads(file_map['submission.json'])
+        self.assertEqual(submission['results'][0]['io_log'], 'FATAL ERROR\n')
@@ -0,0 +1,111 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+plainbox.impl.exporter.test_xlsx
+================================
+
+Test definitions for plainbox.impl.exporter.xlsx module
+"""
+
+from base64 import standard_b64encode
+from io import BytesIO
+from unittest import TestCase
+import zipfile
+
+from plainbox.impl.exporter.xlsx import XLSXSessionStateExporter
+from plainbox.impl.result import IOLogRecord
+from plainbox.impl.result import MemoryJobResult
+
+CATEGORY = 'com.canonical.plainbox::uncategorised'
+
+
+class XLSXSessionStateExporterTests(TestCase):
+
+    def setUp(self):
+        self.exporter = XLSXSessionStateExporter([
+            XLSXSessionStateExporter.OPTION_WITH_SUMMARY,
+            XLSXSessionStateExporter.OPTION_WITH_TEXT_ATTACHMENTS])
+        self.output = (
+            "line 1\nline 2\nline 3\nline 4\n", "attached\nlog\n")
+
+    def make_data(self, **result_map):
+        return {
+            'result_map': result_map,
+            'category_map': {CATEGORY: 'Uncategorised'},
+            'resource_map': {},
+        }
+
+    def make_result_map(self, **extra):
+        return {
+            'job': dict({
+                'summary': 'A job', 'category_id': CATEGORY,
+                'outcome': 'fail', 'comments': None, 'plugin': 'shell'},
+                **extra),
+            'attachment': {
+                'summary': 'An attachment', 'category_id': CATEGORY,
+                'outcome': 'pass', 'comments': None, 'plugin': 'attachment'},
+        }
+
+    def get_strings(self, data):
+        """Get the XML of all the worksheets (strings are inline)."""
+        stream = BytesIO()
+        self.exporter.dump(data, stream)
+        with zipfile.ZipFile(stream) as xlsx:
+            return ''.join(
+                xlsx.read(name).decode('UTF-8') for name in xlsx.namelist()
+                if name.startswith('xl/worksheets/'))
+
+    def check_output(self, data):
+        strings = self.get_strings(data)
+        self.assertNotIn('not attached', strings)
+        # the title written on each worksheet is not lost
+        self.assertIn('System Testing Report', strings)
+        # neither is the data of the summary chart
+        self.assertRegex(strings, '<c r="M8"[^>]*><v>1</v>')
+        self.assertIn('line 1\nline 2\nline 3\n[...]', strings)
+        self.assertNotIn('line 4', strings)
+        self.assertIn('attached', strings)
+
+    def test_dump_encoded_data(self):
+        data = self.make_data(**self.make_result_map(io_log=(
+            standard_b64encode(self.output[0].encode()).decode('ASCII'))))
+        data['attachment_map'] = {
+            'attachment': standard_b64encode(
+                self.output[1].encode()).decode('ASCII')}
+        self.check_output(data)
+
+    def test_dump_from_results(self):
+        data = self.make_data(**self.make_result_map())
+        data['io_log_map'] = {
+            'job': MemoryJobResult({'io_log': [
+                IOLogRecord(0, 'stdout', line.encode())
+                for line in self.output[0].splitlines(True)]}),
+            'attachment': MemoryJobResult({'io_log': [
+                IOLogRecord(0, 'stdout', self.output[1][:4].encode()),
+                IOLogRecord(0, 'stderr', b'not attached\n'),
+                IOLogRecord(0, 'stdout', self.output[1][4:].encode())]}),
+        }
+        self.check_output(data)
+
+    def test_binary_attachments_are_skipped(self):
+        data = self.make_data(**self.make_result_map())
+        data['io_log_map'] = {
+            'job': MemoryJobResult({}),
+            'attachment': MemoryJobResult({'io_log': [
+                IOLogRecord(0, 'stdout', b'\xff\xfe')]}),
+        }
+        self.assertNotIn('>attachment<', self.get_strings(data))
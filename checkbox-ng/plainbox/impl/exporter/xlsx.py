@@ -29,6 +29,7 @@ XLSX exporter
 
 from base64 import standard_b64decode
 from collections import defaultdict, OrderedDict
+import codecs
 import re
 
 # Lazy load these modules
@@ -236,9 +237,8 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
             if result:
                 hw_info['processors'] = result.pop()
         resource = 'com.canonical.certification::lspci_attachment'
-        if resource in data['attachment_map']:
-            lspci = data['attachment_map'][resource]
-            content = standard_b64decode(lspci.encode()).decode("UTF-8")
+        if resource in self._get_attachment_ids(data):
+            content = '\n'.join(self._iter_output_lines(data, resource))
             match = re.search('ISA bridge.*?:\s(?P<chipset>.*?)\sLPC', content)
             if match:
                 hw_info['chipset'] = match.group('chipset')
@@ -324,6 +324,77 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
             if 'path' in resource:
                 return resource['path']
 
+    def _get_attachment_ids(self, data):
+        """Get the identifiers of the attachment jobs with a result."""
+        if 'io_log_map' not in data:
+            return list(data['attachment_map'])
+        return [job_id for job_id, result in data['result_map'].items()
+                if result.get('plugin') == 'attachment']
+
+    def _iter_output_lines(self, data, job_id, errors='strict'):
+        """
+        Iterate over the lines of the output of a job.
+
+        Only the standard output of attachment jobs is considered. With the
+        data from :meth:`dump_from_session_manager`, the output is decoded
+        while it is read from the I/O log of the job instead of being loaded
+        at once.
+
+        :raises UnicodeDecodeError:
+            if the output is not valid UTF-8 and errors is 'strict'
+        """
+        io_log_map = data.get('io_log_map')
+        if io_log_map is None:
+            if job_id in data.get('attachment_map', ()):
+                encoded = data['attachment_map'][job_id]
+            else:
+                encoded = data['result_map'][job_id].get('io_log') or ''
+            yield from standard_b64decode(encoded.encode()).decode(
+                'UTF-8', errors).splitlines()
+            return
+        stdout_only = (
+            data['result_map'][job_id].get('plugin') == 'attachment')
+        decoder = codecs.getincrementaldecoder('UTF-8')(errors)
+        pending = ''
+        for record in io_log_map[job_id].get_io_log():
+            if stdout_only and record.stream_name != 'stdout':
+                continue
+            pending += decoder.decode(record.data)
+            *line_list, pending = pending.split('\n')
+            for line in line_list:
+                yield line.rstrip('\r')
+        pending += decoder.decode(b'', True)
+        if pending:
+            yield pending
+
+    def _get_text_output(self, data, job_id):
+        """
+        Get the lines of the output of a job, None if it is not text (not
+        valid UTF-8).
+        """
+        try:
+            return list(self._iter_output_lines(data, job_id))
+        except UnicodeDecodeError:
+            return None
+
+    def _get_io_log_excerpt(self, data, job_id, max_lines=3):
+        """
+        Get the first lines of the output of a job, for the results sheet.
+
+        Only the lines needed are read, '[...]' marks the truncated output.
+        """
+        line_list = []
+        truncated = False
+        for line in self._iter_output_lines(data, job_id, 'replace'):
+            if len(line_list) < max_lines:
+                line_list.append(line)
+            elif line.strip():
+                truncated = True
+                break
+        if truncated:
+            return '\n'.join(line_list) + '\n[...]'
+        return '\n'.join(line_list).rstrip() or ' '
+
     def write_systeminfo(self, data):
         self.worksheet1.set_column(0, 0, 4)
         self.worksheet1.set_column(1, 1, 34)
@@ -444,13 +515,13 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                 + _('Skip Rate: {} ({}/{})').format(
                     skip_rate, self.total_skip, self.total)
             ), self.format02)
-        self.worksheet2.write_column(
-            'L3', [OMM['fail'].tr_label,
-                   OMM['skip'].tr_label,
-                   OMM['pass'].tr_label], self.format14)
-        self.worksheet2.write_column(
-            'M3', [self.total_fail, self.total_skip, self.total_pass],
-            self.format14)
+        # Data of the chart, hidden below the summary (rows cannot be written
+        # out of order in constant memory mode)
+        for row, (label, total) in enumerate([
+                (OMM['fail'].tr_label, self.total_fail),
+                (OMM['skip'].tr_label, self.total_skip),
+                (OMM['pass'].tr_label, self.total_pass)], start=7):
+            self.worksheet2.write_row(row, 11, [label, total], self.format14)
         # Configure the series.
         chart = self.workbook.add_chart({'type': 'pie'})
         chart.set_legend({'position': 'none'})
@@ -460,8 +531,8 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                 {'fill': {'color': OMM['skip'].color_hex}},
                 {'fill': {'color': OMM['pass'].color_hex}},
             ],
-            'categories': '=' + _("Summary") + '!$L$3:$L$5',
-            'values': '=' + _("Summary") + '!$M$3:$M$5'}
+            'categories': '=' + _("Summary") + '!$L$8:$L$10',
+            'values': '=' + _("Summary") + '!$M$8:$M$10'}
         )
         # Insert the chart into the worksheet.
         self.worksheet2.insert_chart('F4', chart, {
@@ -580,14 +651,8 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                     self.format18 if self._lineno % 2 else self.format19)
                 io_log = ' '
                 if result_map[job]['plugin'] not in ('resource', 'attachment'):
-                    if result_map[job]['io_log']:
-                        io_log = standard_b64decode(
-                            result_map[job]['io_log'].encode()
-                        ).decode('UTF-8').rstrip()
+                    io_log = self._get_io_log_excerpt(self._data, job)
                 io_lines = len(io_log.splitlines()) - 1
-                if io_lines > 2:
-                    io_log = '\n'.join(io_log.splitlines()[:3]) + '\n[...]'
-                    io_lines = len(io_log.splitlines()) - 1
                 desc_lines = len(result_map[job].get('description',
                                                      "").splitlines())
                 desc_lines -= 1
@@ -652,6 +717,7 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                 5, max_level + 1, [_('Name'), _('Description')], self.format07
             )
         self._lineno = 5
+        self._data = data
         self._write_job(tree, data['result_map'], max_level)
         self.worksheet3.set_row(
             self._lineno + 1, None, None, {'collapsed': True})
@@ -723,11 +789,9 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
         self.worksheet5.set_column(0, 0, 5)
         self.worksheet5.set_column(1, 1, 120)
         i = 4
-        for name in data['attachment_map']:
-            try:
-                content = standard_b64decode(
-                    data['attachment_map'][name].encode()).decode('UTF-8')
-            except UnicodeDecodeError:
+        for name in self._get_attachment_ids(data):
+            line_list = self._get_text_output(data, name)
+            if line_list is None:
                 # Skip binary attachments
                 continue
             self.worksheet5.write(i, 1, name, self.format03)
@@ -736,7 +800,7 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                 i, None, None, {'level': 1, 'hidden': True}
             )
             j = 1
-            for line in content.splitlines():
+            for line in line_list:
                 self.worksheet5.write(j + i, 1, line, self.format13)
                 self.worksheet5.set_row(
                     j + i, None, None, {'level': 1, 'hidden': True}
@@ -751,13 +815,8 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
         i = 4
         for name in [job_id for job_id in data['result_map']
                      if data['result_map'][job_id]['plugin'] == 'resource']:
-            io_log = ' '
-            try:
-                if data['result_map'][name]['io_log']:
-                    io_log = standard_b64decode(
-                        data['result_map'][name]['io_log'].encode()
-                    ).decode('UTF-8')
-            except UnicodeDecodeError:
+            line_list = self._get_text_output(data, name)
+            if line_list is None:
                 # Skip binary output
                 continue
             self.worksheet6.write(i, 1, name, self.format03)
@@ -766,7 +825,7 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
                 i, None, None, {'level': 1, 'hidden': True}
             )
             j = 1
-            for line in io_log.splitlines():
+            for line in line_list:
                 self.worksheet6.write(j + i, 1, line, self.format13)
                 self.worksheet6.set_row(
                     j + i, None, None, {'level': 1, 'hidden': True}
@@ -775,6 +834,32 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
             self.worksheet6.set_row(i + j, None, None, {'collapsed': True})
             i += j + 1  # Insert a newline between resources logs
 
+    def write_metrics(self, data):
+        self.worksheet7.set_column(0, 0, 5)
+        self.worksheet7.set_column(1, 1, 48)
+        self.worksheet7.set_column(2, 2, 32)
+        self.worksheet7.set_column(3, 5, 12)
+        self.worksheet7.write(3, 1, _('Benchmark Metrics'), self.format03)
+        self.worksheet7.freeze_panes(6, 0)
+        self.worksheet7.write_row(
+            5, 1, [_('Name'), _('Metric'), _('Value'), _('Unit'),
+                   _('Better')],
+            self.format07)
+        i = 6
+        for job_id in sorted(data['result_map']):
+            result = data['result_map'][job_id]
+            for metric in result.get('metrics', ()):
+                row_format = self.format08 if i % 2 else self.format09
+                self.worksheet7.write_row(
+                    i, 1, [result['summary'], metric['name']], row_format)
+                self.worksheet7.write_number(
+                    i, 3, metric['value'], row_format)
+                self.worksheet7.write_row(
+                    i, 4, [metric['unit'], metric['better'] or ''],
+                    row_format)
+                i += 1
+        self.worksheet7.autofilter(5, 1, i - 1, 5)
+
     def dump_from_session_manager(self, session_manager, stream):
         """
         Extract data from session_manager and dump it into the stream.
@@ -786,45 +871,69 @@ class XLSXSessionStateExporter(SessionStateExporterBase):
             Byte stream to write to.
 
         """
-        data = self.get_session_data_subset(session_manager)
+        # I/O logs and attachments are not included in the data, the rows
+        # showing them read them from the job results as they are written
+        data = self.get_session_data_subset(
+            session_manager, with_io_logs=False)
+        job_state_map = session_manager.state.job_state_map
+        data['io_log_map'] = {
+            job_id: job_state_map[job_id].result
+            for job_id in data['result_map']}
         data['manager'] = session_manager
         self.dump(data, stream)
 
+    def _add_worksheet(self, name, with_title=True):
+        worksheet = self.workbook.add_worksheet(name)
+        worksheet.outline_settings(True, False, False, True)
+        worksheet.hide_gridlines(2)
+        worksheet.fit_to_pages(1, 0)
+        if with_title:
+            # In constant memory mode rows are written out as soon as a row
+            # below is written, the title has to come first
+            worksheet.write(1, 1, _('System Testing Report'), self.format01)
+            worksheet.set_row(1, 30)
+        return worksheet
+
     def dump(self, data, stream):
         """
         Public method to dump the XLSX report to a stream
+
+        The workbook is written in constant memory mode: each worksheet is
+        written row after row and only the current row is kept in memory.
+        The I/O logs and attachments are read from the job results when
+        ``data`` has an ``io_log_map`` (see
+        :meth:`dump_from_session_manager`) and from the base64-encoded
+        ``io_log`` and ``attachment_map`` entries otherwise.
         """
         from xlsxwriter.workbook import Workbook
         self.workbook = Workbook(stream, {'constant_memory': True})
         self._set_formats()
         if self.OPTION_WITH_SYSTEM_INFO in self._option_list:
-            self.worksheet1 = self.workbook.add_worksheet(_('System Info'))
+            self.worksheet1 = self._add_worksheet(_('System Info'))
             self.write_systeminfo(data)
         if not self.OPTION_TEST_PLAN_EXPORT in self._option_list:
-            self.worksheet3 = self.workbook.add_worksheet(_('Test Results'))
-        if (
-            self.OPTION_WITH_DESCRIPTION in self._option_list or
-            self.OPTION_TEST_PLAN_EXPORT in self._option_list
-        ):
-            self.worksheet4 = self.workbook.add_worksheet(
-                _('Test Descriptions'))
+            self.worksheet3 = self._add_worksheet(_('Test Results'))
+        if self.OPTION_TEST_PLAN_EXPORT in self._option_list:
+            # The test plan export starts at the first row
+            self.worksheet4 = self._add_worksheet(
+                _('Test Descriptions'), with_title=False)
+        elif self.OPTION_WITH_DESCRIPTION in self._option_list:
+            self.worksheet4 = self._add_worksheet(_('Test Descriptions'))
         if self.OPTION_TEST_PLAN_EXPORT in self._option_list:
             self.write_tp_export(data)
         else:
             self.write_results(data)
         if self.OPTION_WITH_SUMMARY in self._option_list:
-            self.worksheet2 = self.workbook.add_worksheet(_('Summary'))
+            self.worksheet2 = self._add_worksheet(_('Summary'))
             self.write_summary(data)
         if self.OPTION_WITH_TEXT_ATTACHMENTS in self._option_list:
-            self.worksheet5 = self.workbook.add_worksheet(_('Log Files'))
+            self.worksheet5 = self._add_worksheet(_('Log Files'))
             self.write_attachments(data)
         if not self.OPTION_TEST_PLAN_EXPORT in self._option_list:
-            self.worksheet6 = self.workbook.add_worksheet(_('Resources Logs'))
+            self.worksheet6 = self._add_worksheet(_('Resources Logs'))
             self.write_resources(data)
-        for worksheet in self.workbook.worksheets():
-            worksheet.outline_settings(True, False, False, True)
-            worksheet.hide_gridlines(2)
-            worksheet.fit_to_pages(1, 0)
-            worksheet.write(1, 1, _('System Testing Report'), self.format01)
-            worksheet.set_row(1, 30)
+        if not self.OPTION_TEST_PLAN_EXPORT in self._option_list and any(
+                'metrics' in result for result in data['result_map'].values()):
+            self.worksheet7 = self._add_worksheet(_('Metrics'))
+            self.write_metrics(data)
         self.workbook.close()
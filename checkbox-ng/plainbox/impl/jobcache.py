@@ -1,6 +1,6 @@
 # This file is part of Checkbox.
 #
-# Copyright 2017 Canonical Ltd.
+# Copyright 2017-2024 Canonical Ltd.
 # Written by:
 #   Maciej Kisielewski <maciej.kisielewski@canonical.com>
 #
@@ -17,82 +17,230 @@
 # along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
 """
 :mod:`plainbox.impl.jobcache`  -- job result caching
-==============================================
+====================================================
 
 This module should reduce the time needed to bootstrap a session
 by reusing previously obtained results.
+
+Entries are keyed by the checksum of the job definition and by a validity
+fingerprint computed from the probes the job declares in its
+``cache_probes`` field (see :data:`PROBES`). As soon as any of the probed
+values changes (a package gets installed, the machine reboots, ...) the
+old entry is simply never looked up again and eventually evicted.
+
+The cache directory holds one compact ``index.json`` file describing all
+entries and one JSON file per entry with the parsed resource records. The
+I/O log of a cached job is regenerated from those records into the I/O log
+directory of the running session, so cached results do not depend on files
+of other sessions.
 """
 
+import gzip
+import hashlib
+import io
 import json
 import logging
 import os
 import shutil
-from plainbox.impl.result import DiskJobResult
+import time
+
+from plainbox.abc import IJobResult
 from plainbox.i18n import gettext as _
+from plainbox.impl.collectors import gen_rfc822_lines
+from plainbox.impl.result import DiskJobResult
+from plainbox.impl.result import IOLogRecordWriter
+from plainbox.impl.secure.rfc822 import RFC822SyntaxError
+from plainbox.impl.secure.rfc822 import gen_rfc822_records
 
 logger = logging.getLogger("plainbox.jobcache")
 
 
+def _probe_boot_id():
+    with open('/proc/sys/kernel/random/boot_id', 'rt') as stream:
+        return stream.read().strip()
+
+
+def _probe_kernel():
+    uname = os.uname()
+    return '{} {}'.format(uname.release, uname.version)
+
+
+def _probe_mtime(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _probe_path(bin_dir_list=()):
+    # jobs also find the executables of the providers, through the nest
+    # prepended to their PATH
+    return [[path, _probe_mtime(path)] for path in list(bin_dir_list) +
+            os.environ.get('PATH', os.defpath).split(os.pathsep)]
+
+
+def _probe_modules():
+    # the sizes, instances and dependencies of the modules are part of the
+    # resource records too
+    with open('/proc/modules', 'rt') as stream:
+        return sorted(line.rstrip('\n') for line in stream)
+
+
+#: Validity probes that may be listed in the ``cache_probes`` job field.
+#: Additionally ``mtime:<path>`` probes the modification time of any file.
+PROBES = {
+    'boot-id': _probe_boot_id,
+    'kernel': _probe_kernel,
+    'dpkg-status': lambda: _probe_mtime('/var/lib/dpkg/status'),
+    'path': _probe_path,
+    'modules': _probe_modules,
+}
+
+
+def is_valid_probe(probe):
+    """Check if the given probe name can be used in ``cache_probes``."""
+    return probe in PROBES or (
+        probe.startswith('mtime:') and os.path.isabs(probe[len('mtime:'):]))
+
+
+def compute_fingerprint(probe_list, bin_dir_list=()):
+    """
+    Compute the validity fingerprint for the given list of probes.
+
+    :param probe_list:
+        List of probe names, as returned by
+        :meth:`JobDefinition.get_cache_probe_list()`
+    :param bin_dir_list:
+        List of the bin directories of the providers whose executables are
+        available to the job, probed by ``path`` with the directories of
+        ``PATH``
+    :returns:
+        Hexadecimal digest of the probed values
+    """
+    values = []
+    for probe in sorted(set(probe_list)):
+        try:
+            if probe.startswith('mtime:'):
+                value = _probe_mtime(probe[len('mtime:'):])
+            elif probe == 'path':
+                value = _probe_path(bin_dir_list)
+            else:
+                value = PROBES[probe]()
+        except (OSError, KeyError) as exc:
+            logger.warning(_("Cache probe %s failed: %s"), probe, exc)
+            value = None
+        values.append([probe, value])
+    return hashlib.sha256(json.dumps(
+        values, sort_keys=True, separators=(',', ':')
+    ).encode('UTF-8')).hexdigest()
+
+
 class ResourceJobCache:
     """
     Cache storing results of previously run resource jobs
     """
 
-    def __init__(self):
+    #: Version of the on-disk format, entries of other versions are dropped
+    FORMAT = 1
+
+    #: Default limit of the total size of all cached records, in bytes
+    DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+
+    #: Default limit of the number of cached entries
+    DEFAULT_MAX_ENTRIES = 256
+
+    def __init__(self, cache_path=None, max_size=DEFAULT_MAX_SIZE,
+                 max_entries=DEFAULT_MAX_ENTRIES):
         """
-        Load existing entries from the filesystem
+        Initialize an empty cache, call :meth:`load()` to use stored entries
         """
-        self._cache = {}
+        self._cache_path = cache_path
+        self._max_size = max_size
+        self._max_entries = max_entries
+        self._index = {}
 
     def clear(self):
         logger.debug("Clearing cache")
-        for root, subdirs, files in os.walk(self._get_cache_path()):
-            for subdir in subdirs:
-                try:
-                    shutil.rmtree(os.path.join(root, subdir))
-                except Exception as exc:
-                    logger.warning("Failed to clear the cache. %s" % exc)
+        self._index = {}
+        try:
+            shutil.rmtree(self._get_cache_path())
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning(_("Failed to clear the cache. %s"), exc)
 
     def load(self):
-        for root, subdirs, files in os.walk(self._get_cache_path()):
-            for subdir in subdirs:
-                self._try_load_cache_entry(os.path.join(root, subdir))
+        """
+        Load the index of the cache
+        """
+        index_path = os.path.join(self._get_cache_path(), 'index.json')
+        try:
+            with open(index_path, 'rt', encoding='UTF-8') as stream:
+                data = json.load(stream)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning(_("Error loading cache index. %s"), exc)
+            return
+        if data.get('format') != self.FORMAT:
+            logger.info(_("Ignoring cache index in an unknown format"))
+            return
+        self._index = data['entries']
+        logger.debug(_("Loaded %d cache entries"), len(self._index))
 
-    def get(self, job_checksum, compute_fn):
+    def get_key(self, job, bin_dir_list=()):
+        """
+        Compute the cache key of the given job
+        """
+        return '{}-{}'.format(job.checksum, compute_fingerprint(
+            job.get_cache_probe_list(), bin_dir_list))
+
+    def get(self, job, compute_fn, io_log_filename, bin_dir_list=()):
         """
         Get a result from cache or run compute_fn to acquire it.
+
+        :param job:
+            The resource job to get the result of
+        :param compute_fn:
+            Callable returning the result of running the job
+        :param io_log_filename:
+            Path of the I/O log to write when the result is found in cache
+        :param bin_dir_list:
+            List of the bin directories of the providers whose executables
+            are available to the job
+
         Return a pair containing:
             - a bool signifying whether the result was found in cache
-            - a DiskJobResult object with the result
+            - a job result object
         """
-        in_cache = job_checksum in self._cache.keys()
-        if not in_cache:
-            logger.debug(_("%s not found in cache"), job_checksum)
-            result = compute_fn().get_builder().as_dict()
-            self._store(job_checksum, result.copy())
-        else:
-            logger.info(_("%s found in cache"), job_checksum)
-            result = self._cache[job_checksum]
-        return in_cache, DiskJobResult(result)
-
-    def _try_load_cache_entry(self, job_cache_path):
-        job_checksum = os.path.basename(job_cache_path)
-        logger.debug(_("Loading cache entry %s"), job_checksum)
-        try:
-            with open(os.path.join(job_cache_path, 'result.json'),
-                      'rb') as result_file:
-                data = result_file.read()
-                cache_entry = json.loads(data.decode("UTF-8"))
-                if not os.path.exists(cache_entry['io_log_filename']):
-                    logger.warning(_("Error loading cache entry. Missing %s"),
-                                   cache_entry['io_log_filename'])
-                    return
-                logger.debug(_("Cache entry %s loaded"), job_checksum)
-                self._cache[job_checksum] = cache_entry
-        except Exception as exc:
-            logger.warrning(_("Error loading cache entry. %s"), exc)
+        key = self.get_key(job, bin_dir_list)
+        entry = self._index.get(key)
+        if entry is not None:
+            record_list = self._load_records(key)
+            if record_list is not None:
+                logger.info(_("%s found in cache"), key)
+                entry['last_used'] = time.time()
+                self._save_index()
+                result = dict(entry['result'])
+                result['io_log_filename'] = io_log_filename
+                with gzip.open(io_log_filename, mode='wb') as gzip_stream, \
+                        io.TextIOWrapper(
+                            gzip_stream, encoding='UTF-8') as record_stream:
+                    writer = IOLogRecordWriter(record_stream)
+                    for line in gen_rfc822_lines(record_list):
+                        writer.write_record((0, 'stdout', line))
+                return True, DiskJobResult(result)
+            del self._index[key]
+        logger.debug(_("%s not found in cache"), key)
+        result = compute_fn()
+        if result.outcome == IJobResult.OUTCOME_PASS:
+            self._store(key, job, result)
+        return False, result
 
     def _get_cache_path(self):
+        if self._cache_path:
+            return self._cache_path
         suc = os.environ.get('SNAP_USER_COMMON')
         if suc:
             return os.path.join(
@@ -104,35 +252,79 @@ class ResourceJobCache:
         return os.path.join(
             xdg_cache_home, 'plainbox', 'resource_job_cache')
 
-    def _store(self, job_checksum, result):
+    def _get_entry_path(self, key):
+        return os.path.join(self._get_cache_path(), key + '.json')
+
+    def _load_records(self, key):
+        try:
+            with open(self._get_entry_path(key), 'rt',
+                      encoding='UTF-8') as stream:
+                return json.load(stream)
+        except (OSError, ValueError) as exc:
+            logger.warning(_("Error loading cache entry. %s"), exc)
+            return None
+
+    def _store(self, key, job, result):
         logger.info(_("Caching job result for job with checksum %s"),
-                    job_checksum)
-        job_cache_path = os.path.join(self._get_cache_path(), job_checksum)
-        if os.path.exists(job_cache_path):
-            # this can happen if the loading failed, so let's clear the path
-            try:
-                shutil.rmtree(job_cache_path)
-            except Exception as exc:
-                logger.warning(
-                    _("Failed to remove path in Resource Cache: %s %s"),
-                    job_cache_path, exc)
-                return
-        os.makedirs(job_cache_path)
-        cached_io_log_path = os.path.join(
-            job_cache_path, os.path.basename(result['io_log_filename']))
-        shutil.copyfile(result['io_log_filename'], cached_io_log_path)
-        result['io_log_filename'] = cached_io_log_path
+                    job.checksum)
+        stdout = b''.join(
+            record.data for record in result.get_io_log()
+            if record.stream_name == 'stdout')
+        try:
+            record_list = [record.data for record in gen_rfc822_records(
+                io.StringIO(stdout.decode('UTF-8', 'replace')))]
+        except RFC822SyntaxError as exc:
+            logger.warning(_("Not caching unparsable output of %s: %s"),
+                           job.id, exc)
+            return
         data = json.dumps(
-            result,
-            ensure_ascii=False,
-            sort_keys=True,
-            indent=None,
-            separators=(',', ':')
+            record_list, ensure_ascii=False, separators=(',', ':')
         ).encode("UTF-8")
-        with open(os.path.join(job_cache_path, 'result.json'),
-                  'wb') as result_file:
-            result_file.write(data)
-        logger.debug(
-            _("Wrote %s to %s"),
-            data, os.path.join(job_cache_path, 'result.json'))
-        self._cache[job_checksum] = result
+        try:
+            os.makedirs(self._get_cache_path(), exist_ok=True)
+            self._atomic_write(self._get_entry_path(key), data)
+        except OSError as exc:
+            logger.warning(_("Failed to store cache entry. %s"), exc)
+            return
+        self._index[key] = {
+            'job_id': job.id,
+            'size': len(data),
+            'last_used': time.time(),
+            'result': {
+                'outcome': result.outcome,
+                'return_code': result.return_code,
+                'execution_duration': result.execution_duration,
+            },
+        }
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        """Remove least recently used entries until the limits are met."""
+        total_size = sum(entry['size'] for entry in self._index.values())
+        lru = sorted(self._index, key=lambda k: self._index[k]['last_used'])
+        while lru and (total_size > self._max_size or
+                       len(self._index) > self._max_entries):
+            key = lru.pop(0)
+            total_size -= self._index.pop(key)['size']
+            logger.debug(_("Evicting cache entry %s"), key)
+            try:
+                os.remove(self._get_entry_path(key))
+            except OSError:
+                pass
+
+    def _save_index(self):
+        data = json.dumps(
+            {'format': self.FORMAT, 'entries': self._index},
+            sort_keys=True, separators=(',', ':')).encode('UTF-8')
+        try:
+            self._atomic_write(
+                os.path.join(self._get_cache_path(), 'index.json'), data)
+        except OSError as exc:
+            logger.warning(_("Failed to save cache index. %s"), exc)
+
+    def _atomic_write(self, path, data):
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as stream:
+            stream.write(data)
+        os.replace(tmp_path, path)
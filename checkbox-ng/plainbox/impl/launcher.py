@@ -199,6 +199,13 @@ class LauncherDefinition1(LauncherDefinition):
             ['normal', 'verbose', 'debug'])], help_text=_('Verbosity level'),
         default='normal')
 
+    trace = config.Variable(
+        section='ui',
+        kind=bool,
+        default=False,
+        help_text=_("Save a performance trace of the session in the session"
+                    " directory."))
+
     auto_retry = config.Variable(
         section='ui',
         kind=bool,
@@ -26,12 +26,17 @@
     THIS MODULE DOES NOT HAVE STABLE PUBLIC API
 """
 
-__all__ = ['setup_logging', 'adjust_logging']
+__all__ = ['setup_logging', 'adjust_logging', 'make_asynchronous',
+           'is_asynchronous_logging_enabled']
 
+import atexit
+import copy
 import logging
 import logging.config
 import os
+import queue
 import sys
+import threading
 
 from plainbox.i18n import gettext as _
 from plainbox.impl.color import ansi_on, ansi_off
@@ -79,11 +84,159 @@ class LevelFilter:
             return 0
 
 
+class AsyncLogWriter:
+    """
+    Background thread passing log records to the handlers that output them.
+
+    Formatting records and writing them to files or to the console is done
+    on this thread so that the threads that log (including the threads
+    reading the output of jobs) are not slowed down.
+
+    The queue is bounded, a producer that is much faster than the handlers
+    ends up waiting rather than piling up records in memory. Queued records
+    are written before the program exits.
+    """
+
+    MAX_QUEUED_RECORDS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def put(self, handler_list, record):
+        """Queue a record for the given handlers."""
+        if self._pid != os.getpid():
+            # Start on first use and again in forked children, the thread
+            # does not survive a fork
+            self._start()
+        self._queue.put((handler_list, record))
+
+    def flush(self):
+        """Wait until all the queued records are handled."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self):
+        """Handle all the queued records and stop the thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._pid = None
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.MAX_QUEUED_RECORDS)
+            self._thread = threading.Thread(
+                target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        log_queue = self._queue
+        while True:
+            item = log_queue.get()
+            try:
+                if item is None:
+                    return
+                handler_list, record = item
+                for handler in handler_list:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            finally:
+                log_queue.task_done()
+
+
+class AsyncHandler(logging.Handler):
+    """
+    Handler passing records to other handlers on the background log writer.
+
+    The wrapped handlers keep their level, filters and formatter. Like
+    :class:`logging.handlers.QueueHandler`, the message is merged with its
+    arguments before the record is queued, the arguments may be changed by
+    the caller by the time the record is written.
+    """
+
+    def __init__(self, handler_list, writer):
+        super().__init__()
+        self.handler_list = handler_list
+        self._writer = writer
+
+    def prepare(self, record):
+        """Return a copy of the record with its message rendered."""
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # keep the traceback text, not the frames it references
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        if all(record.levelno < handler.level
+               for handler in self.handler_list):
+            return
+        self._writer.put(self.handler_list, self.prepare(record))
+
+    def flush(self):
+        self._writer.flush()
+
+
+# The writer shared by all asynchronous handlers
+_async_log_writer = AsyncLogWriter()
+atexit.register(_async_log_writer.stop)
+
+
+def is_asynchronous_logging_enabled():
+    """Check that PLAINBOX_SYNC_LOGGING does not disable the log writer."""
+    return os.getenv("PLAINBOX_SYNC_LOGGING") is None
+
+
+def make_asynchronous(logger, handler_names=None):
+    """
+    Move handlers of a logger to the background log writer.
+
+    :param logger:
+        The logger which handlers should run asynchronously
+    :param handler_names:
+        Names of the handlers (as given in the logging configuration) to
+        move, all the handlers are moved if None
+    """
+    handler_list = [
+        handler for handler in logger.handlers
+        if not isinstance(handler, AsyncHandler) and (
+            handler_names is None or handler.get_name() in handler_names)]
+    if not handler_list:
+        return
+    for handler in handler_list:
+        logger.removeHandler(handler)
+    logger.addHandler(AsyncHandler(handler_list, _async_log_writer))
+
+
 class LoggingHelper:
     """
     Helper class that manages logging subsystem
     """
 
+    #: Handlers that run on the background log writer. Console handlers for
+    #: information, warnings and errors stay synchronous so that they are
+    #: displayed in order with the rest of the output of the application and
+    #: crashes are logged right away.
+    ASYNC_HANDLERS = (
+        "console_debug",
+        "logfile_debug",
+        "logfile_error",
+        "logfile_bug",
+    )
+
     def setup_logging(self, config_dict = dict()):
         # Ensure that the logging directory exists. This is important
         # because we're about to open some files there. If it can't be created
@@ -103,8 +256,15 @@ class LoggingHelper:
                                     "console instead."), error)
                 config_dict = self.DEFAULT_CONSOLE_ONLY_CONFIG
         # Apply the selected configuration. This overrides anything currently
-        # defined for all of the logging subsystem in this python runtime
+        # defined for all of the logging subsystem in this python runtime.
+        # Records still queued for the handlers about to be closed are
+        # written first.
+        _async_log_writer.flush()
         logging.config.dictConfig(config_dict)
+        if config_dict.get('asynchronous', True):
+            for name in config_dict.get('loggers', ()):
+                make_asynchronous(
+                    logging.getLogger(name), self.ASYNC_HANDLERS)
 
     def adjust_logging(self, level=None, trace_list=None, debug_console=False):
         # Bump logging on the root logger if requested
@@ -407,6 +567,7 @@ class LoggingHelper:
             "incremental": False,
             "disable_existing_loggers": True,
             "silence_eperm_on_logdir_warning": False,
+            "asynchronous": is_asynchronous_logging_enabled(),
         }
 
     @property
@@ -0,0 +1,278 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.metrics` -- structured measurements reported by jobs
+========================================================================
+
+Besides their free-form output, jobs (typically benchmarks) can report typed
+measurements, called metrics. Each job is started with the
+``PLAINBOX_METRICS_FILE`` environment variable pointing to a file where it
+can append one RFC822 record per metric::
+
+    name: buffered-disk-reads
+    value: 412.5
+    unit: MB/s
+    better: higher
+
+``name`` and ``value`` are mandatory. ``unit`` is free-form and ``better``
+says whether ``higher`` or ``lower`` values are better; metrics without it
+are never considered as regressions. The ``checkbox-support-metric`` script
+(and the ``checkbox_support.helpers.metrics`` module) write such records.
+
+The metrics are stored in the job result, exported by the JSON and the XLSX
+exporters and can be compared between two sessions or submissions with
+``checkbox-cli compare-metrics``.
+"""
+
+from collections import namedtuple
+import json
+import logging
+import math
+import tarfile
+
+from plainbox.i18n import gettext as _
+from plainbox.impl.secure.rfc822 import RFC822SyntaxError
+from plainbox.impl.secure.rfc822 import gen_rfc822_records
+
+logger = logging.getLogger("plainbox.metrics")
+
+#: Environment variable with the pathname of the metrics file of a job
+METRICS_FILE_ENV = 'PLAINBOX_METRICS_FILE'
+
+BETTER_HIGHER = 'higher'
+BETTER_LOWER = 'lower'
+
+
+class Metric(namedtuple('Metric', ['name', 'value', 'unit', 'better'])):
+    """
+    Measurement reported by a job
+
+    :attr name:
+        Name of the metric, unique for a given job
+    :attr value:
+        Measured value (a float)
+    :attr unit:
+        Unit of the value, may be empty
+    :attr better:
+        ``'higher'``, ``'lower'`` or None if the value cannot be judged
+    """
+
+    __slots__ = ()
+
+
+def make_metric(name, value, unit='', better=None):
+    """
+    Create a validated metric.
+
+    :raises ValueError:
+        if any of the fields is not valid
+    """
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(_("metric name cannot be empty"))
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(_("metric value must be a finite number"))
+    if better not in (BETTER_HIGHER, BETTER_LOWER, None):
+        raise ValueError(_("metric direction must be {!r} or {!r}").format(
+            BETTER_HIGHER, BETTER_LOWER))
+    return Metric(name.strip(), value, unit or '', better)
+
+
+def parse_metrics(stream):
+    """
+    Parse RFC822 metric records.
+
+    :param stream:
+        A text stream, a string or any iterable of lines
+    :returns:
+        A list of :class:`Metric`. Invalid records are logged and skipped,
+        a metric reported more than once keeps its last value.
+    """
+    metric_map = {}
+    try:
+        for record in gen_rfc822_records(stream):
+            data = record.data
+            try:
+                metric = make_metric(
+                    data.get('name', ''), data.get('value'),
+                    data.get('unit', ''), data.get('better') or None)
+            except (TypeError, ValueError) as exc:
+                logger.warning(_("Ignoring invalid metric %r: %s"), data, exc)
+                continue
+            metric_map.pop(metric.name, None)
+            metric_map[metric.name] = metric
+    except RFC822SyntaxError as exc:
+        logger.warning(_("Cannot parse metrics: %s"), exc)
+    return list(metric_map.values())
+
+
+def load_metrics_file(pathname):
+    """
+    Load the metrics written by a job.
+
+    :returns:
+        A list of :class:`Metric`, empty if the file does not exist
+    """
+    try:
+        with open(pathname, 'rt', encoding='UTF-8', errors='replace') as f:
+            return parse_metrics(f)
+    except FileNotFoundError:
+        return []
+    except OSError as exc:
+        logger.warning(_("Cannot read metrics from %s: %s"), pathname, exc)
+        return []
+
+
+def metrics_from_json(metric_list):
+    """
+    Convert the JSON representation of metrics back to :class:`Metric`.
+
+    Both the list of lists used in session checkpoints and the list of
+    objects used in submissions are supported.
+    """
+    result = []
+    for item in metric_list:
+        try:
+            if isinstance(item, dict):
+                metric = make_metric(
+                    item['name'], item['value'], item.get('unit', ''),
+                    item.get('better'))
+            else:
+                metric = make_metric(*item)
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.warning(_("Ignoring invalid metric %r: %s"), item, exc)
+            continue
+        result.append(metric)
+    return result
+
+
+def load_submission_metrics(pathname):
+    """
+    Load the metrics of all the jobs of a submission.
+
+    :param pathname:
+        A submission tarball or the ``submission.json`` file from one
+    :returns:
+        A dictionary mapping job ids to lists of :class:`Metric`
+    :raises OSError, ValueError, KeyError:
+        if the submission cannot be read
+    """
+    if tarfile.is_tarfile(pathname):
+        with tarfile.open(pathname) as tar:
+            with tar.extractfile('submission.json') as stream:
+                data = json.loads(stream.read().decode('UTF-8'))
+    else:
+        with open(pathname, 'rt', encoding='UTF-8') as stream:
+            data = json.load(stream)
+    return {
+        result.get('full_id', result['id']): metrics_from_json(
+            result['metrics'])
+        for result in data['results'] if result.get('metrics')
+    }
+
+
+def load_session_metrics(storage):
+    """
+    Load the metrics of all the jobs of a stored session.
+
+    The checkpoint is decoded but the session is not resumed, so the
+    providers of the session are not needed.
+
+    :param storage:
+        The :class:`SessionStorage` of the session
+    :returns:
+        A dictionary mapping job ids to lists of :class:`Metric`
+    :raises CorruptedSessionError:
+        if the checkpoint cannot be decoded
+    """
+    # imported here, the session package depends on this module
+    from plainbox.impl.session.resume import EnvelopeUnpackMixIn
+    json_repr = EnvelopeUnpackMixIn().unpack_envelope(
+        storage.load_checkpoint())
+    results_repr = json_repr.get('session', {}).get('results', {})
+    metric_map = {}
+    for job_id, result_list in results_repr.items():
+        # only the last result of each job counts
+        if result_list and result_list[-1].get('metrics'):
+            metric_map[job_id] = metrics_from_json(
+                result_list[-1]['metrics'])
+    return metric_map
+
+
+class MetricComparison(namedtuple('MetricComparison', [
+        'job_id', 'name', 'unit', 'better', 'old', 'new', 'change',
+        'regression'])):
+    """
+    Comparison of a metric between two sessions
+
+    :attr job_id:
+        Identifier of the job that reported the metric
+    :attr name:
+        Name of the metric
+    :attr unit:
+        Unit of the metric (from the new session)
+    :attr better:
+        Direction of the metric (from the new session)
+    :attr old:
+        Value in the old session or None if it was not reported
+    :attr new:
+        Value in the new session or None if it was not reported
+    :attr change:
+        Relative change in percent or None if it cannot be computed
+    :attr regression:
+        True if the metric got worse by more than the threshold
+    """
+
+    __slots__ = ()
+
+
+def compare_metrics(old_map, new_map, threshold=5.0):
+    """
+    Compare the metrics of two sessions.
+
+    :param old_map:
+        Dictionary mapping job ids to lists of :class:`Metric` (the baseline)
+    :param new_map:
+        Dictionary mapping job ids to lists of :class:`Metric`
+    :param threshold:
+        Relative change, in percent, a metric has to get worse by to be
+        flagged as a regression
+    :returns:
+        A list of :class:`MetricComparison` sorted by job id and metric name
+    """
+    comparison_list = []
+    for job_id in sorted(set(old_map) | set(new_map)):
+        old_metrics = {m.name: m for m in old_map.get(job_id, ())}
+        new_metrics = {m.name: m for m in new_map.get(job_id, ())}
+        for name in sorted(set(old_metrics) | set(new_metrics)):
+            old = old_metrics.get(name)
+            new = new_metrics.get(name)
+            reference = new or old
+            change = None
+            regression = False
+            if old is not None and new is not None and old.value:
+                change = (new.value - old.value) / abs(old.value) * 100
+                if reference.better == BETTER_HIGHER:
+                    regression = change < -threshold
+                elif reference.better == BETTER_LOWER:
+                    regression = change > threshold
+            comparison_list.append(MetricComparison(
+                job_id, name, reference.unit, reference.better,
+                old.value if old else None, new.value if new else None,
+                change, regression))
+    return comparison_list
+
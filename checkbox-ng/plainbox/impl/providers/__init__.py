@@ -47,6 +47,8 @@ import os
 
 from plainbox.impl.providers.embedded_providers import (
     EmbeddedProvider1PlugInCollection)
+from plainbox.impl.tracing import span
+from plainbox.impl.tracing import traced
 
 logger = logging.getLogger("plainbox.providers.__init__")
 
@@ -56,6 +58,7 @@ class ProviderNotFound(LookupError):
     """ Exception used to report that a provider cannot be located. """
 
 
+@traced('get_providers', category='providers')
 def get_providers(*, only_secure: bool=False) -> 'List[Provider1]':
     """
     Find and load all providers that are available.
@@ -79,7 +82,8 @@ def get_providers(*, only_secure: bool=False) -> 'List[Provider1]':
         from plainbox.impl.secure.providers.v1 import all_providers
     else:
         from plainbox.impl.providers.v1 import all_providers
-    all_providers.load()
+    with span('discover providers', category='providers'):
+        all_providers.load()
     std_providers= [
         special.get_manifest(),
         special.get_exporters(),
@@ -92,8 +96,9 @@ def get_providers(*, only_secure: bool=False) -> 'List[Provider1]':
         return "{}:{}".format(provider.namespace, provider.name)
     sideload_path = os.path.expandvars(os.path.join(
         '/var', 'tmp', 'checkbox-providers'))
-    embedded_providers = EmbeddedProvider1PlugInCollection(sideload_path)
-    loaded_provs = embedded_providers.get_all_plugin_objects()
+    with span('discover sideloaded providers', category='providers'):
+        embedded_providers = EmbeddedProvider1PlugInCollection(sideload_path)
+        loaded_provs = embedded_providers.get_all_plugin_objects()
     for p in loaded_provs:
         logger.warning("Using sideloaded provider: %s from %s", p, p.base_dir)
     sl_qual_names = [qualified_name(p) for p in loaded_provs]
@@ -0,0 +1,151 @@
+/*
+ * This file is part of Checkbox.
+ *
+ * Copyright 2024 Canonical Ltd.
+ *
+ * Checkbox is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 3,
+ * as published by the Free Software Foundation.
+ *
+ * Checkbox is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+ */
+
+/*
+ * Lazy loading of the fragments of the paged HTML report.
+ *
+ * Each category table and each job log is stored in its own gzip compressed
+ * fragment under report/fragments/. Fragments are JavaScript files calling
+ * checkboxReport.fragmentLoaded() so they can be loaded with a script
+ * element: browsers forbid fetch() and XMLHttpRequest on reports opened
+ * from the file system.
+ */
+var checkboxReport = (function () {
+    /* Number of lines of a log that are shown before the user asks for more */
+    var TAIL_LINES = 500;
+    var pendingMap = {};
+    var promiseMap = {};
+
+    function decode(data) {
+        var bytes = Uint8Array.from(atob(data), function (c) {
+            return c.charCodeAt(0);
+        });
+        var stream = new Blob([bytes]).stream().pipeThrough(
+            new DecompressionStream('gzip'));
+        return new Response(stream).text().then(JSON.parse);
+    }
+
+    function load(name) {
+        if (!(name in promiseMap)) {
+            promiseMap[name] = new Promise(function (resolve, reject) {
+                var script = document.createElement('script');
+                pendingMap[name] = resolve;
+                script.src = 'report/fragments/' + name + '.js';
+                script.onerror = function () {
+                    delete pendingMap[name];
+                    delete promiseMap[name];
+                    reject(new Error('Cannot load ' + script.src));
+                };
+                document.head.appendChild(script);
+            }).then(decode);
+        }
+        return promiseMap[name];
+    }
+
+    function fragmentLoaded(name, data) {
+        var resolve = pendingMap[name];
+        delete pendingMap[name];
+        if (resolve) {
+            resolve(data);
+        }
+    }
+
+    function cell(width) {
+        return $('<td>').css('width', width);
+    }
+
+    function fillTable(table, rowList) {
+        var tbody = table.find('tbody');
+        $.each(rowList, function (index, row) {
+            var tr = $('<tr>');
+            tr.append(cell('35%').attr('data-filtertext', row.id).text(row.id));
+            tr.append(cell('10%').css({
+                'font-weight': 'bold', 'color': row.color}).text(row.outcome));
+            tr.append(cell('10%').text(row.certification_status));
+            var logCell = cell('10%');
+            if (row.log) {
+                logCell.append($('<a href="#log">').attr(
+                    'data-log', row.log).text(row.link));
+            }
+            tr.append(logCell);
+            tr.append(cell('35%').text(row.comments));
+            tbody.append(tr);
+        });
+        try {
+            table.table('rebuild');
+            table.filterable('refresh');
+        } catch (e) {
+            /* the widgets are not created yet, they will see the rows */
+        }
+    }
+
+    function showLog(log) {
+        var text = $('#log-text');
+        var image = $('#log-image');
+        $('#log-title').text(log.title);
+        $('#log-cap').hide();
+        text.text('');
+        image.hide().removeAttr('src');
+        if (log.image) {
+            image.attr('src', 'data:image/' + log.image_type + ';base64,' +
+                       log.image).show();
+            return;
+        }
+        var lineList = log.text.split('\n');
+        if (lineList.length > TAIL_LINES) {
+            $('#log-cap-text').text('Showing the last ' + TAIL_LINES +
+                                    ' of ' + lineList.length + ' lines.');
+            $('#log-expand').off('click').on('click', function (event) {
+                event.preventDefault();
+                $('#log-cap').hide();
+                text.text(log.text);
+            });
+            $('#log-cap').show();
+            text.text(lineList.slice(-TAIL_LINES).join('\n'));
+        } else {
+            text.text(log.text);
+        }
+    }
+
+    $(document).on('collapsibleexpand', '[data-fragment]', function () {
+        var collapsible = $(this);
+        if (collapsible.data('loaded')) {
+            return;
+        }
+        collapsible.data('loaded', true);
+        load(collapsible.attr('data-fragment')).then(function (rowList) {
+            fillTable(collapsible.find('table'), rowList);
+        }, function (error) {
+            collapsible.data('loaded', false);
+            collapsible.find('tbody').append(
+                $('<tr>').append($('<td>').text(error.message)));
+        });
+    });
+
+    $(document).on('click', 'a[data-log]', function (event) {
+        event.preventDefault();
+        load($(this).attr('data-log')).then(function (log) {
+            showLog(log);
+            $(':mobile-pagecontainer').pagecontainer('change', '#log');
+        }, function (error) {
+            alert(error.message);
+        });
+    });
+
+    return {fragmentLoaded: fragmentLoaded};
+})();
@@ -43,6 +43,7 @@ from plainbox.i18n import gettext as _
 from plainbox.i18n import pgettext as C_
 from plainbox.impl import pod
 from plainbox.impl.decorators import raises
+from plainbox.impl.metrics import Metric
 
 logger = logging.getLogger("plainbox.result")
 
@@ -230,6 +231,10 @@ class JobResultBuilder(pod.POD):
     io_log_filename = pod.Field(
         'path to a structured I/O log file of the (optional) test process',
         str, pod.UNSET, assign_filter_list=[pod.unset_or_typed])
+    metrics = pod.Field(
+        'measurements reported by the (optional) test process',
+        list, pod.UNSET, assign_filter_list=[
+            pod.unset_or_typed, pod.unset_or_typed.sequence(Metric)])
 
     def add_comment(self, comment):
         """
@@ -367,6 +372,11 @@ class _JobResultBase(IJobResult):
         """return code of the command associated with the job, if any."""
         return self._data.get('return_code')
 
+    @property
+    def metrics(self):
+        """tuple of :class:`Metric` reported by the job, if any."""
+        return tuple(self._data.get('metrics', ()))
+
     @property
     def io_log(self):
         return tuple(self.get_io_log())
@@ -546,7 +556,8 @@ class IOLogRecordWriter:
             base64.standard_b64encode(record[2]).decode("ASCII")],
             check_circular=False, ensure_ascii=True, indent=None,
             separators=(',', ':'))
-        logger.debug(_("Encoded %r into string %r"), record, text)
+        logger.debug(_("Encoded %d bytes of %s into %d characters"),
+                     len(record[2]), record[1], len(text))
         assert "\n" not in text
         self.stream.write(text)
         self.stream.write('\n')
@@ -47,8 +47,6 @@ import logging
 import os
 import time
 
-import pkg_resources
-
 from plainbox.i18n import gettext as _
 
 
@@ -512,6 +510,8 @@ class PkgResourcesPlugInCollection(PlugInCollectionBase):
 
         This is the method you want to mock if you are writing unit tests
         """
+        # imported here, pkg_resources takes a while to load
+        import pkg_resources
         return pkg_resources.iter_entry_points(self._namespace)
 
 
@@ -47,6 +47,7 @@ from plainbox.impl.secure.plugins import now
 from plainbox.impl.secure.rfc822 import FileTextSource
 from plainbox.impl.secure.rfc822 import RFC822SyntaxError
 from plainbox.impl.secure.rfc822 import load_rfc822_records
+from plainbox.impl.tracing import span
 from plainbox.impl.unit import all_units
 from plainbox.impl.unit.file import FileRole
 from plainbox.impl.unit.file import FileUnit
@@ -193,22 +194,30 @@ class UnitPlugIn(ProviderContentPlugIn):
                 raise PlugInError(
                     _("Cannot define unit from record {!r}: {}").format(
                         record, exc))
-            if check:
-                for issue in unit.check(context=context, live=True):
-                    if issue.severity is Severity.error:
-                        raise PlugInError(
-                            _("Problem in unit definition, {}").format(issue))
-            if validate:
-                try:
-                    unit.validate(**validation_kwargs)
-                except ValidationError as exc:
-                    raise PlugInError(
-                        _("Problem in unit definition, field {}: {}").format(
-                            exc.field, exc.problem))
+            if check or validate:
+                with span('validate unit', category='units',
+                          origin=str(record.origin)):
+                    self._check_unit(
+                        unit, check, context, validate, validation_kwargs)
             unit_list.append(unit)
             logger.debug(_("Loaded %r"), unit)
         return unit_list
 
+    @staticmethod
+    def _check_unit(unit, check, context, validate, validation_kwargs):
+        if check:
+            for issue in unit.check(context=context, live=True):
+                if issue.severity is Severity.error:
+                    raise PlugInError(
+                        _("Problem in unit definition, {}").format(issue))
+        if validate:
+            try:
+                unit.validate(**validation_kwargs)
+            except ValidationError as exc:
+                raise PlugInError(
+                    _("Problem in unit definition, field {}: {}").format(
+                        exc.field, exc.problem))
+
     def discover_units(
         self, inspect_result: "List[Unit]", filename: str, text: str,
         provider: "Provider1"
@@ -578,11 +587,14 @@ class ProviderContentLoader:
 
     def load(self, plugin_kwargs):
         logger.info("Loading content for provider %s", self.provider)
-        self.provider.content_collection.load()
-        for file_plugin in self.provider.content_collection.get_all_plugins():
-            filename = file_plugin.plugin_name
-            text = file_plugin.plugin_object
-            self._load_file(filename, text, plugin_kwargs)
+        with span('load provider', category='providers',
+                  provider=self.provider.name):
+            self.provider.content_collection.load()
+            for file_plugin in (
+                    self.provider.content_collection.get_all_plugins()):
+                filename = file_plugin.plugin_name
+                text = file_plugin.plugin_object
+                self._load_file(filename, text, plugin_kwargs)
         self.problem_list.extend(self.provider.content_collection.problem_list)
         self.is_loaded = True
 
@@ -594,8 +606,9 @@ class ProviderContentLoader:
         if plugin_cls is None:
             return
         try:
-            plugin = plugin_cls(
-                filename, text, 0, self.provider, **plugin_kwargs)
+            with span('load units', category='units', file=filename):
+                plugin = plugin_cls(
+                    filename, text, 0, self.provider, **plugin_kwargs)
         except PlugInError as exc:
             self.problem_list.append(exc)
         else:
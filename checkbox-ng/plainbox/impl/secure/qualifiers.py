@@ -26,6 +26,7 @@ some set of rules.
 """
 
 import abc
+import bisect
 import functools
 import itertools
 import logging
@@ -33,6 +34,7 @@ import operator
 import os
 import re
 import sre_constants
+import sre_parse
 
 from plainbox.abc import IJobQualifier
 from plainbox.i18n import gettext as _
@@ -435,104 +437,345 @@ def select_jobs(job_list, qualifier_list):
         A list of IJobQualifier objects.
     :returns:
         A sub-list of JobDefinition objects, selected from job_list.
+
+    This is a shortcut for ``JobSelector(job_list).select(qualifier_list)``.
+    Qualifiers that did not match any job are logged (at debug level).
+    """
+    selector = JobSelector(job_list)
+    selected_list = selector.select(qualifier_list)
+    if _logger.isEnabledFor(logging.DEBUG):
+        for qualifier in selector.get_unmatched_qualifiers():
+            _logger.debug(
+                "Qualifier %r did not match any job", qualifier)
+    return selected_list
+
+
+@functools.lru_cache(maxsize=None)
+def _get_literal_prefix(pattern_text):
+    """
+    Get the literal text that all the job ids matched by a pattern start with
+
+    :param pattern_text:
+        Text of a regular expression, as used with ``re.match()``
+    :returns:
+        The (possibly empty) literal prefix
+    """
+    try:
+        if re.compile(pattern_text).flags & re.IGNORECASE:
+            return ''
+        parsed = sre_parse.parse(pattern_text)
+    except sre_constants.error:
+        return ''
+    prefix = []
+    for op, av in parsed:
+        if op == sre_constants.AT and not prefix and av in (
+                sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING):
+            continue
+        if op != sre_constants.LITERAL:
+            break
+        prefix.append(chr(av))
+    return ''.join(prefix)
+
+
+# Constructs that change meaning when a pattern is embedded in a bigger one
+_UNCOMBINABLE_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def _is_combinable(regex):
+    """
+    Check if a compiled pattern can become one branch of a combined pattern
+
+    Patterns with inline (global) flags, named groups or back-references
+    can only be matched on their own.
+    """
+    return (regex.flags & ~re.UNICODE == 0 and not regex.groupindex and
+            _UNCOMBINABLE_RE.search(regex.pattern) is None)
+
+
+class _PatternBucket:
+    """
+    Job id patterns sharing one literal prefix
+
+    Patterns of inclusive and exclusive qualifiers are merged into one
+    combined regular expression each, with one named group per qualifier.
+    Since the branches are tried in order the name of the group that matched
+    identifies the first qualifier (in qualifier order) matching a job id.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.include_list = []
+        self.exclude_list = []
+
+    def add(self, q_index, regex, inclusive):
+        if inclusive:
+            self.include_list.append((q_index, regex))
+        else:
+            self.exclude_list.append((q_index, regex))
+
+    def compile(self):
+        """
+        Compile the patterns of this bucket
+
+        :returns:
+            A tuple (include_re, include_list, exclude_re, exclude_list) with
+            the combined patterns (or None) and the lists of (q_index, regex)
+            pairs that have to be matched one by one.
+        """
+        return (self._compile(self.include_list) +
+                self._compile(self.exclude_list))
+
+    @staticmethod
+    def _compile(pattern_list):
+        combinable = [(q_index, regex) for q_index, regex in pattern_list
+                      if _is_combinable(regex)]
+        single_list = [(q_index, regex) for q_index, regex in pattern_list
+                       if not _is_combinable(regex)]
+        if len(combinable) < 2:
+            return None, pattern_list
+        try:
+            combined_re = re.compile('|'.join(
+                '(?P<q{}>{})'.format(q_index, regex.pattern)
+                for q_index, regex in combinable))
+        except (sre_constants.error, OverflowError, RecursionError):
+            return None, pattern_list
+        return combined_re, single_list
+
+
+class JobSelector:
+    """
+    Compiled job selection engine
+
+    The selector indexes a list of jobs by id, by literal id prefix (as a
+    sorted list of ids) and, on demand, by the value of any other field. This
+    lets :meth:`select()` evaluate qualifiers without matching each one of
+    them against each job:
+
+    * qualifiers referring to a single job id are looked up in a dictionary
+    * job id patterns are grouped by their literal prefix, each group is
+      merged into one combined pattern and only applied to the jobs in the
+      range of ids starting with that prefix
+    * other field qualifiers are evaluated once per distinct field value
+    * anything else falls back to asking each qualifier about each job
+
+    The selection is identical to voting with each qualifier on each job:
+    the selected jobs are those with at least one inclusion and no
+    exclusions, ordered by the index of the first qualifier that included
+    them and then by their index in the job list.
     """
-    # Flatten the qualifier list, so that we can see the fine structure of
-    # composite objects.
-    flat_qualifier_list = get_flat_primitive_qualifier_list(qualifier_list)
-    # Short-circuit if there are no jobs to select. Min is used later and this
-    # will allow us to assume that the matrix is not empty.
-    if not flat_qualifier_list:
-        return []
-    # Vote matrix, encodes the vote cast by a particular qualifier for a
-    # particular job. Visually it's a two-dimensional array like this:
-    #
-    #   ^
-    # q |
-    # u |   X
-    # a |
-    # l |  ........
-    # i |
-    # f |             .
-    # i | .
-    # e |          .
-    # r |
-    #    ------------------->
-    #                    job
-    #
-    # The vertical axis represents qualifiers from the flattened qualifier
-    # list.  The horizontal axis represents jobs from job list. Dots represent
-    # inclusion, X represents exclusion.
-    #
-    # The result of the select_job() function is a list of jobs that have at
-    # least one inclusion and no exclusions. The resulting list is ordered by
-    # increasing qualifier index.
-    #
-    # The algorithm implemented below is composed of two steps.
-    #
-    # The first step iterates over the vote matrix (row-major, meaning that we
-    # visit all columns for each visit of one row) and constructs two
-    # structures: a set of jobs that got VOTE_INCLUDE and a list of those jobs,
-    # in the order of discovery. All VOTE_EXCLUDE votes are collected in
-    # another set.
-    #
-    # The second step filters-out all items from the excluded job set from the
-    # selected job list. For extra efficiency the algorithm operates on
-    # integers representing the index of a particular job in job_list.
-    #
-    # The final complexity is O(N x M) + O(M), where N is the number of
-    # qualifiers (flattened) and M is the number of jobs. The algorithm assumes
-    # that set lookup is a O(1) operation which is true enough for python.
-    #
-    # A possible optimization would differentiate qualifiers that may select
-    # more than one job and fall-back to the current implementation while
-    # short-circuiting qualifiers that may select at most one job with a
-    # separate set lookup. That would make the algorithm "mostly" linear in the
-    # common case.
-    #
-    # As a separate feature, we might return a list of qualifiers that never
-    # matched anything. That may be helpful for debugging.
-    included_list = []
-    id_to_index_map = {job.id: index for index, job in enumerate(job_list)}
-    included_set = set()
-    excluded_set = set()
-    for qualifier in flat_qualifier_list:
+
+    def __init__(self, job_list):
+        self._job_list = job_list
+        self._id_to_index_map = {
+            job.id: index for index, job in enumerate(job_list)}
+        self._sorted_id_list = None
+        self._field_index_map = {}
+        self._unmatched_candidates = ()
+
+    def select(self, qualifier_list):
+        """
+        Select desired jobs.
+
+        :param qualifier_list:
+            A list of IJobQualifier objects.
+        :returns:
+            A sub-list of JobDefinition objects, selected from the job list.
+        """
+        # Flatten the qualifier list, so that we can see the fine structure of
+        # composite objects.
+        flat_qualifier_list = get_flat_primitive_qualifier_list(
+            qualifier_list)
+        # Vote matrix, encodes the vote cast by a particular qualifier for a
+        # particular job. Visually it's a two-dimensional array like this:
+        #
+        #   ^
+        # q |
+        # u |   X
+        # a |
+        # l |  ........
+        # i |
+        # f |             .
+        # i | .
+        # e |          .
+        # r |
+        #    ------------------->
+        #                    job
+        #
+        # The vertical axis represents qualifiers from the flattened qualifier
+        # list.  The horizontal axis represents jobs from job list. Dots
+        # represent inclusion, X represents exclusion.
+        #
+        # The result is a list of jobs that have at least one inclusion and
+        # no exclusions. The resulting list is ordered by increasing qualifier
+        # index (of the first inclusion) and then by increasing job index.
+        #
+        # Instead of visiting the whole matrix, each kind of qualifier only
+        # visits the cells that may hold a vote (see the class docstring).
+        # For each job we only keep the index of the first qualifier that
+        # included it and whether any qualifier excluded it.
+        self._first_include_map = {}
+        self._excluded_set = set()
+        self._matched_set = set()
+        bucket_map = {}
+        for q_index, qualifier in enumerate(flat_qualifier_list):
+            if isinstance(qualifier, JobIdQualifier):
+                for j_index in self._get_field_index('id').get(
+                        qualifier.id, ()):
+                    self._vote(q_index, j_index, qualifier.get_vote(
+                        self._job_list[j_index]))
+                continue
+            job_id = self._get_exact_id(qualifier)
+            if job_id is not None:
+                # The lookup can fail if the pattern is a constant reference
+                # to a generated job that doesn't exist yet. To maintain
+                # correctness we should just ignore it, as it would not match
+                # anything yet.
+                j_index = self._id_to_index_map.get(job_id)
+                if j_index is not None:
+                    self._vote(q_index, j_index, qualifier.get_vote(
+                        self._job_list[j_index]))
+                continue
+            regex = self._get_id_regex(qualifier)
+            if regex is not None:
+                prefix = _get_literal_prefix(regex.pattern)
+                if prefix not in bucket_map:
+                    bucket_map[prefix] = _PatternBucket(prefix)
+                bucket_map[prefix].add(q_index, regex, qualifier.inclusive)
+                continue
+            if isinstance(qualifier, FieldQualifier):
+                field_index = self._get_field_index(qualifier.field)
+                if field_index is not None:
+                    self._vote_by_field(q_index, qualifier, field_index)
+                    continue
+            for j_index, job in enumerate(self._job_list):
+                self._vote(q_index, j_index, qualifier.get_vote(job))
+        for bucket in bucket_map.values():
+            self._vote_by_pattern(bucket)
+        self._unmatched_candidates = [
+            (q_index, qualifier)
+            for q_index, qualifier in enumerate(flat_qualifier_list)
+            if q_index not in self._matched_set]
+        return [self._job_list[j_index] for q_index, j_index in sorted(
+            (q_index, j_index)
+            for j_index, q_index in self._first_include_map.items()
+            if j_index not in self._excluded_set)]
+
+    def get_unmatched_qualifiers(self):
+        """
+        Get the qualifiers of the last selection that didn't match any job.
+
+        :returns:
+            A list of primitive qualifiers that neither included nor excluded
+            any job during the last call to :meth:`select()`.
+        """
+        unmatched_list = []
+        for q_index, qualifier in self._unmatched_candidates:
+            regex = self._get_id_regex(qualifier)
+            # Combined patterns only tell which qualifier matched a job id
+            # first, patterns shadowed by others have to be checked again.
+            if regex is None or not any(
+                    regex.match(job_id) for job_id, j_index in
+                    self._iter_prefixed_ids(
+                        _get_literal_prefix(regex.pattern))):
+                unmatched_list.append(qualifier)
+        return unmatched_list
+
+    def _vote(self, q_index, j_index, vote):
+        if vote == IJobQualifier.VOTE_INCLUDE:
+            self._matched_set.add(q_index)
+            if q_index < self._first_include_map.get(j_index, q_index + 1):
+                self._first_include_map[j_index] = q_index
+        elif vote == IJobQualifier.VOTE_EXCLUDE:
+            self._matched_set.add(q_index)
+            self._excluded_set.add(j_index)
+
+    def _vote_by_field(self, q_index, qualifier, field_index):
+        if qualifier.inclusive:
+            vote = IJobQualifier.VOTE_INCLUDE
+        else:
+            vote = IJobQualifier.VOTE_EXCLUDE
+        matcher = qualifier.matcher
+        for value, j_index_list in field_index.items():
+            if matcher.match(value):
+                for j_index in j_index_list:
+                    self._vote(q_index, j_index, vote)
+
+    def _vote_by_pattern(self, bucket):
+        include_re, include_list, exclude_re, exclude_list = bucket.compile()
+        for job_id, j_index in self._iter_prefixed_ids(bucket.prefix):
+            if include_re is not None:
+                match = include_re.match(job_id)
+                if match is not None:
+                    self._vote(q_index=int(match.lastgroup[1:]),
+                               j_index=j_index,
+                               vote=IJobQualifier.VOTE_INCLUDE)
+            for q_index, regex in include_list:
+                if regex.match(job_id) is not None:
+                    self._vote(q_index, j_index, IJobQualifier.VOTE_INCLUDE)
+                    break
+            if exclude_re is not None:
+                match = exclude_re.match(job_id)
+                if match is not None:
+                    self._vote(q_index=int(match.lastgroup[1:]),
+                               j_index=j_index,
+                               vote=IJobQualifier.VOTE_EXCLUDE)
+                    continue
+            for q_index, regex in exclude_list:
+                if regex.match(job_id) is not None:
+                    self._vote(q_index, j_index, IJobQualifier.VOTE_EXCLUDE)
+                    break
+
+    def _iter_prefixed_ids(self, prefix):
+        """Iterate over (id, index) pairs of jobs whose id has the prefix"""
+        if self._sorted_id_list is None:
+            self._sorted_id_list = sorted(
+                (job.id, j_index) for j_index, job in enumerate(
+                    self._job_list))
+        sorted_id_list = self._sorted_id_list
+        for pos in range(
+                bisect.bisect_left(sorted_id_list, (prefix,)),
+                len(sorted_id_list)):
+            job_id, j_index = sorted_id_list[pos]
+            if not job_id.startswith(prefix):
+                break
+            yield job_id, j_index
+
+    def _get_field_index(self, field):
+        """
+        Get a mapping from the values of a field to lists of job indices
+
+        :returns:
+            The mapping or None if the values of the field are not hashable
+        """
+        field = str(field)
+        if field not in self._field_index_map:
+            field_index = {}
+            try:
+                for j_index, job in enumerate(self._job_list):
+                    field_index.setdefault(
+                        getattr(job, field), []).append(j_index)
+            except TypeError:
+                field_index = None
+            self._field_index_map[field] = field_index
+        return self._field_index_map[field]
+
+    @staticmethod
+    def _get_exact_id(qualifier):
+        """Get the only job id the qualifier can match, if there is one"""
         if (isinstance(qualifier, FieldQualifier) and
                 qualifier.field == 'id' and
                 isinstance(qualifier.matcher, OperatorMatcher) and
                 qualifier.matcher.op == operator.eq):
-            # optimize the super-common case where a qualifier refers to
-            # a specific job by using the id_to_index_map to instantly
-            # perform the requested operation on a single job
-            try:
-                j_index = id_to_index_map[qualifier.matcher.value]
-            except KeyError:
-                # The lookup can fail if the pattern is a constant reference to
-                # a generated job that doens't exist yet. To maintain
-                # correctness we should just ignore it, as it would not
-                # match anything yet.
-                continue
-            job = job_list[j_index]
-            vote = qualifier.get_vote(job)
-            if vote == IJobQualifier.VOTE_INCLUDE:
-                if j_index in included_set:
-                    continue
-                included_set.add(j_index)
-                included_list.append(j_index)
-            elif vote == IJobQualifier.VOTE_EXCLUDE:
-                excluded_set.add(j_index)
-            elif vote == IJobQualifier.VOTE_IGNORE:
-                pass
-        else:
-            for j_index, job in enumerate(job_list):
-                vote = qualifier.get_vote(job)
-                if vote == IJobQualifier.VOTE_INCLUDE:
-                    if j_index in included_set:
-                        continue
-                    included_set.add(j_index)
-                    included_list.append(j_index)
-                elif vote == IJobQualifier.VOTE_EXCLUDE:
-                    excluded_set.add(j_index)
-                elif vote == IJobQualifier.VOTE_IGNORE:
-                    pass
-    return [job_list[index] for index in included_list
-            if index not in excluded_set]
+            return qualifier.matcher.value
+        return None
+
+    @staticmethod
+    def _get_id_regex(qualifier):
+        """Get the compiled pattern the qualifier matches job ids with"""
+        if isinstance(qualifier, RegExpJobQualifier):
+            return qualifier._pattern
+        if (isinstance(qualifier, FieldQualifier) and
+                qualifier.field == 'id' and
+                isinstance(qualifier.matcher, PatternMatcher)):
+            return qualifier.matcher._pattern
+        return None
@@ -31,6 +31,7 @@ Implementation of rfc822 serializer and deserializer.
 
 import logging
 import re
+import sys
 import textwrap
 
 from plainbox.i18n import gettext as _
@@ -40,13 +41,34 @@ from plainbox.impl.secure.origin import UnknownTextSource
 
 logger = logging.getLogger("plainbox.secure.rfc822")
 
+# Longest normalized value that gets interned
+_INTERN_MAX_LEN = 64
+
+# Multi-line dot marker used to encode empty lines in multi-line values
+_DOT_MARKER_RE = re.compile(r'^(\s*)\.$', re.M)
+
+# Tokenizer used by the fast parser. Lines are classified in the same order
+# the line-based parser checks for them. A field token also swallows all the
+# (non-blank) continuation lines that immediately follow it, continuation
+# tokens only show up after comments embedded in multi-line values.
+_LINE_RE = re.compile(r"""
+    (?P<comment>\#[^\n]*\n?)
+  | (?P<blank>[^\S\n]*\n|[^\S\n]+\Z)
+  | (?P<continuation>\ [^\n]*\n?)
+  | (?P<field>[^:\n]*:[^\n]*(?:\n\ [^\S\n]*\S[^\n]*)*\n?)
+  | (?P<other>[^\n]+\n?)
+""", re.X)
+
+# Line boundaries recognized by str.splitlines(), other than the newline
+_EXTRA_LINE_BREAKS_RE = re.compile('[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]')
+
 
 def normalize_rfc822_value(value):
     # multi-line markers and consistent indentation happens only on multi-line
     # values, so let's run those operations only on multi-line values
     if value.count('\n') > 1:
         # Remove the multi-line dot marker
-        value = re.sub('^(\s*)\.$', '\\1', value, flags=re.M)
+        value = _DOT_MARKER_RE.sub('\\1', value)
         # Remove consistent indentation
         value = textwrap.dedent(value)
     # Strip the remaining whitespace
@@ -68,8 +90,13 @@ class RFC822Record:
 
     Each instance also holds the origin of the data (location of the
     file/stream where it was parsed from).
+
+    Records produced by the parser only keep the raw data, the normalized
+    copy is computed the first time it is accessed.
     """
 
+    __slots__ = ('_data', '_raw_data', '_origin', '_field_offset_map')
+
     def __init__(self, data, origin=None, raw_data=None,
                  field_offset_map=None):
         """
@@ -95,18 +122,30 @@ class RFC822Record:
         self._origin = origin
         self._field_offset_map = field_offset_map
 
+    @classmethod
+    def _from_raw_data(cls, raw_data, origin, field_offset_map):
+        """
+        Create a record whose normalized data is computed lazily.
+        """
+        self = cls.__new__(cls)
+        self._data = None
+        self._raw_data = raw_data
+        self._origin = origin
+        self._field_offset_map = field_offset_map
+        return self
+
     def __repr__(self):
         return "<{} data:{!r} origin:{!r}>".format(
-            self.__class__.__name__, self._data, self._origin)
+            self.__class__.__name__, self.data, self._origin)
 
     def __eq__(self, other):
         if isinstance(other, RFC822Record):
-            return (self._data, self._origin) == (other._data, other._origin)
+            return (self.data, self._origin) == (other.data, other._origin)
         return NotImplemented
 
     def __ne__(self, other):
         if isinstance(other, RFC822Record):
-            return (self._data, self._origin) != (other._data, other._origin)
+            return (self.data, self._origin) != (other.data, other._origin)
         return NotImplemented
 
     @property
@@ -118,7 +157,18 @@ class RFC822Record:
         in this record. Normalization is performed with
         :func:`normalize_rfc822_value()`. Only values are normalized, keys are
         left intact.
+
+        Short single-line values are interned as resource records repeat
+        the same values (bus names, vendors, drivers, ...) very often.
         """
+        if self._data is None:
+            data = self._raw_data.__class__()
+            for key, value in self._raw_data.items():
+                value = normalize_rfc822_value(value)
+                if len(value) <= _INTERN_MAX_LEN and '\n' not in value:
+                    value = sys.intern(value)
+                data[key] = value
+            self._data = data
         return self._data
 
     @property
@@ -242,7 +292,8 @@ def gen_rfc822_records(stream, data_cls=dict, source=None):
     Load a sequence of rfc822-like records from a text stream.
 
     :param stream:
-        A file-like object from which to load the rfc822 data
+        A file-like object from which to load the rfc822 data. A string or
+        any iterable of lines is accepted as well.
     :param data_cls:
         The class of the dictionary-like type to hold the results. This is
         mainly there so that callers may pass collections.OrderedDict.
@@ -261,12 +312,11 @@ def gen_rfc822_records(stream, data_cls=dict, source=None):
     Returns a list of subsequent values as instances RFC822Record class. If
     the optional data_cls argument is collections.OrderedDict then the values
     retain their original ordering.
+
+    Strings and file-like objects are parsed in one go with
+    :func:`gen_rfc822_records_from_text()`, other iterables of lines are
+    parsed line by line. Both produce exactly the same records.
     """
-    record = None
-    key = None
-    value_list = None
-    origin = None
-    field_offset_map = None
     # If the source was not provided then try constructing a FileTextSource
     # from the name of the stream. If that fails, keep using None.
     if source is None:
@@ -274,6 +324,116 @@ def gen_rfc822_records(stream, data_cls=dict, source=None):
             source = FileTextSource(stream.name)
         except AttributeError:
             source = UnknownTextSource()
+    if isinstance(stream, str):
+        # str.splitlines() knows more line boundaries than the tokenizer
+        if _EXTRA_LINE_BREAKS_RE.search(stream) is None:
+            return gen_rfc822_records_from_text(stream, data_cls, source)
+        # keepends=True (python3.2 has no keyword for this)
+        stream = stream.splitlines(True)
+    elif hasattr(stream, 'read'):
+        # Streams are iterated over newline-terminated lines so the whole
+        # text can be tokenized the same way
+        return gen_rfc822_records_from_text(
+            stream.read(), data_cls, source,
+            getattr(stream, 'name', None))
+    return _gen_rfc822_records_from_lines(stream, data_cls, source)
+
+
+def gen_rfc822_records_from_text(text, data_cls=dict, source=None,
+                                 filename=None):
+    """
+    Load a sequence of rfc822-like records from a string.
+
+    :param text:
+        The rfc822 data. Only newline characters separate lines.
+    :param data_cls:
+        The class of the dictionary-like type to hold the results.
+    :param source:
+        A :class:`plainbox.abc.ITextSource` subclass instance that describes
+        where the text is coming from.
+    :param filename:
+        Name of the file to report in syntax errors
+
+    This is the fast variant of :func:`gen_rfc822_records()`. The text is
+    split into classified lines by a single regular expression, values are
+    only joined when a field ends and normalized lazily, when the data of a
+    record is first accessed.
+    """
+    if source is None:
+        source = UnknownTextSource()
+    raw_data = data_cls()
+    field_offset_map = {}
+    line_start = line_end = None
+    key = None
+    value_list = None
+    lineno = 0
+    for match in _LINE_RE.finditer(text):
+        lineno += 1
+        kind = match.lastgroup
+        if kind == 'continuation':
+            if key is None:
+                raise RFC822SyntaxError(
+                    filename, lineno, _("Unexpected multi-line value"))
+            value_list.append(match.group()[1:])
+            line_end = lineno
+        elif kind == 'field':
+            if line_start is None:
+                line_start = lineno
+            if key is not None:
+                raw_data[key] = ''.join(value_list)
+            head, newline, tail = match.group().partition('\n')
+            key, value = head.split(":", 1)
+            # Keys repeat in every record, share one copy of each
+            key = sys.intern(key.strip())
+            value = (value + newline).lstrip()
+            if key in raw_data:
+                raise RFC822SyntaxError(filename, lineno, _(
+                    "Job has a duplicate key {!r} "
+                    "with old value {!r} and new value {!r}"
+                ).format(key, raw_data[key], value))
+            if value.strip() != "":
+                value_list = [value]
+                field_offset_map[key] = lineno - line_start
+            else:
+                value_list = []
+                field_offset_map[key] = lineno - line_start + 1
+            if tail:
+                # Strip the initial space of each continuation line
+                value_list.append(tail.replace('\n ', '\n')[1:])
+                lineno += tail.count('\n')
+                if not tail.endswith('\n'):
+                    lineno += 1
+            line_end = lineno
+        elif kind == 'blank':
+            if key is not None:
+                raw_data[key] = ''.join(value_list)
+                key = None
+            if raw_data:
+                yield RFC822Record._from_raw_data(
+                    raw_data, Origin(source, line_start, line_end),
+                    field_offset_map)
+            raw_data = data_cls()
+            field_offset_map = {}
+            line_start = line_end = None
+        elif kind == 'other':
+            raise RFC822SyntaxError(filename, lineno, _(
+                "Unexpected non-empty line: {!r}").format(match.group()))
+    if key is not None:
+        raw_data[key] = ''.join(value_list)
+    if raw_data:
+        yield RFC822Record._from_raw_data(
+            raw_data, Origin(source, line_start, line_end), field_offset_map)
+
+
+def _gen_rfc822_records_from_lines(stream, data_cls, source):
+    """
+    Load a sequence of rfc822-like records from an iterable of lines.
+    """
+    record = None
+    key = None
+    value_list = None
+    origin = None
+    field_offset_map = None
 
     def _syntax_error(msg):
         """
@@ -330,10 +490,6 @@ def gen_rfc822_records(stream, data_cls=dict, source=None):
 
     # Start with an empty record
     _new_record()
-    # Support simple text strings
-    if isinstance(stream, str):
-        # keepends=True (python3.2 has no keyword for this)
-        stream = iter(stream.splitlines(True))
     # Iterate over subsequent lines of the stream
     for lineno, line in enumerate(stream, start=1):
         logger.debug(_("Looking at line %d:%r"), lineno, line)
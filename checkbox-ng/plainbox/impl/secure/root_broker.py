@@ -0,0 +1,422 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.secure.root_broker` -- privileged job runner broker
+=======================================================================
+
+Running a job as root used to mean one ``sudo`` invocation (and the PAM
+session and password check that come with it) per job. The broker is a small
+server started once per session, with a single ``sudo``, that spawns the
+commands of root jobs on behalf of the runner.
+
+The runner talks to the broker over a Unix socket pair: the broker gets its
+end as its standard input, which is also where ``sudo`` reads the password
+from. Nothing else can reach the broker, there is no socket in the
+filesystem and the runner end is not inherited by the jobs. Each job is one
+connection: the runner creates another socket pair and sends one end to the
+broker over the control socket, then sends the command, the environment and
+the working directory along with the file descriptors of the standard input
+and output pipes of the job. The broker starts the command with them (in a
+new session, like the runner does) and sends back its pid and, once it is
+done, its return code. The runner can send signals to the process group of
+the command over the same connection.
+
+The environment sent by the runner is the differential environment also
+used with ``sudo``: it is applied on top of the environment of the broker,
+which is the one ``sudo`` gives to root commands.
+
+The broker stops when the control socket is closed, that is when the runner
+stops it or exits.
+
+This module only depends on the standard library: the broker runs it as a
+script, with the python interpreter of the runner.
+"""
+
+import array
+import atexit
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+logger = logging.getLogger("plainbox.root_broker")
+
+#: Environment variable disabling the broker (root jobs then use one sudo
+#: invocation each)
+DISABLE_ENV = 'PLAINBOX_NO_ROOT_BROKER'
+
+# Maximum size of a request, the environment can be large
+_MAX_MESSAGE_SIZE = 1024 * 1024
+_NUM_STDIO_FDS = 3
+
+
+class RootBrokerError(Exception):
+    """Exception raised when the broker cannot be used."""
+
+
+def root_broker_enabled():
+    """Check if root jobs should be run by the broker."""
+    return not os.getenv(DISABLE_ENV)
+
+
+def _send_message(sock, message, fds=()):
+    data = json.dumps(message).encode('UTF-8') + b'\n'
+    if fds:
+        sock.sendmsg([data], [(
+            socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))])
+    else:
+        sock.sendall(data)
+
+
+class _MessageReader:
+    """Reader of newline-delimited JSON messages (and attached fds)."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._buffer = b''
+
+    def read(self, with_fds=False):
+        """
+        Read one message.
+
+        :returns:
+            The message (None at the end of the stream) or, with with_fds,
+            a tuple with the message and the list of received fds
+        """
+        fds = []
+        while b'\n' not in self._buffer:
+            if len(self._buffer) > _MAX_MESSAGE_SIZE:
+                raise RootBrokerError("message too large")
+            if with_fds:
+                fd_size = array.array('i').itemsize * _NUM_STDIO_FDS
+                data, ancdata, _flags, _addr = self._sock.recvmsg(
+                    65536, socket.CMSG_SPACE(fd_size))
+                for level, kind, fd_data in ancdata:
+                    if level == socket.SOL_SOCKET and \
+                            kind == socket.SCM_RIGHTS:
+                        fd_array = array.array('i')
+                        fd_array.frombytes(fd_data[:len(fd_data) - (
+                            len(fd_data) % fd_array.itemsize)])
+                        fds.extend(fd_array)
+            else:
+                data = self._sock.recv(65536)
+            if not data:
+                for fd in fds:
+                    os.close(fd)
+                return (None, []) if with_fds else None
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        message = json.loads(line.decode('UTF-8'))
+        return (message, fds) if with_fds else message
+
+
+class BrokeredProcess:
+    """
+    Process started by the broker.
+
+    This has the subset of the :class:`subprocess.Popen` interface used by
+    the runner: ``pid``, ``stdout``, ``stderr``, ``returncode``,
+    :meth:`wait` and :meth:`send_signal`.
+    """
+
+    def __init__(self, sock, reader, pid, stdout, stderr):
+        self._sock = sock
+        self._reader = reader
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def wait(self):
+        """Wait for the process to finish and return its return code."""
+        if self.returncode is None:
+            message = self._reader.read()
+            if message is None:
+                # The broker went away, report the process as killed
+                self.returncode = -9
+            else:
+                self.returncode = message['returncode']
+            self._sock.close()
+        return self.returncode
+
+    def send_signal(self, signal_num):
+        """Send a signal to the process group of the process."""
+        if self.returncode is None:
+            try:
+                _send_message(self._sock, {'signal': int(signal_num)})
+            except OSError as exc:
+                logger.warning("Cannot signal process %d: %s", self.pid, exc)
+
+
+class RootBrokerClient:
+    """
+    Client of the privileged runner broker, used by the job runner.
+
+    :param password_provider:
+        Callable returning the sudo password (bytes) or None if sudo does
+        not need one
+    :param use_sudo:
+        Start the broker with sudo, as root. Without it the broker runs as
+        the current user (this is only useful for testing).
+    """
+
+    def __init__(self, password_provider=None, use_sudo=True):
+        self._password_provider = password_provider
+        self._use_sudo = use_sudo
+        self._proc = None
+        self._control = None
+        self._control_lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self, timeout=30):
+        """
+        Start the broker and wait until it is ready.
+
+        :raises RootBrokerError:
+            if the broker cannot be started (for instance because the sudo
+            password is not valid)
+        """
+        cmd = []
+        if self._use_sudo:
+            cmd = ['sudo', '--prompt', '', '--reset-timestamp', '--stdin',
+                   '--user', 'root']
+        # Isolated mode: the environment is reset by sudo anyway and the
+        # directory of this module must not be in sys.path
+        cmd += [sys.executable, '-I', os.path.abspath(__file__)]
+        control, broker_end = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            if self._use_sudo and self._password_provider:
+                password = self._password_provider()
+                if password:
+                    control.sendall(password + b'\n')
+            self._proc = subprocess.Popen(
+                cmd, stdin=broker_end, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError as exc:
+            control.close()
+            raise RootBrokerError(str(exc))
+        finally:
+            broker_end.close()
+        # The control socket is also the lifeline of the broker
+        self._control = control
+        # The broker says when it is ready, sudo fails without printing
+        # anything on stdout if the password is wrong
+        status = []
+        done = threading.Event()
+
+        def read_status():
+            status.append(self._proc.stdout.readline().strip())
+            done.set()
+        threading.Thread(target=read_status, daemon=True).start()
+        if not done.wait(timeout) or status != [b'ready']:
+            self.stop()
+            raise RootBrokerError("the privileged runner broker did not start")
+        atexit.register(self.stop)
+        logger.debug("Privileged runner broker started (pid %d)",
+                     self._proc.pid)
+
+    def stop(self):
+        """Stop the broker."""
+        if self._proc is None:
+            return
+        self._control.close()
+        try:
+            self._proc.wait(10)
+        except subprocess.TimeoutExpired:
+            logger.warning("The privileged runner broker did not stop")
+        self._proc.stdout.close()
+        self._proc = None
+
+    def _connect(self):
+        """Open a connection to the broker, over the control socket."""
+        sock, broker_end = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            with self._control_lock:
+                # one byte per connection, the broker reads them one by one
+                # to get each descriptor with its own byte
+                self._control.sendmsg([b'c'], [(
+                    socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                    array.array('i', [broker_end.fileno()]))])
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            broker_end.close()
+        return sock
+
+    def spawn(self, args, env, cwd=None, stdin=None):
+        """
+        Start a command through the broker.
+
+        :param args:
+            The argument list of the command
+        :param env:
+            Variables to set (or override) in the environment of the broker
+        :param cwd:
+            The working directory of the command
+        :param stdin:
+            File descriptor to use as the standard input of the command
+        :returns:
+            A :class:`BrokeredProcess` which stdout and stderr can be read
+        :raises RootBrokerError:
+            if the broker cannot start the command
+        """
+        if not self.is_running:
+            raise RootBrokerError(
+                "the privileged runner broker is not running")
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        stdin_fd = os.open(os.devnull, os.O_RDONLY) if stdin is None else stdin
+        sock = None
+        try:
+            sock = self._connect()
+            _send_message(sock, {
+                'args': list(args), 'env': dict(env), 'cwd': cwd,
+            }, [stdin_fd, out_w, err_w])
+            reader = _MessageReader(sock)
+            reply = reader.read()
+        except (OSError, ValueError) as exc:
+            if sock is not None:
+                sock.close()
+            os.close(out_r)
+            os.close(err_r)
+            raise RootBrokerError(str(exc))
+        finally:
+            # The command has its own copies now
+            os.close(out_w)
+            os.close(err_w)
+            if stdin is None:
+                os.close(stdin_fd)
+        if reply is None or 'error' in reply:
+            sock.close()
+            os.close(out_r)
+            os.close(err_r)
+            raise RootBrokerError(
+                reply['error'] if reply else "no reply from the broker")
+        return BrokeredProcess(
+            sock, reader, reply['pid'],
+            os.fdopen(out_r, 'rb'), os.fdopen(err_r, 'rb'))
+
+
+class RootBroker:
+    """
+    The broker itself, running as root.
+
+    :param control:
+        The socket connected to the runner, only the runner has the other
+        end of it
+    """
+
+    def __init__(self, control):
+        self._control = control
+
+    def serve_forever(self):
+        """Handle connections until the runner closes the control socket."""
+        fd_size = array.array('i').itemsize
+        while True:
+            try:
+                # one byte at a time: each byte comes with one connection
+                data, ancdata, _flags, _addr = self._control.recvmsg(
+                    1, socket.CMSG_SPACE(fd_size))
+            except OSError:
+                return
+            if not data:
+                return
+            for level, kind, fd_data in ancdata:
+                if level != socket.SOL_SOCKET or kind != socket.SCM_RIGHTS:
+                    continue
+                fd_array = array.array('i')
+                fd_array.frombytes(fd_data[:len(fd_data) - (
+                    len(fd_data) % fd_size)])
+                for fd in fd_array:
+                    conn = socket.socket(
+                        socket.AF_UNIX, socket.SOCK_STREAM, fileno=fd)
+                    threading.Thread(
+                        target=self._handle, args=(conn,),
+                        daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            reader = _MessageReader(conn)
+            try:
+                request, fds = reader.read(with_fds=True)
+            except (OSError, ValueError, RootBrokerError):
+                return
+            if request is None:
+                return
+            try:
+                if len(fds) != _NUM_STDIO_FDS:
+                    raise RootBrokerError(
+                        "expected the stdio file descriptors")
+                env = dict(os.environ)
+                env.update(request['env'])
+                proc = subprocess.Popen(
+                    request['args'], env=env, cwd=request.get('cwd'),
+                    stdin=fds[0], stdout=fds[1], stderr=fds[2],
+                    start_new_session=True)
+            except (OSError, ValueError, KeyError, TypeError,
+                    RootBrokerError) as exc:
+                _send_message(conn, {'error': str(exc)})
+                return
+            finally:
+                for fd in fds:
+                    os.close(fd)
+            _send_message(conn, {'pid': proc.pid})
+            threading.Thread(
+                target=self._forward_signals, args=(reader, proc),
+                daemon=True).start()
+            returncode = proc.wait()
+            try:
+                _send_message(conn, {'returncode': returncode})
+            except OSError:
+                pass
+
+    def _forward_signals(self, reader, proc):
+        while True:
+            try:
+                message = reader.read()
+            except (OSError, ValueError, RootBrokerError):
+                return
+            if message is None or proc.poll() is not None:
+                return
+            try:
+                os.killpg(proc.pid, message['signal'])
+            except (OSError, KeyError, TypeError):
+                pass
+
+
+def main():
+    """Run the broker until the runner closes its standard input."""
+    # sudo has read the password from it, the rest is for the broker
+    control = socket.fromfd(0, socket.AF_UNIX, socket.SOCK_STREAM)
+    os.close(0)
+    os.open(os.devnull, os.O_RDONLY)
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+    RootBroker(control).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
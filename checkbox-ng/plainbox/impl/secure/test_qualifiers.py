@@ -37,8 +37,10 @@ from plainbox.impl.secure.origin import Origin
 from plainbox.impl.secure.origin import UnknownTextSource
 from plainbox.impl.secure.qualifiers import CompositeQualifier
 from plainbox.impl.secure.qualifiers import FieldQualifier
+from plainbox.impl.secure.qualifiers import get_flat_primitive_qualifier_list
 from plainbox.impl.secure.qualifiers import IMatcher
 from plainbox.impl.secure.qualifiers import JobIdQualifier
+from plainbox.impl.secure.qualifiers import JobSelector
 from plainbox.impl.secure.qualifiers import NonPrimitiveQualifierOrigin
 from plainbox.impl.secure.qualifiers import OperatorMatcher
 from plainbox.impl.secure.qualifiers import PatternMatcher
@@ -525,3 +527,123 @@ class FunctionTests(TestCase):
             self.assertEqual(
                 select_jobs(job_list, [qual_all, qual_not_c]),
                 [job_a, job_b])
+
+
+def naive_select_jobs(job_list, qualifier_list):
+    """
+    Reference implementation of select_jobs(), voting on each job with each
+    qualifier.
+    """
+    included_list = []
+    excluded_set = set()
+    for qualifier in get_flat_primitive_qualifier_list(qualifier_list):
+        for j_index, job in enumerate(job_list):
+            vote = qualifier.get_vote(job)
+            if vote == IJobQualifier.VOTE_INCLUDE:
+                if j_index not in included_list:
+                    included_list.append(j_index)
+            elif vote == IJobQualifier.VOTE_EXCLUDE:
+                excluded_set.add(j_index)
+    return [job_list[j_index] for j_index in included_list
+            if j_index not in excluded_set]
+
+
+class JobSelectorTests(TestCase):
+
+    def setUp(self):
+        self.origin = mock.Mock(name='origin', spec_set=Origin)
+        self.job_list = [
+            JobDefinition({'id': 'ns::{}/{}'.format(group, name),
+                           'plugin': plugin})
+            for group, plugin in [
+                ('audio', 'shell'), ('usb', 'manual'), ('disk', 'shell'),
+                ('audio2', 'user-interact')]
+            for name in ['detect', 'playback', 'stress', 'detect-ng']]
+
+    def id_pattern(self, pattern, inclusive=True):
+        return FieldQualifier(
+            'id', PatternMatcher(pattern), self.origin, inclusive)
+
+    def id_eq(self, job_id, inclusive=True):
+        return FieldQualifier(
+            'id', OperatorMatcher(operator.eq, job_id), self.origin,
+            inclusive)
+
+    def assertSameSelection(self, qualifier_list):
+        for job_list in [self.job_list, list(reversed(self.job_list))]:
+            self.assertEqual(
+                JobSelector(job_list).select(qualifier_list),
+                naive_select_jobs(job_list, qualifier_list))
+
+    def test_ordering_follows_first_inclusion(self):
+        self.assertSameSelection([
+            self.id_pattern('^ns::usb/.*$'),
+            self.id_eq('ns::disk/stress'),
+            self.id_pattern('^ns::.*detect$'),
+            self.id_pattern('^ns::audio/.*$'),
+            self.id_pattern('^ns::.*playback$'),
+            self.id_pattern('^ns::audio.*$'),
+            self.id_pattern('^ns::.*-ng$'),
+        ])
+
+    def test_exclusions(self):
+        self.assertSameSelection([
+            self.id_pattern('^ns::.*$'),
+            self.id_pattern('^ns::audio/.*$', inclusive=False),
+            self.id_pattern('^ns::.*stress$', inclusive=False),
+            self.id_pattern('^ns::.*-ng$', inclusive=False),
+            self.id_eq('ns::usb/detect', inclusive=False),
+        ])
+
+    def test_uncombinable_patterns(self):
+        self.assertSameSelection([
+            self.id_pattern('^ns::(?P<group>[a-z]+)/detect$'),
+            self.id_pattern('(?i)^NS::DISK/.*$'),
+            self.id_pattern(r'^ns::(a)udio\1?/.*$'),
+            self.id_pattern('^ns::audio2/.*$'),
+            RegExpJobQualifier('^ns::audio/.*$', self.origin),
+            RegExpJobQualifier('ns::usb', self.origin, inclusive=False),
+        ])
+
+    def test_field_qualifiers(self):
+        self.assertSameSelection([
+            FieldQualifier(
+                'plugin', OperatorMatcher(operator.eq, 'shell'), self.origin),
+            FieldQualifier(
+                'plugin', PatternMatcher('^user-'), self.origin),
+            FieldQualifier(
+                'plugin', OperatorMatcher(operator.ne, 'manual'), self.origin,
+                inclusive=False),
+            self.id_pattern('^ns::usb/.*$'),
+        ])
+
+    def test_duplicate_ids(self):
+        job_list = self.job_list + [JobDefinition({'id': 'ns::usb/detect'})]
+        qualifier_list = [
+            JobIdQualifier('ns::usb/detect', self.origin),
+            self.id_pattern('^ns::usb/detect$'),
+        ]
+        self.assertEqual(
+            JobSelector(job_list).select(qualifier_list),
+            naive_select_jobs(job_list, qualifier_list))
+
+    def test_other_qualifiers(self):
+        qualifier = mock.Mock(spec_set=SimpleQualifier)
+        qualifier.get_primitive_qualifiers.return_value = [qualifier]
+        qualifier.get_vote.side_effect = lambda job: (
+            IJobQualifier.VOTE_INCLUDE if job.plugin == 'manual'
+            else IJobQualifier.VOTE_IGNORE)
+        self.assertSameSelection([qualifier, self.id_pattern('^ns::disk/')])
+
+    def test_get_unmatched_qualifiers(self):
+        typo = self.id_pattern('^ns::adio/.*$')
+        missing = self.id_eq('ns::audio/missing')
+        shadowed = self.id_pattern('^ns::audio/detect$')
+        unused_exclusion = self.id_pattern('^ns::video/.*$', inclusive=False)
+        selector = JobSelector(self.job_list)
+        selector.select([
+            self.id_pattern('^ns::audio/.*$'), typo, missing, shadowed,
+            unused_exclusion])
+        self.assertEqual(
+            selector.get_unmatched_qualifiers(),
+            [typo, missing, unused_exclusion])
@@ -26,12 +26,16 @@ Test definitions for plainbox.impl.secure.rfc822 module
 
 from io import StringIO
 from unittest import TestCase
+import glob
+import os
 
 from plainbox.impl.secure.origin import FileTextSource
 from plainbox.impl.secure.origin import Origin
 from plainbox.impl.secure.origin import UnknownTextSource
 from plainbox.impl.secure.rfc822 import RFC822Record
 from plainbox.impl.secure.rfc822 import RFC822SyntaxError
+from plainbox.impl.secure.rfc822 import _gen_rfc822_records_from_lines
+from plainbox.impl.secure.rfc822 import gen_rfc822_records_from_text
 from plainbox.impl.secure.rfc822 import load_rfc822_records
 from plainbox.impl.secure.rfc822 import normalize_rfc822_value
 
@@ -569,6 +573,83 @@ class RFC822ParserTests(TestCase):
         })
 
 
+def load_rfc822_records_line_by_line(stream, data_cls=dict, source=None):
+    """
+    Load records with the line-based parser, for comparison.
+    """
+    if source is None:
+        try:
+            source = FileTextSource(stream.name)
+        except AttributeError:
+            source = UnknownTextSource()
+    if isinstance(stream, str):
+        stream = stream.splitlines(True)
+    return list(_gen_rfc822_records_from_lines(stream, data_cls, source))
+
+
+class LineBasedRFC822ParserTests(RFC822ParserTests):
+
+    loader = load_rfc822_records_line_by_line
+
+
+class FastParserCompatibilityTests(TestCase):
+    """
+    Tests comparing the fast parser with the line-based parser.
+    """
+
+    def assertSameRecords(self, text):
+        source = FileTextSource('file.pxu')
+        try:
+            expected = load_rfc822_records_line_by_line(
+                NamedStringIO(text, 'file.pxu'), source=source)
+        except RFC822SyntaxError as exc:
+            with self.assertRaises(RFC822SyntaxError) as boom:
+                list(gen_rfc822_records_from_text(
+                    text, source=source, filename='file.pxu'))
+            self.assertEqual(boom.exception, exc)
+            return
+        records = list(gen_rfc822_records_from_text(text, source=source))
+        self.assertEqual(len(records), len(expected))
+        for record, expected_record in zip(records, expected):
+            self.assertEqual(record.data, expected_record.data)
+            self.assertEqual(record.raw_data, expected_record.raw_data)
+            self.assertEqual(record.origin.line_start,
+                             expected_record.origin.line_start)
+            self.assertEqual(record.origin.line_end,
+                             expected_record.origin.line_end)
+            self.assertEqual(record.field_offset_map,
+                             expected_record.field_offset_map)
+
+    def test_corner_cases(self):
+        for text in [
+            "", "\n", "  ", "a: b", "a:\n b\n \n c", "# c\na: b\n\t\n",
+            "a: b\n c\n#\n .\n d\n\n\n\ne:\n\n", " x\n", "a: b\nx\n",
+            "a: 1\na: 2\n", "a: b\r\nc: d\r\n", "a: b\x1c\nc: d\n",
+            "a : b :c\n\x85\n",
+        ]:
+            with self.subTest(text=text):
+                self.assertSameRecords(text)
+
+    def test_provider_units(self):
+        providers_dir = os.path.join(
+            os.path.dirname(__file__), '..', '..', '..', '..', 'providers')
+        filenames = glob.glob(
+            os.path.join(providers_dir, '**', '*.pxu'), recursive=True)
+        if not filenames:
+            self.skipTest("provider sources are not available")
+        for filename in filenames:
+            with open(filename, encoding='UTF-8') as stream:
+                text = stream.read()
+            with self.subTest(filename=filename):
+                self.assertSameRecords(text)
+
+    def test_lazy_normalization(self):
+        record, = gen_rfc822_records_from_text("key:\n  a\n  .\n  b\n")
+        self.assertIsNone(record._data)
+        self.assertEqual(record.data, {'key': 'a\n\nb'})
+        self.assertIs(record.data, record.data)
+
+
 class NamedStringIO(StringIO):
     """
      Subclass of StringIO with a name attribute.
@@ -0,0 +1,165 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.secure.test_root_broker`
+============================================
+
+Test definitions for :mod:`plainbox.impl.secure.root_broker`
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import os
+import signal
+
+from plainbox.impl.execution import UnifiedRunner
+from plainbox.impl.secure.root_broker import RootBrokerClient
+from plainbox.impl.secure.root_broker import RootBrokerError
+from plainbox.impl.unit.job import JobDefinition
+
+
+class RootBrokerTests(TestCase):
+
+    def setUp(self):
+        # The broker runs as the current user, without sudo
+        self.client = RootBrokerClient(use_sudo=False)
+        self.client.start()
+        self.addCleanup(self.client.stop)
+
+    def test_jobs_cannot_reach_the_broker(self):
+        # the job only has its standard input and output
+        proc = self.client.spawn(['ls', '/proc/self/fd'], {})
+        with proc.stdout, proc.stderr:
+            fds = proc.stdout.read().split()
+        proc.wait()
+        # the last one is the directory listed by ls
+        self.assertEqual(fds[:3], [b'0', b'1', b'2'])
+        self.assertEqual(len(fds), 4)
+
+    def test_password_is_ignored(self):
+        # sudo does not read the password when it does not need it
+        self.client._control.sendall(b'password\n')
+        self.test_spawn()
+
+    def test_spawn(self):
+        in_r, in_w = os.pipe()
+        os.write(in_w, b'input\n')
+        os.close(in_w)
+        with TemporaryDirectory() as cwd:
+            proc = self.client.spawn(
+                ['sh', '-c', 'read line; echo "$line $VAR $(pwd)";'
+                 ' echo err >&2; exit 3'],
+                {'VAR': 'value'}, cwd, in_r)
+            os.close(in_r)
+            with proc.stdout, proc.stderr:
+                self.assertEqual(
+                    proc.stdout.read().decode(),
+                    'input value {}\n'.format(os.path.realpath(cwd)))
+                self.assertEqual(proc.stderr.read(), b'err\n')
+            self.assertEqual(proc.wait(), 3)
+        self.assertEqual(proc.returncode, 3)
+
+    def test_environment_is_kept(self):
+        proc = self.client.spawn(['sh', '-c', 'echo "$HOME"'], {})
+        with proc.stdout, proc.stderr:
+            self.assertEqual(proc.stdout.read().decode().strip(),
+                             os.environ['HOME'])
+        self.assertEqual(proc.wait(), 0)
+
+    def test_send_signal(self):
+        proc = self.client.spawn(['sh', '-c', 'echo started; sleep 30'], {})
+        with proc.stdout, proc.stderr:
+            self.assertEqual(proc.stdout.readline(), b'started\n')
+            proc.send_signal(signal.SIGKILL)
+            self.assertEqual(proc.wait(), -signal.SIGKILL)
+
+    def test_spawn_error(self):
+        with self.assertRaises(RootBrokerError):
+            self.client.spawn(['/nonexistent/command'], {})
+
+    def test_stop(self):
+        self.client.stop()
+        self.assertFalse(self.client.is_running)
+        with self.assertRaises(RootBrokerError):
+            self.client.spawn(['true'], {})
+
+
+class UnifiedRunnerRootBrokerTests(TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('plainbox.impl.execution.ResourceJobCache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for target in ('plainbox.impl.execution.collectors_enabled',
+                       'plainbox.impl.execution.on_ubuntucore'):
+            patcher = mock.patch(target, return_value=False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # an already closed stdin, nothing to forward to the job
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        stdin = open(read_fd, 'rt')
+        self.addCleanup(stdin.close)
+        self.runner = UnifiedRunner(
+            'session-id', [], tmp.name, stdin=stdin,
+            password_provider=mock.Mock(side_effect=AssertionError))
+        self.runner._root_broker = RootBrokerClient(use_sudo=False)
+        self.runner._root_broker.start()
+        self.addCleanup(self.runner._root_broker.stop)
+
+    def test_root_job(self):
+        provider = mock.Mock(
+            namespace='ns', gettext_domain=None, locale_dir=None,
+            extra_PYTHONPATH=None, data_dir=None, units_dir=None,
+            CHECKBOX_SHARE=None)
+        job = JobDefinition({
+            'id': 'root-job', 'plugin': 'shell', 'user': 'root',
+            'command': 'echo "$PLAINBOX_METRICS_FILE"; exit 2',
+        }, provider=provider)
+        # pretend the session runs as a normal user
+        with mock.patch('plainbox.impl.execution.getpass.getuser',
+                        return_value='tester'):
+            result = self.runner.run_job(job, None)
+        self.assertEqual(result.return_code, 2)
+        self.assertEqual(
+            result.io_log_as_text_attachment.strip(),
+            self.runner.get_metrics_path_for_job(job))
+
+    def test_fallback_to_sudo(self):
+        provider = mock.Mock(
+            namespace='ns', gettext_domain=None, locale_dir=None,
+            extra_PYTHONPATH=None, data_dir=None, units_dir=None,
+            CHECKBOX_SHARE=None)
+        job = JobDefinition({
+            'id': 'root-job', 'plugin': 'shell', 'user': 'root',
+            'command': 'exit 2',
+        }, provider=provider)
+        self.runner._password_provider = mock.Mock(return_value=None)
+        broker = self.runner._root_broker
+        with mock.patch.object(broker, 'spawn',
+                               side_effect=RootBrokerError('broken')), \
+                mock.patch('plainbox.impl.execution.get_execution_command',
+                           return_value=['sh', '-c', 'exit 4']), \
+                mock.patch('plainbox.impl.execution.getpass.getuser',
+                           return_value='tester'):
+            result = self.runner.run_job(job, None)
+        # the job is run with sudo instead of failing
+        self.assertEqual(result.return_code, 4)
+        self.assertFalse(self.runner._root_broker)
+        self.assertFalse(broker.is_running)
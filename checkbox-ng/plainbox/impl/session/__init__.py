@@ -54,8 +54,14 @@ of each module and class for additional details though.
     This class knows how properly to save and load bytes and manages a
     directory for all the filesystem entries associated with a particular
     session. It holds no references to a session though.
+
+:class:`SessionIndex`
+
+    This class keeps an index of the meta-data of all the stored sessions so
+    that they can be listed without loading their checkpoints.
 """
 
+from plainbox.impl.session.index import SessionIndex
 from plainbox.impl.session.jobs import InhibitionCause
 from plainbox.impl.session.jobs import JobReadinessInhibitor
 from plainbox.impl.session.jobs import JobState
@@ -70,6 +76,7 @@ from plainbox.impl.session.storage import SessionStorage
 __all__ = (
     'JobReadinessInhibitor',
     'JobState',
+    'SessionIndex',
     'SessionManager',
     'SessionMetaData',
     'SessionPeekHelper',
@@ -55,14 +55,18 @@ from plainbox.impl.secure.qualifiers import JobIdQualifier
 from plainbox.impl.secure.qualifiers import PatternMatcher
 from plainbox.impl.secure.qualifiers import RegExpJobQualifier
 from plainbox.impl.session import SessionMetaData
-from plainbox.impl.session import SessionPeekHelper
 from plainbox.impl.session import SessionResumeError
+from plainbox.impl.session import SessionStorage
+from plainbox.impl.session.index import SessionIndex
 from plainbox.impl.session.jobs import InhibitionCause
 from plainbox.impl.session.manager import SessionManager
 from plainbox.impl.session.restart import IRestartStrategy
 from plainbox.impl.session.restart import detect_restart_strategy
 from plainbox.impl.session.restart import RemoteDebRestartStrategy
 from plainbox.impl.session.storage import WellKnownDirsHelper
+from plainbox.impl.tracing import save_trace
+from plainbox.impl.tracing import set_trace_dir
+from plainbox.impl.tracing import span
 from plainbox.impl.transport import OAuthTransport
 from plainbox.impl.transport import TransportError
 from plainbox.impl.unit.exporter import ExporterError
@@ -420,19 +424,11 @@ class SessionAssistant:
             is the likely cause.
         """
         UsageExpectation.of(self).enforce()
-        for storage in WellKnownDirsHelper.get_storage_list():
-            data = storage.load_checkpoint()
-            if len(data) == 0:
-                continue
-            try:
-                metadata = SessionPeekHelper().peek(data)
-                if (metadata.app_id == self._app_id):
-                    if ((allow_not_flagged and not metadata.flags) or
-                            (metadata.flags & flags)):
-                        yield storage.id, metadata.flags
-            except SessionResumeError as exc:
-                _logger.info("Exception raised when trying to peek session"
-                             "data: %s", str(exc))
+        for entry in SessionIndex().get_entry_list():
+            if entry.app_id == self._app_id:
+                if ((allow_not_flagged and not entry.flags) or
+                        (entry.flags & flags)):
+                    yield entry.id, set(entry.flags)
 
     @raises(UnexpectedMethodCall)
     def delete_sessions(self, session_ids: 'List[str]') -> None:
@@ -451,9 +447,7 @@ class SessionAssistant:
             repository, it is silently ignored.
         """
         UsageExpectation.of(self).enforce()
-        for storage in WellKnownDirsHelper.get_storage_list():
-            if storage.id in session_ids:
-                storage.remove()
+        SessionIndex().remove(session_ids)
 
     @raises(UnexpectedMethodCall)
     def start_new_session(self, title: str, runner_cls=UnifiedRunner,
@@ -481,6 +475,7 @@ class SessionAssistant:
         """
         UsageExpectation.of(self).enforce()
         self._manager = SessionManager.create(prefix=title + '-')
+        set_trace_dir(self._manager.storage.location)
         self._context = self._manager.add_local_device_context()
         for provider in self._selected_providers:
             if provider.problem_list:
@@ -540,6 +535,7 @@ class SessionAssistant:
             *[p.unit_list for p in self._selected_providers]))
         self._manager = SessionManager.load_session(
             all_units, self._resume_candidates[session_id][0])
+        set_trace_dir(self._manager.storage.location)
         self._context = self._manager.default_device_context
         self._metadata = self._context.state.metadata
         self._command_io_delegate = JobRunnerUIDelegate(_SilentUI())
@@ -599,23 +595,25 @@ class SessionAssistant:
         UsageExpectation.of(self).enforce()
         # let's keep resume_candidates, so we don't have to load data again
         self._resume_candidates = {}
-        for storage in WellKnownDirsHelper.get_storage_list():
-            data = storage.load_checkpoint()
-            if len(data) == 0:
+        index = SessionIndex()
+        for entry in index.get_entry_list():
+            if (entry.app_id != self._app_id or
+                    SessionMetaData.FLAG_INCOMPLETE not in entry.flags):
                 continue
+            storage = SessionStorage(entry.id)
             try:
-                metadata = SessionPeekHelper().peek(data)
-            except SessionResumeError:
+                metadata = index.peek(storage)
+            except (SessionResumeError, OSError):
                 _logger.info("Exception raised when trying to resume "
                              "session: %s", str(storage.id))
-            else:
-                if (metadata.app_id == self._app_id and
-                        SessionMetaData.FLAG_INCOMPLETE in metadata.flags):
-                    self._resume_candidates[storage.id] = (
-                        InternalResumeCandidate(storage, metadata))
-                    UsageExpectation.of(self).allowed_calls[
-                        self.resume_session] = "resume session"
-                    yield ResumeCandidate(storage.id, metadata)
+                continue
+            if metadata is None:
+                continue
+            self._resume_candidates[storage.id] = (
+                InternalResumeCandidate(storage, metadata))
+            UsageExpectation.of(self).allowed_calls[
+                self.resume_session] = "resume session"
+            yield ResumeCandidate(storage.id, metadata)
 
     def update_app_blob(self, app_blob: bytes) -> None:
         """
@@ -756,6 +754,16 @@ class SessionAssistant:
             finished. This can take any amount of time (easily over one minute)
         """
         UsageExpectation.of(self).enforce()
+        with span('bootstrap', category='bootstrap'):
+            self._bootstrap()
+        # Set subsequent usage expectations i.e. all of the runtime parts are
+        # available now.
+        UsageExpectation.of(self).allowed_calls = (
+            self._get_allowed_calls_in_normal_state())
+        self._metadata.flags = {SessionMetaData.FLAG_INCOMPLETE}
+        self._manager.checkpoint()
+
+    def _bootstrap(self):
         # NOTE: there is next-to-none UI here as bootstrap jobs are limited to
         # just resource jobs (including their dependencies) so there should be
         # very little UI required.
@@ -770,8 +778,9 @@ class SessionAssistant:
                 continue
             UsageExpectation.of(self).allowed_calls[self.run_job] = (
                 "to run bootstrapping job")
-            rb = self.run_job(job.id, 'silent', False)
-            self.use_job_result(job.id, rb.get_result())
+            with span('bootstrap job', category='bootstrap', job=job.id):
+                rb = self.run_job(job.id, 'silent', False)
+                self.use_job_result(job.id, rb.get_result())
         # Perform initial selection -- we want to run everything that is
         # described by the test plan that was selected earlier.
         desired_job_list = select_jobs(
@@ -779,12 +788,6 @@ class SessionAssistant:
             [plan.get_qualifier() for plan in self._manager.test_plans] +
             self._exclude_qualifiers)
         self._context.state.update_desired_job_list(desired_job_list)
-        # Set subsequent usage expectations i.e. all of the runtime parts are
-        # available now.
-        UsageExpectation.of(self).allowed_calls = (
-            self._get_allowed_calls_in_normal_state())
-        self._metadata.flags = {SessionMetaData.FLAG_INCOMPLETE}
-        self._manager.checkpoint()
 
     @raises(UnexpectedMethodCall)
     def hand_pick_jobs(self, id_patterns: 'Iterable[str]'):
@@ -1382,11 +1385,12 @@ class SessionAssistant:
                             f.writelines(self._restart_cmd_callback(
                                 self.get_session_id()))
             if not native:
-                if self._config.environment is Unset:
-                    result = self._runner.run_job(job, job_state, ui=ui)
-                else:
-                    result = self._runner.run_job(job, job_state,
-                                                  self._config.environment, ui)
+                with span('run job', category='execution', job=job.id):
+                    if self._config.environment is Unset:
+                        result = self._runner.run_job(job, job_state, ui=ui)
+                    else:
+                        result = self._runner.run_job(
+                            job, job_state, self._config.environment, ui)
                 builder = result.get_builder()
             else:
                 builder = JobResultBuilder(
@@ -1464,7 +1468,8 @@ class SessionAssistant:
             job_state.result_history = job_state.result_history[:-1]
         if self._job_start_time:
             result.execution_duration = (time.time() - self._job_start_time)
-        self._context.state.update_job_result(job, result)
+        with span('update job result', category='session', job=job_id):
+            self._context.state.update_job_result(job, result)
         try:
             if self._config.auto_retry:
                 self._context.state.job_state_map[job_id].attempts -= 1
@@ -1602,6 +1607,7 @@ class SessionAssistant:
                             "anywhere: %s", self._manager.storage.id)
         self._metadata.flags.remove(SessionMetaData.FLAG_INCOMPLETE)
         self._manager.checkpoint()
+        save_trace()
         UsageExpectation.of(self).allowed_calls = {
             self.finalize_session: "to finalize session",
             self.export_to_transport: "to export the results and send them",
@@ -1654,7 +1660,9 @@ class SessionAssistant:
         try:
             exporter = self._manager.create_exporter(exporter_id, options)
             exported_stream = SpooledTemporaryFile(max_size=102400, mode='w+b')
-            exporter.dump_from_session_manager(self._manager, exported_stream)
+            with span('export', category='export', exporter=exporter_id):
+                exporter.dump_from_session_manager(
+                    self._manager, exported_stream)
             exported_stream.seek(0)
         except ExporterError as exc:
             logging.warning(_("Transport skipped due to exporter error (%s)"),
@@ -1707,7 +1715,8 @@ class SessionAssistant:
             basename = filename
         path = os.path.join(dir_path, ''.join(
             [basename, '.', exporter.unit.file_extension]))
-        with open(path, 'wb') as stream:
+        with open(path, 'wb') as stream, span(
+                'export', category='export', exporter=exporter_id):
             exporter.dump_from_session_manager(self._manager, stream)
         return path
 
@@ -1735,7 +1744,8 @@ class SessionAssistant:
         """
         UsageExpectation.of(self).enforce()
         exporter = self._manager.create_exporter(exporter_id, option_list)
-        exporter.dump_from_session_manager(self._manager, stream)
+        with span('export', category='export', exporter=exporter_id):
+            exporter.dump_from_session_manager(self._manager, stream)
         if SessionMetaData.FLAG_SUBMITTED not in self._metadata.flags:
             self._metadata.flags.add(SessionMetaData.FLAG_SUBMITTED)
             self._manager.checkpoint()
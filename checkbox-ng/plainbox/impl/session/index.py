@@ -0,0 +1,209 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.session.index` -- index of the session repository
+=====================================================================
+
+Listing stored sessions (to find the ones that can be resumed or the ones
+that can be removed) only needs the meta-data of each session. Peeking at
+the checkpoint of a session means reading, decompressing and parsing the
+whole checkpoint so each checkpoint is accompanied by a small meta-data file
+(see :meth:`SessionStorage.save_metadata()`) and the session repository has
+an index of the most important bits of the meta-data of all the sessions,
+``index.json``. The index is refreshed (from meta-data files) each time the
+sessions are listed.
+"""
+
+from collections import namedtuple
+import json
+import logging
+import os
+
+from plainbox.i18n import gettext as _
+from plainbox.impl.session.resume import SessionPeekHelper
+from plainbox.impl.session.resume import SessionResumeError
+from plainbox.impl.session.storage import WellKnownDirsHelper
+
+logger = logging.getLogger("plainbox.session.index")
+
+
+class SessionIndexEntry(namedtuple('SessionIndexEntry', [
+        'id', 'app_id', 'flags', 'title', 'mtime', 'size'])):
+    """
+    Entry of the session repository index
+
+    :attr id:
+        Identifier of the session storage
+    :attr app_id:
+        Identifier of the application that created the session
+    :attr flags:
+        Frozen set of session flags
+    :attr title:
+        Title of the session
+    :attr mtime:
+        Modification time of the session checkpoint
+    :attr size:
+        Size of the session checkpoint, in bytes
+    """
+
+    __slots__ = ()
+
+
+class SessionIndex:
+    """
+    Index of the meta-data of the sessions stored in the session repository
+    """
+
+    #: Version of the on-disk format, indices of other versions are rebuilt
+    FORMAT = 1
+
+    _INDEX_FILE = 'index.json'
+
+    @property
+    def index_file(self):
+        """
+        pathname of the index file
+        """
+        return os.path.join(
+            WellKnownDirsHelper.session_repository(), self._INDEX_FILE)
+
+    def get_entry_list(self):
+        """
+        Get the index entries of all the stored sessions.
+
+        :returns:
+            A list of :class:`SessionIndexEntry`, sorted by age of the
+            sessions (youngest first). Sessions that were never saved and
+            sessions that cannot be peeked at are skipped.
+
+        Entries of sessions that were saved since they got indexed are
+        refreshed and the index is saved back if anything changed.
+        """
+        old_record_map = self._load()
+        record_map = {}
+        entry_list = []
+        for storage in WellKnownDirsHelper.get_storage_list():
+            try:
+                session_stat = os.stat(storage.session_file)
+            except OSError:
+                continue
+            stamp = [session_stat.st_mtime_ns, session_stat.st_size]
+            record = old_record_map.get(storage.id)
+            if record is None or record.get('stamp') != stamp:
+                try:
+                    metadata = self.peek(storage)
+                except (SessionResumeError, OSError) as exc:
+                    logger.info(_("Cannot peek at session %s: %s"),
+                                storage.id, exc)
+                    continue
+                if metadata is None:
+                    continue
+                record = {
+                    'app_id': metadata.app_id,
+                    'flags': sorted(metadata.flags),
+                    'title': metadata.title,
+                    'stamp': stamp,
+                }
+            record_map[storage.id] = record
+            entry_list.append(SessionIndexEntry(
+                storage.id, record['app_id'], frozenset(record['flags']),
+                record['title'], session_stat.st_mtime,
+                session_stat.st_size))
+        if record_map != old_record_map:
+            self._save(record_map)
+        return entry_list
+
+    def peek(self, storage):
+        """
+        Peek at the meta-data of a stored session.
+
+        :param storage:
+            The :class:`SessionStorage` of the session
+        :returns:
+            A :class:`SessionMetaData` object or None if the session was
+            never saved
+        :raises SessionResumeError:
+            if the checkpoint of the session is corrupted or not supported
+        :raises IOError, OSError:
+            on various problems related to accessing the filesystem
+
+        The meta-data file of the session is used when it is up to date,
+        otherwise the whole checkpoint has to be loaded.
+        """
+        try:
+            session_mtime = os.stat(storage.session_file).st_mtime_ns
+            metadata_mtime = os.stat(storage.metadata_file).st_mtime_ns
+        except FileNotFoundError:
+            metadata_mtime = session_mtime = None
+        if metadata_mtime is not None and metadata_mtime >= session_mtime:
+            try:
+                return SessionPeekHelper().peek(storage.load_metadata())
+            except SessionResumeError as exc:
+                logger.warning(_("Ignoring meta-data of session %s: %s"),
+                               storage.id, exc)
+        data = storage.load_checkpoint()
+        if len(data) == 0:
+            return None
+        return SessionPeekHelper().peek(data)
+
+    def remove(self, session_id_list):
+        """
+        Remove the given sessions from the repository and from the index.
+
+        :param session_id_list:
+            A list of session ids which storages should be removed. Sessions
+            that are not found in the repository are silently ignored.
+
+        The index is only saved once, which makes this suitable for pruning
+        any number of old sessions.
+        """
+        session_id_set = set(session_id_list)
+        record_map = self._load()
+        changed = False
+        for storage in WellKnownDirsHelper.get_storage_list():
+            if storage.id in session_id_set:
+                storage.remove()
+                changed |= record_map.pop(storage.id, None) is not None
+        if changed:
+            self._save(record_map)
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'rt', encoding='UTF-8') as stream:
+                data = json.load(stream)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning(_("Error loading session index. %s"), exc)
+            return {}
+        if not isinstance(data, dict) or data.get('format') != self.FORMAT:
+            logger.info(_("Ignoring session index in an unknown format"))
+            return {}
+        return data['sessions']
+
+    def _save(self, record_map):
+        data = json.dumps(
+            {'format': self.FORMAT, 'sessions': record_map},
+            ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        ).encode('UTF-8')
+        next_pathname = '{}.{}.next'.format(self.index_file, os.getpid())
+        try:
+            with open(next_pathname, 'wb') as stream:
+                stream.write(data)
+            os.replace(next_pathname, self.index_file)
+        except OSError as exc:
+            logger.warning(_("Cannot save session index. %s"), exc)
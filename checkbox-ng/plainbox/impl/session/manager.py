@@ -44,6 +44,7 @@ from plainbox.impl.session.state import SessionState
 from plainbox.impl.session.storage import LockedStorageError
 from plainbox.impl.session.storage import SessionStorage
 from plainbox.impl.session.suspend import SessionSuspendHelper
+from plainbox.impl.tracing import traced
 from plainbox.impl.unit.testplan import TestPlanUnit
 from plainbox.vendor import morris
 
@@ -207,6 +208,7 @@ class SessionManager(pod.POD):
         return cls([context], storage)
 
     @classmethod
+    @traced('load session', category='session')
     def load_session(cls, unit_list, storage, early_cb=None, flags=None):
         """
         Load a previously checkpointed session.
@@ -265,6 +267,7 @@ class SessionManager(pod.POD):
         context = SessionDeviceContext(state)
         return cls([context], storage)
 
+    @traced('checkpoint', category='session')
     def checkpoint(self):
         """
         Create a checkpoint of the session.
@@ -273,8 +276,8 @@ class SessionManager(pod.POD):
         :meth:`SessionManager.load_session()`.
         """
         logger.debug("SessionManager.checkpoint()")
-        data = SessionSuspendHelper().suspend(
-            self.state, self.storage.location)
+        helper = SessionSuspendHelper()
+        data = helper.suspend(self.state, self.storage.location)
         logger.debug(
             ngettext(
                 "Saving %d byte of checkpoint data to %r",
@@ -285,6 +288,13 @@ class SessionManager(pod.POD):
         except LockedStorageError:
             self.storage.break_lock()
             self.storage.save_checkpoint(data)
+        # The meta-data must be saved after the checkpoint, see
+        # SessionStorage.save_metadata()
+        try:
+            self.storage.save_metadata(helper.suspend_metadata(
+                self.state, self.storage.location))
+        except OSError as exc:
+            logger.warning(_("Cannot save session meta-data: %s"), exc)
 
     def destroy(self):
         """
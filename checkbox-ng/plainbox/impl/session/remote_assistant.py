@@ -34,6 +34,7 @@ from plainbox.impl.session.assistant import SA_RESTARTABLE
 from plainbox.impl.session.jobs import InhibitionCause
 from plainbox.impl.session.storage import WellKnownDirsHelper
 from plainbox.impl.secure.sudo_broker import is_passwordless_sudo
+from plainbox.impl.tracing import enable_tracing
 from plainbox.impl.result import JobResultBuilder
 from plainbox.impl.result import MemoryJobResult
 from plainbox.abc import IJobResult
@@ -281,6 +282,8 @@ class RemoteSessionAssistant():
                 session_title = self._launcher.session_title
             if self._launcher.session_desc:
                 session_desc = self._launcher.session_desc
+        if self._launcher.trace:
+            enable_tracing()
 
         self._sa.use_alternate_configuration(self._launcher)
 
@@ -55,6 +55,9 @@ import os
 import re
 
 from plainbox.i18n import gettext as _
+from plainbox.impl.metrics import BETTER_HIGHER
+from plainbox.impl.metrics import BETTER_LOWER
+from plainbox.impl.metrics import Metric
 from plainbox.impl.result import DiskJobResult
 from plainbox.impl.result import IOLogRecord
 from plainbox.impl.result import MemoryJobResult
@@ -184,8 +187,9 @@ class SessionPeekHelper(EnvelopeUnpackMixIn):
         and parsing is done. The only error conditions that can happen
         are related to semantic incompatibilities or corrupted internal state.
         """
-        logger.debug(_("Peeking at json... (see below)"))
-        logger.debug(json.dumps(json_repr, indent=4))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(_("Peeking at json... (see below)"))
+            logger.debug(json.dumps(json_repr, indent=4))
         _validate(json_repr, value_type=dict)
         version = _validate(json_repr, key="version", choice=[1])
         if version == 1:
@@ -308,8 +312,9 @@ class SessionResumeHelper(EnvelopeUnpackMixIn):
         and parsing is done. The only error conditions that can happen
         are related to semantic incompatibilities or corrupted internal state.
         """
-        logger.debug(_("Resuming from json... (see below)"))
-        logger.debug(json.dumps(json_repr, indent=4))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(_("Resuming from json... (see below)"))
+            logger.debug(json.dumps(json_repr, indent=4))
         _validate(json_repr, value_type=dict)
         version = _validate(json_repr, key="version", choice=[1])
         if version == 1:
@@ -938,6 +943,11 @@ class SessionResumeHelper1(MetaDataHelper1MixIn):
         execution_duration = _validate(
             result_repr, key='execution_duration', value_type=float,
             value_none=True)
+        # Metrics are only stored when the job reported some
+        metrics = [
+            cls._build_Metric(metric_repr)
+            for metric_repr in _validate(
+                result_repr.get('metrics', []), value_type=list)]
         # Construct either DiskJobResult or MemoryJobResult
         if 'io_log_filename' in result_repr:
             io_log_filename = cls._load_io_log_filename(
@@ -959,7 +969,8 @@ class SessionResumeHelper1(MetaDataHelper1MixIn):
                 'comments': comments,
                 'execution_duration': execution_duration,
                 'io_log_filename': io_log_filename,
-                'return_code': return_code
+                'return_code': return_code,
+                'metrics': metrics,
             })
         else:
             io_log = [
@@ -971,7 +982,8 @@ class SessionResumeHelper1(MetaDataHelper1MixIn):
                 'comments': comments,
                 'execution_duration': execution_duration,
                 'io_log': io_log,
-                'return_code': return_code
+                'return_code': return_code,
+                'metrics': metrics,
             })
 
     @classmethod
@@ -983,6 +995,18 @@ class SessionResumeHelper1(MetaDataHelper1MixIn):
         return re.sub(
             '.*\/\.cache\/plainbox\/sessions/[^//]+', location, pathname)
 
+    @classmethod
+    def _build_Metric(cls, metric_repr):
+        """Convert the representation of Metric back to the object."""
+        _validate(metric_repr, value_type=list)
+        name = _validate(metric_repr, key=0, value_type=str)
+        value = _validate(metric_repr, key=1, value_type=(int, float))
+        unit = _validate(metric_repr, key=2, value_type=str)
+        better = _validate(
+            metric_repr, key=3, value_type=str, value_none=True,
+            value_choice=[BETTER_HIGHER, BETTER_LOWER, None])
+        return Metric(name, float(value), unit, better)
+
     @classmethod
     def _build_IOLogRecord(cls, record_repr):
         """Convert the representation of IOLogRecord back the object."""
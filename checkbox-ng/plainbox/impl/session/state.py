@@ -35,6 +35,7 @@ from plainbox.impl.depmgr import DependencySolver
 from plainbox.impl.secure.qualifiers import select_jobs
 from plainbox.impl.session.jobs import JobState
 from plainbox.impl.session.jobs import UndesiredJobReadinessInhibitor
+from plainbox.impl.tracing import traced
 from plainbox.impl.unit.job import JobDefinition
 from plainbox.impl.unit.unit_with_id import UnitWithId
 from plainbox.impl.unit.testplan import TestPlanUnitSupport
@@ -826,6 +827,7 @@ class SessionState:
         """
         self._mandatory_job_list = mandatory_job_list
 
+    @traced('update desired job list', category='session')
     def update_desired_job_list(self, desired_job_list,
                                 include_mandatory=True):
         """
@@ -1424,6 +1426,7 @@ class SessionState:
         """meta-data object associated with this session state."""
         return self._metadata
 
+    @traced('recompute job readiness', category='session')
     def _recompute_job_readiness(self):
         """
         Internal method of SessionState.
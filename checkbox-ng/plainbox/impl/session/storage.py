@@ -176,6 +176,10 @@ class SessionStorage:
 
     _SESSION_FILE_NEXT = 'session.next'
 
+    _METADATA_FILE = 'session.meta'
+
+    _METADATA_FILE_NEXT = 'session.meta.next'
+
     def __init__(self, id):
         """
         Initialize a :class:`SessionStorage` with the given location.
@@ -210,6 +214,13 @@ class SessionStorage:
         """
         return os.path.join(self.location, self._SESSION_FILE)
 
+    @property
+    def metadata_file(self):
+        """
+        pathname of the session meta-data file
+        """
+        return os.path.join(self.location, self._METADATA_FILE)
+
     @classmethod
     def create(cls, prefix='pbox-'):
         """
@@ -421,6 +432,51 @@ class SessionStorage:
             logger.debug(_("Closing descriptor %d"), location_fd)
             os.close(location_fd)
 
+    def load_metadata(self):
+        """
+        Load the meta-data saved along with the most recent checkpoint
+
+        :returns: data saved by :meth:`save_metadata()`
+        :rtype: bytes
+
+        :raises IOError, OSError:
+            on various problems related to accessing the filesystem
+        """
+        try:
+            with open(self.metadata_file, 'rb') as stream:
+                return stream.read()
+        except FileNotFoundError:
+            # Treat lack of 'session.meta' file as an empty file
+            return b''
+
+    def save_metadata(self, data):
+        """
+        Save the meta-data of the most recent checkpoint.
+
+        The meta-data file is a small companion of the checkpoint that lets
+        applications look at the meta-data of a session without loading the
+        (possibly huge) checkpoint. It must be saved after the checkpoint so
+        a meta-data file that is older than the checkpoint is stale.
+
+        Unlike :meth:`save_checkpoint()` the data is not synchronized to
+        the disk: a missing or stale meta-data file is simply ignored in
+        favour of the checkpoint.
+
+        :raises TypeError:
+            if data is not a bytes object.
+        :raises IOError, OSError:
+            on various problems related to accessing the filesystem.
+        """
+        if not isinstance(data, bytes):
+            raise TypeError("data must be bytes")
+        logger.debug(ngettext(
+            "Saving %d byte of meta-data",
+            "Saving %d bytes of meta-data", len(data)), len(data))
+        next_pathname = os.path.join(self.location, self._METADATA_FILE_NEXT)
+        with open(next_pathname, 'wb') as stream:
+            stream.write(data)
+        os.replace(next_pathname, self.metadata_file)
+
     def break_lock(self):
         """
         Forcibly unlock the storage by removing a file created during
@@ -128,7 +128,36 @@ class SessionSuspendHelper1:
 
         :returns bytes: the serialized data
         """
-        json_repr = self._json_repr(session, session_dir)
+        return self._pack(self._json_repr(session, session_dir))
+
+    def suspend_metadata(self, session, session_dir=None):
+        """
+        Compute suspend representation of the session meta-data alone.
+
+        Compute the data that is saved by :class:`SessionStorage` as a
+        part of :meth:`SessionStorage.save_metadata()`. The data has the
+        same format as the one computed by :meth:`suspend()` except that the
+        session only has the ``metadata`` key so that it can be read by
+        :class:`~plainbox.impl.session.resume.SessionPeekHelper` without
+        loading the whole session.
+
+        :param session:
+            The SessionState object to represent.
+        :param session_dir:
+            (optional) The base directory of the session.
+
+        :returns bytes: the serialized data
+        """
+        return self._pack({
+            "version": self.VERSION,
+            "session": {
+                "metadata": self._repr_SessionMetaData(
+                    session.metadata, session_dir),
+            },
+        })
+
+    def _pack(self, json_repr):
+        """Serialize the JSON representation and put it in the envelope."""
         data = json.dumps(
             json_repr,
             ensure_ascii=False,
@@ -277,16 +306,23 @@ class SessionSuspendHelper1:
             ``return_code``
                 The exit code of the application.
 
+            ``metrics``
+                List of ``[name, value, unit, better]`` lists, only present
+                if the job reported any metric.
+
         .. note::
             return_code can have unexpected values when the process was killed
             by a signal
         """
-        return {
+        result = {
             "outcome": obj.outcome,
             "execution_duration": obj.execution_duration,
             "comments": obj.comments,
             "return_code": obj.return_code,
         }
+        if obj.metrics:
+            result["metrics"] = [list(metric) for metric in obj.metrics]
+        return result
 
     def _repr_MemoryJobResult(self, obj, session_dir):
         """
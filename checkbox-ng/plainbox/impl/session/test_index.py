@@ -0,0 +1,134 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.session.test_index`
+=======================================
+
+Test definitions for :mod:`plainbox.impl.session.index`
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import json
+import os
+
+from plainbox.impl.session.index import SessionIndex
+from plainbox.impl.session.state import SessionState
+from plainbox.impl.session.storage import SessionStorage
+from plainbox.impl.session.storage import WellKnownDirsHelper
+from plainbox.impl.session.suspend import SessionSuspendHelper
+
+
+class SessionIndexTests(TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(
+            WellKnownDirsHelper, 'base_of_everything', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = SessionIndex()
+
+    def save_session(self, app_id, flags, title='title', metadata=True):
+        storage = SessionStorage.create(title)
+        state = SessionState([])
+        state.metadata.app_id = app_id
+        state.metadata.flags = set(flags)
+        state.metadata.title = title
+        state.metadata.last_job_start_time = 0.0
+        helper = SessionSuspendHelper()
+        storage.save_checkpoint(helper.suspend(state, storage.location))
+        if metadata:
+            storage.save_metadata(helper.suspend_metadata(
+                state, storage.location))
+        return storage
+
+    def test_get_entry_list(self):
+        storage = self.save_session('app', ['incomplete'])
+        SessionStorage.create('unsaved')
+        entry_list = self.index.get_entry_list()
+        self.assertEqual(len(entry_list), 1)
+        entry = entry_list[0]
+        self.assertEqual(entry.id, storage.id)
+        self.assertEqual(entry.app_id, 'app')
+        self.assertEqual(entry.flags, frozenset(['incomplete']))
+        self.assertEqual(entry.title, 'title')
+        self.assertEqual(
+            entry.size, os.stat(storage.session_file).st_size)
+        with open(self.index.index_file) as stream:
+            self.assertIn(storage.id, json.load(stream)['sessions'])
+
+    def test_checkpoints_are_not_loaded(self):
+        self.save_session('app', ['incomplete'])
+        with mock.patch.object(SessionStorage, 'load_checkpoint') as load:
+            self.assertEqual(len(self.index.get_entry_list()), 1)
+            load.assert_not_called()
+
+    def test_indexed_sessions_are_not_peeked_at(self):
+        self.save_session('app', ['incomplete'])
+        self.index.get_entry_list()
+        with mock.patch.object(SessionIndex, 'peek') as peek:
+            self.assertEqual(len(self.index.get_entry_list()), 1)
+            peek.assert_not_called()
+
+    def test_modified_sessions_are_reindexed(self):
+        storage = self.save_session('app', ['incomplete'])
+        self.index.get_entry_list()
+        state = SessionState([])
+        state.metadata.app_id = 'app'
+        state.metadata.flags = {'submitted', 'other'}
+        state.metadata.last_job_start_time = 0.0
+        helper = SessionSuspendHelper()
+        storage.save_checkpoint(helper.suspend(state, storage.location))
+        storage.save_metadata(helper.suspend_metadata(
+            state, storage.location))
+        os.utime(storage.session_file, ns=(0, 0))
+        entry, = self.index.get_entry_list()
+        self.assertEqual(entry.flags, frozenset(['submitted', 'other']))
+
+    def test_stale_metadata_file_is_ignored(self):
+        storage = self.save_session('app', ['incomplete'])
+        os.utime(storage.metadata_file, ns=(0, 0))
+        with mock.patch.object(
+                SessionStorage, 'load_metadata',
+                side_effect=AssertionError) as load:
+            self.assertEqual(self.index.peek(storage).app_id, 'app')
+            load.assert_not_called()
+
+    def test_sessions_without_metadata_file(self):
+        storage = self.save_session('app', ['incomplete'], metadata=False)
+        self.assertEqual(self.index.peek(storage).app_id, 'app')
+        self.assertEqual(self.index.get_entry_list()[0].app_id, 'app')
+
+    def test_remove(self):
+        keep = self.save_session('app', ['incomplete'])
+        drop = self.save_session('app', ['submitted'])
+        self.index.get_entry_list()
+        self.index.remove([drop.id, 'missing'])
+        self.assertFalse(os.path.exists(drop.location))
+        self.assertTrue(os.path.exists(keep.location))
+        with open(self.index.index_file) as stream:
+            self.assertEqual(
+                list(json.load(stream)['sessions']), [keep.id])
+
+    def test_corrupted_index(self):
+        self.save_session('app', ['incomplete'])
+        os.makedirs(os.path.dirname(self.index.index_file), exist_ok=True)
+        with open(self.index.index_file, 'wt') as stream:
+            stream.write('{')
+        self.assertEqual(len(self.index.get_entry_list()), 1)
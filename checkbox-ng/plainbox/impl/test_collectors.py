@@ -0,0 +1,157 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+plainbox.impl.test_collectors
+=============================
+
+Test definitions for plainbox.impl.collectors module
+"""
+
+from collections import OrderedDict
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import getpass
+
+from plainbox.impl.collectors import ResourceCollectorPlugIn
+from plainbox.impl.collectors import gen_rfc822_lines
+from plainbox.impl.collectors import get_collector_for_job
+from plainbox.impl.ctrl import gen_rfc822_records_from_io_log
+from plainbox.impl.execution import UnifiedRunner
+from plainbox.impl.unit.job import JobDefinition
+
+
+def fake_collector(environ):
+    """Collect fake records."""
+    return [OrderedDict([('a', 'b'), ('c', 1)]), {'d': 'e'}]
+
+
+def broken_collector(environ):
+    """Fail to collect anything."""
+    raise OSError("boom")
+
+
+class GenRfc822LinesTests(TestCase):
+
+    def test_records_are_separated(self):
+        self.assertEqual(list(gen_rfc822_lines(fake_collector({}))), [
+            b'a: b\n', b'c: 1\n', b'\n', b'd: e\n'])
+
+    def test_multi_line_values_are_continued(self):
+        self.assertEqual(
+            list(gen_rfc822_lines([{'a': 'b\n\nc'}])),
+            [b'a:\n', b' b\n', b' .\n', b' c\n'])
+
+    def test_empty(self):
+        self.assertEqual(list(gen_rfc822_lines([])), [])
+
+
+class GetCollectorForJobTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('plainbox.impl.collectors.all_collectors')
+        self.all_collectors = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.plugin = ResourceCollectorPlugIn(
+            'fake_resource.py', fake_collector)
+        self.all_collectors.get_by_name.side_effect = (
+            lambda name: {'fake_resource.py': self.plugin}[name])
+
+    def make_job(self, namespace='com.canonical.certification', **kwargs):
+        data = {'id': 'fake', 'plugin': 'resource',
+                'command': 'fake_resource.py'}
+        data.update(kwargs)
+        return JobDefinition(data, provider=mock.Mock(namespace=namespace))
+
+    def test_matching_command(self):
+        job = self.make_job(command='fake_resource.py\n')
+        self.assertIs(get_collector_for_job(job), self.plugin)
+
+    def test_other_command(self):
+        job = self.make_job(command='fake_resource.py --all')
+        self.assertIsNone(get_collector_for_job(job))
+
+    def test_not_a_resource_job(self):
+        job = self.make_job(plugin='shell')
+        self.assertIsNone(get_collector_for_job(job))
+
+    def test_other_provider(self):
+        # another provider may ship its own script with the same name
+        job = self.make_job(namespace='com.example')
+        self.assertIsNone(get_collector_for_job(job))
+        job = JobDefinition({'id': 'fake', 'plugin': 'resource',
+                             'command': 'fake_resource.py'})
+        self.assertIsNone(get_collector_for_job(job))
+
+
+class UnifiedRunnerCollectorTests(TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('plainbox.impl.execution.ResourceJobCache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runner = UnifiedRunner('session-id', [], tmp.name)
+        self.provider = mock.Mock(
+            namespace='ns', gettext_domain=None, locale_dir=None,
+            extra_PYTHONPATH=None, data_dir=None, units_dir=None,
+            CHECKBOX_SHARE=None)
+
+    def make_job(self, **kwargs):
+        data = {'id': 'fake', 'plugin': 'resource',
+                'command': 'fake_resource.py'}
+        data.update(kwargs)
+        return JobDefinition(data, provider=self.provider)
+
+    def test_collector_output_is_recorded(self):
+        job = self.make_job()
+        plugin = ResourceCollectorPlugIn('fake_resource.py', fake_collector)
+        with mock.patch('plainbox.impl.execution.get_collector_for_job',
+                        return_value=plugin), \
+                mock.patch.object(self.runner, 'execute_job') as m_execute:
+            result = self.runner.run_job(job, None)
+        m_execute.assert_not_called()
+        self.assertEqual(result.outcome, 'pass')
+        self.assertEqual(result.return_code, 0)
+        records = list(gen_rfc822_records_from_io_log(job, result))
+        self.assertEqual([r.data for r in records],
+                         [{'a': 'b', 'c': '1'}, {'d': 'e'}])
+
+    def test_broken_collector_falls_back_to_command(self):
+        job = self.make_job()
+        plugin = ResourceCollectorPlugIn(
+            'fake_resource.py', broken_collector)
+        with mock.patch('plainbox.impl.execution.get_collector_for_job',
+                        return_value=plugin), \
+                mock.patch.object(self.runner, 'execute_job',
+                                  return_value=1) as m_execute:
+            result = self.runner.run_job(job, None)
+        self.assertEqual(m_execute.call_count, 1)
+        self.assertEqual(result.outcome, 'fail')
+
+    def test_other_user_is_not_collected_in_process(self):
+        job = self.make_job(user='not-{}'.format(getpass.getuser()))
+        with mock.patch(
+                'plainbox.impl.execution.get_collector_for_job') as m_get:
+            self.assertIsNone(self.runner._get_collector(job))
+        m_get.assert_not_called()
+
+    def test_collectors_can_be_disabled(self):
+        job = self.make_job()
+        with mock.patch.dict(
+                'os.environ', {'PLAINBOX_NO_RESOURCE_COLLECTORS': '1'}):
+            self.assertIsNone(self.runner._get_collector(job))
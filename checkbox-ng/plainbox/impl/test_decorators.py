@@ -24,6 +24,8 @@ Test definitions for plainbox.impl.decorators module
 import sys
 import unittest
 
+from plainbox.impl.decorators import clear_instance_method_cache
+from plainbox.impl.decorators import instance_method_lru_cache
 from plainbox.impl.decorators import raises
 from plainbox.impl.decorators import UndocumentedException
 
@@ -78,3 +80,49 @@ class RaisesTests(unittest.TestCase):
         @raises(ValueError)
         def func():
             raise ValueError
+
+
+class InstanceMethodLruCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        class C:
+            def __init__(self):
+                self.calls = []
+
+            @instance_method_lru_cache()
+            def method(self, *args, **kwargs):
+                self.calls.append((args, kwargs))
+                return len(self.calls)
+
+            @instance_method_lru_cache()
+            def other(self, arg):
+                return 'other'
+        self.C = C
+
+    def test_values_are_cached_per_instance(self):
+        a, b = self.C(), self.C()
+        self.assertEqual(a.method(1), 1)
+        self.assertEqual(a.method(1), 1)
+        self.assertEqual(b.method(1), 1)
+        self.assertEqual(a.method(2), 2)
+        self.assertEqual(a.other(1), 'other')
+        self.assertEqual(a.method(1), 1)
+
+    def test_keyword_arguments(self):
+        c = self.C()
+        self.assertEqual(c.method(1, x=2), 1)
+        self.assertEqual(c.method(1, x=2), 1)
+        self.assertEqual(c.method(1), 2)
+        self.assertEqual(c.method(1, x=3), 3)
+
+    def test_one_cache_per_instance(self):
+        c = self.C()
+        c.method(1)
+        c.other(1)
+        self.assertEqual(len(c.__dict__['_method_cache']), 2)
+
+    def test_clear_instance_method_cache(self):
+        c = self.C()
+        c.method(1)
+        clear_instance_method_cache(c)
+        self.assertEqual(c.method(1), 2)
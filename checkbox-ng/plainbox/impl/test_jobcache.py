@@ -0,0 +1,192 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+plainbox.impl.test_jobcache
+===========================
+
+Test definitions for plainbox.impl.jobcache module
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import json
+import os
+
+from plainbox.impl.jobcache import ResourceJobCache
+from plainbox.impl.jobcache import compute_fingerprint
+from plainbox.impl.jobcache import is_valid_probe
+from plainbox.impl.result import MemoryJobResult
+from plainbox.impl.unit.job import JobDefinition
+
+
+def make_result(stdout, outcome='pass'):
+    return MemoryJobResult({
+        'outcome': outcome,
+        'return_code': 0,
+        'io_log': [(0, 'stdout', line.encode('UTF-8'))
+                   for line in stdout.splitlines(True)],
+    })
+
+
+class ProbeTests(TestCase):
+
+    def test_is_valid_probe(self):
+        self.assertTrue(is_valid_probe('dpkg-status'))
+        self.assertTrue(is_valid_probe('mtime:/etc/os-release'))
+        self.assertFalse(is_valid_probe('mtime:relative'))
+        self.assertFalse(is_valid_probe('moon-phase'))
+
+    def test_fingerprint_follows_mtime(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'status')
+            with open(path, 'wt') as stream:
+                stream.write('a')
+            probes = ['mtime:' + path]
+            first = compute_fingerprint(probes)
+            self.assertEqual(first, compute_fingerprint(probes))
+            os.utime(path, ns=(0, 0))
+            self.assertNotEqual(first, compute_fingerprint(probes))
+
+    def test_path_follows_provider_bin_dirs(self):
+        with TemporaryDirectory() as bin_dir:
+            first = compute_fingerprint(['path'], [bin_dir])
+            self.assertNotEqual(first, compute_fingerprint(['path']))
+            self.assertEqual(first, compute_fingerprint(['path'], [bin_dir]))
+            # a new executable in the provider
+            os.utime(bin_dir, ns=(0, 0))
+            self.assertNotEqual(
+                first, compute_fingerprint(['path'], [bin_dir]))
+
+    def test_modules_follow_module_records(self):
+        modules = ['snd 94208 1 snd_hda_codec, Live 0x0\n']
+        with mock.patch('plainbox.impl.jobcache.open',
+                        mock.mock_open(read_data=''.join(modules)),
+                        create=True):
+            first = compute_fingerprint(['modules'])
+        modules = ['snd 94208 2 snd_hda_codec,snd_pcm, Live 0x0\n']
+        with mock.patch('plainbox.impl.jobcache.open',
+                        mock.mock_open(read_data=''.join(modules)),
+                        create=True):
+            self.assertNotEqual(first, compute_fingerprint(['modules']))
+
+    def test_fingerprint_ignores_order(self):
+        self.assertEqual(compute_fingerprint(['kernel', 'boot-id']),
+                         compute_fingerprint(['boot-id', 'kernel']))
+
+    def test_job_probe_list(self):
+        job = JobDefinition({
+            'id': 'r', 'plugin': 'resource',
+            'cache_probes': 'kernel,boot-id  kernel'})
+        self.assertEqual(job.get_cache_probe_list(), ['boot-id', 'kernel'])
+
+
+class ResourceJobCacheTests(TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.cache_path = os.path.join(self.tmp, 'cache')
+        self.job = JobDefinition({
+            'id': 'r', 'plugin': 'resource', 'command': 'true',
+            'cache_probes': 'kernel'})
+        self.stdout = 'a: b\nc:\n multi\n .\n line\n\nd: e\n'
+
+    def get(self, cache, stdout=None, outcome='pass', job=None):
+        compute_fn = mock.Mock(return_value=make_result(
+            stdout or self.stdout, outcome))
+        in_cache, result = cache.get(
+            job or self.job, compute_fn,
+            os.path.join(self.tmp, 'r.record.gz'))
+        return in_cache, result, compute_fn
+
+    def test_miss_then_hit(self):
+        cache = ResourceJobCache(self.cache_path)
+        in_cache, result, compute_fn = self.get(cache)
+        self.assertFalse(in_cache)
+        self.assertEqual(compute_fn.call_count, 1)
+        cache = ResourceJobCache(self.cache_path)
+        cache.load()
+        in_cache, result, compute_fn = self.get(cache)
+        self.assertTrue(in_cache)
+        compute_fn.assert_not_called()
+        self.assertEqual(result.outcome, 'pass')
+        self.assertEqual(result.return_code, 0)
+        self.assertEqual(
+            b''.join(record.data for record in result.get_io_log()),
+            self.stdout.encode('UTF-8'))
+
+    def test_probe_change_invalidates(self):
+        cache = ResourceJobCache(self.cache_path)
+        self.get(cache)
+        with mock.patch.dict(
+                'plainbox.impl.jobcache.PROBES', {'kernel': lambda: 'new'}):
+            in_cache, result, compute_fn = self.get(cache)
+        self.assertFalse(in_cache)
+        self.assertEqual(compute_fn.call_count, 1)
+
+    def test_failed_results_are_not_stored(self):
+        cache = ResourceJobCache(self.cache_path)
+        self.get(cache, outcome='fail')
+        in_cache, result, compute_fn = self.get(cache)
+        self.assertFalse(in_cache)
+
+    def test_index_is_compact(self):
+        cache = ResourceJobCache(self.cache_path)
+        self.get(cache)
+        self.assertEqual(
+            sorted(os.listdir(self.cache_path)),
+            sorted(['index.json', cache.get_key(self.job) + '.json']))
+        with open(os.path.join(self.cache_path, 'index.json')) as stream:
+            index = json.load(stream)
+        self.assertEqual(index['format'], ResourceJobCache.FORMAT)
+        self.assertEqual(list(index['entries']), [cache.get_key(self.job)])
+
+    def test_lru_eviction(self):
+        cache = ResourceJobCache(self.cache_path, max_entries=2)
+        jobs = [JobDefinition({
+            'id': 'r{}'.format(i), 'plugin': 'resource',
+            'command': 'true', 'cache_probes': 'kernel'}) for i in range(3)]
+        with mock.patch('time.time', side_effect=range(100)):
+            self.get(cache, job=jobs[0])
+            self.get(cache, job=jobs[1])
+            # use the first one again so that the second one is the oldest
+            self.assertTrue(self.get(cache, job=jobs[0])[0])
+            self.get(cache, job=jobs[2])
+        self.assertTrue(self.get(cache, job=jobs[0])[0])
+        self.assertFalse(self.get(cache, job=jobs[1])[0])
+        self.assertEqual(len(os.listdir(self.cache_path)), 3)
+
+    def test_size_eviction(self):
+        cache = ResourceJobCache(self.cache_path, max_size=10)
+        self.get(cache)
+        self.assertEqual(os.listdir(self.cache_path), ['index.json'])
+
+    def test_missing_entry_file(self):
+        cache = ResourceJobCache(self.cache_path)
+        self.get(cache)
+        os.remove(os.path.join(
+            self.cache_path, cache.get_key(self.job) + '.json'))
+        in_cache, result, compute_fn = self.get(cache)
+        self.assertFalse(in_cache)
+
+    def test_clear(self):
+        cache = ResourceJobCache(self.cache_path)
+        self.get(cache)
+        cache.clear()
+        self.assertFalse(os.path.exists(self.cache_path))
+        self.assertFalse(self.get(cache)[0])
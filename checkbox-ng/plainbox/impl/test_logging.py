@@ -0,0 +1,107 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.test_logging`
+=================================
+
+Test definitions for :mod:`plainbox.impl.logging`
+"""
+
+from unittest import TestCase
+import io
+import logging
+import threading
+
+from plainbox.impl.logging import AsyncHandler
+from plainbox.impl.logging import AsyncLogWriter
+from plainbox.impl.logging import make_asynchronous
+
+
+class AsyncLoggingTests(TestCase):
+
+    def setUp(self):
+        self.writer = AsyncLogWriter()
+        self.addCleanup(self.writer.stop)
+        # a logger outside of the hierarchy, not reaching the root handlers
+        self.logger = logging.Logger("test", logging.DEBUG)
+        self.stream = io.StringIO()
+        self.handler = logging.StreamHandler(self.stream)
+        self.handler.set_name("test_handler")
+        self.handler.setLevel(logging.INFO)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def test_records_are_written_in_background(self):
+        thread_names = []
+
+        class Handler(logging.StreamHandler):
+            def emit(self, record):
+                thread_names.append(threading.current_thread().name)
+                super().emit(record)
+
+        handler = Handler(self.stream)
+        handler.setLevel(logging.INFO)
+        self.logger.addHandler(AsyncHandler([handler], self.writer))
+        self.logger.info("message %s", "arg")
+        self.writer.flush()
+        self.assertEqual(self.stream.getvalue(), "message arg\n")
+        self.assertEqual(thread_names, ["log-writer"])
+
+    def test_messages_are_rendered_when_logged(self):
+        rendered = []
+
+        class Arg:
+            def __str__(self):
+                rendered.append(True)
+                return "arg"
+
+        arg_list = ["first"]
+        self.logger.addHandler(AsyncHandler([self.handler], self.writer))
+        self.logger.info("message %s", arg_list)
+        arg_list.append("second")
+        # records no handler wants are not rendered
+        self.logger.debug("filtered %s", Arg())
+        try:
+            raise ValueError("oops")
+        except ValueError:
+            self.logger.exception("failed")
+        self.writer.flush()
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(lines[:2], ["message ['first']", "failed"])
+        self.assertEqual(lines[-1], "ValueError: oops")
+        self.assertEqual(rendered, [])
+
+    def test_stop_writes_queued_records(self):
+        self.logger.addHandler(AsyncHandler([self.handler], self.writer))
+        for index in range(100):
+            self.logger.warning("%d", index)
+        self.writer.stop()
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 100)
+        # the writer starts again if needed
+        self.logger.warning("again")
+        self.writer.flush()
+        self.assertTrue(self.stream.getvalue().endswith("again\n"))
+
+    def test_make_asynchronous(self):
+        other = logging.NullHandler()
+        self.logger.addHandler(self.handler)
+        self.logger.addHandler(other)
+        make_asynchronous(self.logger, ["test_handler"])
+        make_asynchronous(self.logger, ["test_handler"])
+        self.assertEqual(len(self.logger.handlers), 2)
+        self.assertIs(self.logger.handlers[0], other)
+        self.assertIsInstance(self.logger.handlers[1], AsyncHandler)
+        self.assertEqual(self.logger.handlers[1].handler_list, [self.handler])
@@ -0,0 +1,181 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.test_metrics`
+=================================
+
+Test definitions for :mod:`plainbox.impl.metrics`
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import io
+import json
+import os
+import tarfile
+
+from plainbox.impl.execution import UnifiedRunner
+from plainbox.impl.metrics import Metric
+from plainbox.impl.metrics import compare_metrics
+from plainbox.impl.metrics import load_submission_metrics
+from plainbox.impl.metrics import make_metric
+from plainbox.impl.metrics import parse_metrics
+from plainbox.impl.result import JobResultBuilder
+from plainbox.impl.session.resume import SessionResumeHelper1
+from plainbox.impl.session.suspend import SessionSuspendHelper1
+from plainbox.impl.unit.job import JobDefinition
+
+
+class ParseMetricsTests(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_metrics(
+            "name: read\nvalue: 412.5\nunit: MB/s\nbetter: higher\n\n"
+            "name: latency\nvalue: 3\nbetter: lower\n\n"
+            "name: score\nvalue: 7\n"), [
+                Metric('read', 412.5, 'MB/s', 'higher'),
+                Metric('latency', 3.0, '', 'lower'),
+                Metric('score', 7.0, '', None)])
+
+    def test_last_value_wins(self):
+        self.assertEqual(parse_metrics(
+            "name: a\nvalue: 1\n\nname: b\nvalue: 2\n\nname: a\nvalue: 3\n"),
+            [Metric('b', 2.0, '', None), Metric('a', 3.0, '', None)])
+
+    def test_invalid_records_are_skipped(self):
+        with self.assertLogs('plainbox.metrics', 'WARNING'):
+            self.assertEqual(parse_metrics(
+                "value: 1\n\nname: nan\nvalue: nan\n\n"
+                "name: word\nvalue: fast\n\n"
+                "name: dir\nvalue: 1\nbetter: faster\n\n"
+                "name: ok\nvalue: 1\n"), [Metric('ok', 1.0, '', None)])
+
+    def test_make_metric(self):
+        self.assertEqual(make_metric(' a ', '1e3', None, 'lower'),
+                         Metric('a', 1000.0, '', 'lower'))
+        with self.assertRaises(ValueError):
+            make_metric('', 1)
+
+
+class CompareMetricsTests(TestCase):
+
+    def test_compare(self):
+        old_map = {'job': [
+            Metric('read', 100.0, 'MB/s', 'higher'),
+            Metric('latency', 10.0, 'ms', 'lower'),
+            Metric('temp', 50.0, 'C', None),
+            Metric('gone', 1.0, '', 'higher')]}
+        new_map = {'job': [
+            Metric('read', 90.0, 'MB/s', 'higher'),
+            Metric('latency', 10.4, 'ms', 'lower'),
+            Metric('temp', 80.0, 'C', None)]}
+        comparison_map = {
+            c.name: c for c in compare_metrics(old_map, new_map, 5)}
+        self.assertTrue(comparison_map['read'].regression)
+        self.assertAlmostEqual(comparison_map['read'].change, -10.0)
+        self.assertFalse(comparison_map['latency'].regression)
+        self.assertFalse(comparison_map['temp'].regression)
+        self.assertIsNone(comparison_map['gone'].new)
+        self.assertIsNone(comparison_map['gone'].change)
+        self.assertFalse(comparison_map['gone'].regression)
+        comparison_map = {
+            c.name: c for c in compare_metrics(old_map, new_map, 3)}
+        self.assertTrue(comparison_map['latency'].regression)
+
+    def test_zero_baseline(self):
+        comparison, = compare_metrics(
+            {'job': [Metric('errors', 0.0, '', 'lower')]},
+            {'job': [Metric('errors', 5.0, '', 'lower')]})
+        self.assertIsNone(comparison.change)
+        self.assertFalse(comparison.regression)
+
+
+class MetricsStorageTests(TestCase):
+
+    def test_suspend_resume(self):
+        result = JobResultBuilder(
+            outcome='pass', io_log=[],
+            metrics=[Metric('read', 1.5, 'MB/s', 'higher')]).get_result()
+        result_repr = SessionSuspendHelper1()._repr_JobResultBase(
+            result, None)
+        self.assertEqual(result_repr['metrics'],
+                         [['read', 1.5, 'MB/s', 'higher']])
+        result_repr['io_log'] = []
+        resumed = SessionResumeHelper1._build_JobResult(
+            json.loads(json.dumps(result_repr)), 0, None)
+        self.assertEqual(resumed.metrics, result.metrics)
+
+    def test_no_metrics(self):
+        result = JobResultBuilder(outcome='pass').get_result()
+        self.assertEqual(result.metrics, ())
+        self.assertNotIn('metrics', SessionSuspendHelper1()
+                         ._repr_JobResultBase(result, None))
+
+    def test_load_submission(self):
+        submission = {'results': [
+            {'id': 'a', 'full_id': 'ns::a', 'metrics': [
+                {'name': 'read', 'value': 1, 'unit': 'MB/s',
+                 'better': 'higher'}]},
+            {'id': 'b', 'full_id': 'ns::b'}]}
+        data = json.dumps(submission).encode('UTF-8')
+        with TemporaryDirectory() as tmp:
+            pathname = os.path.join(tmp, 'submission.tar.xz')
+            with tarfile.open(pathname, 'w:xz') as tar:
+                info = tarfile.TarInfo('submission.json')
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+            self.assertEqual(load_submission_metrics(pathname), {
+                'ns::a': [Metric('read', 1.0, 'MB/s', 'higher')]})
+
+
+class UnifiedRunnerMetricsTests(TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('plainbox.impl.execution.ResourceJobCache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # an already closed stdin, nothing to forward to the job
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        stdin = open(read_fd, 'rt')
+        self.addCleanup(stdin.close)
+        self.runner = UnifiedRunner(
+            'session-id', [], tmp.name, stdin=stdin)
+        self.provider = mock.Mock(
+            namespace='ns', gettext_domain=None, locale_dir=None,
+            extra_PYTHONPATH=None, data_dir=None, units_dir=None,
+            CHECKBOX_SHARE=None)
+
+    def test_metrics_are_collected(self):
+        job = JobDefinition({
+            'id': 'bench', 'plugin': 'shell', 'flags': 'preserve-cwd',
+            'command': 'printf "name: score\\nvalue: 42\\nbetter: higher\\n"'
+                       ' >> "$PLAINBOX_METRICS_FILE"'
+        }, provider=self.provider)
+        with mock.patch('plainbox.impl.execution.collectors_enabled',
+                        return_value=False), \
+                mock.patch('plainbox.impl.execution.on_ubuntucore',
+                           return_value=False):
+            result = self.runner.run_job(job, None)
+            self.assertEqual(result.outcome, 'pass')
+            self.assertEqual(result.metrics,
+                             (Metric('score', 42.0, '', 'higher'),))
+            # metrics of previous runs are discarded
+            result = self.runner.run_job(job, None)
+        self.assertEqual(len(result.metrics), 1)
@@ -0,0 +1,124 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.test_tracing`
+=================================
+
+Test definitions for :mod:`plainbox.impl.tracing`
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+import json
+import os
+
+from plainbox.impl import tracing
+
+
+class TracingTests(TestCase):
+
+    def setUp(self):
+        tracing.disable_tracing()
+        self.addCleanup(tracing.disable_tracing)
+
+    def test_disabled(self):
+        self.assertFalse(tracing.is_tracing_enabled())
+        with tracing.span('name', arg=1) as s:
+            s.annotate(other=2)
+        self.assertIs(tracing.span('name'), tracing.span('other'))
+        self.assertIsNone(tracing.save_trace())
+
+    def test_span(self):
+        tracer = tracing.enable_tracing()
+        self.assertIs(tracing.enable_tracing(), tracer)
+        with tracing.span('outer', category='cat', arg=1) as s:
+            with tracing.span('inner'):
+                pass
+            s.annotate(result=2)
+        inner, outer = tracer.event_list
+        self.assertEqual(inner['name'], 'inner')
+        self.assertEqual(inner['cat'], 'plainbox')
+        self.assertNotIn('args', inner)
+        self.assertEqual(outer['name'], 'outer')
+        self.assertEqual(outer['cat'], 'cat')
+        self.assertEqual(outer['ph'], 'X')
+        self.assertEqual(outer['pid'], os.getpid())
+        self.assertEqual(outer['args'], {'arg': 1, 'result': 2})
+        self.assertLessEqual(outer['ts'], inner['ts'])
+        self.assertGreaterEqual(outer['dur'], inner['dur'])
+
+    def test_span_error(self):
+        tracer = tracing.enable_tracing()
+        with self.assertRaises(ValueError):
+            with tracing.span('name'):
+                raise ValueError
+        event, = tracer.event_list
+        self.assertEqual(event['args'], {'error': 'ValueError'})
+
+    def test_traced(self):
+        @tracing.traced()
+        def func(arg):
+            return arg
+
+        self.assertEqual(func(1), 1)
+        tracer = tracing.enable_tracing()
+        self.assertEqual(func(2), 2)
+        event, = tracer.event_list
+        self.assertEqual(event['name'], func.__qualname__)
+
+    def test_save(self):
+        tracer = tracing.enable_tracing()
+        with tracing.span('first'):
+            pass
+        self.assertIsNone(tracing.save_trace())
+        event_list = tracer.event_list
+        with TemporaryDirectory() as tmp:
+            tracing.set_trace_dir(tmp)
+            pathname = tracing.save_trace()
+            self.assertEqual(pathname, os.path.join(
+                tmp, 'trace-{}.json'.format(os.getpid())))
+            with open(pathname) as stream:
+                self.assertEqual(json.load(stream), event_list)
+            # the events are written as they are recorded, not kept
+            with tracing.span('second'):
+                pass
+            self.assertEqual(tracer.event_list, [])
+            self.assertEqual(tracing.save_trace(), pathname)
+            with tracing.span('third'):
+                pass
+            tracing.disable_tracing()
+            with open(pathname) as stream:
+                trace = json.load(stream)
+        self.assertEqual(
+            [event['name'] for event in trace], ['first', 'second', 'third'])
+
+    def test_empty_trace(self):
+        tracing.enable_tracing()
+        with TemporaryDirectory() as tmp:
+            tracing.set_trace_dir(tmp)
+            with open(tracing.save_trace()) as stream:
+                self.assertEqual(json.load(stream), [])
+
+    def test_buffer_limit(self):
+        tracer = tracing.enable_tracing()
+        tracer.MAX_BUFFERED_EVENTS = 2
+        for name in ('first', 'second', 'third'):
+            with tracing.span(name):
+                pass
+        self.assertEqual(
+            [event['name'] for event in tracer.event_list],
+            ['first', 'second'])
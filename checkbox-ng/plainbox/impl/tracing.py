@@ -0,0 +1,395 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+:mod:`plainbox.impl.tracing` -- performance tracing
+===================================================
+
+Spans of time spent in the various phases of a session (loading providers,
+bootstrapping, running jobs, exporting results...) can be recorded and saved
+in the Trace Event Format understood by ``chrome://tracing`` and by
+Perfetto (https://ui.perfetto.dev).
+
+Tracing is disabled by default and then :func:`span()` returns a shared,
+do-nothing context manager so instrumented code costs next to nothing. It is
+enabled with the ``trace`` launcher option (in the ``[ui]`` section) or by
+setting the ``PLAINBOX_TRACE`` environment variable. The trace is written
+to ``trace-<pid>.json`` in the directory of the session as the events are
+recorded, the file is complete when the session is finalized and when the
+program exits.
+
+Instrumenting code looks like this::
+
+    with span("bootstrap", job=job.id):
+        ...
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from plainbox.i18n import gettext as _
+
+logger = logging.getLogger("plainbox.tracing")
+
+# The active tracer, None when tracing is disabled
+_tracer = None
+
+
+class Tracer:
+    """
+    Collector of trace events.
+
+    Each event is a complete ("X") event with the start time and the
+    duration expressed in microseconds since the tracer was created.
+
+    The events are written to the trace file as they are recorded, in the
+    JSON array format of the Trace Event Format. Trace viewers also load the
+    file when the program is killed before the array is closed. Until the
+    directory of the trace is known, up to :attr:`MAX_BUFFERED_EVENTS` events
+    are kept in memory, the later ones are dropped.
+    """
+
+    MAX_BUFFERED_EVENTS = 10000
+
+    # written after the events when the trace is saved, and overwritten by
+    # the next event
+    _TRAILER = b'\n]\n'
+
+    def __init__(self):
+        self._event_list = []
+        self._dropped_count = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._trace_dir = None
+        self._stream = None
+        self._written_count = 0
+
+    @property
+    def event_list(self):
+        """list of the events not written to the trace file yet"""
+        with self._lock:
+            return list(self._event_list)
+
+    @property
+    def trace_dir(self):
+        """directory of the trace file, None if not known yet"""
+        return self._trace_dir
+
+    @trace_dir.setter
+    def trace_dir(self, trace_dir):
+        with self._lock:
+            if trace_dir == self._trace_dir:
+                return
+            self._close()
+            self._trace_dir = trace_dir
+            if trace_dir is not None:
+                self._open()
+
+    @property
+    def pathname(self):
+        """pathname of the trace file or None if not known yet"""
+        if self._trace_dir is None:
+            return None
+        return os.path.join(
+            self._trace_dir, 'trace-{}.json'.format(self._pid))
+
+    def now(self):
+        """Get the time elapsed since the tracer was created, in seconds."""
+        return time.perf_counter() - self._origin
+
+    def add_event(self, name, category, start, end, args=None):
+        """
+        Record a complete event.
+
+        :param name:
+            Name of the event
+        :param category:
+            Category of the event, used for filtering in trace viewers
+        :param start:
+            Start time, as returned by :meth:`now()`
+        :param end:
+            End time, as returned by :meth:`now()`
+        :param args:
+            Optional dictionary of extra data displayed with the event
+        """
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round(start * 1e6, 3),
+            'dur': round((end - start) * 1e6, 3),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            if self._stream is not None:
+                self._write(event)
+            elif len(self._event_list) < self.MAX_BUFFERED_EVENTS:
+                self._event_list.append(event)
+            else:
+                if not self._dropped_count:
+                    logger.warning(
+                        _("Too many trace events before the trace file is "
+                          "known, dropping the next ones"))
+                self._dropped_count += 1
+
+    def save(self):
+        """
+        Flush the events written so far and complete the trace file.
+
+        More events can be recorded afterwards, they are written after the
+        ones already saved.
+
+        :returns:
+            The pathname of the saved trace or None if it was not saved
+        """
+        with self._lock:
+            if self._stream is None:
+                logger.debug(_("No trace file to save the trace to"))
+                return None
+            try:
+                self._write_trailer()
+            except OSError as exc:
+                self._fail(exc)
+                return None
+        logger.info(_("Trace saved to %s"), self.pathname)
+        return self.pathname
+
+    def close(self):
+        """Complete and close the trace file."""
+        with self._lock:
+            self._close()
+
+    def _open(self):
+        try:
+            self._stream = open(self.pathname, 'wb')
+        except OSError as exc:
+            logger.warning(_("Cannot save the trace to %s: %s"),
+                           self.pathname, exc)
+            return
+        self._written_count = 0
+        try:
+            self._stream.write(b'[')
+        except OSError as exc:
+            self._fail(exc)
+            return
+        event_list, self._event_list = self._event_list, []
+        for event in event_list:
+            self._write(event)
+
+    def _close(self):
+        if self._stream is None:
+            return
+        try:
+            self._write_trailer()
+            self._stream.close()
+        except OSError as exc:
+            self._fail(exc)
+        self._stream = None
+
+    def _write(self, event):
+        separator = b',\n' if self._written_count else b'\n'
+        try:
+            self._stream.write(separator + json.dumps(
+                event, separators=(',', ':')).encode('UTF-8'))
+        except OSError as exc:
+            self._fail(exc)
+            return
+        self._written_count += 1
+
+    def _write_trailer(self):
+        position = self._stream.tell()
+        self._stream.write(self._TRAILER)
+        self._stream.flush()
+        self._stream.seek(position)
+
+    def _fail(self, exc):
+        logger.warning(_("Cannot save the trace to %s: %s"),
+                       self.pathname, exc)
+        stream, self._stream = self._stream, None
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+class _Span:
+    """Context manager recording the time spent in its body."""
+
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_start')
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start = None
+
+    def annotate(self, **args):
+        """Add extra data to the span (e.g. results only known at the end)."""
+        self._args.update(args)
+
+    def __enter__(self):
+        self._start = self._tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._args['error'] = exc_type.__name__
+        self._tracer.add_event(
+            self._name, self._category, self._start, self._tracer.now(),
+            self._args)
+        return False
+
+
+class _NullSpan:
+    """Context manager used when tracing is disabled."""
+
+    __slots__ = ()
+
+    def annotate(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, category='plainbox', **args):
+    """
+    Trace the time spent in the body of a ``with`` statement.
+
+    :param name:
+        Name of the span
+    :param category:
+        Category of the span
+    :param args:
+        Extra data displayed with the span in trace viewers
+    :returns:
+        A context manager. The object bound by ``with ... as`` has an
+        ``annotate(**args)`` method to add more data to the span.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, category, args)
+
+
+def traced(name=None, category='plainbox'):
+    """
+    Decorator tracing the time spent in each call of a function.
+
+    :param name:
+        Name of the span, defaults to the qualified name of the function
+    :param category:
+        Category of the span
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with _Span(tracer, span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_tracing_enabled():
+    """Check if tracing is enabled."""
+    return _tracer is not None
+
+
+def get_tracer():
+    """Get the active :class:`Tracer` or None if tracing is disabled."""
+    return _tracer
+
+
+def enable_tracing():
+    """
+    Enable tracing.
+
+    This is idempotent. The trace is saved automatically when the program
+    exits.
+
+    :returns:
+        The active :class:`Tracer`
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+        atexit.register(_save_at_exit, _tracer)
+        logger.debug(_("Tracing enabled"))
+    return _tracer
+
+
+def disable_tracing():
+    """
+    Disable tracing, events recorded so far and not written to the trace
+    file are discarded.
+    """
+    global _tracer
+    if _tracer is not None:
+        atexit.unregister(_save_at_exit)
+        _tracer.close()
+        _tracer = None
+
+
+def set_trace_dir(trace_dir):
+    """
+    Set the directory where the trace is saved.
+
+    This is called with the directory of the session when it is created or
+    resumed and does nothing when tracing is disabled.
+    """
+    if _tracer is not None:
+        _tracer.trace_dir = trace_dir
+
+
+def save_trace():
+    """
+    Complete the trace file with the events so far, if tracing is enabled.
+
+    :returns:
+        The pathname of the saved trace or None
+    """
+    if _tracer is None:
+        return None
+    return _tracer.save()
+
+
+def _save_at_exit(tracer):
+    tracer.close()
+
+
+if os.getenv("PLAINBOX_TRACE"):
+    enable_tracing()
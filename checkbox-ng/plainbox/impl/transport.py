@@ -31,7 +31,6 @@ Shared code for test data transports..
 from collections import OrderedDict
 from io import TextIOWrapper
 from logging import getLogger
-import pkg_resources
 import re
 from shutil import copyfileobj
 import sys
@@ -40,8 +39,6 @@ from plainbox.abc import ISessionStateTransport
 from plainbox.i18n import gettext as _
 from plainbox.impl.exporter import ByteStringStreamTranslator
 
-import requests
-
 # OAuth is not always available on all platforms.
 _oauth_available = True
 try:
@@ -143,6 +140,9 @@ class _OAuthTransport(TransportBase):
         self.uploader_email = transport_details['uploader_email']
 
     def send(self, data, config=None, session_state=None):
+        # imported here, requests takes a while to load and is only needed
+        # to submit results
+        import requests
         headers = {}
         if self.oauth_creds:
             client = oauth1.Client(
@@ -252,6 +252,8 @@ def get_all_transports():
 
     Returns a map of transports (mapping from name to transport class)
     """
+    # imported here, pkg_resources takes a while to load
+    import pkg_resources
     transport_map = OrderedDict()
     iterator = pkg_resources.iter_entry_points('plainbox.transport')
     for entry_point in sorted(iterator, key=lambda ep: ep.name):
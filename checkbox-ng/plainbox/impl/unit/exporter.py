@@ -23,8 +23,6 @@ import logging
 import os.path
 import re
 
-import pkg_resources
-
 from plainbox.i18n import gettext as _
 from plainbox.impl.symbol import SymbolDef
 from plainbox.impl.unit import concrete_validators
@@ -40,6 +38,14 @@ logger = logging.getLogger("plainbox.unit.exporter")
 __all__ = ('ExporterUnit', )
 
 
+def load_exporter_entry_point(entry_point):
+    """Load the exporter class advertised by the given entry point."""
+    # imported here, pkg_resources takes a while to load
+    import pkg_resources
+    return pkg_resources.load_entry_point(
+        'checkbox-ng', 'plainbox.exporter', entry_point)
+
+
 class ExporterUnit(UnitWithId):
 
     """
@@ -123,8 +129,7 @@ class ExporterUnit(UnitWithId):
                 concrete_validators.present,
                 concrete_validators.untranslatable,
                 CorrectFieldValueValidator(
-                    lambda entry_point: pkg_resources.load_entry_point(
-                        'checkbox-ng', 'plainbox.exporter', entry_point),
+                    load_exporter_entry_point,
                     Problem.wrong, Severity.error),
             ],
             fields.file_extension: [
@@ -208,8 +213,7 @@ class ExporterUnitSupport():
 
     def _get_exporter_cls(self, exporter):
         """Return the exporter class."""
-        return pkg_resources.load_entry_point(
-            'checkbox-ng', 'plainbox.exporter', exporter.entry_point)
+        return load_exporter_entry_point(exporter.entry_point)
 
 class ExporterError(Exception):
     """
@@ -23,17 +23,22 @@
 =========================================
 """
 
+import functools
 import json
 import logging
 import re
 import os
+from collections import namedtuple
 
 from plainbox.abc import IJobDefinition
 from plainbox.i18n import gettext as _
 from plainbox.i18n import gettext_noop as N_
 from plainbox.impl.decorators import cached_property
+from plainbox.impl.decorators import clear_instance_method_cache
 from plainbox.impl.decorators import instance_method_lru_cache
+from plainbox.impl.jobcache import is_valid_probe
 from plainbox.impl.resource import ResourceProgram
+from plainbox.impl.resource import ResourceProgramError
 from plainbox.impl.resource import parse_imports_stmt
 from plainbox.impl.secure.origin import JobOutputTextSource
 from plainbox.impl.secure.origin import Origin
@@ -56,7 +61,7 @@ from plainbox.impl.xparsers import Text
 from plainbox.impl.xparsers import Visitor
 from plainbox.impl.xparsers import WordList
 
-__all__ = ['JobDefinition', 'propertywithsymbols']
+__all__ = ['JobDefinition', 'JobMetadata', 'propertywithsymbols']
 
 
 logger = logging.getLogger("plainbox.unit.job")
@@ -164,6 +169,48 @@ class _AutoRetryValues(SymbolDef):
     no = 'no'
 
 
+@functools.lru_cache(maxsize=4096)
+def _compile_resource_program(text, implicit_namespace, imports):
+    """
+    Compile a resource program, sharing it between identical requirements.
+
+    Resource programs are immutable once compiled, so all the jobs with the
+    same ``requires`` field (most notably, units instantiated from the same
+    template) can use one instance.
+    """
+    return ResourceProgram(text, implicit_namespace, imports)
+
+
+class JobMetadata(namedtuple('JobMetadata', [
+        'direct_deps', 'after_deps', 'salvage_deps', 'resource_deps',
+        'flag_set', 'resource_program', 'resource_program_error'])):
+    """
+    Precompiled metadata of a job definition.
+
+    The dependency-related fields of a job (``depends``, ``after``,
+    ``salvages``, ``requires`` and ``flags``) are parsed once into this
+    immutable object so that the dependency solver and the readiness
+    computation don't have to parse them again for each job on each pass.
+
+    :attr direct_deps:
+        frozenset of fully-qualified ids of jobs listed in ``depends``
+    :attr after_deps:
+        frozenset of fully-qualified ids of jobs listed in ``after``
+    :attr salvage_deps:
+        frozenset of fully-qualified ids of jobs listed in ``salvages``
+    :attr resource_deps:
+        frozenset of ids of resource jobs referenced by ``requires``
+    :attr flag_set:
+        frozenset of flags
+    :attr resource_program:
+        ResourceProgram compiled from ``requires`` or None
+    :attr resource_program_error:
+        Exception raised while compiling ``requires`` or None
+    """
+
+    __slots__ = ()
+
+
 class JobDefinition(UnitWithId, IJobDefinition):
     """
     Job definition class.
@@ -219,7 +266,7 @@ class JobDefinition(UnitWithId, IJobDefinition):
             # XXX: moved here because of cyclic imports
             from plainbox.impl.ctrl import checkbox_session_state_ctrl
             controller = checkbox_session_state_ctrl
-        self._resource_program = None
+        self._metadata = None
         self._controller = controller
 
     @classmethod
@@ -346,6 +393,10 @@ class JobDefinition(UnitWithId, IJobDefinition):
     def flags(self):
         return self.get_record_value('flags')
 
+    @cached_property
+    def cache_probes(self):
+        return self.get_record_value('cache_probes')
+
     @cached_property
     def siblings(self):
         return self.get_record_value('siblings')
@@ -530,15 +581,23 @@ class JobDefinition(UnitWithId, IJobDefinition):
         else:
             return set()
 
-    @instance_method_lru_cache(maxsize=None)
     def get_flag_set(self):
         """
         Return a set of flags associated with this job
         """
-        if self.flags is not None:
-            return {flag for flag in re.split('[\s,]+', self.flags)}
+        return self.get_metadata().flag_set
+
+    @instance_method_lru_cache(maxsize=None)
+    def get_cache_probe_list(self):
+        """
+        Return a sorted list of cache validity probes of this job
+        """
+        if self.cache_probes is not None:
+            return sorted({
+                probe for probe in re.split(r'[\s,]+', self.cache_probes)
+                if probe})
         else:
-            return set()
+            return []
 
     def get_imported_jobs(self):
         """
@@ -578,41 +637,77 @@ class JobDefinition(UnitWithId, IJobDefinition):
         return self.plugin in ['manual', 'user-interact',
                                'user-interact-verify']
 
-    def get_resource_program(self):
+    def get_metadata(self):
         """
-        Return a ResourceProgram based on the 'requires' expression.
+        Get the precompiled metadata of this job.
 
-        The program instance is cached in the JobDefinition and is not
-        compiled or validated on subsequent calls.
+        The metadata is computed the first time it is needed and then reused,
+        see :meth:`invalidate_metadata()`.
 
         :returns:
-            ResourceProgram if one is available or None
-        :raises ResourceProgramError:
-            If the program definition is incorrect
+            A :class:`JobMetadata` instance
         """
-        if self.requires is not None and self._resource_program is None:
+        if self._metadata is None:
+            self._metadata = self._compile_metadata()
+        return self._metadata
+
+    def invalidate_metadata(self):
+        """
+        Forget the precompiled metadata of this job.
+
+        This has to be called after changing any of the fields (or the
+        provider) that the metadata is computed from.
+        """
+        self._metadata = None
+        for name in ('depends', 'after', 'salvages', 'requires', 'imports',
+                     'flags'):
+            self.__dict__.pop(name, None)
+        clear_instance_method_cache(self)
+
+    def _compile_metadata(self):
+        if self.flags is not None:
+            flag_set = frozenset(re.split(r'[\s,]+', self.flags))
+        else:
+            flag_set = frozenset()
+        resource_program = None
+        resource_program_error = None
+        resource_deps = frozenset()
+        if self.requires is not None:
             if self._provider is not None:
                 implicit_namespace = self._provider.namespace
             else:
                 implicit_namespace = None
-            if self.imports is not None:
-                imports = list(self.get_imported_jobs())
+            try:
+                if self.imports is not None:
+                    imports = tuple(self.get_imported_jobs())
+                else:
+                    imports = None
+                resource_program = _compile_resource_program(
+                    self.requires, implicit_namespace, imports)
+            except (ResourceProgramError, SyntaxError, ValueError) as exc:
+                resource_program_error = exc
             else:
-                imports = None
-            self._resource_program = ResourceProgram(
-                self.requires, implicit_namespace, imports)
-        return self._resource_program
-
-    def get_direct_dependencies(self):
+                resource_deps = frozenset(
+                    resource_program.required_resources)
+        return JobMetadata(
+            direct_deps=self._parse_job_id_list(self.depends),
+            after_deps=self._parse_job_id_list(self.after),
+            salvage_deps=self._parse_job_id_list(self.salvages),
+            resource_deps=resource_deps,
+            flag_set=flag_set,
+            resource_program=resource_program,
+            resource_program_error=resource_program_error)
+
+    def _parse_job_id_list(self, text):
         """
-        Compute and return a set of direct dependencies
+        Parse a list of job identifiers and qualify each of them.
 
         To combat a simple mistake where the jobs are space-delimited any
         mixture of white-space (including newlines) and commas are allowed.
         """
         deps = set()
-        if self.depends is None:
-            return deps
+        if text is None:
+            return frozenset()
 
         class V(Visitor):
 
@@ -622,8 +717,34 @@ class JobDefinition(UnitWithId, IJobDefinition):
             def visit_Error_node(visitor, node: Error):
                 logger.warning(_("unable to parse depends: %s"), node.msg)
 
-        V().visit(WordList.parse(self.depends))
-        return deps
+        V().visit(WordList.parse(text))
+        return frozenset(deps)
+
+    def get_resource_program(self):
+        """
+        Return a ResourceProgram based on the 'requires' expression.
+
+        The program instance is cached in the metadata of the JobDefinition
+        and is not compiled or validated on subsequent calls.
+
+        :returns:
+            ResourceProgram if one is available or None
+        :raises ResourceProgramError:
+            If the program definition is incorrect
+        """
+        metadata = self.get_metadata()
+        if metadata.resource_program_error is not None:
+            raise metadata.resource_program_error.with_traceback(None)
+        return metadata.resource_program
+
+    def get_direct_dependencies(self):
+        """
+        Compute and return a set of direct dependencies
+
+        To combat a simple mistake where the jobs are space-delimited any
+        mixture of white-space (including newlines) and commas are allowed.
+        """
+        return self.get_metadata().direct_deps
 
     def get_after_dependencies(self):
         """
@@ -640,48 +761,20 @@ class JobDefinition(UnitWithId, IJobDefinition):
         To combat a simple mistake where the jobs are space-delimited any
         mixture of white-space (including newlines) and commas are allowed.
         """
-        deps = set()
-        if self.after is None:
-            return deps
-
-        class V(Visitor):
-
-            def visit_Text_node(visitor, node: Text):
-                deps.add(self.qualify_id(node.text))
-
-            def visit_Error_node(visitor, node: Error):
-                logger.warning(_("unable to parse depends: %s"), node.msg)
-
-        V().visit(WordList.parse(self.after))
-        return deps
+        return self.get_metadata().after_deps
 
     def get_salvage_dependencies(self):
         """Return a set of jobs that need to fail before this job can run."""
-        deps = set()
-        if self.salvages is None:
-            return deps
-
-        class V(Visitor):
-
-            def visit_Text_node(visitor, node: Text):
-                deps.add(self.qualify_id(node.text))
-
-            def visit_Error_node(visitor, node: Error):
-                logger.warning(_("unable to parse depends: %s"), node.msg)
-
-        V().visit(WordList.parse(self.salvages))
-        return deps
-
+        return self.get_metadata().salvage_deps
 
     def get_resource_dependencies(self):
         """
         Compute and return a set of resource dependencies
         """
-        program = self.get_resource_program()
-        if program:
-            return program.required_resources
-        else:
-            return set()
+        metadata = self.get_metadata()
+        if metadata.resource_program_error is not None:
+            raise metadata.resource_program_error.with_traceback(None)
+        return metadata.resource_deps
 
     @instance_method_lru_cache(maxsize=None)
     def get_category_id(self):
@@ -739,6 +832,7 @@ class JobDefinition(UnitWithId, IJobDefinition):
             certification_status = 'certification_status'
             siblings = 'siblings'
             auto_retry = 'auto_retry'
+            cache_probes = 'cache_probes'
 
         field_validators = {
             fields.name: [
@@ -971,4 +1065,18 @@ class JobDefinition(UnitWithId, IJobDefinition):
                 MemberOfFieldValidator(
                     _AutoRetryValues.get_all_symbols()),
             ],
+            fields.cache_probes: [
+                concrete_validators.untranslatable,
+                concrete_validators.templateInvariant,
+                CorrectFieldValueValidator(
+                    lambda value, unit: all(
+                        is_valid_probe(probe)
+                        for probe in unit.get_cache_probe_list()),
+                    Problem.wrong, Severity.error,
+                    message=_('unknown cache probe'),
+                    onlyif=lambda unit: unit.cache_probes),
+                UselessFieldValidator(
+                    message=_("only resource jobs are cached"),
+                    onlyif=lambda unit: unit.plugin != 'resource'),
+            ],
         }
@@ -140,6 +140,7 @@ class TemplateUnit(Unit):
             data, raw_data, origin, provider, parameters, field_offset_map)
         self._filter_program = None
         self._fake_resources = False
+        self._instance_data = None
 
     @classmethod
     def instantiate_template(cls, data, raw_data, origin, provider, parameters,
@@ -355,27 +356,10 @@ class TemplateUnit(Unit):
         else:
             unit_cls = self.get_target_unit_cls()
         assert unit_cls is not None
-        # Filter out template- data fields as they are not relevant to the
-        # target unit.
-        data = {
-            key: value for key, value in self._data.items()
-            if not key.startswith('template-')
-        }
-        raw_data = {
-            key: value for key, value in self._raw_data.items()
-            if not key.startswith('template-')
-        }
-        # Only keep the template-engine field
-        raw_data['template-engine'] = self.template_engine
-        data['template-engine'] = raw_data['template-engine']
-        # Override the value of the 'unit' field from 'template-unit' field
-        data['unit'] = raw_data['unit'] = self.template_unit
+        data, raw_data, accessed_parameters = self._get_instance_data()
         # XXX: extract raw dictionary from the resource object, there is no
         # normal API for that due to the way resource objects work.
-        parameters = dict(object.__getattribute__(resource, '_data'))
-        accessed_parameters = set(itertools.chain(*{get_accessed_parameters(
-            value, template_engine=self.template_engine)
-            for value in data.values()}))
+        parameters = object.__getattribute__(resource, '_data')
         # Recreate the parameters with only the subset that will actually be
         # used by the template. Doing this filter can prevent exceptions like
         # DependencyDuplicateError where an unused resource property can differ
@@ -398,6 +382,41 @@ class TemplateUnit(Unit):
             data, raw_data, self.origin, self.provider, parameters,
             self.field_offset_map)
 
+    def _get_instance_data(self):
+        """
+        Get the data shared by all the units instantiated from this template.
+
+        :returns:
+            A tuple (data, raw_data, accessed_parameters)
+
+        Instantiated units differ only by their parameters so the (normalized
+        and raw) data dictionaries are computed once and shared by all of
+        them. Units never modify their data, code that needs a modified copy
+        of the data of a unit has to copy it first.
+        """
+        if self._instance_data is None:
+            # Filter out template- data fields as they are not relevant to
+            # the target unit.
+            data = {
+                key: value for key, value in self._data.items()
+                if not key.startswith('template-')
+            }
+            raw_data = {
+                key: value for key, value in self._raw_data.items()
+                if not key.startswith('template-')
+            }
+            # Only keep the template-engine field
+            raw_data['template-engine'] = self.template_engine
+            data['template-engine'] = raw_data['template-engine']
+            # Override the value of the 'unit' field from 'template-unit' field
+            data['unit'] = raw_data['unit'] = self.template_unit
+            accessed_parameters = frozenset(itertools.chain(*{
+                get_accessed_parameters(
+                    value, template_engine=self.template_engine)
+                for value in data.values()}))
+            self._instance_data = (data, raw_data, accessed_parameters)
+        return self._instance_data
+
     def should_instantiate(self, resource):
         """
         Check if a job should be instantiated for a specific resource.
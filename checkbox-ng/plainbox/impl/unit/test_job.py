@@ -27,6 +27,7 @@ Test definitions for plainbox.impl.unit.job module
 from unittest import TestCase
 
 from plainbox.impl.providers.v1 import Provider1
+from plainbox.impl.resource import ResourceProgramError
 from plainbox.impl.secure.origin import FileTextSource
 from plainbox.impl.secure.origin import Origin
 from plainbox.impl.secure.rfc822 import RFC822Record
@@ -1075,6 +1076,48 @@ class TestJobDefinition(TestCase):
             prog.required_resources,
             {'com.canonical.certification::package'})
 
+    def test_get_metadata(self):
+        job = JobDefinition({
+            'id': 'job',
+            'depends': 'a, b',
+            'after': 'c',
+            'salvages': 'd',
+            'requires': 'package.name == "checkbox"',
+            'flags': 'preserve-locale noreturn',
+        })
+        metadata = job.get_metadata()
+        self.assertEqual(metadata.direct_deps, frozenset(['a', 'b']))
+        self.assertEqual(metadata.after_deps, frozenset(['c']))
+        self.assertEqual(metadata.salvage_deps, frozenset(['d']))
+        self.assertEqual(metadata.resource_deps, frozenset(['package']))
+        self.assertEqual(metadata.flag_set,
+                         frozenset(['preserve-locale', 'noreturn']))
+        self.assertIsNone(metadata.resource_program_error)
+        # The metadata is computed only once and cannot be modified
+        self.assertIs(job.get_metadata(), metadata)
+        self.assertIs(job.get_direct_dependencies(), metadata.direct_deps)
+        with self.assertRaises(AttributeError):
+            metadata.flag_set = frozenset()
+
+    def test_get_metadata_broken_resource_program(self):
+        job = JobDefinition({'id': 'job', 'requires': 'package.name ='})
+        with mock.patch('plainbox.impl.unit.job.ResourceProgram',
+                        side_effect=ResourceProgramError) as mock_program:
+            with self.assertRaises(ResourceProgramError):
+                job.get_resource_program()
+            with self.assertRaises(ResourceProgramError):
+                job.get_resource_dependencies()
+        self.assertEqual(mock_program.call_count, 1)
+        self.assertEqual(job.get_metadata().resource_deps, frozenset())
+
+    def test_invalidate_metadata(self):
+        job = JobDefinition({'id': 'job', 'depends': 'a'})
+        metadata = job.get_metadata()
+        job._data['depends'] = 'b'
+        job.invalidate_metadata()
+        self.assertIsNot(job.get_metadata(), metadata)
+        self.assertEqual(job.get_direct_dependencies(), frozenset(['b']))
+
 
 class TestJobDefinitionStartup(TestCaseWithParameters):
     """
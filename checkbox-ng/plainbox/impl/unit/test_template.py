@@ -348,6 +348,21 @@ class TemplateUnitTests(TestCase):
         self.assertEqual(len(unit_list), 1)
         self.assertEqual(unit_list[0].partial_id, 'check-device-sda1')
 
+    def test_instantiate_all_shares_data(self):
+        template = TemplateUnit({
+            'template-resource': 'resource',
+            'id': 'check-device-{dev_name}',
+            'plugin': 'shell',
+        })
+        unit_list = template.instantiate_all([
+            Resource({'dev_name': 'sda1', 'unused': '1'}),
+            Resource({'dev_name': 'sda2', 'unused': '2'}),
+        ])
+        self.assertIs(unit_list[0]._data, unit_list[1]._data)
+        self.assertIs(unit_list[0]._raw_data, unit_list[1]._raw_data)
+        self.assertNotIn('unused', unit_list[0].parameters)
+        self.assertEqual(unit_list[1].partial_id, 'check-device-sda2')
+
 
 class TemplateUnitJinja2Tests(TestCase):
 
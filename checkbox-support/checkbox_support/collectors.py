@@ -0,0 +1,130 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.collectors
+===========================
+
+Resource collectors shared by the resource provider scripts and by the
+in-process resource collector API of Checkbox.
+
+Each ``collect_*`` function returns a list of ordered dictionaries, one per
+resource record. They are registered with the ``plainbox.resource_collector``
+entry point under the name of the script they implement, so Checkbox can
+produce the resource records without starting a new interpreter. The scripts
+themselves just print the records with :func:`print_records`.
+"""
+
+from collections import OrderedDict
+import os
+
+from checkbox_support.parsers.cpuinfo import CpuinfoParser
+from checkbox_support.parsers.meminfo import MeminfoParser
+
+CPUINFO_FILENAME = "/proc/cpuinfo"
+
+FREQUENCY_FILENAME = "/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq"
+
+GOVERNORS_FILENAME = (
+    "/sys/devices/system/cpu/cpu0/cpufreq/scaling_available_governors")
+
+SYSLPICHECK_FILENAMES = (
+    "/sys/devices/system/cpu/cpuidle/low_power_idle_system_residency_us",
+    "/sys/kernel/debug/pmc_core/slp_s0_residency_usec")
+
+CPULPICHECK_FILENAMES = (
+    "/sys/devices/system/cpu/cpuidle/low_power_idle_cpu_residency_us",
+    "/sys/kernel/debug/pmc_core/package_cstate_show")
+
+CPUFREQ_DRIVER_FILENAME = (
+    "/sys/devices/system/cpu/cpu0/cpufreq/scaling_driver")
+
+MEMINFO_FILENAME = "/proc/meminfo"
+
+
+def print_records(records):
+    """Print resource records in the RFC822 format expected by Checkbox."""
+    for index, record in enumerate(records):
+        if index:
+            print()
+        for key, value in record.items():
+            print("%s: %s" % (key, value))
+
+
+def collect_uname(environ=None):
+    """Collect information about the running kernel (uname)."""
+    keys = ("name", "node", "release", "version", "machine")
+    return [OrderedDict(zip(keys, os.uname()))]
+
+
+class _MeminfoResult:
+
+    def __init__(self):
+        self.records = []
+
+    def setMemory(self, memory):
+        self.records.append(OrderedDict(sorted(memory.items())))
+
+
+def collect_meminfo(environ=None):
+    """Collect information about system memory (/proc/meminfo)."""
+    result = _MeminfoResult()
+    with open(MEMINFO_FILENAME) as stream:
+        MeminfoParser(stream).run(result)
+    return result.records
+
+
+class _CpuinfoResult:
+
+    def __init__(self):
+        self.records = []
+
+    def setProcessor(self, processor):
+        record = OrderedDict()
+        for key, value in sorted(processor.items()):
+            if key == "speed":
+                # Check for frequency scaling
+                if os.path.exists(FREQUENCY_FILENAME):
+                    with open(FREQUENCY_FILENAME) as stream:
+                        value = int(stream.read().strip()) // 1000
+            if value:
+                record[key] = value
+        try:
+            with open(GOVERNORS_FILENAME) as stream:
+                record["governors"] = stream.read().strip()
+        except FileNotFoundError:
+            record["governors"] = "GOVERNORS NOT FOUND"
+        for fname in CPULPICHECK_FILENAMES:
+            if os.path.exists(fname):
+                record["cpu_lpi_file"] = os.path.basename(fname)
+                break
+        for fname in SYSLPICHECK_FILENAMES:
+            if os.path.exists(fname):
+                record["sys_lpi_file"] = os.path.basename(fname)
+                break
+        if os.path.exists(CPUFREQ_DRIVER_FILENAME):
+            record["scaling"] = "supported"
+        else:
+            record["scaling"] = "non-supported"
+        self.records.append(record)
+
+
+def collect_cpuinfo(environ=None):
+    """Collect information about the CPU (/proc/cpuinfo)."""
+    result = _CpuinfoResult()
+    with open(CPUINFO_FILENAME) as stream:
+        CpuinfoParser(stream).run(result)
+    return result.records
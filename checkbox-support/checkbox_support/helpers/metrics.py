@@ -0,0 +1,73 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+checkbox_support.helpers.metrics
+================================
+
+Report structured measurements (metrics) of benchmark jobs to Checkbox.
+
+Checkbox starts each job with the ``PLAINBOX_METRICS_FILE`` environment
+variable pointing to the file where the metrics of the job are collected.
+Outside of Checkbox the variable is not set and metrics are dropped.
+"""
+import math
+import os
+
+METRICS_FILE_ENV = 'PLAINBOX_METRICS_FILE'
+
+BETTER_CHOICES = ('higher', 'lower')
+
+
+def emit_metric(name, value, unit='', better=None):
+    """
+    Report a metric of the running job.
+
+    :param name:
+        Name of the metric, unique for the job
+    :param value:
+        Measured value, anything that can be converted to a float
+    :param unit:
+        Unit of the value (e.g. "MB/s")
+    :param better:
+        "higher" or "lower" if higher (or lower) values are better, this is
+        used to detect regressions between sessions
+    :returns:
+        True if the metric was recorded, False if the job does not run
+        under Checkbox
+    :raises ValueError:
+        if the metric is not valid
+    """
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("metric value must be a finite number")
+    if better is not None and better not in BETTER_CHOICES:
+        raise ValueError("better must be one of {}".format(BETTER_CHOICES))
+    for field in (name, unit):
+        if '\n' in field:
+            raise ValueError("metric names and units must fit on one line")
+    if not name.strip():
+        raise ValueError("metric name cannot be empty")
+    pathname = os.getenv(METRICS_FILE_ENV)
+    if not pathname:
+        return False
+    record = "name: {}\nvalue: {!r}\n".format(name.strip(), value)
+    if unit:
+        record += "unit: {}\n".format(unit)
+    if better:
+        record += "better: {}\n".format(better)
+    with open(pathname, 'at', encoding='UTF-8') as stream:
+        stream.write(record + "\n")
+    return True
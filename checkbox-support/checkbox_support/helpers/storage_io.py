@@ -0,0 +1,271 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+checkbox_support.helpers.storage_io
+===================================
+
+Write, read back and verify test files on storage devices.
+
+The test data is generated block by block in a reusable buffer and hashed
+while it is written, the file is then hashed again while it is read back.
+No copy of the data is kept on disk or in memory, so the files can be as
+large as the device allows and the throughput is bound by the device
+rather than by the CPU.
+
+With ``direct=True`` the file is opened with ``O_DIRECT`` to bypass the
+page cache, the buffers are then aligned on memory pages and the size of
+the file is rounded up to a multiple of :data:`ALIGNMENT`. When the
+filesystem does not support it, buffered I/O is used and the cached pages
+of the file are dropped before it is read back.
+"""
+import errno
+import hashlib
+import logging
+import math
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MiB = 1024 * 1024
+DEFAULT_BLOCK_SIZE = 4 * MiB
+# alignment of the offsets, sizes and buffers of O_DIRECT transfers, a
+# multiple of the logical block size of the devices
+ALIGNMENT = 4096
+LATENCY_PERCENTILES = (50, 90, 99)
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of the values (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+def _round_up(value, multiple):
+    return -(-value // multiple) * multiple
+
+
+class StorageIOResult:
+    """
+    Outcome of a :class:`StorageIOTest`.
+
+    The times only include the system calls transferring the data (and the
+    final ``fsync`` of the writes), not the generation and hashing of the
+    data. Latencies are the durations of each transfer of a block.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.write_time = 0.0
+        self.read_time = 0.0
+        self.write_latencies = []
+        self.read_latencies = []
+        self.written_digest = None
+        self.read_digest = None
+        self.direct = False
+        self.error = None
+
+    @staticmethod
+    def _speed(size, duration):
+        try:
+            return size / duration / MiB
+        except ZeroDivisionError:
+            return 0.0
+
+    @property
+    def write_speed(self):
+        """Write throughput in MiB/s."""
+        return self._speed(self.size, self.write_time)
+
+    @property
+    def read_speed(self):
+        """Read throughput in MiB/s."""
+        return self._speed(self.size, self.read_time)
+
+    @property
+    def passed(self):
+        return (self.error is None and self.written_digest is not None and
+                self.written_digest == self.read_digest)
+
+    def latency_percentiles(self, latencies):
+        """Map the percentiles of LATENCY_PERCENTILES to latencies in ms."""
+        return {pct: percentile(latencies, pct) * 1000
+                for pct in LATENCY_PERCENTILES}
+
+    def summary(self):
+        """Return the lines describing the throughput and latencies."""
+        lines = []
+        for name, speed, latencies in (
+                ('Write', self.write_speed, self.write_latencies),
+                ('Read', self.read_speed, self.read_latencies)):
+            latency = ', '.join(
+                'p{}: {:.2f} ms'.format(pct, value) for pct, value in
+                sorted(self.latency_percentiles(latencies).items()))
+            lines.append('{} speed: {:.4f} MB/s (latency {})'.format(
+                name, speed, latency))
+        return lines
+
+
+class StorageIOTest:
+    """
+    Write a test file of the given size and read it back.
+
+    :meth:`run` writes, reads and removes the file, :meth:`write`,
+    :meth:`read` and :meth:`remove` let callers interleave the steps of
+    several tests. The outcome is in :attr:`result`.
+    """
+
+    def __init__(self, path, size, block_size=DEFAULT_BLOCK_SIZE,
+                 direct=False, hash_name='md5'):
+        self.path = path
+        self.direct = direct
+        if direct:
+            size = _round_up(size, ALIGNMENT)
+            block_size = _round_up(block_size, ALIGNMENT)
+        self.size = size
+        self.block_size = block_size
+        self.hash_name = hash_name
+        self.result = StorageIOResult(path, size)
+
+    def _open(self, flags):
+        if self.direct:
+            try:
+                fd = os.open(self.path, flags | os.O_DIRECT, 0o644)
+            except OSError as exc:
+                if exc.errno != errno.EINVAL:
+                    raise
+                logger.warning(
+                    "%s does not support direct I/O, using the page cache",
+                    self.path)
+                self.direct = False
+            else:
+                self.result.direct = True
+                return fd
+        return os.open(self.path, flags, 0o644)
+
+    def _blocks(self, buf):
+        """
+        Fill the buffer with the data of each block and yield its length.
+
+        Each block is fresh random data, so that devices compressing or
+        deduplicating what they store cannot write less than the test asks
+        for. Generating it is not counted in the transfer times.
+        """
+        offset = 0
+        while offset < self.size:
+            length = min(self.block_size, self.size - offset)
+            buf[:length] = os.urandom(length)
+            yield length
+            offset += length
+
+    def write(self):
+        """Write the test file, return False on error."""
+        result = self.result
+        digest = hashlib.new(self.hash_name)
+        # anonymous maps are page aligned, as O_DIRECT requires
+        buf = mmap.mmap(-1, self.block_size)
+        view = memoryview(buf)
+        try:
+            fd = self._open(os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            try:
+                for length in self._blocks(buf):
+                    block = view[:length]
+                    digest.update(block)
+                    start = time.perf_counter()
+                    while block:
+                        block = block[os.write(fd, block):]
+                    latency = time.perf_counter() - start
+                    result.write_latencies.append(latency)
+                    result.write_time += latency
+                start = time.perf_counter()
+                os.fsync(fd)
+                result.write_time += time.perf_counter() - start
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            logger.error("Unable to write %s: %s", self.path, exc)
+            result.error = exc
+            return False
+        result.written_digest = digest.hexdigest()
+        return True
+
+    def read(self):
+        """Read the test file back, return False on error or mismatch."""
+        result = self.result
+        digest = hashlib.new(self.hash_name)
+        buf = mmap.mmap(-1, self.block_size)
+        view = memoryview(buf)
+        try:
+            fd = self._open(os.O_RDONLY)
+            try:
+                if not self.direct:
+                    # the pages written are clean after the fsync, drop
+                    # them to read from the device
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                while True:
+                    start = time.perf_counter()
+                    length = os.readv(fd, [buf])
+                    latency = time.perf_counter() - start
+                    if not length:
+                        break
+                    result.read_latencies.append(latency)
+                    result.read_time += latency
+                    digest.update(view[:length])
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            logger.error("Unable to read %s: %s", self.path, exc)
+            result.error = exc
+            return False
+        result.read_digest = digest.hexdigest()
+        return result.passed
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.error("Unable to remove %s: %s", self.path, exc)
+
+    def run(self):
+        """Write, read back and remove the test file, return the result."""
+        try:
+            if self.write():
+                self.read()
+        finally:
+            self.remove()
+        return self.result
+
+
+def run_storage_io_tests(tests):
+    """
+    Run the tests at the same time and return their results, in order.
+
+    The transfers and the hashing release the GIL, so each test runs in a
+    thread of its own.
+    """
+    tests = list(tests)
+    if len(tests) == 1:
+        return [tests[0].run()]
+    with ThreadPoolExecutor(max_workers=max(len(tests), 1)) as executor:
+        return list(executor.map(StorageIOTest.run, tests))
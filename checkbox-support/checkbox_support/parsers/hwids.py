@@ -0,0 +1,219 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+This module provides access to the ``usb.ids`` and ``pci.ids`` hardware ID
+databases.
+
+Both files share the same layout: a vendor section (vendors, their devices
+and, for PCI, subsystems) followed by a class section (classes, subclasses
+and protocols / programming interfaces). They are parsed in a single linear
+pass into plain dictionaries so that every lookup is O(1).
+
+Parsing the full files takes a noticeable amount of time, so the parsed
+tables are also cached on disk, in :mod:`marshal` format, keyed by the path,
+size and modification time of the source file. Within one process the
+database is loaded only once, see :func:`get_usb_ids`.
+"""
+
+import hashlib
+import marshal
+import os
+import string
+
+__all__ = ('IdsDatabase', 'get_usb_ids')
+
+USB_IDS_PATHS = (
+    # focal, bionic, xenial, and debian(s)
+    '/var/lib/usbutils/usb.ids',
+    # fallback - used in kernel maintainer's repos
+    '/usr/share/usb.ids',
+)
+
+#: Version of the on-disk cache format, bump when the tables change
+CACHE_FORMAT = 1
+
+_HEXDIGITS = frozenset(string.hexdigits)
+
+
+def _ishex(chars):
+    return bool(chars) and all(c in _HEXDIGITS for c in chars)
+
+
+def _get_cache_dir():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'checkbox-support', 'hwids')
+
+
+class IdsDatabase:
+    """
+    In-memory index of an ``usb.ids`` / ``pci.ids`` style database.
+
+    Lookups return the name as written in the database or ``None`` when the
+    ID is not known.
+    """
+
+    def __init__(self, vendors=None, products=None, subsystems=None,
+                 classes=None, subclasses=None, protocols=None):
+        self.vendors = vendors if vendors is not None else {}
+        self.products = products if products is not None else {}
+        self.subsystems = subsystems if subsystems is not None else {}
+        self.classes = classes if classes is not None else {}
+        self.subclasses = subclasses if subclasses is not None else {}
+        self.protocols = protocols if protocols is not None else {}
+
+    def _tables(self):
+        return (self.vendors, self.products, self.subsystems,
+                self.classes, self.subclasses, self.protocols)
+
+    def vendor_name(self, vid):
+        return self.vendors.get(vid)
+
+    def product_name(self, vid, pid):
+        return self.products.get((vid, pid))
+
+    def subsystem_name(self, vid, pid, subvid, subpid):
+        return self.subsystems.get((vid, pid, subvid, subpid))
+
+    def class_name(self, cid):
+        return self.classes.get(cid)
+
+    def subclass_name(self, cid, scid):
+        return self.subclasses.get((cid, scid))
+
+    def protocol_name(self, cid, scid, prid):
+        return self.protocols.get((cid, scid, prid))
+
+    def update(self, other):
+        """Merge entries from another database, overriding existing ones."""
+        for mine, theirs in zip(self._tables(), other._tables()):
+            mine.update(theirs)
+
+    @classmethod
+    def parse(cls, content):
+        """Parse the text of an ids file in a single linear pass."""
+        db = cls()
+        vendors = db.vendors
+        products = db.products
+        subsystems = db.subsystems
+        classes = db.classes
+        subclasses = db.subclasses
+        protocols = db.protocols
+        # Keys of the most recently seen entries of each level. None means
+        # that lines of the next level cannot be attached to anything.
+        vendor = product = klass = subclass = None
+        for line in content.splitlines():
+            if not line or line[0] == '#':
+                # empty line or a comment
+                continue
+            if line[0] == '\t':
+                if line[1:2] == '\t':
+                    if product is not None:
+                        # PCI subsystem: "\t\tsvvv sddd  name". USB interface
+                        # lines ("\t\tii  name") are not indexed.
+                        if _ishex(line[2:6]) and _ishex(line[7:11]):
+                            subsystems[product + (
+                                int(line[2:6], 16),
+                                int(line[7:11], 16))] = line[13:]
+                    elif subclass is not None and _ishex(line[2:4]):
+                        protocols[subclass + (int(line[2:4], 16),)] = (
+                            line[6:])
+                    continue
+                if vendor is not None and _ishex(line[1:5]):
+                    product = (vendor, int(line[1:5], 16))
+                    products[product] = line[7:]
+                elif klass is not None and _ishex(line[1:3]):
+                    subclass = (klass, int(line[1:3], 16))
+                    subclasses[subclass] = line[5:]
+                continue
+            vendor = product = klass = subclass = None
+            if _ishex(line[:4]):
+                vendor = int(line[:4], 16)
+                vendors[vendor] = line[6:]
+            elif line.startswith('C ') and _ishex(line[2:4]):
+                klass = int(line[2:4], 16)
+                classes[klass] = line[6:]
+            # any other top-level entry (audio terminals, HID usages, ...)
+            # starts a section this parser doesn't index
+        return db
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """
+        Load the database from path, using the on-disk cache when possible.
+
+        :param path:
+            Path of the ids file
+        :param cache_dir:
+            Directory for the parsed index. Defaults to
+            ``$XDG_CACHE_HOME/checkbox-support/hwids``; pass an empty string
+            to disable the cache.
+        :raises OSError:
+            If the file cannot be read
+        """
+        path = os.path.abspath(path)
+        if cache_dir is None:
+            cache_dir = _get_cache_dir()
+        try:
+            stat = os.stat(path)
+            key = [CACHE_FORMAT, path, stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            # without the file metadata a cached copy cannot be validated
+            cache_dir = ''
+        cache_file = None
+        if cache_dir:
+            cache_file = os.path.join(cache_dir, '{}.marshal'.format(
+                hashlib.sha1(path.encode('UTF-8')).hexdigest()))
+            try:
+                with open(cache_file, 'rb') as stream:
+                    # marshal.load() on a file is much slower than loads()
+                    cached_key, tables = marshal.loads(stream.read())
+                if cached_key == key:
+                    return cls(*tables)
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+        # at the time of writing this the usb_ids has one line that uses
+        # character from beyond standard ascii 7-bit set. namely 0xb4 (Accent
+        # Acute). I couldn't find information about the file's encoding, but
+        # iso match it nicely.
+        with open(path, 'rt', encoding='iso8859') as stream:
+            db = cls.parse(stream.read())
+        if cache_file:
+            tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(tmp_file, 'wb') as stream:
+                    stream.write(marshal.dumps((key, db._tables())))
+                os.replace(tmp_file, cache_file)
+            except OSError:
+                pass
+        return db
+
+
+_loaded = {}
+
+
+def get_usb_ids(path=None):
+    """Get the USB IDs database, from path or from the system locations."""
+    paths = (path,) if path else USB_IDS_PATHS
+    if paths not in _loaded:
+        db = IdsDatabase()
+        for ids_path in paths:
+            if os.path.isfile(ids_path):
+                db.update(IdsDatabase.load(ids_path))
+        _loaded[paths] = db
+    return _loaded[paths]
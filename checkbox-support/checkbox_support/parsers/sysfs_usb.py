@@ -26,10 +26,10 @@ import os
 import re
 import string
 
-from collections import OrderedDict
-from enum import Enum
 from functools import partial
 
+from checkbox_support.parsers.hwids import get_usb_ids
+
 
 def ishex(chars):
     """Checks if all `chars` are hexdigits [0-9a-f]."""
@@ -41,12 +41,12 @@ class UsbIds:
 
     def decode_vendor(self, vid):
         """Translate vendor ID to a Vendor Name."""
-        return self._vendors[vid]
+        return self._db.vendors[vid]
 
     def decode_product(self, vid, pid):
         """Transate vendor ID and product ID to a device name."""
         return '{} {}'.format(
-            self._vendors[vid], self._products[vid, pid])
+            self._db.vendors[vid], self._db.products[vid, pid])
 
     def decode_protocol(self, cid, scid, prid):
         """
@@ -55,96 +55,21 @@ class UsbIds:
         There is a cascade of fallbacks if some of the more IDs is not known.
         See implementation for details.
         """
-        return (
-            self._protocols.get((cid, scid, prid)) or
-            self._subclasses.get((cid, scid)) or
-            self._classes.get(cid) or
-            ''
-        )
+        class_name = self._db.class_name(cid)
+        if class_name is None:
+            return ''
+        subclass_name = self._db.subclass_name(cid, scid)
+        if subclass_name is None:
+            return class_name
+        subclass_desc = "{}:{}".format(
+            class_name, subclass_name if subclass_name != 'Unused' else '')
+        protocol_name = self._db.protocol_name(cid, scid, prid)
+        if protocol_name is None:
+            return subclass_desc
+        return "{}:{}".format(subclass_desc, protocol_name)
 
     def __init__(self, usb_ids_path=None):
-        self._vendors = OrderedDict()
-        self._products = OrderedDict()
-        self._classes = OrderedDict()
-        self._subclasses = OrderedDict()
-        self._protocols = OrderedDict()
-        if usb_ids_path:
-            paths = [usb_ids_path]
-        else:
-            paths = [
-                # focal, bionic, xenial, and debian(s)
-                '/var/lib/usbutils/usb.ids',
-                # fallback - used in kernel maintainer's repos
-                '/usr/share/usb.ids',
-            ]
-        for path in paths:
-            if os.path.isfile(path):
-                # at the time of writing this the usb_ids has one line that
-                # uses character from beyond standard ascii 7-bit set. namely
-                # 0xb4 (Accent Acute). I couldn't find information about the
-                # file's encoding, but iso match it nicely.  The other way to
-                # cover for those cases would be to use surrogates and then
-                # have some pass to interpret them.
-                with open(path, 'rt', encoding='iso8859') as usb_ids_file:
-                    self._parse_usb_ids(usb_ids_file.read())
-
-    def _parse_usb_ids(self, content):
-        """Parse the contents of usb.ids file."""
-
-        class ParserContext(Enum):
-            """Context marker for usb.ids parser."""
-            DEFAULT = 0
-            VENDOR = 1
-            CLASS = 2
-            OTHER = 3
-
-        context = ParserContext.DEFAULT
-
-        for line in content.splitlines():
-            if not line or line[0] == '#':
-                # empty line or a comment
-                continue
-            if ishex(line[:4]):
-                # vendor information
-                vid = int(line[:4], 16)
-                self._vendors[vid] = line[6:]
-                context = ParserContext.VENDOR
-                continue
-            if line[0] == '\t' and ishex(line[1:3]):
-                # classes use only 2 hex digits, devices use 4
-                if context == ParserContext.VENDOR:
-                    pid = int(line[1:5], 16)
-                    # last added vendor is the current vendor
-                    vid = list(self._vendors.keys())[-1]
-                    self._products[vid, pid] = line[7:]
-                    continue
-                if context == ParserContext.CLASS:
-                    subclass_id = int(line[1:5], 16)
-                    name = line[5:]
-                    class_id = list(self._classes.keys())[-1]
-                    description = "{}:{}".format(
-                        self._classes[class_id],
-                        name if name != 'Unused' else '')
-                    self._subclasses[class_id, subclass_id] = description
-                    continue
-            if line[0] == 'C':
-                context = ParserContext.CLASS
-                class_id = int(line[2:4], 16)
-                class_name = line[6:]
-                self._classes[class_id] = class_name
-                continue
-            if line[0:2] == '\t\t' and ishex(line[2:4]):
-                protocol_id = int(line[2:4], 16)
-                class_id, subclass_id = list(self._subclasses.keys())[-1]
-                description = "{}:{}".format(
-                    self._subclasses[class_id, subclass_id], line[6:])
-                self._protocols[class_id, subclass_id, protocol_id] = (
-                    description)
-                continue
-            # if we got here without satisfying any of the above ifs
-            # then we need to set paraser into a state where lines won't be
-            # consumed
-            context = ParserContext.OTHER
+        self._db = get_usb_ids(usb_ids_path)
 
 
 def read_entry(sysfs_path, field):
@@ -0,0 +1,147 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for the hwids module."""
+import os
+import tempfile
+import textwrap
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from checkbox_support.parsers.hwids import IdsDatabase, get_usb_ids
+
+
+USB_IDS = textwrap.dedent("""
+    # comment
+    0042  ACME
+    \t0042  Seafourium
+    \t\t00  Seafourium interface
+    0043  Other
+    \t0001  Thing
+    C 42  Explosives
+    \t06  Bomb
+    \t\t01  Boom
+    AT 0100  USB Undefined
+    HID 00  Undefined
+""")
+
+PCI_IDS = textwrap.dedent("""
+    8086  Intel Corporation
+    \t1533  I210 Gigabit Network Connection
+    \t\t103c 0003  Ethernet I210-T1 GbE NIC
+    C 02  Network controller
+    \t00  Ethernet controller
+    C 0c  Serial bus controller
+    \t03  USB controller
+    \t\t30  XHCI
+""")
+
+
+class TestIdsDatabaseParse(TestCase):
+    """Tests for the IdsDatabase.parse method."""
+
+    def test_usb(self):
+        db = IdsDatabase.parse(USB_IDS)
+        self.assertEqual(db.vendor_name(0x42), 'ACME')
+        self.assertEqual(db.product_name(0x42, 0x42), 'Seafourium')
+        self.assertEqual(db.product_name(0x43, 0x01), 'Thing')
+        self.assertEqual(db.class_name(0x42), 'Explosives')
+        self.assertEqual(db.subclass_name(0x42, 0x06), 'Bomb')
+        self.assertEqual(db.protocol_name(0x42, 0x06, 0x01), 'Boom')
+        self.assertIsNone(db.product_name(0x43, 0x42))
+        # interface lines and trailing sections are not indexed
+        self.assertEqual(db.subsystems, {})
+        self.assertEqual(len(db.vendors), 2)
+        self.assertEqual(len(db.classes), 1)
+
+    def test_pci(self):
+        db = IdsDatabase.parse(PCI_IDS)
+        self.assertEqual(db.vendor_name(0x8086), 'Intel Corporation')
+        self.assertEqual(db.product_name(0x8086, 0x1533),
+                         'I210 Gigabit Network Connection')
+        self.assertEqual(db.subsystem_name(0x8086, 0x1533, 0x103c, 0x0003),
+                         'Ethernet I210-T1 GbE NIC')
+        self.assertEqual(db.subclass_name(0x02, 0x00), 'Ethernet controller')
+        self.assertEqual(db.protocol_name(0x0c, 0x03, 0x30), 'XHCI')
+
+    def test_update(self):
+        db = IdsDatabase.parse(USB_IDS)
+        db.update(IdsDatabase.parse("0042  ACME Corp\n"))
+        self.assertEqual(db.vendor_name(0x42), 'ACME Corp')
+        self.assertEqual(db.product_name(0x42, 0x42), 'Seafourium')
+
+
+class TestIdsDatabaseLoad(TestCase):
+    """Tests for the on-disk cache used by IdsDatabase.load."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = os.path.join(tmp.name, 'cache')
+        self.path = os.path.join(tmp.name, 'usb.ids')
+        with open(self.path, 'wt') as stream:
+            stream.write(USB_IDS)
+
+    def test_cache_is_used(self):
+        first = IdsDatabase.load(self.path, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with patch.object(IdsDatabase, 'parse') as m_parse:
+            second = IdsDatabase.load(self.path, self.cache_dir)
+        m_parse.assert_not_called()
+        self.assertEqual(first.products, second.products)
+        self.assertEqual(first.protocols, second.protocols)
+
+    def test_cache_is_invalidated(self):
+        IdsDatabase.load(self.path, self.cache_dir)
+        with open(self.path, 'at') as stream:
+            stream.write("0044  Newcomer\n")
+        db = IdsDatabase.load(self.path, self.cache_dir)
+        self.assertEqual(db.vendor_name(0x44), 'Newcomer')
+
+    def test_cache_disabled(self):
+        IdsDatabase.load(self.path, '')
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+class TestGetUsbIds(TestCase):
+    """Tests for the per-process loading done by get_usb_ids."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'usb.ids')
+        with open(self.path, 'wt') as stream:
+            stream.write(USB_IDS)
+        env = patch.dict(os.environ, {'XDG_CACHE_HOME': tmp.name})
+        env.start()
+        self.addCleanup(env.stop)
+        loaded = patch('checkbox_support.parsers.hwids._loaded', {})
+        loaded.start()
+        self.addCleanup(loaded.stop)
+
+    def test_loaded_once(self):
+        first = get_usb_ids(self.path)
+        with patch.object(IdsDatabase, 'load') as m_load:
+            second = get_usb_ids(self.path)
+        m_load.assert_not_called()
+        self.assertIs(first, second)
+        self.assertEqual(first.vendor_name(0x42), 'ACME')
+
+    def test_missing_file(self):
+        db = get_usb_ids(self.path + '.missing')
+        self.assertIsNone(db.vendor_name(0x42))
@@ -59,6 +59,12 @@ class TestIsHex(TestCase):
 
 class TestUsbIds(TestCase):
     """Test for the UsbIds class."""
+    def setUp(self):
+        # each test feeds its own database, do not reuse the loaded one
+        loaded = patch('checkbox_support.parsers.hwids._loaded', {})
+        loaded.start()
+        self.addCleanup(loaded.stop)
+
     def test_empty(self):
         """Test empty database."""
         mopen = mock_open(read_data='')
@@ -24,6 +24,8 @@ import argparse
 import os
 import re
 
+from checkbox_support.helpers.metrics import emit_metric
+
 
 def check_log(logfile):
     """
@@ -48,6 +50,9 @@ def check_log(logfile):
                     'This means the benchmark could not be run. '
                     'Check the above output for error messages, '
                     'these will show the reason for the failure.')
+            match = re.search(r'Benchmark_Score.*?(\d+) points', log)
+            if match:
+                emit_metric('score', match.group(1), 'points', 'higher')
     except EnvironmentError as error:
         raise SystemExit(error)
     return False
@@ -0,0 +1,76 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Report a metric of the running job to Checkbox.
+
+The value is either given on the command line::
+
+    checkbox-support-metric --name score --better higher 1234
+
+or extracted from the output of a benchmark, which is passed through
+unchanged::
+
+    glmark2 | checkbox-support-metric --name score --better higher \\
+        --pattern 'Score: ([0-9]+)'
+"""
+import argparse
+import re
+import sys
+
+from checkbox_support.helpers.metrics import BETTER_CHOICES
+from checkbox_support.helpers.metrics import emit_metric
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report a metric of the running job to Checkbox")
+    parser.add_argument('value', nargs='?', help="value of the metric")
+    parser.add_argument('-n', '--name', required=True,
+                        help="name of the metric")
+    parser.add_argument('-u', '--unit', default='',
+                        help="unit of the value")
+    parser.add_argument('-b', '--better', choices=BETTER_CHOICES,
+                        help="whether higher or lower values are better")
+    parser.add_argument('-p', '--pattern',
+                        help=("regular expression matching the value in the"
+                              " standard input (the first group or the whole"
+                              " match is used), the input is copied to the"
+                              " standard output"))
+    args = parser.parse_args(argv)
+    if (args.value is None) == (args.pattern is None):
+        parser.error("either a value or a pattern is required")
+    value = args.value
+    if args.pattern:
+        pattern = re.compile(args.pattern)
+        for line in sys.stdin:
+            sys.stdout.write(line)
+            match = pattern.search(line)
+            if match and value is None:
+                value = match.group(1) if pattern.groups else match.group(0)
+        sys.stdout.flush()
+        if value is None:
+            print("No value found for metric {}".format(args.name),
+                  file=sys.stderr)
+            return 0
+    try:
+        emit_metric(args.name, value, args.unit, args.better)
+    except ValueError as exc:
+        raise SystemExit("Invalid metric {}: {}".format(args.name, exc))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@
 
 import json
 import time
+from urllib.parse import quote, urlsplit
 
 from requests.exceptions import HTTPError
 
@@ -31,9 +32,24 @@ class SnapdRequestError(Exception):
             response['message'], response.get('kind', ''))
 
 
-class Snapd():
+SNAPD_SOCKET = '/run/snapd.socket'
+
+
+class SnapdAdapter(requests_unixsocket.UnixAdapter):
+    """
+    Adapter with one connection pool per socket.
+
+    UnixAdapter keeps a pool for each URL, so each resource of the snapd
+    API would get a connection of its own.
+    """
 
-    _url = 'http+unix://%2Frun%2Fsnapd.socket'
+    def get_connection(self, url, proxies=None):
+        parts = urlsplit(url)
+        return super().get_connection(
+            '{}://{}'.format(parts.scheme, parts.netloc), proxies)
+
+
+class Snapd():
 
     _snaps = '/v2/snaps'
     _find = '/v2/find'
@@ -42,10 +58,17 @@ class Snapd():
     _interfaces = '/v2/interfaces'
     _assertions = '/v2/assertions'
 
-    def __init__(self, task_timeout=30, poll_interval=1, verbose=False):
+    def __init__(self, task_timeout=30, poll_interval=1, verbose=False,
+                 min_poll_interval=0.01, socket_path=SNAPD_SOCKET):
+        # the session keeps the connection to snapd open between requests
         self._session = requests_unixsocket.Session()
+        self._session.mount('http+unix://', SnapdAdapter())
+        self._url = 'http+unix://' + quote(socket_path, safe='')
         self._task_timeout = task_timeout
+        # changes are polled after min_poll_interval, then twice as late
+        # each time up to poll_interval
         self._poll_interval = poll_interval
+        self._min_poll_interval = min(min_poll_interval, poll_interval)
         self._verbose = verbose
 
     def _info(self, msg):
@@ -80,18 +103,58 @@ class Snapd():
         return r
 
     def _poll_change(self, change_id):
-        maxtime = time.time() + self._task_timeout
+        return self.wait_changes([change_id])
+
+    def _async_change(self, r, wait):
+        """
+        Wait for the change started by a request, if any.
+
+        Return the id of the change when not waiting for it.
+        """
+        if r['type'] == 'async' and r['status'] == 'Accepted':
+            if not wait:
+                return r['change']
+            self._poll_change(r['change'])
+
+    def wait_changes(self, change_ids, timeout=None):
+        """
+        Wait until all the changes are done.
+
+        The changes still in progress after the timeout (task_timeout by
+        default) are aborted and :class:`AsyncException` is raised, as
+        soon as a change fails otherwise.
+        """
+        if timeout is None:
+            timeout = self._task_timeout
+        maxtime = time.time() + timeout
+        pending = list(change_ids)
+        interval = self._min_poll_interval
+        reported = set()
         while True:
-            status = self.change(change_id)
-            if status == 'Done':
+            for change_id in list(pending):
+                change = self._get(self._changes + '/' + change_id)['result']
+                if change['status'] == 'Done':
+                    pending.remove(change_id)
+                elif change.get('ready'):
+                    raise AsyncException(
+                        change['status'], change.get('err', ''))
+                else:
+                    for task in change.get('tasks', []):
+                        if (task['status'] == 'Doing' and
+                                task['id'] not in reported):
+                            reported.add(task['id'])
+                            self._info(task['summary'])
+            if not pending:
                 return True
-            if time.time() > maxtime:
-                abort_result = self._abort_change(change_id)
-                raise AsyncException(status, abort_result)
-            for task in self.tasks(change_id):
-                if task['status'] == 'Doing':
-                    self._info(task['summary'])
-            time.sleep(self._poll_interval)
+            remaining = maxtime - time.time()
+            if remaining < 0:
+                statuses = [self.change(change_id) for change_id in pending]
+                abort_results = [self._abort_change(change_id)
+                                 for change_id in pending]
+                raise AsyncException(
+                    ', '.join(statuses), ', '.join(abort_results))
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self._poll_interval)
 
     def _abort_change(self, change_id):
         path = self._changes + '/' + change_id
@@ -110,23 +173,21 @@ class Snapd():
                 return None
             raise
 
-    def install(self, snap, channel='stable', revision=None):
+    def install(self, snap, channel='stable', revision=None, wait=True):
         path = self._snaps + '/' + snap
         data = {'action': 'install', 'channel': channel}
         if revision is not None:
             data['revision'] = revision
         r = self._post(path, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
 
-    def remove(self, snap, revision=None):
+    def remove(self, snap, revision=None, wait=True):
         path = self._snaps + '/' + snap
         data = {'action': 'remove'}
         if revision is not None:
             data['revision'] = revision
         r = self._post(path, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
 
     def find(self, search, exact=False):
         if exact:
@@ -138,14 +199,13 @@ class Snapd():
     def info(self, snap):
         return self.find(snap, exact=True)[0]
 
-    def refresh(self, snap, channel='stable', revision=None):
+    def refresh(self, snap, channel='stable', revision=None, wait=True):
         path = self._snaps + '/' + snap
         data = {'action': 'refresh', 'channel': channel}
         if revision is not None:
             data['revision'] = revision
         r = self._post(path, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
 
     def change(self, change_id):
         path = self._changes + '/' + change_id
@@ -157,39 +217,47 @@ class Snapd():
         r = self._get(path)
         return r['result']['tasks']
 
-    def revert(self, snap, channel='stable', revision=None):
+    def revert(self, snap, channel='stable', revision=None, wait=True):
         path = self._snaps + '/' + snap
         data = {'action': 'revert', 'channel': channel}
         if revision is not None:
             data['revision'] = revision
         r = self._post(path, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
 
     def get_configuration(self, snap, key):
         path = self._snaps + '/' + snap + '/conf'
         p = 'keys={}'.format(key)
         return self._get(path, params=p)['result'][key]
 
-    def set_configuration(self, snap, key, value):
+    def set_configuration(self, snap, key, value, wait=True):
         path = self._snaps + '/' + snap + '/conf'
         data = {key: value}
         r = self._post(path, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
 
     def interfaces(self):
         return self._get(self._interfaces)['result']
 
-    def connect(self, slot_snap, slot_slot, plug_snap, plug_plug):
+    def connect(self, slot_snap, slot_slot, plug_snap, plug_plug,
+                wait=True):
         data = {
             'action': 'connect',
             'slots': [{'snap': slot_snap, 'slot': slot_slot}],
             'plugs': [{'snap': plug_snap, 'plug': plug_plug}]
         }
         r = self._post(self._interfaces, json.dumps(data))
-        if r['type'] == 'async' and r['status'] == 'Accepted':
-            self._poll_change(r['change'])
+        return self._async_change(r, wait)
+
+    def disconnect(self, slot_snap, slot_slot, plug_snap, plug_plug,
+                   wait=True):
+        data = {
+            'action': 'disconnect',
+            'slots': [{'snap': slot_snap, 'slot': slot_slot}],
+            'plugs': [{'snap': plug_snap, 'plug': plug_plug}]
+        }
+        r = self._post(self._interfaces, json.dumps(data))
+        return self._async_change(r, wait)
 
     def get_assertions(self, assertion_type):
         path = self._assertions + '/' + assertion_type
@@ -0,0 +1,247 @@
+# Copyright 2024 Canonical Ltd.
+# All rights reserved.
+"""
+Stand-in for snapd listening on a unix socket, to test without snapd.
+
+It serves the parts of the snapd REST API used by
+:class:`checkbox_support.snap_utils.snapd.Snapd`. Operations on snaps and
+interfaces start changes that are done after ``change_duration`` seconds,
+or fail if the snap is in ``failing``. Run it with::
+
+    python3 -m checkbox_support.snap_utils.tests.fake_snapd SOCKET
+
+and point ``Snapd(socket_path=SOCKET)`` to it.
+"""
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeSnapdHandler(BaseHTTPRequestHandler):
+
+    # keep the connections open like snapd does
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.snapd.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        return 'fake-snapd'
+
+    def _reply(self, status_code, body):
+        data = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or 'null')
+        snapd = self.server.snapd
+        with snapd.lock:
+            snapd.requests.append((method, url.path))
+            try:
+                status_code, body = snapd.handle(
+                    method, url.path, parse_qs(url.query), data)
+            except KeyError as exc:
+                status_code, body = 404, error_body(
+                    404, 'not found: {}'.format(exc))
+        self._reply(status_code, body)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+
+class FakeSnapdServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+def sync_body(result):
+    return {'type': 'sync', 'status-code': 200, 'status': 'OK',
+            'result': result}
+
+
+def error_body(status_code, message, kind=None):
+    result = {'message': message}
+    if kind:
+        result['kind'] = kind
+    return {'type': 'error', 'status-code': status_code,
+            'status': 'Error', 'result': result}
+
+
+class FakeSnapd:
+
+    def __init__(self, socket_path, change_duration=0.05):
+        self.socket_path = socket_path
+        self.change_duration = change_duration
+        self.snaps = {}
+        self.connections = []
+        self.configuration = {}
+        self.failing = set()
+        self.changes = {}
+        self.requests = []
+        self.connection_count = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = FakeSnapdServer(self.socket_path, FakeSnapdHandler)
+        self._server.snapd = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        os.unlink(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, method, path, query, data):
+        parts = path.strip('/').split('/')
+        if parts[0] != 'v2' or len(parts) < 2:
+            raise KeyError(path)
+        resource, args = parts[1], parts[2:]
+        if resource == 'snaps' and not args and method == 'GET':
+            return 200, sync_body(list(self.snaps.values()))
+        if resource == 'snaps' and len(args) == 1:
+            if method == 'GET':
+                if args[0] not in self.snaps:
+                    return 404, error_body(
+                        404, 'snap not installed', 'snap-not-found')
+                return 200, sync_body(self.snaps[args[0]])
+            return self._snap_action(args[0], data)
+        if resource == 'snaps' and args[1:] == ['conf']:
+            conf = self.configuration.setdefault(args[0], {})
+            if method == 'GET':
+                keys = query.get('keys', [''])[0].split(',')
+                return 200, sync_body({key: conf[key] for key in keys})
+            return self._start_change(
+                'configure-snap', args[0],
+                lambda: conf.update(data))
+        if resource == 'changes' and len(args) == 1:
+            change = self._change(args[0])
+            if method == 'POST' and data.get('action') == 'abort':
+                if change['ready']:
+                    return 400, error_body(
+                        400, 'cannot abort change {} with nothing '
+                             'pending'.format(args[0]))
+                self.changes[args[0]].update(
+                    status='Undone', ready=True, err='change aborted')
+                change = self._change(args[0])
+            return 200, sync_body(change)
+        if resource == 'interfaces':
+            if method == 'GET':
+                return 200, sync_body({'plugs': [], 'slots': []})
+            connection = (data['plugs'][0], data['slots'][0])
+            if data['action'] == 'connect':
+                def effect():
+                    self.connections.append(connection)
+            else:
+                def effect():
+                    self.connections.remove(connection)
+            return self._start_change(
+                data['action'] + '-snap', data['plugs'][0]['snap'], effect)
+        if resource == 'find':
+            name = query.get('name', query.get('q', ['']))[0]
+            return 200, sync_body([{'name': name, 'channels': {}}])
+        if resource == 'system-info':
+            return 200, sync_body({'confinement': 'strict'})
+        raise KeyError(path)
+
+    def _snap_action(self, name, data):
+        action = data['action']
+        if action == 'install' and name in self.snaps:
+            return 400, error_body(
+                400, 'snap "{}" is already installed'.format(name),
+                'snap-already-installed')
+        if action != 'install' and name not in self.snaps:
+            return 404, error_body(
+                404, 'snap "{}" is not installed'.format(name),
+                'snap-not-installed')
+
+        def effect():
+            if action == 'remove':
+                del self.snaps[name]
+            else:
+                self.snaps[name] = {
+                    'name': name,
+                    'channel': data.get('channel', 'stable'),
+                    'revision': str(data.get('revision', 1))}
+        return self._start_change(action + '-snap', name, effect)
+
+    def _start_change(self, kind, snap, effect):
+        change_id = str(len(self.changes) + 1)
+        self.changes[change_id] = {
+            'id': change_id,
+            'kind': kind,
+            'summary': '{} "{}"'.format(kind, snap),
+            'status': 'Doing',
+            'ready': False,
+            'tasks': [{'id': change_id + '.1', 'kind': kind,
+                       'summary': 'Run {} of "{}"'.format(kind, snap),
+                       'status': 'Doing'}],
+            'snap': snap,
+            'effect': effect,
+            'end-time': time.time() + self.change_duration,
+        }
+        return 202, {'type': 'async', 'status-code': 202,
+                     'status': 'Accepted', 'change': change_id,
+                     'result': None}
+
+    def _change(self, change_id):
+        change = self.changes[change_id]
+        if not change['ready'] and time.time() >= change['end-time']:
+            change['ready'] = True
+            if change['snap'] in self.failing:
+                change['status'] = 'Error'
+                change['err'] = 'cannot perform the following tasks'
+            else:
+                change['effect']()
+                change['status'] = 'Done'
+            for task in change['tasks']:
+                task['status'] = change['status']
+        return {key: value for key, value in change.items()
+                if key not in ('snap', 'effect', 'end-time')}
+
+
+def main(argv):
+    snapd = FakeSnapd(argv[0])
+    snapd.start()
+    print('Fake snapd listening on {}'.format(argv[0]), flush=True)
+    try:
+        snapd._thread.join()
+    except KeyboardInterrupt:
+        snapd.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,97 @@
+# Copyright 2024 Canonical Ltd.
+# All rights reserved.
+
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from checkbox_support.snap_utils.snapd import AsyncException
+from checkbox_support.snap_utils.snapd import Snapd
+from checkbox_support.snap_utils.tests.fake_snapd import FakeSnapd
+
+
+class TestSnapdChanges(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        socket_path = os.path.join(tmp_dir.name, 'snapd.socket')
+        self.fake = FakeSnapd(socket_path, change_duration=0.05)
+        self.fake.start()
+        self.addCleanup(self.fake.stop)
+        self.snapd = Snapd(task_timeout=5, socket_path=socket_path)
+
+    def polls(self, change_id):
+        path = '/v2/changes/' + change_id
+        return [request for request in self.fake.requests
+                if request == ('GET', path)]
+
+    def test_install_remove(self):
+        self.snapd.install('test-snapd-tools', channel='edge')
+        # polls after 0, 10, 30 and 70 ms catch the 50 ms change
+        self.assertLess(len(self.polls('1')), 6)
+        snap = self.snapd.list('test-snapd-tools')
+        self.assertEqual(snap['channel'], 'edge')
+        self.snapd.remove('test-snapd-tools')
+        self.assertIsNone(self.snapd.list('test-snapd-tools'))
+
+    def test_persistent_connection(self):
+        self.snapd.install('test-snapd-tools')
+        self.snapd.refresh('test-snapd-tools', revision=2)
+        self.assertGreater(len(self.fake.requests), 4)
+        self.assertEqual(self.fake.connection_count, 1)
+
+    def test_backoff(self):
+        self.fake.change_duration = 0.5
+        self.snapd.install('test-snapd-tools')
+        polls = [path for method, path in self.fake.requests
+                 if path.startswith('/v2/changes/')]
+        # 10, 20, 40... ms then one second, not one poll every 10 ms
+        self.assertLess(len(polls), 10)
+
+    def test_batch(self):
+        self.fake.change_duration = 0.2
+        change_ids = [self.snapd.install(name, wait=False)
+                      for name in ('snap-a', 'snap-b', 'snap-c')]
+        self.assertEqual(change_ids, ['1', '2', '3'])
+        self.assertTrue(self.snapd.wait_changes(change_ids))
+        # the changes are polled together, the 310 ms round sees them done
+        for change_id in change_ids:
+            self.assertLess(len(self.polls(change_id)), 8)
+        self.assertEqual(
+            sorted(snap['name'] for snap in self.snapd.list()),
+            ['snap-a', 'snap-b', 'snap-c'])
+
+    def test_connect_disconnect(self):
+        self.snapd.connect('core', 'network', 'checkbox', 'network')
+        self.assertEqual(len(self.fake.connections), 1)
+        self.snapd.disconnect('core', 'network', 'checkbox', 'network')
+        self.assertEqual(self.fake.connections, [])
+
+    def test_failure(self):
+        self.fake.failing.add('snap-b')
+        change_ids = [self.snapd.install(name, wait=False)
+                      for name in ('snap-a', 'snap-b')]
+        with self.assertRaises(AsyncException) as cm:
+            self.snapd.wait_changes(change_ids)
+        self.assertEqual(cm.exception.message, 'Error')
+        # no need to wait for the timeout once the change failed
+        self.assertLess(len(self.polls('2')), 6)
+
+    def test_timeout(self):
+        self.fake.change_duration = 10
+        change_id = self.snapd.install('test-snapd-tools', wait=False)
+        with self.assertRaises(AsyncException) as cm:
+            self.snapd.wait_changes([change_id], timeout=0.1)
+        self.assertEqual(cm.exception.message, 'Doing')
+        self.assertEqual(cm.exception.abort_message, 'Undone')
+
+    def test_verbose(self):
+        self.snapd._verbose = True
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            self.snapd.install('test-snapd-tools')
+        self.assertEqual(
+            stdout.getvalue(),
+            '(info) Run install-snap of "test-snapd-tools"\n')
@@ -0,0 +1,58 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.tests.test_collectors
+======================================
+
+Tests for checkbox_support.collectors module
+"""
+
+from collections import OrderedDict
+from io import StringIO
+from unittest import TestCase, mock
+import textwrap
+
+from checkbox_support import collectors
+
+
+class PrintRecordsTests(TestCase):
+
+    def test_print_records(self):
+        with mock.patch('sys.stdout', new=StringIO()) as stdout:
+            collectors.print_records([
+                OrderedDict([('a', 1), ('b', 'c')]), {'d': 'e'}])
+        self.assertEqual(stdout.getvalue(), "a: 1\nb: c\n\nd: e\n")
+
+
+class CollectorsTests(TestCase):
+
+    def test_uname(self):
+        with mock.patch('os.uname', return_value=(
+                'Linux', 'host', '6.0', '#1', 'x86_64')):
+            self.assertEqual(collectors.collect_uname(), [OrderedDict([
+                ('name', 'Linux'), ('node', 'host'), ('release', '6.0'),
+                ('version', '#1'), ('machine', 'x86_64')])])
+
+    def test_meminfo(self):
+        meminfo = textwrap.dedent("""
+            MemTotal:        8000000 kB
+            MemFree:         1000000 kB
+            SwapTotal:       2000000 kB
+        """)
+        with mock.patch('builtins.open', mock.mock_open(read_data=meminfo)):
+            self.assertEqual(collectors.collect_meminfo(), [OrderedDict([
+                ('swap', 2000000 * 1024), ('total', 8000000 * 1024)])])
@@ -0,0 +1,87 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.tests.test_metrics
+===================================
+
+Tests for checkbox_support.helpers.metrics module
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import mock
+import io
+import os
+import unittest
+
+from checkbox_support.helpers.metrics import emit_metric
+from checkbox_support.scripts.metric import main
+
+
+class EmitMetricTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pathname = os.path.join(tmp.name, 'job.metrics')
+        patcher = mock.patch.dict(
+            os.environ, {'PLAINBOX_METRICS_FILE': self.pathname})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self):
+        with open(self.pathname) as stream:
+            return stream.read()
+
+    def test_emit(self):
+        self.assertTrue(emit_metric('read', 412.5, 'MB/s', 'higher'))
+        self.assertTrue(emit_metric('score', '7'))
+        self.assertEqual(self.read(), (
+            "name: read\nvalue: 412.5\nunit: MB/s\nbetter: higher\n\n"
+            "name: score\nvalue: 7.0\n\n"))
+
+    def test_not_under_checkbox(self):
+        del os.environ['PLAINBOX_METRICS_FILE']
+        self.assertFalse(emit_metric('read', 1))
+
+    def test_invalid(self):
+        for args in (('', 1), ('a', 'nan'), ('a', 'x'), ('a\nb', 1),
+                     ('a', 1, '', 'faster')):
+            with self.assertRaises(ValueError):
+                emit_metric(*args)
+        self.assertFalse(os.path.exists(self.pathname))
+
+    def test_script_value(self):
+        self.assertEqual(main(['--name', 'temp', '--unit', 'C', '42']), 0)
+        self.assertEqual(self.read(), "name: temp\nvalue: 42.0\nunit: C\n\n")
+
+    def test_script_pattern(self):
+        stdin = io.StringIO("a\nScore: 12\nScore: 3\n")
+        stdout = io.StringIO()
+        with mock.patch('sys.stdin', stdin), \
+                mock.patch('sys.stdout', stdout):
+            main(['--name', 'score', '--better', 'higher',
+                  '--pattern', r'Score: (\d+)'])
+        self.assertEqual(stdout.getvalue(), "a\nScore: 12\nScore: 3\n")
+        self.assertEqual(
+            self.read(), "name: score\nvalue: 12.0\nbetter: higher\n\n")
+
+    def test_script_pattern_no_match(self):
+        with mock.patch('sys.stdin', io.StringIO("nothing\n")), \
+                mock.patch('sys.stdout', io.StringIO()), \
+                mock.patch('sys.stderr', io.StringIO()):
+            self.assertEqual(main(['--name', 'score', '--pattern', 'x']), 0)
+        self.assertFalse(os.path.exists(self.pathname))
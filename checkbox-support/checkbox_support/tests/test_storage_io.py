@@ -0,0 +1,131 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.tests.test_storage_io
+======================================
+
+Tests for checkbox_support.helpers.storage_io module
+"""
+
+from tempfile import TemporaryDirectory
+from unittest import mock
+import errno
+import hashlib
+import os
+import unittest
+
+from checkbox_support.helpers.storage_io import (
+    ALIGNMENT, StorageIOTest, percentile, run_storage_io_tests)
+
+
+class PercentileTests(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3, 6, 8, 7, 10, 9]
+        self.assertEqual(percentile(values, 50), 5)
+        self.assertEqual(percentile(values, 90), 9)
+        self.assertEqual(percentile(values, 99), 10)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class StorageIOTestTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_run(self):
+        path = os.path.join(self.dir, 'test')
+        result = StorageIOTest(path, 10000, block_size=4096).run()
+        self.assertTrue(result.passed)
+        self.assertEqual(result.size, 10000)
+        self.assertEqual(len(result.write_latencies), 3)
+        self.assertEqual(len(result.read_latencies), 3)
+        self.assertGreater(result.write_speed, 0)
+        self.assertGreater(result.read_speed, 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_blocks_differ(self):
+        path = os.path.join(self.dir, 'test')
+        test = StorageIOTest(path, 3 * 4096, block_size=4096)
+        self.assertTrue(test.write())
+        with open(path, 'rb') as stream:
+            data = stream.read()
+        self.assertEqual(len(data), 3 * 4096)
+        blocks = {data[i:i + 4096] for i in range(0, len(data), 4096)}
+        self.assertEqual(len(blocks), 3)
+        # no repeated pattern within the blocks either
+        chunks = {data[i:i + 512] for i in range(0, len(data), 512)}
+        self.assertEqual(len(chunks), len(data) // 512)
+        self.assertEqual(
+            hashlib.md5(data).hexdigest(), test.result.written_digest)
+
+    def test_corruption(self):
+        path = os.path.join(self.dir, 'test')
+        test = StorageIOTest(path, 8192, block_size=4096)
+        self.assertTrue(test.write())
+        with open(path, 'r+b') as stream:
+            stream.seek(5000)
+            stream.write(b'corrupted')
+        self.assertFalse(test.read())
+        self.assertFalse(test.result.passed)
+        self.assertIsNone(test.result.error)
+
+    def test_direct(self):
+        path = os.path.join(self.dir, 'test')
+        test = StorageIOTest(path, 10000, block_size=5000, direct=True)
+        self.assertEqual(test.size, 3 * ALIGNMENT)
+        self.assertEqual(test.block_size, 2 * ALIGNMENT)
+        self.assertTrue(test.run().passed)
+
+    def test_direct_unsupported(self):
+        path = os.path.join(self.dir, 'test')
+        real_open = os.open
+
+        def fake_open(path, flags, mode=0o777):
+            if flags & os.O_DIRECT:
+                raise OSError(errno.EINVAL, 'Invalid argument')
+            return real_open(path, flags, mode)
+
+        with mock.patch('os.open', fake_open):
+            result = StorageIOTest(path, 10000, direct=True).run()
+        self.assertTrue(result.passed)
+        self.assertFalse(result.direct)
+
+    def test_write_error(self):
+        path = os.path.join(self.dir, 'missing', 'test')
+        result = StorageIOTest(path, 10000).run()
+        self.assertFalse(result.passed)
+        self.assertEqual(result.error.errno, errno.ENOENT)
+
+    def test_parallel(self):
+        tests = [StorageIOTest(os.path.join(self.dir, str(i)), 100000)
+                 for i in range(3)]
+        results = run_storage_io_tests(tests)
+        self.assertEqual([r.path for r in results], [t.path for t in tests])
+        self.assertTrue(all(result.passed for result in results))
+
+    def test_summary(self):
+        result = StorageIOTest(os.path.join(self.dir, 'test'), 1000).run()
+        lines = result.summary()
+        self.assertEqual(len(lines), 2)
+        self.assertRegex(lines[0], r'^Write speed: [\d.]+ MB/s \(latency '
+                                   r'p50: [\d.]+ ms, p90: [\d.]+ ms, '
+                                   r'p99: [\d.]+ ms\)$')
+        self.assertTrue(lines[1].startswith('Read speed: '))
@@ -0,0 +1,125 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.tests.test_udev_snapshot
+=========================================
+
+Tests for checkbox_support.udev_snapshot module
+"""
+
+from io import StringIO
+from unittest import TestCase, mock
+import tempfile
+
+from checkbox_support.parsers.tests.test_udevadm import UdevadmDataMixIn
+from checkbox_support.parsers.udevadm import UdevadmParser
+from checkbox_support.udev_snapshot import ATTRIBUTES
+from checkbox_support.udev_snapshot import UdevSnapshot
+from checkbox_support.udev_snapshot import get_udev_snapshot
+
+
+class UdevSnapshotTests(TestCase, UdevadmDataMixIn):
+
+    def snapshot(self, name, list_partitions=False):
+        return UdevSnapshot.from_udevadm_output(
+            self.get_text(name), self.get_lsblk(name), list_partitions)
+
+    def test_matches_parser(self):
+        for name in ('LENOVO_T430S', 'DELL_POWEREDGE_R820_NVME', 'CARA_T'):
+            for list_partitions in (False, True):
+                parser = UdevadmParser(
+                    self.get_text(name), lsblk=self.get_lsblk(name),
+                    list_partitions=list_partitions)
+                expected = [
+                    tuple(getattr(d, attr) for attr in ATTRIBUTES)
+                    for d in parser.run()]
+                actual = [
+                    tuple(getattr(d, attr) for attr in ATTRIBUTES)
+                    for d in self.snapshot(name, list_partitions)]
+                self.assertEqual(actual, expected)
+
+    def test_filter(self):
+        snapshot = self.snapshot('LENOVO_T430S')
+        disks = snapshot.filter(category='DISK')
+        self.assertTrue(disks)
+        self.assertTrue(all(d.category == 'DISK' for d in disks))
+        both = snapshot.filter(category=('DISK', 'NETWORK'))
+        self.assertEqual(
+            both, [d for d in snapshot if d.category in ('DISK', 'NETWORK')])
+        self.assertEqual(
+            snapshot.filter(category='NETWORK', bus='pci'),
+            [d for d in snapshot
+             if d.category == 'NETWORK' and d.bus == 'pci'])
+        self.assertEqual(snapshot.filter(category='NO-SUCH-CATEGORY'), [])
+        self.assertEqual(snapshot.filter(), snapshot.devices)
+
+    def test_get(self):
+        snapshot = self.snapshot('LENOVO_T430S')
+        for device in snapshot:
+            self.assertIs(snapshot.get(device.path), snapshot.get(device.path))
+        self.assertIsNone(snapshot.get('/no/such/path'))
+
+    def test_dump_load_roundtrip(self):
+        snapshot = self.snapshot('LENOVO_T430S')
+        snapshot.fingerprint = 'fp'
+        stream = StringIO()
+        snapshot.dump(stream)
+        stream.seek(0)
+        loaded = UdevSnapshot.load(stream)
+        self.assertEqual(loaded.fingerprint, 'fp')
+        self.assertEqual(loaded.devices, snapshot.devices)
+
+
+class GetUdevSnapshotTests(TestCase, UdevadmDataMixIn):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        patcher = mock.patch('checkbox_support.udev_snapshot._capture')
+        self.capture = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            'checkbox_support.udev_snapshot._compute_fingerprint')
+        self.fingerprint = patcher.start()
+        self.addCleanup(patcher.stop)
+        text = self.get_text('LENOVO_T430S')
+        self.capture.side_effect = lambda cmd: (
+            text if cmd[0] == 'udevadm' else '')
+
+    def udevadm_calls(self):
+        return [c for c in self.capture.call_args_list
+                if c[0][0][0] == 'udevadm']
+
+    def test_snapshot_is_reused(self):
+        self.fingerprint.return_value = 'fp1'
+        first = get_udev_snapshot(cache_dir=self.cache_dir.name)
+        second = get_udev_snapshot(cache_dir=self.cache_dir.name)
+        self.assertEqual(len(self.udevadm_calls()), 1)
+        self.assertEqual(first.devices, second.devices)
+
+    def test_snapshot_is_refreshed_when_udev_changes(self):
+        self.fingerprint.return_value = 'fp1'
+        get_udev_snapshot(cache_dir=self.cache_dir.name)
+        self.fingerprint.return_value = 'fp2'
+        get_udev_snapshot(cache_dir=self.cache_dir.name)
+        self.assertEqual(len(self.udevadm_calls()), 2)
+
+    def test_no_cache_without_fingerprint(self):
+        self.fingerprint.return_value = None
+        get_udev_snapshot(cache_dir=self.cache_dir.name)
+        get_udev_snapshot(cache_dir=self.cache_dir.name)
+        self.assertEqual(len(self.udevadm_calls()), 2)
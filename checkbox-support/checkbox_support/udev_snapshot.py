@@ -0,0 +1,249 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+checkbox_support.udev_snapshot
+==============================
+
+Session-level snapshot of the udev database.
+
+Several resource jobs and test scripts need the list of devices computed by
+:class:`~checkbox_support.parsers.udevadm.UdevadmParser`. Running
+``udevadm info --export-db`` and parsing its output is expensive on machines
+with thousands of udev nodes, so this module parses the database once, keeps
+only the derived device attributes and stores them in
+``$PLAINBOX_SESSION_SHARE``. Subsequent callers in the same session reuse that
+snapshot for as long as the udev database and the block device layout are
+unchanged.
+"""
+
+from collections import OrderedDict
+from subprocess import check_output
+import hashlib
+import json
+import os
+
+from checkbox_support.parsers.udevadm import UdevadmParser
+
+__all__ = ('ATTRIBUTES', 'UdevSnapshotDevice', 'UdevSnapshot',
+           'get_udev_snapshot')
+
+
+#: Derived attributes of :class:`UdevadmDevice` kept in the snapshot
+ATTRIBUTES = ("path", "name", "bus", "category", "driver", "product_id",
+              "vendor_id", "subproduct_id", "subvendor_id", "product",
+              "vendor", "interface", "mac", "product_slug", "vendor_slug",
+              "symlink_uuid")
+
+#: Default commands used to capture the udev database and block devices
+UDEVADM_COMMAND = ['udevadm', 'info', '--export-db']
+LSBLK_COMMAND = ['lsblk', '-i', '-n', '-P', '-o', 'KNAME,TYPE,MOUNTPOINT']
+
+#: Directory where udevd keeps its database. Its modification time changes
+#: whenever a device is added, removed or has its properties updated.
+UDEV_DATA_DIR = '/run/udev/data'
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+SNAPSHOT_FORMAT = 1
+
+
+class UdevSnapshotDevice(object):
+    """
+    Compact, read-only view of one device from the udev database.
+
+    All the attributes listed in :data:`ATTRIBUTES` are computed once, when
+    the snapshot is taken, so accessing them is a plain slot lookup.
+    """
+
+    __slots__ = ATTRIBUTES
+
+    def __init__(self, **kwargs):
+        for attr in ATTRIBUTES:
+            setattr(self, attr, kwargs.get(attr))
+
+    def __repr__(self):
+        return "<{}: {} {} {}>".format(
+            type(self).__name__, self.category, self.bus, self.path)
+
+    def __eq__(self, other):
+        if not isinstance(other, UdevSnapshotDevice):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    @classmethod
+    def from_udevadm_device(cls, device):
+        """Create a snapshot device from a parsed UdevadmDevice."""
+        return cls(**{attr: getattr(device, attr) for attr in ATTRIBUTES})
+
+    def as_dict(self):
+        return OrderedDict((attr, getattr(self, attr)) for attr in ATTRIBUTES)
+
+
+class UdevSnapshot(object):
+    """
+    Parsed udev database indexed by category, bus, driver and path.
+
+    Devices are kept in the order produced by
+    :meth:`UdevadmParser.run() <checkbox_support.parsers.udevadm.UdevadmParser.run>`
+    so the snapshot can be used as a drop-in replacement for it.
+    """
+
+    def __init__(self, devices, fingerprint=None):
+        self._devices = list(devices)
+        self.fingerprint = fingerprint
+        self._by_category = self._build_index('category')
+        self._by_bus = self._build_index('bus')
+        self._by_driver = self._build_index('driver')
+        self._by_path = {device.path: device for device in self._devices}
+
+    def _build_index(self, attr):
+        index = OrderedDict()
+        for device in self._devices:
+            index.setdefault(getattr(device, attr), []).append(device)
+        return index
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(self._devices)
+
+    @property
+    def devices(self):
+        return list(self._devices)
+
+    def get(self, path):
+        """Return the device with the given (udev) path or None."""
+        return self._by_path.get(path)
+
+    def filter(self, category=None, bus=None, driver=None):
+        """
+        Return the list of devices matching all of the given criteria.
+
+        Each criterion may be either a single value or a collection of
+        values. Devices are returned in snapshot order.
+        """
+        candidates = None
+        for index, wanted in ((self._by_category, category),
+                              (self._by_bus, bus),
+                              (self._by_driver, driver)):
+            if wanted is None:
+                continue
+            if isinstance(wanted, str):
+                wanted = (wanted,)
+            matched = set()
+            for value in wanted:
+                matched.update(id(d) for d in index.get(value, ()))
+            if candidates is None:
+                candidates = matched
+            else:
+                candidates &= matched
+        if candidates is None:
+            return list(self._devices)
+        return [d for d in self._devices if id(d) in candidates]
+
+    @classmethod
+    def from_udevadm_output(cls, output, lsblk=None, list_partitions=False,
+                            fingerprint=None):
+        """Parse ``udevadm info --export-db`` output into a snapshot."""
+        parser = UdevadmParser(output, lsblk=lsblk,
+                               list_partitions=list_partitions)
+        return cls((UdevSnapshotDevice.from_udevadm_device(device)
+                    for device in parser.run()), fingerprint)
+
+    def dump(self, stream):
+        json.dump({
+            'format': SNAPSHOT_FORMAT,
+            'fingerprint': self.fingerprint,
+            'devices': [device.as_dict() for device in self._devices],
+        }, stream)
+
+    @classmethod
+    def load(cls, stream):
+        data = json.load(stream)
+        if data.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError("unsupported udev snapshot format")
+        return cls((UdevSnapshotDevice(**record)
+                    for record in data['devices']), data['fingerprint'])
+
+
+def _compute_fingerprint(lsblk, list_partitions):
+    """
+    Compute a cheap fingerprint of the current udev state.
+
+    Returns None when the state cannot be probed reliably, in which case the
+    snapshot must not be reused.
+    """
+    try:
+        udev_mtime = os.stat(UDEV_DATA_DIR).st_mtime_ns
+        with open(BOOT_ID_FILE, 'rt') as stream:
+            boot_id = stream.read().strip()
+    except OSError:
+        return None
+    digest = hashlib.sha1()
+    for part in (boot_id, str(udev_mtime), str(bool(list_partitions)),
+                 lsblk):
+        digest.update(part.encode('UTF-8', errors='ignore'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _capture(cmd):
+    # Set the error policy to 'ignore' in order to let tests depending on
+    # this data to properly match udev properties
+    return check_output(cmd).decode('UTF-8', errors='ignore')
+
+
+def get_udev_snapshot(list_partitions=False, cache_dir=None):
+    """
+    Get a snapshot of the udev database, reusing the cached one if valid.
+
+    :param list_partitions:
+        Passed down to :class:`UdevadmParser`, report partitions as well
+    :param cache_dir:
+        Directory where the snapshot is cached. Defaults to
+        ``$PLAINBOX_SESSION_SHARE``; when neither is available the database
+        is parsed every time.
+    :raises subprocess.CalledProcessError:
+        If ``udevadm`` or ``lsblk`` fail
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('PLAINBOX_SESSION_SHARE')
+    lsblk = _capture(LSBLK_COMMAND)
+    fingerprint = _compute_fingerprint(lsblk, list_partitions)
+    cache_file = None
+    if cache_dir and fingerprint:
+        cache_file = os.path.join(cache_dir, 'udev-snapshot-{}.json'.format(
+            'partitions' if list_partitions else 'devices'))
+        try:
+            with open(cache_file, 'rt', encoding='UTF-8') as stream:
+                snapshot = UdevSnapshot.load(stream)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        else:
+            if snapshot.fingerprint == fingerprint:
+                return snapshot
+    snapshot = UdevSnapshot.from_udevadm_output(
+        _capture(UDEVADM_COMMAND), lsblk, list_partitions, fingerprint)
+    if cache_file:
+        tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+        try:
+            with open(tmp_file, 'wt', encoding='UTF-8') as stream:
+                snapshot.dump(stream)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    return snapshot
@@ -78,6 +78,11 @@ setup(
             ("kernelcmdline=checkbox_support.parsers.kernel_cmdline:parse"
              "_kernel_cmdline"),
         ],
+        'plainbox.resource_collector': [
+            "cpuinfo_resource.py=checkbox_support.collectors:collect_cpuinfo",
+            "meminfo_resource.py=checkbox_support.collectors:collect_meminfo",
+            "uname_resource.py=checkbox_support.collectors:collect_uname",
+        ],
         'console_scripts': [
             ("checkbox-support-run_watcher="
                 "checkbox_support.scripts.run_watcher:main"),
@@ -93,6 +98,8 @@ setup(
                 "checkbox_support.scripts.eddystone_scanner:main"),
             ("checkbox-support-lsusb="
                 "checkbox_support.scripts.lsusb:main"),
+            ("checkbox-support-metric="
+                "checkbox_support.scripts.metric:main"),
             ("checkbox-support-parse=checkbox_support.parsers:main"),
             ("checkbox-support-zapper-proxy="
                 "checkbox_support.scripts.zapper_proxy:main"),
@@ -0,0 +1,161 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+local_execute
+=============
+
+Counterpart of :mod:`metabox.core.lxd_execute` for commands run as
+processes of the host.
+"""
+import contextvars
+import fcntl
+import os
+import pty
+import shutil
+import struct
+import subprocess
+import termios
+import threading
+
+from loguru import logger
+from metabox.core.lxd_execute import InteractiveMixin
+from metabox.core.utils import ExecuteResult
+
+# size of the terminal of the interactive sessions
+PTY_ROWS = 24
+PTY_COLUMNS = 80
+
+
+class InteractivePty(InteractiveMixin):
+    """Interactive session with a process running in a pseudo-terminal."""
+
+    def __init__(self, args, env, cwd=None, verbose=False):
+        super().__init__()
+        self.verbose = verbose
+        self._master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack(
+            'HHHH', PTY_ROWS, PTY_COLUMNS, 0, 0))
+        try:
+            self._process = subprocess.Popen(
+                args, stdin=slave, stdout=slave, stderr=slave, env=env,
+                cwd=cwd, start_new_session=True)
+        finally:
+            os.close(slave)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                # EIO: all the processes using the terminal are gone
+                break
+            if not data:
+                break
+            self.data_received(data)
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    def send(self, data, binary=False):
+        os.write(self._master, data)
+
+    def send_signal(self, signal):
+        # sudo relays the signals it gets to the command it runs
+        self._process.send_signal(signal)
+
+    def poll(self):
+        return self._process.poll()
+
+    def close(self):
+        if self._process.poll() is None:
+            # let sudo forward the signal before killing it
+            self._process.terminate()
+            try:
+                self._process.wait(5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        # the output of the process is usually read by now, processes it left
+        # behind could keep the terminal open
+        self._reader.join(1)
+        os.close(self._master)
+        self._reader.join()
+
+
+def interactive_execute(args, env, cwd=None, verbose=False):
+    if verbose:
+        logger.trace(' '.join(args))
+    return InteractivePty(args, env, cwd, verbose)
+
+
+def run_or_raise(args, env=None, cwd=None, verbose=False, timeout=0):
+    """
+    Run a command and return an ExecuteResult.
+
+    Like in :func:`metabox.core.lxd_execute.run_or_raise`, the arguments
+    have to start with ``timeout_wrapper(timeout)`` for the timeout to be
+    detected.
+    """
+    if verbose:
+        logger.trace(' '.join(args))
+    process = subprocess.Popen(
+        args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, env=env, cwd=cwd, start_new_session=True)
+    output = {}
+
+    def reader(name, stream, context):
+        data = ''
+        for line in iter(stream.readline, b''):
+            line = line.decode('utf-8', errors='ignore')
+            data += line
+            if verbose:
+                context.run(logger.trace, line.rstrip())
+        output[name] = data
+
+    threads = [
+        threading.Thread(target=reader, args=(
+            name, stream, contextvars.copy_context()))
+        for name, stream in (
+            ('stdout', process.stdout), ('stderr', process.stderr))]
+    for thread in threads:
+        thread.start()
+    exit_code = process.wait()
+    if exit_code < 0:
+        # killed by a signal, report it like a shell (and LXD) does
+        exit_code = 128 - exit_code
+    for thread in threads:
+        thread.join()
+    process.stdout.close()
+    process.stderr.close()
+    if timeout and exit_code == 137:
+        logger.warning(
+            "{} Timeout is reached (set to {})", ' '.join(args), timeout)
+        raise TimeoutError
+    return ExecuteResult(exit_code, output['stdout'], output['stderr'])
+
+
+def remove_tree(path):
+    """Remove a directory, with sudo if it has files owned by root."""
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        subprocess.run(
+            ['sudo', '--non-interactive', 'rm', '-rf', str(path)], check=True)
@@ -0,0 +1,154 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+local_provider
+==============
+
+This module implements the Local Machine Provider.
+Local machines run checkbox as processes of the host, in directories of
+their own, so scenarios can run without LXD.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pkg_resources
+from loguru import logger
+
+from metabox.core.local_execute import remove_tree
+from metabox.core.local_execute import run_or_raise
+from metabox.core.machine import LocalMachine
+from metabox.core.machine import MachineConfig
+
+
+class LocalMachineProvider():
+    """Machine provider that uses directories of the host as targets."""
+
+    LOCAL_INTERNAL_CONFIG_FILE = 'machine_config.json'
+    # scenarios rebooting the machine for real would reboot the host
+    excluded_tags = frozenset(['restart'])
+
+    def __init__(self, session_config, effective_machine_config,
+                 debug_machine_setup=False, dispose=False,
+                 machine_count=None):
+        self._session_config = session_config
+        self._machine_config = effective_machine_config
+        # number of machines to provide for each config (default: 1)
+        self._machine_count = machine_count or {}
+        self._debug_machine_setup = debug_machine_setup
+        self._owned_machines = []
+        self._config_dirs = []
+        self._dispose = dispose
+        self._workdir = Path(os.getenv(
+            'XDG_CACHE_HOME', Path.home() / '.cache')) / 'metabox'
+
+    def setup(self):
+        for config in self._machine_config:
+            if config.origin != 'source':
+                raise SystemExit(
+                    "Local machines only run checkbox from source, "
+                    "not from {}".format(config.origin))
+            config_dir = self._workdir / 'metabox-{}'.format(config)
+            self._config_dirs.append(config_dir)
+            if not self._is_provisioned(config, config_dir):
+                self._provision(config, config_dir)
+            for index in range(1, self._machine_count.get(config, 1) + 1):
+                name = 'metabox-{}-{}'.format(config, index)
+                self._owned_machines.append(LocalMachine(
+                    config, name, self._workdir / 'machines' / name,
+                    config_dir / 'venv', config_dir / 'provisioned'))
+
+    def _is_provisioned(self, config, config_dir):
+        try:
+            with open(config_dir / self.LOCAL_INTERNAL_CONFIG_FILE) as f:
+                config_dict = json.load(f)
+            return MachineConfig(config_dict['role'], config_dict) == config
+        except (KeyError, OSError, ValueError):
+            return False
+
+    def _provision(self, config, config_dir):
+        """
+        Install checkbox in a virtualenv and prepare the directory the
+        machines are copied from.
+        """
+        logger.opt(colors=True).debug(
+            "[<y>provisioning</y>] {}", config_dir.name)
+        remove_tree(config_dir)
+        # work on a copy, mk-venv installs checkbox in develop mode
+        source_dir = config_dir / 'checkbox-ng'
+        shutil.copytree(
+            Path(config.uri).expanduser(), source_dir, symlinks=True,
+            ignore=shutil.ignore_patterns('venv', '.git', '__pycache__'))
+        venv = config_dir / 'venv'
+        self._run_setup_command(['./mk-venv', str(venv)], source_dir)
+        provider_path = Path(pkg_resources.resource_filename(
+            'metabox', 'metabox-provider'))
+        self._run_setup_command([
+            str(venv / 'bin' / 'python3'), 'manage.py', 'develop', '-d',
+            str(venv / 'share' / 'plainbox-providers-1')], provider_path)
+        machine = LocalMachine(
+            config, config_dir.name, config_dir / 'provisioned', venv)
+        machine.prepare()
+        for src, dest in config.transfer:
+            shutil.copytree(
+                os.path.expanduser(src), machine.local_path(dest),
+                symlinks=True, dirs_exist_ok=True)
+        for cmd in config.setup:
+            res = machine.run_cmd(cmd)
+            if res.exit_code:
+                msg = "Failed to run command on the local machine! "
+                msg += "Command: \n" + cmd + '\n' + res.stderr
+                logger.critical(msg)
+                raise SystemExit()
+        with open(config_dir / self.LOCAL_INTERNAL_CONFIG_FILE, 'w') as f:
+            json.dump(config.__dict__, f)
+        logger.opt(colors=True).debug(
+            "[<y>provisioned</y> ] {}", config_dir.name)
+
+    def _run_setup_command(self, args, cwd):
+        res = run_or_raise(
+            args, cwd=cwd, verbose=self._debug_machine_setup)
+        if res.exit_code:
+            msg = "Failed to run command on the host! Command: \n"
+            msg += ' '.join(args) + '\n' + res.stderr
+            logger.critical(msg)
+            raise SystemExit()
+
+    @property
+    def machines(self):
+        return list(self._owned_machines)
+
+    def get_machine_by_config(self, config):
+        for machine in self._owned_machines:
+            if config == machine.config:
+                return machine
+
+    def cleanup(self, dispose=False):
+        """Stop and delete (on request) all the machines."""
+        for machine in self._owned_machines:
+            machine.stop()
+        if dispose:
+            for machine in self._owned_machines:
+                remove_tree(self._workdir / 'machines' / machine.name)
+            for config_dir in self._config_dirs:
+                remove_tree(config_dir)
+                logger.opt(colors=True).debug(
+                    "[<y>deleted</y>     ] {}", config_dir.name)
+
+    def __del__(self):
+        self.cleanup(self._dispose)
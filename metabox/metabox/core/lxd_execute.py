@@ -16,6 +16,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+import contextvars
 import json
 import re
 import shlex
@@ -24,6 +25,7 @@ import time
 
 from loguru import logger
 import metabox.core.keys as keys
+from metabox.core.terminal import TerminalScreen
 from metabox.core.utils import ExecuteResult
 from ws4py.client.threadedclient import WebSocketClient
 
@@ -36,109 +38,174 @@ base_env = {
 login_shell = ['sudo', '--user', 'ubuntu', '--login']
 
 
-class InteractiveWebsocket(WebSocketClient):
+class InteractiveMixin:
+    """
+    Output buffering and matching of an interactive session.
+
+    Subclasses feed the output of the session to :meth:`data_received` and
+    implement ``send(data, binary)`` and ``send_signal(signal)``. Waiting
+    threads are woken up as soon as data is received, and only the new data
+    (plus what a match could straddle) is searched.
+    """
 
     # https://stackoverflow.com/a/14693789/1154487
     ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+    # bytes searched again by regular expressions, for matches straddling
+    # the data already searched and the new data
+    REGEX_LOOKBACK = 4096
+    # time without output after which a screen is considered drawn
+    SCREEN_SETTLE_TIME = 0.1
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.stdout_data = bytearray()
         self.stdout_data_full = bytearray()
         self.stdout_lock = threading.Lock()
-        self._new_data = False
+        self._data_received = threading.Condition(self.stdout_lock)
+        # incremented on each received message
+        self._generation = 0
+        # stdout_data before this offset did not match the expected data
+        self._searched = 0
+        self.screen = TerminalScreen()
         self._lookup_by_id = False
+        # messages are received in another thread, log them in the context
+        # (i.e. the scenario) of the thread that started the command
+        self._log_context = contextvars.copy_context()
 
-    def received_message(self, message):
-        if len(message.data) == 0:
-            self.close()
+    def data_received(self, data):
         if self.verbose:
             raw_msg = self.ansi_escape.sub(
-                '', message.data.decode('utf-8', errors='ignore'))
-            logger.trace(raw_msg.rstrip())
-        with self.stdout_lock:
-            self.stdout_data += message.data
-            self.stdout_data_full += message.data
-            self._new_data = True
+                '', data.decode('utf-8', errors='ignore'))
+            self._log_context.run(logger.trace, raw_msg.rstrip())
+        with self._data_received:
+            self.stdout_data += data
+            self.stdout_data_full += data
+            self.screen.feed(data)
+            self._generation += 1
+            self._data_received.notify_all()
+
+    def _search(self, data):
+        if type(data) != str:
+            start = max(0, self._searched - self.REGEX_LOOKBACK)
+            found = data.search(self.stdout_data[start:])
+        else:
+            data = data.encode('utf-8')
+            start = max(0, self._searched - len(data) + 1)
+            found = self.stdout_data.find(data, start) != -1
+        self._searched = len(self.stdout_data)
+        return found
+
+    def _clear(self):
+        self.stdout_data = bytearray()
+        self._searched = 0
 
     def expect(self, data, timeout=0):
-        not_found = True
-        start_time = time.time()
-        while not_found:
-            time.sleep(0.1)
-            if type(data) != str:
-                check = data.search(self.stdout_data)
-            else:
-                check = data.encode('utf-8') in self.stdout_data
-            if check:
-                with self.stdout_lock:
-                    self.stdout_data = bytearray()
-                not_found = False
-            if timeout and time.time() > start_time + timeout:
-                logger.warning(
-                    "{} not found! Timeout is reached (set to {})",
-                    data, timeout)
-                raise TimeoutError
-        return not_found is False
+        deadline = time.time() + timeout if timeout else None
+        with self._data_received:
+            while not self._search(data):
+                remaining = deadline and deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(
+                        "{} not found! Timeout is reached (set to {})",
+                        data, timeout)
+                    raise TimeoutError
+                self._data_received.wait(remaining)
+            self._clear()
+        return True
+
+    @property
+    def generation(self):
+        """Number of messages received so far."""
+        return self._generation
+
+    def wait_for_screen(self, generation, deadline=None):
+        """
+        Wait until the program redraws the screen after the given generation.
+
+        :returns: the rows of the screen or None if the deadline is reached
+        """
+        with self._data_received:
+            while self._generation == generation:
+                timeout = deadline and deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    return None
+                self._data_received.wait(timeout)
+            # the screen is drawn when no more data comes
+            while self._data_received.wait(self.SCREEN_SETTLE_TIME):
+                pass
+            return self.screen.display
 
     def select_test_plan(self, data, timeout=0):
+        """
+        Select a test plan in the test plan browser.
+
+        The browser shows the test plan ids, and moving the focus is followed
+        by a space to select the focused test plan: the selected one on the
+        screen tells where the focus is. Paging down is only needed until
+        both the focus and the test plan have been seen.
+        """
+        deadline = time.time() + timeout if timeout else None
+        stdin_payload = keys.KEY_HOME
         if not self._lookup_by_id:
-            self.send(('i' + keys.KEY_HOME).encode('utf-8'), binary=True)
+            stdin_payload = 'i' + stdin_payload
             self._lookup_by_id = True
-        else:
-            self.send(keys.KEY_HOME.encode('utf-8'), binary=True)
-        not_found = True
-        max_attemps = 10
-        attempt = 0
-        still_on_first_screen = True
-        old_stdout_data = b''
-        if len(data) > 67:
-            data = data[:67] + '   │\r\n│        ' + data[67:]
-        while attempt < max_attemps:
-            if self._new_data and self.stdout_data:
-                if old_stdout_data == self.stdout_data:
-                    break
-                check = data.encode('utf-8') in self.stdout_data
-                if not check:
-                    self._new_data = False
-                    with self.stdout_lock:
-                        old_stdout_data = self.stdout_data
-                        self.stdout_data = bytearray()
-                    stdin_payload = keys.KEY_PAGEDOWN + keys.KEY_SPACE
-                    self.send(stdin_payload.encode('utf-8'), binary=True)
-                    still_on_first_screen = False
-                    attempt = 0
-                else:
-                    not_found = False
-                    break
-            else:
-                time.sleep(0.1)
-                attempt += 1
-        if not_found:
-            return False
-        data = '(X) ' + data
-        attempt = 0
-        if still_on_first_screen:
-            self.send(keys.KEY_PAGEDOWN.encode('utf-8'), binary=True)
-        while attempt < max_attemps:
-            if self._new_data and self.stdout_data:
-                check = data.encode('utf-8') in self.stdout_data
-                if not check:
-                    self._new_data = False
-                    with self.stdout_lock:
-                        self.stdout_data = bytearray()
-                    stdin_payload = keys.KEY_UP + keys.KEY_SPACE
-                    self.send(stdin_payload.encode('utf-8'), binary=True)
-                    attempt = 0
+        # all the test plans seen so far, in the order of the list
+        known_test_plans = []
+        previous_test_plans = None
+        # the selection is not moved by the first keys
+        focus_known = False
+        moves = 0
+        generation = self.generation
+        self.send(stdin_payload.encode('utf-8'), binary=True)
+        while moves < 3:
+            screen = self.wait_for_screen(generation, deadline)
+            if screen is None:
+                return False
+            generation = self.generation
+            test_plans, focus = _test_plan_list(screen)
+            _merge_test_plans(known_test_plans, test_plans)
+            selected = None
+            if focus_known and focus is not None:
+                selected = test_plans[focus]
+            if selected == data:
+                with self.stdout_lock:
+                    self._clear()
+                return True
+            if selected is not None and data in known_test_plans:
+                offset = (
+                    known_test_plans.index(data) -
+                    known_test_plans.index(selected))
+                if offset > 0:
+                    stdin_payload = keys.KEY_DOWN * offset
                 else:
-                    not_found = False
-                    with self.stdout_lock:
-                        self.stdout_data = bytearray()
-                    break
+                    stdin_payload = keys.KEY_UP * -offset
+                moves += 1
+            elif test_plans == previous_test_plans:
+                # the end of the list is reached
+                return False
             else:
-                time.sleep(0.1)
-                attempt += 1
-        return not_found is False
+                stdin_payload = keys.KEY_PAGEDOWN
+            previous_test_plans = test_plans
+            focus_known = True
+            self.send(
+                (stdin_payload + keys.KEY_SPACE).encode('utf-8'), binary=True)
+        return False
+
+    @property
+    def verbose(self):
+        return self._verbose
+
+    @verbose.setter
+    def verbose(self, verbose):
+        self._verbose = verbose
+
+
+class InteractiveWebsocket(InteractiveMixin, WebSocketClient):
+
+    def received_message(self, message):
+        if len(message.data) == 0:
+            self.close()
+        self.data_received(message.data)
 
     def send_signal(self, signal):
         self.ctl.send(json.dumps({'command': 'signal', 'signal': signal}))
@@ -159,13 +226,37 @@ class InteractiveWebsocket(WebSocketClient):
     def ctl(self, ctl):
         self._ctl = ctl
 
-    @property
-    def verbose(self):
-        return self._verbose
 
-    @verbose.setter
-    def verbose(self, verbose):
-        self._verbose = verbose
+def _test_plan_list(screen):
+    """
+    Parse the test plans shown by the test plan browser.
+
+    :returns: the list of test plans and the index of the selected one
+    """
+    test_plans = []
+    focus = None
+    for row in screen:
+        row = row.strip()
+        # only the rows of the box around the list
+        if not row.startswith('│'):
+            continue
+        content = row.strip('│').strip()
+        match = re.match(r'\(([ X])\) (.+)', content)
+        if match:
+            if match.group(1) == 'X':
+                focus = len(test_plans)
+            test_plans.append(match.group(2))
+        elif content and test_plans:
+            # long test plan ids are wrapped
+            test_plans[-1] += content
+    return test_plans, focus
+
+
+def _merge_test_plans(known_test_plans, test_plans):
+    """Add the test plans of a screen to the ones seen before."""
+    if test_plans and test_plans[0] in known_test_plans:
+        del known_test_plans[known_test_plans.index(test_plans[0]):]
+    known_test_plans.extend(test_plans)
 
 
 def env_wrapper(env):
@@ -205,16 +296,20 @@ def interactive_execute(container, cmd, env={}, verbose=False, timeout=0):
 def run_or_raise(container, cmd, env={}, verbose=False, timeout=0):
     stdout_data = ''
     stderr_data = ''
+    # the handlers are called from the websocket threads, each one needs
+    # its own copy of the logging context
+    stdout_context = contextvars.copy_context()
+    stderr_context = contextvars.copy_context()
 
     def on_stdout(msg):
         nonlocal stdout_data
         stdout_data += msg
-        logger.trace(msg.rstrip())
+        stdout_context.run(logger.trace, msg.rstrip())
 
     def on_stderr(msg):
         nonlocal stderr_data
         stderr_data += msg
-        logger.trace(msg.rstrip())
+        stderr_context.run(logger.trace, msg.rstrip())
 
     if verbose:
         logger.trace(cmd)
@@ -46,11 +46,16 @@ class LxdMachineProvider():
     LXD_CREATE_TIMEOUT = 120
     LXD_POLL_INTERVAL = 5
     LXD_INTERNAL_CONFIG_PATH = '/var/tmp/machine_config.json'
+    # tags of the scenarios the machines cannot run
+    excluded_tags = frozenset()
 
     def __init__(self, session_config, effective_machine_config,
-                 debug_machine_setup=False, dispose=False):
+                 debug_machine_setup=False, dispose=False,
+                 machine_count=None):
         self._session_config = session_config
         self._machine_config = effective_machine_config
+        # number of machines to provide for each config (default: 1)
+        self._machine_count = machine_count or {}
         self._debug_machine_setup = debug_machine_setup
         self._owned_containers = []
         self._dispose = dispose
@@ -67,9 +72,13 @@ class LxdMachineProvider():
         self._create_profiles()
         self._get_existing_machines()
         for config in self._machine_config:
-            if config in [oc.config for oc in self._owned_containers]:
-                continue
-            self._create_machine(config)
+            machines = [
+                oc for oc in self._owned_containers if oc.config == config]
+            if not machines:
+                machines.append(self._create_machine(config))
+            for _ in range(
+                    len(machines), self._machine_count.get(config, 1)):
+                self._clone_machine(machines[0])
 
     def _get_existing_machines(self):
         for container in self.client.containers.all():
@@ -164,7 +173,35 @@ class LxdMachineProvider():
             self._owned_containers.append(machine)
             logger.opt(colors=True).debug(
                 "[<y>provisioned</y> ] {}", container.name)
+            return machine
+
+        except LXDAPIException as exc:
+            error = self._api_exc_to_human(exc)
+            raise SystemExit(error) from exc
+
+    def _clone_machine(self, machine):
+        """
+        Copy a provisioned machine, its snapshots included.
 
+        This is much faster than creating and provisioning a new container.
+        """
+        source = machine._container
+        index = 1
+        while self.client.containers.exists(
+                '{}-{}'.format(source.name, index)):
+            index += 1
+        name = '{}-{}'.format(source.name, index)
+        try:
+            logger.opt(colors=True).debug("[<y>cloning</y>     ] {}", name)
+            if source.status == 'Running':
+                source.stop(wait=True)
+            container = self.client.containers.create({
+                "name": name,
+                "source": {"type": "copy", "source": source.name},
+            }, wait=True)
+            self._owned_containers.append(
+                machine_selector(machine.config, container))
+            logger.opt(colors=True).debug("[<y>cloned</y>      ] {}", name)
         except LXDAPIException as exc:
             error = self._api_exc_to_human(exc)
             raise SystemExit(error) from exc
@@ -207,6 +244,10 @@ class LxdMachineProvider():
         machine._container.files.put(
             self.LXD_INTERNAL_CONFIG_PATH, json.dumps(machine.config.__dict__))
 
+    @property
+    def machines(self):
+        return list(self._owned_containers)
+
     def get_machine_by_config(self, config):
         for machine in self._owned_containers:
             if config == machine.config:
@@ -17,13 +17,22 @@
 # You should have received a copy of the GNU General Public License
 # along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
 import itertools
+import os
+import shlex
+import shutil
 import signal
+import socket
+import subprocess
 import time
 from pathlib import Path
 
 from loguru import logger
+from metabox.core import local_execute
+from metabox.core.lxd_execute import base_env
 from metabox.core.lxd_execute import interactive_execute
 from metabox.core.lxd_execute import run_or_raise
+from metabox.core.lxd_execute import timeout_wrapper
+from metabox.core.utils import ExecuteResult
 
 
 class MachineConfig:
@@ -88,7 +97,17 @@ class ContainerBaseMachine():
             self._container, self._checkbox_wrapper + cmd, env, verbose,
             timeout)
 
+    @property
+    def name(self):
+        return self._container.name
+
     def rollback_to(self, savepoint):
+        """
+        Restore a snapshot of the container and wait for it to boot.
+
+        :returns: the time it took, in seconds
+        """
+        start_time = time.perf_counter()
         if self._container.status != 'Stopped':
             self._container.stop(wait=True)
         self._container.restore_snapshot(savepoint, wait=True)
@@ -119,6 +138,17 @@ class ContainerBaseMachine():
             raise SystemExit(
                 "Rollback to {} failed (systemd not in running state)".format(
                     savepoint))
+        duration = time.perf_counter() - start_time
+        logger.opt(colors=True).debug(
+            "[<y>rolled back</y> ] {} in {:.1f}s", self._container.name,
+            duration)
+        return duration
+
+    def stop(self):
+        if self._container.status == 'Running':
+            self._container.stop(wait=True)
+            logger.opt(colors=True).debug(
+                "[<y>stopped</y>     ] {}", self._container.name)
 
     def put(self, filepath, data, mode=None, uid=1000, gid=1000):
         self._container.files.put(filepath, data, mode, uid, gid)
@@ -424,6 +454,257 @@ class ContainerSnapMachine(ContainerBaseMachine):
         ).stdout == 'active'
 
 
+class LocalMachine(ContainerBaseMachine):
+    """
+    Machine running checkbox from a virtualenv as processes of the host.
+
+    The machine is a directory: ``home`` stands for /home/ubuntu and the
+    runtime, cache and temporary files of checkbox go to the other
+    sub-directories. It is rolled back by replacing the directory with a
+    copy of the provisioned one. Commands starting with sudo run as root,
+    like the service, which listens on a port of its own so that several
+    machines can run side by side.
+    """
+
+    HOME = '/home/ubuntu'
+    VOLATILE_DIRS = ('run', 'tmp')
+
+    def __init__(self, config, name, root, venv, template=None):
+        super().__init__(config, None)
+        self._name = name
+        self._root = Path(root)
+        self._home = self._root / 'home'
+        self._venv = Path(venv)
+        self._template = template
+        self._sessions = []
+        self._xvfb = None
+        self._pulseaudio = False
+        self._pts = None
+        self._running = False
+        self.port = None
+        if self.config.role == 'service':
+            with socket.socket() as sock:
+                sock.bind(('127.0.0.1', 0))
+                self.port = sock.getsockname()[1]
+            self._checkbox_wrapper = 'sudo {} '.format(
+                self._venv / 'bin' / 'checkbox-cli')
+        else:
+            self._checkbox_wrapper = '{} '.format(
+                self._venv / 'bin' / 'checkbox-cli')
+        self._environ = {
+            'HOME': str(self._home),
+            'PATH': '{}:{}'.format(
+                self._venv / 'bin', os.environ.get('PATH', os.defpath)),
+            'LANG': os.environ.get('LANG', 'C.UTF-8'),
+            'TERM': 'xterm',
+            'XDG_RUNTIME_DIR': str(self._root / 'run'),
+            'XDG_CACHE_HOME': str(self._root / 'cache'),
+            'XDG_CONFIG_HOME': str(self._home / '.config'),
+            'XDG_DATA_HOME': str(self._home / '.local' / 'share'),
+            'TMPDIR': str(self._root / 'tmp'),
+            'PROVIDERPATH': str(
+                self._venv / 'share' / 'plainbox-providers-1'),
+        }
+
+    def local_path(self, path):
+        """Path on the host of a path of the machine."""
+        path = str(path)
+        if path.startswith(self.HOME):
+            return self._home / path[len(self.HOME):].lstrip('/')
+        return self._root / path.lstrip('/')
+
+    def _args(self, cmd, env, timeout):
+        """Command line and environment to run a command of the machine."""
+        environ = dict(self._environ)
+        environ.update(base_env)
+        environ['XDG_RUNTIME_DIR'] = self._environ['XDG_RUNTIME_DIR']
+        environ.update(env)
+        args = shlex.split(cmd.replace(self.HOME, str(self._home)))
+        if args and args[0] == 'sudo':
+            # sudo resets the environment, env sets it back as root
+            return ['sudo', '--non-interactive', 'env'] + [
+                '{}={}'.format(key, value)
+                for key, value in sorted(environ.items())
+            ] + timeout_wrapper(timeout) + args[1:], None
+        return timeout_wrapper(timeout) + args, environ
+
+    def _run(self, cmd, env={}, verbose=False, timeout=0):
+        args, environ = self._args(cmd, env, timeout)
+        return local_execute.run_or_raise(
+            args, environ, self._home, verbose, timeout)
+
+    def _interactive_run(self, cmd, env={}, verbose=False):
+        args, environ = self._args(cmd, env, 0)
+        session = local_execute.interactive_execute(
+            args, environ, self._home, verbose)
+        self._sessions.append(session)
+        return session
+
+    def execute(self, cmd, env={}, verbose=False, timeout=0):
+        return self._run(self._checkbox_wrapper + cmd, env, verbose, timeout)
+
+    def interactive_execute(self, cmd, env={}, verbose=False, timeout=0):
+        return self._interactive_run(
+            self._checkbox_wrapper + cmd, env, verbose)
+
+    def run_cmd(self, cmd, env={}, interactive=False, timeout=0):
+        if interactive:
+            return self._interactive_run(cmd, env, verbose=True)
+        return self._run(cmd, env, verbose=True, timeout=timeout)
+
+    @property
+    def name(self):
+        return self._name
+
+    def prepare(self):
+        """Create the directories of the machine."""
+        for directory in ('home', 'cache') + self.VOLATILE_DIRS:
+            (self._root / directory).mkdir(parents=True, exist_ok=True)
+        # pulseaudio refuses a runtime directory readable by others
+        (self._root / 'run').chmod(0o700)
+
+    def rollback_to(self, savepoint):
+        """
+        Replace the machine by a copy of the provisioned one.
+
+        :returns: the time it took, in seconds
+        """
+        if savepoint != 'provisioned':
+            raise SystemExit(
+                "Local machines can only be rolled back to provisioned")
+        start_time = time.perf_counter()
+        self.stop()
+        local_execute.remove_tree(self._root)
+        shutil.copytree(self._template, self._root, symlinks=True)
+        self.prepare()
+        self._running = True
+        duration = time.perf_counter() - start_time
+        logger.opt(colors=True).debug(
+            "[<y>rolled back</y> ] {} in {:.1f}s", self._name, duration)
+        return duration
+
+    def stop(self):
+        """Kill all the processes of the machine."""
+        for session in self._sessions:
+            session.close()
+        self._sessions = []
+        self._pts = None
+        if self._xvfb:
+            self._xvfb.terminate()
+            self._xvfb.wait()
+            self._xvfb = None
+            self._environ.pop('DISPLAY', None)
+        if self._pulseaudio:
+            subprocess.run(
+                ['pulseaudio', '--kill'], env=self._environ,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._pulseaudio = False
+        if self._running:
+            self._running = False
+            logger.opt(colors=True).debug(
+                "[<y>stopped</y>     ] {}", self._name)
+
+    def put(self, filepath, data, mode=None, uid=1000, gid=1000):
+        path = self.local_path(filepath)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        path.write_bytes(data)
+        if mode is not None:
+            path.chmod(mode)
+
+    def get_connecting_cmd(self):
+        return "cd {} && env -i {} bash".format(
+            shlex.quote(str(self._home)), ' '.join(
+                shlex.quote('{}={}'.format(key, value))
+                for key, value in sorted(self._environ.items())))
+
+    @property
+    def address(self):
+        if self.port:
+            return '127.0.0.1:{}'.format(self.port)
+        return '127.0.0.1'
+
+    def start_remote(self, host, launcher, interactive=False, timeout=0):
+        assert(self.config.role == 'remote')
+        host, _, port = host.partition(':')
+        cmd = 'remote {} {}'.format(host, launcher)
+        if port:
+            cmd += ' --port {}'.format(port)
+        if interactive:
+            # Return a PTS object to interact with
+            return self.interactive_execute(cmd, verbose=True)
+        else:
+            # Return an ExecuteResult named tuple
+            return self.execute(cmd, verbose=True, timeout=timeout)
+
+    def start_service(self, force=False):
+        assert(self.config.role == 'service')
+        self._pts = self.interactive_execute(
+            'service --port {}'.format(self.port), verbose=True)
+        return self._pts
+
+    def stop_service(self):
+        assert(self.config.role == 'service')
+        return self._pts.send_signal(signal.SIGINT.value)
+
+    def reboot_service(self):
+        """
+        Like the virtualenv service of the containers, the service does
+        not show up after a reboot.
+        """
+        raise RuntimeError
+
+    def is_service_active(self):
+        assert(self.config.role == 'service')
+        return self._run(
+            'pgrep -f "checkbox-cli service --port {}"'.format(self.port))
+
+    def reboot(self, timeout=0):
+        """
+        Emulate a reboot: the processes are killed and the runtime and
+        temporary files are lost.
+        """
+        self.stop()
+        for directory in self.VOLATILE_DIRS:
+            local_execute.remove_tree(self._root / directory)
+        self.prepare()
+        self._running = True
+        return ExecuteResult(0, '', '')
+
+    def start_user_session(self):
+        assert(self.config.role in ('service', 'local'))
+        # Start a virtual framebuffer on the first free display and a
+        # pulseaudio server of the machine, when they are installed
+        if shutil.which('Xvfb'):
+            read_fd, write_fd = os.pipe()
+            self._xvfb = subprocess.Popen(
+                ['Xvfb', '-displayfd', str(write_fd),
+                 '-screen', '0', '1280x1024x24'],
+                pass_fds=(write_fd,), stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True)
+            os.close(write_fd)
+            with os.fdopen(read_fd) as f:
+                display = f.readline().strip()
+            if display:
+                self._environ['DISPLAY'] = ':{}'.format(display)
+        if shutil.which('pulseaudio'):
+            subprocess.run(
+                ['pulseaudio', '--start', '--exit-idle-time=-1',
+                 '--disallow-module-loading'], env=self._environ,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._pulseaudio = True
+
+    def switch_off_networking(self):
+        logger.warning("{} cannot switch off networking", self._name)
+        return ExecuteResult(1, '', 'Not supported by local machines')
+
+    def switch_on_networking(self):
+        logger.warning("{} cannot switch on networking", self._name)
+        return ExecuteResult(1, '', 'Not supported by local machines')
+
+
 def machine_selector(config, container):
     if config.origin in ('snap', 'classic_snap'):
         return(ContainerSnapMachine(config, container))
@@ -0,0 +1,66 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+pool
+====
+
+This module implements the pool of provisioned machines shared by the
+scenarios running concurrently.
+"""
+import threading
+from collections import defaultdict
+
+
+class MachinePool:
+    """Machines that are not used by a scenario, grouped by config."""
+
+    def __init__(self, machines):
+        self._idle = defaultdict(list)
+        self._size = defaultdict(int)
+        self._condition = threading.Condition()
+        for machine in machines:
+            self._idle[machine.config].append(machine)
+            self._size[machine.config] += 1
+
+    def acquire(self, configs):
+        """
+        Take one machine for each of the configs.
+
+        All the machines are taken at once, so that two scenarios each
+        needing a remote and a service machine cannot deadlock. Blocks until
+        they are all available.
+        """
+        for config in configs:
+            if configs.count(config) > self._size[config]:
+                raise ValueError("Not enough {} machines".format(config))
+        with self._condition:
+            self._condition.wait_for(lambda: self._available(configs))
+            return [self._idle[config].pop() for config in configs]
+
+    def release(self, machines):
+        """Give back machines taken with :meth:`acquire`."""
+        with self._condition:
+            for machine in machines:
+                self._idle[machine.config].append(machine)
+            self._condition.notify_all()
+
+    def _available(self, configs):
+        needed = defaultdict(int)
+        for config in configs:
+            needed[config] += 1
+        return all(
+            len(self._idle[config]) >= count
+            for config, count in needed.items())
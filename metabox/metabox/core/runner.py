@@ -16,18 +16,30 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+import os
 import sys
+import threading
 import time
+from collections import Counter
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 from loguru import logger
 from metabox.core.aggregator import aggregator
 from metabox.core.configuration import read_config
 from metabox.core.configuration import validate_config
+from metabox.core.local_provider import LocalMachineProvider
 from metabox.core.lxd_provider import LxdMachineProvider
 from metabox.core.machine import MachineConfig
+from metabox.core.pool import MachinePool
 
 logger = logger.opt(colors=True)
 
+# Wall-clock time of a scenario, rollbacks is a list of (machine, seconds)
+ScenarioTiming = namedtuple(
+    'ScenarioTiming', ['name', 'passed', 'duration', 'rollbacks'])
+
 
 class Runner:
     """Metabox scenario discovery and runner."""
@@ -48,24 +60,39 @@ class Runner:
         else:
             self.config = read_config(args.config)
             validate_config(self.config)
-        # effective set of machine configs required by scenarios
-        self.combo = set()
+        # effective set of machine configs required by scenarios, with the
+        # number of scenarios using them
+        self.combo = Counter()
         self.machine_provider = None
         self.failed = False
+        self.parallel = max(1, self.args.parallel)
+        self.log_dir = self.args.log_dir
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+        self.timings = []
+        self._hold_lock = threading.Lock()
         self.tags = set(self.args.tags or [])
         self.exclude_tags = set(self.args.exclude_tags or [])
         self.hold_on_fail = self.args.hold_on_fail
         self.debug_machine_setup = self.args.debug_machine_setup
+        if self.args.machine_provider == 'local':
+            self.provider_cls = LocalMachineProvider
+        else:
+            self.provider_cls = LxdMachineProvider
         self.dispose = not self.args.do_not_dispose
         aggregator.load_all()
 
     def _formatter(self, record):
+        prefix = ""
+        # tell apart the output of the scenarios running concurrently
+        if self.parallel > 1 and "scenario" in record["extra"]:
+            prefix = "[{extra[scenario]}] "
         if record["level"].no < 10:
-            return "<level>{message}</level>\n"
+            return "<level>" + prefix + "{message}</level>\n"
         else:
             return (
                 "{time:HH:mm:ss} | <level>{level: <8}</level> "
-                "<level>{message}</level>\n"
+                "<level>" + prefix + "{message}</level>\n"
             )
 
     def _gather_all_machine_spec(self):
@@ -76,12 +103,12 @@ class Runner:
                 remote_release, service_release = v.releases
                 remote_config['alias'] = remote_release
                 service_config['alias'] = service_release
-                self.combo.add(MachineConfig('remote', remote_config))
-                self.combo.add(MachineConfig('service', service_config))
+                self.combo[MachineConfig('remote', remote_config)] += 1
+                self.combo[MachineConfig('service', service_config)] += 1
             elif v.mode == 'local':
                 local_config = self.config['local'].copy()
                 local_config['alias'] = v.releases[0]
-                self.combo.add(MachineConfig('local', local_config))
+                self.combo[MachineConfig('local', local_config)] += 1
 
     def _filter_scn_by_tags(self):
         filtered_suite = []
@@ -137,7 +164,12 @@ class Runner:
                         if alias not in local_releases:
                             continue
                         self.scn_variants.append(scenario_cls(mode, alias))
-        if self.args.tags or self.args.exclude_tags:
+        if self.provider_cls.excluded_tags - self.exclude_tags:
+            logger.info(
+                'Excluding scenario tag(s) not supported by the machines: '
+                '%s' % ', '.join(sorted(self.provider_cls.excluded_tags)))
+            self.exclude_tags.update(self.provider_cls.excluded_tags)
+        if self.tags or self.exclude_tags:
             if self.args.tags:
                 logger.info('Including scenario tag(s): %s' % ', '.join(
                     sorted(self.args.tags)))
@@ -149,38 +181,100 @@ class Runner:
                 logger.warning('No match found!')
                 raise SystemExit(1)
         self._gather_all_machine_spec()
-        self.machine_provider = LxdMachineProvider(
+        # a pool of machines per config, as many as the scenarios that can
+        # use them at the same time
+        machine_count = {
+            config: min(self.parallel, count)
+            for config, count in self.combo.items()}
+        self.machine_provider = self.provider_cls(
             self.config, self.combo,
-            self.debug_machine_setup, self.dispose)
+            self.debug_machine_setup, self.dispose, machine_count)
         self.machine_provider.setup()
 
-    def _load(self, mode, release_alias):
+    def _machine_config(self, mode, release_alias):
         config = self.config[mode].copy()
         config['alias'] = release_alias
         config['role'] = mode
-        return self.machine_provider.get_machine_by_config(
-                        MachineConfig(mode, config))
+        return MachineConfig(mode, config)
+
+    def _scenario_id(self, scn):
+        return '{}.{}'.format(scn.name, '-'.join((scn.mode,) + scn.releases))
 
     def run(self):
         startTime = time.perf_counter()
-        for scn in self.scn_variants:
+        # machines are started when a scenario gets them from the pool
+        self.machine_provider.cleanup()
+        self.pool = MachinePool(self.machine_provider.machines)
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            futures = [
+                executor.submit(self._run_scenario, scn)
+                for scn in self.scn_variants]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        del self.machine_provider
+        stopTime = time.perf_counter()
+        timeTaken = stopTime - startTime
+        self._print_timings()
+        print('-' * 80)
+        total = len(self.scn_variants)
+        status = "Ran {} scenario{} in {:.3f}s".format(
+            total, total != 1 and "s" or "", timeTaken)
+        if self.wasSuccessful():
+            logger.success(status)
+        else:
+            logger.error(status)
+
+    def _run_scenario(self, scn):
+        """Run a scenario, logging to its own file if requested."""
+        scn_id = self._scenario_id(scn)
+        with logger.contextualize(scenario=scn_id):
+            handler_id = None
+            if self.log_dir:
+                handler_id = logger.add(
+                    os.path.join(self.log_dir, '{}.log'.format(scn_id)),
+                    format="{time:HH:mm:ss} | {level: <8} {message}",
+                    level="TRACE",
+                    filter=lambda record: (
+                        record["extra"].get("scenario") == scn_id))
+            try:
+                self._run_scenario_on_machines(scn, scn_id)
+            finally:
+                if handler_id is not None:
+                    logger.remove(handler_id)
+
+    def _run_scenario_on_machines(self, scn, scn_id):
+        if scn.mode == "remote":
+            configs = [
+                self._machine_config("remote", scn.releases[0]),
+                self._machine_config("service", scn.releases[1])]
+        elif scn.mode == "local":
+            configs = [self._machine_config("local", scn.releases[0])]
+        machines = self.pool.acquire(configs)
+        start_time = time.perf_counter()
+        rollbacks = []
+        try:
+            for machine in machines:
+                rollbacks.append(
+                    (machine.name, machine.rollback_to('provisioned')))
             if scn.mode == "remote":
-                scn.remote_machine = self._load("remote", scn.releases[0])
-                scn.service_machine = self._load("service", scn.releases[1])
-                scn.remote_machine.rollback_to('provisioned')
-                scn.service_machine.rollback_to('provisioned')
+                scn.remote_machine, scn.service_machine = machines
                 if scn.launcher:
                     scn.remote_machine.put(scn.LAUNCHER_PATH, scn.launcher)
                 scn.service_machine.start_user_session()
             elif scn.mode == "local":
-                scn.local_machine = self._load("local", scn.releases[0])
-                scn.local_machine.rollback_to('provisioned')
+                scn.local_machine, = machines
                 if scn.launcher:
                     scn.local_machine.put(scn.LAUNCHER_PATH, scn.launcher)
                 scn.local_machine.start_user_session()
             logger.info("Starting scenario: {}".format(scn.name))
             scn.run()
-            if not scn.has_passed():
+            passed = scn.has_passed()
+            if not passed:
                 self.failed = True
                 logger.error("{} scenario has failed.".format(scn.name))
                 if self.hold_on_fail:
@@ -197,22 +291,30 @@ class Runner:
                             "the following command:\n{}\n"
                             "Press enter to continue testing").format(
                                 scn.local_machine.get_connecting_cmd())
-                    print(msg)
-                    input()
+                    with self._hold_lock:
+                        print(msg)
+                        input()
             else:
                 logger.success("{} scenario has passed.".format(scn.name))
-            self.machine_provider.cleanup()
-        del self.machine_provider
-        stopTime = time.perf_counter()
-        timeTaken = stopTime - startTime
+        finally:
+            for machine in machines:
+                machine.stop()
+            self.pool.release(machines)
+        self.timings.append(ScenarioTiming(
+            scn_id, passed, time.perf_counter() - start_time, rollbacks))
+
+    def _print_timings(self):
+        """Print the time taken by the scenarios, slowest first."""
+        if not self.timings:
+            return
         print('-' * 80)
-        total = len(self.scn_variants)
-        status = "Ran {} scenario{} in {:.3f}s".format(
-            total, total != 1 and "s" or "", timeTaken)
-        if self.wasSuccessful():
-            logger.success(status)
-        else:
-            logger.error(status)
+        for timing in sorted(
+                self.timings, key=lambda t: t.duration, reverse=True):
+            print("{:8.1f}s {} {} (rollback: {})".format(
+                timing.duration, "PASS" if timing.passed else "FAIL",
+                timing.name, ", ".join(
+                    "{} {:.1f}s".format(machine, duration)
+                    for machine, duration in timing.rollbacks)))
 
     def _run_single_scn(self, scenario_cls, mode, *releases):
         pass
@@ -44,6 +44,9 @@ class Scenario:
     def __init__(self, mode, *releases):
         self.mode = mode
         self.releases = releases
+        # run() adds steps, keep the list of the class intact for the other
+        # variants of the scenario
+        self.steps = list(self.steps)
         self._checks = []
         self._ret_code = None
         self._stdout = ''
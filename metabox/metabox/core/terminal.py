@@ -0,0 +1,142 @@
+# This file is part of Checkbox.
+#
+# Copyright 2024 Canonical Ltd.
+#
+# Checkbox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# Checkbox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+terminal
+========
+
+This module implements a minimal terminal emulator, enough to know what
+the urwid screens of checkbox display.
+"""
+import codecs
+import re
+
+
+class TerminalScreen:
+    """
+    Characters displayed by a terminal fed with the output of a program.
+
+    Printable characters, CR, LF, BS, TAB and the CSI sequences moving the
+    cursor or erasing characters are interpreted, the other control and
+    escape sequences are ignored.
+    """
+
+    _escape = re.compile(
+        r'\x1b(?:\[(?P<params>[0-?]*)[ -/]*(?P<final>[@-~])'
+        r'|\][^\x07\x1b]*(?:\x07|\x1b\\)'
+        r'|[@-Z\\^_])')
+    _incomplete_escape = re.compile(
+        r'\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*\x1b?)?\Z')
+
+    def __init__(self, columns=80, rows=24):
+        self.columns = columns
+        self.rows = rows
+        self._lines = [self._blank_line() for _ in range(rows)]
+        self._x = 0
+        self._y = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')(
+            errors='replace')
+        self._pending = ''
+
+    def _blank_line(self):
+        return [' '] * self.columns
+
+    @property
+    def display(self):
+        """The rows of the screen, without trailing spaces."""
+        return [''.join(line).rstrip() for line in self._lines]
+
+    def feed(self, data):
+        """Interpret bytes written to the terminal."""
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ''
+        pos = 0
+        while pos < len(text):
+            char = text[pos]
+            if char == '\x1b':
+                match = self._escape.match(text, pos)
+                if match:
+                    if match.group('final'):
+                        self._csi(match.group('params'), match.group('final'))
+                    pos = match.end()
+                    continue
+                if self._incomplete_escape.match(text, pos):
+                    # the end of the sequence comes with the next data
+                    self._pending = text[pos:]
+                    break
+            elif char == '\r':
+                self._x = 0
+            elif char == '\n':
+                self._line_feed()
+            elif char == '\b':
+                self._x = max(0, self._x - 1)
+            elif char == '\t':
+                self._x = min(self.columns - 1, (self._x // 8 + 1) * 8)
+            elif char >= ' ' and char != '\x7f':
+                if self._x >= self.columns:
+                    self._x = 0
+                    self._line_feed()
+                self._lines[self._y][self._x] = char
+                self._x += 1
+            pos += 1
+
+    def _line_feed(self):
+        if self._y == self.rows - 1:
+            del self._lines[0]
+            self._lines.append(self._blank_line())
+        else:
+            self._y += 1
+
+    def _csi(self, params, final):
+        if params.startswith('?'):
+            # private modes (cursor visibility, alternate screen...)
+            return
+        args = [int(arg) if arg.isdigit() else 0 for arg in params.split(';')]
+        count = max(args[0], 1)
+        if final == 'A':
+            self._y = max(0, self._y - count)
+        elif final == 'B':
+            self._y = min(self.rows - 1, self._y + count)
+        elif final == 'C':
+            self._x = min(self.columns - 1, self._x + count)
+        elif final == 'D':
+            self._x = max(0, self._x - count)
+        elif final in 'Hf':
+            row = count
+            column = max(args[1], 1) if len(args) > 1 else 1
+            self._y = min(self.rows, row) - 1
+            self._x = min(self.columns, column) - 1
+        elif final == 'J':
+            if args[0] == 0:
+                self._erase_line(self._x, self.columns)
+                for y in range(self._y + 1, self.rows):
+                    self._lines[y] = self._blank_line()
+            elif args[0] == 1:
+                self._erase_line(0, self._x + 1)
+                for y in range(self._y):
+                    self._lines[y] = self._blank_line()
+            else:
+                self._lines = [self._blank_line() for _ in range(self.rows)]
+        elif final == 'K':
+            if args[0] == 0:
+                self._erase_line(self._x, self.columns)
+            elif args[0] == 1:
+                self._erase_line(0, self._x + 1)
+            else:
+                self._erase_line(0, self.columns)
+
+    def _erase_line(self, start, end):
+        line = self._lines[self._y]
+        line[start:end] = [' '] * (min(end, self.columns) - start)
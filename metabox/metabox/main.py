@@ -54,6 +54,10 @@ def main():
     parser.add_argument(
         '--do-not-dispose', action='store_true',
         help="Do not delete LXD containers after the run")
+    parser.add_argument(
+        '--machine-provider', choices=('lxd', 'local'), default='lxd',
+        help="Run the scenarios in LXD containers or as processes of "
+             "this machine (only for checkbox installed from source)")
     parser.add_argument(
         '--hold-on-fail', action='store_true',
         help="Pause testing when a scenario fails")
@@ -61,6 +65,12 @@ def main():
         '--debug-machine-setup', action='store_true',
         help="Turn on verbosity during machine setup. "
              "Only works with --log TRACE")
+    parser.add_argument(
+        '-j', '--parallel', type=int, default=1, metavar='N',
+        help="Run up to N scenarios at the same time")
+    parser.add_argument(
+        '--log-dir', type=Path,
+        help="Also write the full log of each scenario to this directory")
     # Ignore warnings issued by pylxd/models/operation.py
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
@@ -41,6 +41,7 @@ out by the SMART availability test in block_device_resource.
 
 Changelog:
 
+v1.5: Add a mode testing many disks (and RAID elements) at the same time
 v1.4: Fix script failure on disks with no pre-existing SMART tests
 v1.3: Fix detection of SMART availability & activate SMART if available
       but deactivated. Also use smartctl return value rather than string-
@@ -68,6 +69,7 @@ V0: First draft
 """
 
 import os
+import re
 import sys
 import time
 import logging
@@ -75,7 +77,7 @@ import shlex
 
 from subprocess import Popen, PIPE, check_call, check_output
 from subprocess import CalledProcessError
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 
 # NOTE: If raid_types changes, also change it in block_device_resource script!
 raid_types = ["megaraid", "cciss", "3ware", "areca"]
@@ -289,6 +291,34 @@ def in_progress(current_entries):
         return False
 
 
+def check_status(disk, raid_element, raid_type, previous_entries):
+    """Check once whether a SMART test is complete.
+
+    :param disk:
+        Disk device (e.g., /dev/sda)
+    :param raid_element:
+        RAID disk number (undefined for non-RAID disk)
+    :param raid_type:
+        Type of RAID device (megaraid, etc.)
+    :param previous_entries:
+        SMART log entries before the test; used to spot a change
+    :returns:
+        True if the test is complete, its status and the smartctl return code
+    """
+    current_entries, output, returncode = get_smart_entries(disk,
+                                                            raid_element,
+                                                            raid_type)
+    if current_entries != previous_entries:
+        if not in_progress(current_entries):
+            logging.debug("Current log entries differ from starting log"
+                          " entries. Stopping polling.")
+            if isinstance(current_entries[0], str):
+                return True, current_entries[0], returncode
+            else:
+                return True, current_entries[0]['status'], returncode
+    return False, None, returncode
+
+
 def poll_for_status(args, disk, raid_element, raid_type, previous_entries):
     """Poll a disk for its SMART status.
 
@@ -314,20 +344,16 @@ def poll_for_status(args, disk, raid_element, raid_type, previous_entries):
     # Priming read... this is here in case our test is finished or fails
     # immediate after it beginsAccording to.
     logging.debug('Polling SMART selftest log for status')
-    keep_going = True
 
-    while keep_going:
+    while True:
         # Poll every sleep seconds until test is complete
         time.sleep(args.sleep)
 
-        current_entries, output, returncode = get_smart_entries(disk,
-                                                                raid_element,
-                                                                raid_type)
-        if current_entries != previous_entries:
-            if not in_progress(current_entries):
-                logging.debug("Current log entries differ from starting log"
-                              " entries. Stopping polling.")
-                keep_going = False
+        complete, status, returncode = check_status(disk, raid_element,
+                                                    raid_type,
+                                                    previous_entries)
+        if complete:
+            return status, returncode
 
         if args.timeout is not None:
             if args.timeout <= 0:
@@ -336,17 +362,10 @@ def poll_for_status(args, disk, raid_element, raid_type, previous_entries):
             else:
                 args.timeout -= args.sleep
 
-    if isinstance(current_entries[0], str):
-        return current_entries[0], returncode
-    else:
-        return current_entries[0]['status'], returncode
-
 
-def run_smart_test(args, disk, raid_element, raid_type):
-    """Run a test on a single disk device (possibly multiple RAID elements).
+def start_smart_test(disk, raid_element, raid_type):
+    """Start a SMART self-test.
 
-    :param args:
-        Command-line arguments passed to script
     :param disk:
         Disk device filename (e.g., /dev/sda)
     :param raid_element:
@@ -354,7 +373,7 @@ def run_smart_test(args, disk, raid_element, raid_type):
     :param raid_type:
         Type of RAID device (e.g., megaraid)
     :returns:
-        True for success, False for failure
+        The SMART log entries before the test, None if it could not start
     """
     previous_entries, output, returncode = get_smart_entries(disk,
                                                              raid_element,
@@ -366,7 +385,7 @@ def run_smart_test(args, disk, raid_element, raid_type):
                      format(disk, raid_element))
     if initiate_smart_test(disk, raid_element, raid_type) != 0:
         logging.error("Error reported during smartctl test")
-        return False
+        return None
 
     if len(previous_entries) > 20:
         # Abort the previous instance
@@ -381,6 +400,26 @@ def run_smart_test(args, disk, raid_element, raid_type):
         previous_entries, output, returncode = get_smart_entries(disk,
                                                                  raid_element,
                                                                  raid_type)
+    return previous_entries
+
+
+def run_smart_test(args, disk, raid_element, raid_type):
+    """Run a test on a single disk device (possibly multiple RAID elements).
+
+    :param args:
+        Command-line arguments passed to script
+    :param disk:
+        Disk device filename (e.g., /dev/sda)
+    :param raid_element:
+        Number of RAID array element or undefined for non-RAID disk
+    :param raid_type:
+        Type of RAID device (e.g., megaraid)
+    :returns:
+        True for success, False for failure
+    """
+    previous_entries = start_smart_test(disk, raid_element, raid_type)
+    if previous_entries is None:
+        return False
 
     status, returncode = poll_for_status(args, disk, raid_element, raid_type,
                                          previous_entries)
@@ -409,6 +448,180 @@ def run_smart_test(args, disk, raid_element, raid_type):
         return True
 
 
+class SmartTest:
+    """SMART self-test of a disk or of an element of a RAID array."""
+
+    def __init__(self, disk, raid_element=-1, raid_type='none',
+                 controller=None):
+        self.disk = disk
+        self.raid_element = raid_element
+        self.raid_type = raid_type
+        # the tests sharing a controller are limited
+        self.controller = controller or disk
+        self.status = None
+        self.returncode = None
+        self.start_time = None
+        self.duration = None
+        self._previous_entries = None
+
+    def __str__(self):
+        if self.raid_type == 'none':
+            return self.disk
+        return '{}, element {}'.format(self.disk, self.raid_element)
+
+    def start(self):
+        """Start the test, returns False if it could not start."""
+        self.start_time = time.time()
+        self._previous_entries = start_smart_test(
+            self.disk, self.raid_element, self.raid_type)
+        if self._previous_entries is None:
+            self._finish('Error reported during smartctl test', 1)
+            return False
+        return True
+
+    def poll(self, timeout=None):
+        """Check once whether the test is over, returns True if it is."""
+        complete, status, returncode = check_status(
+            self.disk, self.raid_element, self.raid_type,
+            self._previous_entries)
+        if complete:
+            self._finish(status, returncode)
+        elif timeout is not None and time.time() - self.start_time >= timeout:
+            logging.debug('Polling {} timed out'.format(self))
+            self._finish('Polling timed out', 1)
+        return self.returncode is not None
+
+    def _finish(self, status, returncode):
+        self.status = status
+        self.returncode = returncode
+        self.duration = time.time() - self.start_time
+        if returncode == 0:
+            logging.info("PASS: SMART Self-Test on {} completed without "
+                         "error".format(self))
+        else:
+            logging.error("FAIL: SMART Self-Test on {}: {} (smartctl return "
+                          "code: {})".format(self, status, returncode))
+
+    @property
+    def passed(self):
+        return self.returncode == 0
+
+
+def get_controller(disk):
+    """Find the PCI device of the controller a disk is attached to.
+
+    :param disk:
+        Disk device filename (e.g., /dev/sda)
+    :returns:
+        The PCI address of the controller, the disk if it cannot be found
+    """
+    name = os.path.basename(os.path.realpath(disk))
+    device = os.path.realpath('/sys/class/block/{}/device'.format(name))
+    pci_addresses = [
+        part for part in device.split(os.sep)
+        if re.match(r'^[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.[0-9a-f]$', part)]
+    if pci_addresses:
+        return pci_addresses[-1]
+    return disk
+
+
+def scan_disks():
+    """List the disks (and RAID elements) smartctl knows about.
+
+    :returns:
+        A list of (disk, raid_element, raid_type) tuples
+    """
+    output = check_output(['smartctl', '--scan'], universal_newlines=True)
+    disks = []
+    for line in output.splitlines():
+        fields = line.split('#')[0].split()
+        if not fields:
+            continue
+        disk = fields[0]
+        device_type = fields[2] if fields[1:2] == ['-d'] else ''
+        raid_type, _, raid_element = device_type.partition(',')
+        if raid_type in raid_types and raid_element.isdigit():
+            disks.append((disk, int(raid_element), raid_type))
+        else:
+            disks.append((disk, -1, 'none'))
+    return disks
+
+
+def get_smart_tests(disks):
+    """Make the tests of the disks having SMART enabled.
+
+    :param disks:
+        A list of (disk, raid_element, raid_type) tuples
+    :returns:
+        A list of SmartTest
+    """
+    tests = []
+    for disk, raid_element, raid_type in disks:
+        if raid_type == 'none':
+            controller = get_controller(disk)
+        else:
+            # all the elements are behind the same RAID controller
+            controller = disk
+        if enable_smart(disk, raid_element, raid_type):
+            tests.append(SmartTest(disk, raid_element, raid_type, controller))
+    return tests
+
+
+def run_smart_tests(args, tests):
+    """Run SMART tests at the same time.
+
+    No more than args.max_per_controller tests run at once on a controller,
+    the others wait for one of them to complete.
+    :param args:
+        Command-line arguments passed to script
+    :param tests:
+        A list of SmartTest
+    :returns:
+        True if all the tests passed, False otherwise
+    """
+    pending = list(tests)
+    running = []
+    while pending or running:
+        for test in list(pending):
+            busy = sum(t.controller == test.controller for t in running)
+            if busy < args.max_per_controller:
+                pending.remove(test)
+                if test.start():
+                    running.append(test)
+        if not running:
+            continue
+        time.sleep(args.sleep)
+        running = [test for test in running if not test.poll(args.timeout)]
+    return all(test.passed for test in tests)
+
+
+def positive_int(value):
+    """Argument type of the counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError(
+            '{!r} is not a positive integer'.format(value))
+    return number
+
+
+def print_results(tests):
+    """Print the outcome of the tests, a record for each test."""
+    for test in tests:
+        print('disk: {}'.format(test.disk))
+        if test.raid_type != 'none':
+            print('raid_type: {}'.format(test.raid_type))
+            print('raid_element: {}'.format(test.raid_element))
+        print('controller: {}'.format(test.controller))
+        print('outcome: {}'.format('pass' if test.passed else 'fail'))
+        print('status: {}'.format(test.status))
+        print('returncode: {}'.format(test.returncode))
+        print('duration: {:.0f}'.format(test.duration))
+        print()
+
+
 def main():
     """Test SMART capabilities on disks that support SMART functions."""
     description = ('Tests SMART capabilities on disks that support '
@@ -416,9 +629,19 @@ def main():
     parser = ArgumentParser(description=description)
     parser.add_argument('-b', '--block-dev',
                         metavar='DISK',
-                        default='/dev/sda',
-                        help=('the DISK to run this test against '
-                              '[default: %(default)s]'))
+                        action='append',
+                        help=('the DISK to run this test against, can be '
+                              'used multiple times to test disks at the '
+                              'same time [default: /dev/sda]'))
+    parser.add_argument('-a', '--all',
+                        action='store_true',
+                        help='test all the disks reported by smartctl --scan '
+                             'at the same time')
+    parser.add_argument('-m', '--max-per-controller',
+                        type=positive_int,
+                        default=4,
+                        help=('maximum number of tests running at the same '
+                              'time on a controller [default: %(default)s]'))
     parser.add_argument('-d', '--debug',
                         action='store_true',
                         default=False,
@@ -449,7 +672,30 @@ def main():
     if not os.geteuid() == 0:
         parser.error("You must be root to run this program")
 
-    disk = args.block_dev
+    if args.all or (args.block_dev and len(args.block_dev) > 1):
+        if args.all:
+            disks = scan_disks()
+        else:
+            disks = []
+            for disk in args.block_dev:
+                num_disks, raid_type = count_raid_disks(disk)
+                if num_disks == 0:
+                    disks.append((disk, -1, raid_type))
+                else:
+                    disks.extend((disk, raid_element, raid_type)
+                                 for raid_element in range(num_disks))
+        tests = get_smart_tests(disks)
+        if not tests:
+            logging.error("No disk with SMART enabled found")
+            return 1
+        success = run_smart_tests(args, tests)
+        if not args.all:
+            # a disk asked for that could not be enabled fails the run
+            success = success and len(tests) == len(disks)
+        print_results(tests)
+        return 0 if success else 1
+
+    disk = args.block_dev[0] if args.block_dev else '/dev/sda'
     num_disks, raid_type = count_raid_disks(disk)
     if num_disks == 0:
         success = enable_smart(disk, -1, raid_type)
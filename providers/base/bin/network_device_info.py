@@ -31,7 +31,7 @@ import sys
 import dbus
 
 from checkbox_support.parsers.modinfo import ModinfoParser
-from checkbox_support.parsers.udevadm import UdevadmParser
+from checkbox_support.udev_snapshot import get_udev_snapshot
 
 
 class Utils():
@@ -341,17 +341,13 @@ class UdevDevices():
         return len(self._devices)
 
     def _collect_devices(self):
-        cmd = ['udevadm', 'info', '--export-db']
         try:
-            output = check_output(cmd).decode(sys.stdout.encoding,
-                                              errors='ignore')
+            snapshot = get_udev_snapshot()
         except CalledProcessError as err:
-            sys.stderr.write(err)
+            sys.stderr.write(str(err))
             return
-        udev = UdevadmParser(output)
-        for device in udev.run():
-            if (device.category == self.category and
-                    device.interface != 'UNKNOWN'):
+        for device in snapshot.filter(category=self.category):
+            if device.interface != 'UNKNOWN':
                 self._devices.append(device)
 
     def devices(self):
@@ -1,9 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-import collections
 import dbus
-import hashlib
 import logging
 import os
 import platform
@@ -12,7 +10,6 @@ import shlex
 import subprocess
 import sys
 import tempfile
-import time
 
 import gi
 gi.require_version('GUdev', '1.0')
@@ -32,6 +29,12 @@ from checkbox_support.dbus.udisks2 import (                     # noqa: E402
 from checkbox_support.heuristics.udisks2 import is_memory_card  # noqa: E402
 from checkbox_support.helpers.human_readable_bytes import (     # noqa: E402
     HumanReadableBytes)
+from checkbox_support.helpers.metrics import emit_metric        # noqa: E402
+from checkbox_support.helpers.storage_io import (               # noqa: E402
+    DEFAULT_BLOCK_SIZE,
+    StorageIOResult,
+    StorageIOTest,
+    run_storage_io_tests)
 from checkbox_support.parsers.udevadm import (                  # noqa: E402
     CARD_READER_RE,
     GENERIC_RE,
@@ -42,71 +45,6 @@ from checkbox_support.udev import get_udev_block_devices        # noqa: E402
 from checkbox_support.udev import get_udev_xhci_devices         # noqa: E402
 
 
-class ActionTimer():
-    '''Class to implement a simple timer'''
-
-    def __enter__(self):
-        self.start = time.time()
-        return self
-
-    def __exit__(self, *args):
-        self.stop = time.time()
-        self.interval = self.stop - self.start
-
-
-class RandomData():
-    '''Class to create data files'''
-
-    def __init__(self, size):
-        self.tfile = tempfile.NamedTemporaryFile(delete=False)
-        self.path = ''
-        self.name = ''
-        self.path, self.name = os.path.split(self.tfile.name)
-        self._write_test_data_file(size)
-
-    def _generate_test_data(self):
-        seed = "104872948765827105728492766217823438120"
-        phrase = '''
-        Lorem ipsum dolor sit amet, consectetuer adipiscing elit, sed diam
-        nonummy nibh euismod tincidunt ut laoreet dolore magna aliquam erat
-        volutpat. Ut wisi enim ad minim veniam, quis nostrud exerci tation
-        ullamcorper suscipit lobortis nisl ut aliquip ex ea commodo consequat.
-        Duis autem vel eum iriure dolor in hendrerit in vulputate velit esse
-        molestie consequat, vel illum dolore eu feugiat nulla facilisis at vero
-        eros et accumsan et iusto odio dignissim qui blandit praesent luptatum
-        zzril delenit augue duis dolore te feugait nulla facilisi.
-        '''
-        words = phrase.replace('\n', '').split()
-        word_deque = collections.deque(words)
-        seed_deque = collections.deque(seed)
-        while True:
-            yield ' '.join(list(word_deque))
-            word_deque.rotate(int(seed_deque[0]))
-            seed_deque.rotate(1)
-
-    def _write_test_data_file(self, size):
-        data = self._generate_test_data()
-        while os.path.getsize(self.tfile.name) < size:
-            self.tfile.write(next(data).encode('UTF-8'))
-        return self
-
-
-def md5_hash_file(path):
-    md5 = hashlib.md5()
-    try:
-        with open(path, 'rb') as stream:
-            while True:
-                data = stream.read(8192)
-                if not data:
-                    break
-                md5.update(data)
-    except IOError as exc:
-        logging.error("unable to checksum %s: %s", path, exc)
-        return None
-    else:
-        return md5.hexdigest()
-
-
 def on_ubuntucore():
     """
     Check if running from on ubuntu core
@@ -132,48 +70,12 @@ class DiskTest():
         self.rem_disks_speed = {}
         # LP: #1313581, TODO: extend to be rem_disks_driver
         self.rem_disks_xhci = {}
-        self.data = ''
         self.lsblk = ''
         self.device = device
         self.memorycard = memorycard
         self._run_lsblk(lsblkcommand)
         self._probe_disks()
 
-    def read_file(self, source):
-        with open(source, 'rb') as infile:
-            try:
-                self.data = infile.read()
-            except IOError as exc:
-                logging.error("Unable to read data from %s: %s", source, exc)
-                return False
-            else:
-                return True
-
-    def write_file(self, data, dest):
-        try:
-            outfile = open(dest, 'wb', 0)
-        except OSError as exc:
-            logging.error("Unable to open %s for writing.", dest)
-            logging.error("  %s", exc)
-            return False
-        with outfile:
-            try:
-                outfile.write(self.data)
-            except IOError as exc:
-                logging.error("Unable to write data to %s: %s", dest, exc)
-                return False
-            else:
-                outfile.flush()
-                os.fsync(outfile.fileno())
-                return True
-
-    def clean_up(self, target):
-        try:
-            os.unlink(target)
-        except OSError as exc:
-            logging.error("Unable to remove tempfile %s", target)
-            logging.error("  %s", exc)
-
     def _find_parent(self, device):
         if self.lsblk:
             pattern = re.compile('KNAME="(?P<KNAME>.*)" '
@@ -561,6 +463,94 @@ class DiskTest():
             return False
 
 
+def run_io_tests(disks, args, size):
+    """
+    Write, read back and check the test files on the disks, all at once.
+
+    :param disks: dictionary of the mount points of the disks to test
+    :returns:
+        dictionary of the results of each disk, as a list of the
+        StorageIOResult of each test file for each iteration
+    """
+    results = {disk: [] for disk in disks}
+    for iteration in range(args.iterations):
+        for results_list in results.values():
+            results_list.append([])
+        for file_index in range(args.count):
+            tests = [
+                StorageIOTest(
+                    os.path.join(mount_point, 'checkbox-storage-test.{}.{}'
+                                 .format(file_index, iteration)),
+                    size, args.block_size, args.direct)
+                for mount_point in disks.values()]
+            for disk, result in zip(disks, run_storage_io_tests(tests)):
+                results[disk][iteration].append(result)
+    return results
+
+
+def report_results(disk, iteration_results):
+    """
+    Print the throughput of a disk and its errors.
+
+    :returns: a tuple of the number of errors and the average write speed
+    """
+    errors = 0
+    iterations = len(iteration_results)
+    total_write_size = sum(
+        result.size for result in iteration_results[0]) / 1024 / 1024
+    print("%s (Total Data Size / iteration: %0.4f MB):" %
+          (disk, total_write_size))
+    succeeded = []
+    for iteration, results in enumerate(iteration_results):
+        for result in results:
+            if result.error:
+                logging.error("Failed to copy data to %s", result.path)
+                errors += 1
+                continue
+            succeeded.append(result)
+            if not result.passed:
+                logging.warning(
+                    "[Iteration %s] Parent and Child"
+                    " copy hashes mismatch on %s!", iteration, result.path)
+                logging.warning("\tParent hash: %s", result.written_digest)
+                logging.warning("\tChild hash: %s", result.read_digest)
+                errors += 1
+        write_size = sum(result.size for result in results if not result.error)
+        write_time = sum(
+            result.write_time for result in results if not result.error)
+        try:
+            avg_write_speed = write_size / write_time / 1024 / 1024
+        except ZeroDivisionError:
+            avg_write_speed = 0.00
+        print("\t[Iteration %s] Average Speed: %0.4f"
+              % (iteration, avg_write_speed))
+    # aggregate the transfers of all the test files
+    summary = StorageIOResult(disk, sum(r.size for r in succeeded))
+    for result in succeeded:
+        summary.write_time += result.write_time
+        summary.read_time += result.read_time
+        summary.write_latencies.extend(result.write_latencies)
+        summary.read_latencies.extend(result.read_latencies)
+    print("\tSummary:")
+    print("\t\tTotal Data Attempted: %0.4f MB"
+          % (total_write_size * iterations))
+    print("\t\tTotal Time to write: %0.4f secs" % summary.write_time)
+    print("\t\tAverage Write Time: %0.4f secs" %
+          (summary.write_time / iterations))
+    print("\t\tAverage Write Speed: %0.4f MB/s" % summary.write_speed)
+    print("\t\tAverage Read Speed: %0.4f MB/s" % summary.read_speed)
+    for name, latencies in (('Write', summary.write_latencies),
+                            ('Read', summary.read_latencies)):
+        for pct, latency in sorted(
+                summary.latency_percentiles(latencies).items()):
+            print("\t\t%s Latency p%s: %0.2f ms" % (name, pct, latency))
+    emit_metric('write-speed-{}'.format(disk), summary.write_speed, 'MB/s',
+                'higher')
+    emit_metric('read-speed-{}'.format(disk), summary.read_speed, 'MB/s',
+                'higher')
+    return errors, summary.write_speed
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('device',
@@ -606,6 +596,23 @@ def main():
                               "You may use SI or IEC suffixes like: 'K', 'M',"
                               "'G', 'T', 'Ki', 'Mi', 'Gi', 'Ti', etc. Default"
                               " is %(default)s"))
+    parser.add_argument('-b', '--block-size',
+                        action='store',
+                        type=HumanReadableBytes,
+                        default=HumanReadableBytes(DEFAULT_BLOCK_SIZE),
+                        help=("The size of the blocks written and read at "
+                              "once. Default is %(default)s"))
+    parser.add_argument('--direct',
+                        action='store_true',
+                        default=False,
+                        help=("Bypass the page cache (O_DIRECT) when the "
+                              "filesystem supports it"))
+    parser.add_argument('--parallel',
+                        action='store_true',
+                        default=False,
+                        help=("Test all the devices at the same time instead "
+                              "of one after another. Devices sharing a bus "
+                              "share its bandwidth."))
     parser.add_argument('--auto-reduce-size',
                         action='store_true',
                         default=False,
@@ -717,8 +724,6 @@ def main():
                         "No %s disks with speed higher than %s bits/s",
                         args.device, args.min_speed)
                     return 1
-                write_sizes = []
-                test_files = {}
                 disks_freespace = {}
                 for disk, path in disks_eligible.items():
                     stat = os.statvfs(path)
@@ -742,90 +747,21 @@ def main():
                     else:
                         sys.exit("Not enough space. {} is required on {}"
                                  .format(desired_size, smallest_partition))
-                # Generate our data file(s)
-                for count in range(args.count):
-                    test_files[count] = RandomData(desired_size)
-                    write_sizes.append(os.path.getsize(
-                        test_files[count].tfile.name))
-                    total_write_size = sum(write_sizes)
-
+                if args.parallel:
+                    disk_groups = [disks_eligible]
+                else:
+                    disk_groups = [{disk: mount_point} for disk, mount_point
+                                   in disks_eligible.items()]
                 try:
                     # Clear dmesg so we can check for I/O errors later
                     subprocess.check_output(['dmesg', '-C'])
-                    for disk, mount_point in disks_eligible.items():
-                        print("%s (Total Data Size / iteration: %0.4f MB):" %
-                              (disk, (total_write_size / 1024 / 1024)))
-                        iteration_write_size = (
-                            total_write_size * args.iterations) / 1024 / 1024
-                        iteration_write_times = []
-                        for iteration in range(args.iterations):
-                            target_file_list = []
-                            write_times = []
-                            for file_index in range(args.count):
-                                parent_file = test_files[file_index].tfile.name
-                                parent_hash = md5_hash_file(parent_file)
-                                target_filename = (
-                                    test_files[file_index].name +
-                                    '.%s' % iteration)
-                                target_path = mount_point
-                                target_file = os.path.join(target_path,
-                                                           target_filename)
-                                target_file_list.append(target_file)
-                                test.read_file(parent_file)
-                                with ActionTimer() as timer:
-                                    if not test.write_file(test.data,
-                                                           target_file):
-                                        logging.error(
-                                            "Failed to copy %s to %s",
-                                            parent_file, target_file)
-                                        errors += 1
-                                        continue
-                                write_times.append(timer.interval)
-                                child_hash = md5_hash_file(target_file)
-                                if parent_hash != child_hash:
-                                    logging.warning(
-                                        "[Iteration %s] Parent and Child"
-                                        " copy hashes mismatch on %s!",
-                                        iteration, target_file)
-                                    logging.warning(
-                                        "\tParent hash: %s", parent_hash)
-                                    logging.warning(
-                                        "\tChild hash: %s", child_hash)
-                                    errors += 1
-                            for file in target_file_list:
-                                test.clean_up(file)
-                            total_write_time = sum(write_times)
-                            # avg_write_time = total_write_time / args.count
-                            try:
-                                avg_write_speed = ((
-                                    total_write_size / total_write_time) /
-                                    1024 / 1024)
-                            except ZeroDivisionError:
-                                avg_write_speed = 0.00
-                            finally:
-                                iteration_write_times.append(total_write_time)
-                                print("\t[Iteration %s] Average Speed: %0.4f"
-                                      % (iteration, avg_write_speed))
-                        for iteration in range(args.iterations):
-                            iteration_write_time = sum(iteration_write_times)
-                        print("\tSummary:")
-                        print("\t\tTotal Data Attempted: %0.4f MB"
-                              % iteration_write_size)
-                        print("\t\tTotal Time to write: %0.4f secs"
-                              % iteration_write_time)
-                        print("\t\tAverage Write Time: %0.4f secs" %
-                              (iteration_write_time / args.iterations))
-                        try:
-                            avg_write_speed = (iteration_write_size /
-                                               iteration_write_time)
-                        except ZeroDivisionError:
-                            avg_write_speed = 0.00
-                        finally:
-                            print("\t\tAverage Write Speed: %0.4f MB/s" %
-                                  avg_write_speed)
+                    for disks in disk_groups:
+                        results = run_io_tests(disks, args, desired_size)
+                        for disk, iteration_results in results.items():
+                            disk_errors, avg_write_speed = report_results(
+                                disk, iteration_results)
+                            errors += disk_errors
                 finally:
-                    for key in range(args.count):
-                        test.clean_up(test_files[key].tfile.name)
                     if (len(test.rem_disks_nm) > 0):
                         if test.umount() != 0:
                             errors += 1
@@ -36,6 +36,7 @@ from subprocess import (
     TimeoutExpired
 )
 import os
+import re
 import shlex
 import shutil
 import stat
@@ -44,10 +45,18 @@ import time
 import uuid
 import psutil
 from checkbox_support.disk_support import Disk
+from checkbox_support.helpers.metrics import emit_metric
 
 # Swap filename
 my_swap = None
 
+# Line of the --metrics-brief output of stress-ng, e.g.:
+# stress-ng: info:  [1234] cpu   14208   10.00   39.86   0.01   1420.74 ...
+# (newer versions use "metrc:" instead of "info:")
+METRICS_BRIEF_RE = re.compile(
+    r"^stress-ng: (?:info|metrc): +\[\d+\] +(?P<stressor>[a-z][\w-]*) +"
+    r"\d+ +[\d.]+ +[\d.]+ +[\d.]+ +(?P<rate>[\d.]+)", re.MULTILINE)
+
 
 class StressNg():
     """Interface with the external stress-ng binary."""
@@ -109,8 +118,17 @@ class StressNg():
             print("** stress-ng binary not found!")
             self.results = ""
             self.returncode = 1
+        if self.returncode == 0:
+            self.report_metrics()
         return self.returncode
 
+    def report_metrics(self):
+        """Report the bogo ops rates printed with --metrics-brief."""
+        for match in METRICS_BRIEF_RE.finditer(self.results):
+            emit_metric(
+                "{}-bogo-ops-per-second".format(match.group('stressor')),
+                match.group('rate'), 'bogo ops/s', 'higher')
+
 
 # Define CPU-related functions...
 
@@ -244,21 +262,24 @@ def stress_memory(args):
         test_object = StressNg(stressors=stressor.split(),
                                sng_timeout=args.base_time,
                                wrapper_timeout=args.base_time * 2,
-                               thread_count=0)
+                               thread_count=0,
+                               extra_options="--metrics-brief")
         retval = retval | test_object.run()
         print(test_object.results)
     for stressor in vrt_stressors:
         test_object = StressNg(stressors=stressor.split(),
                                sng_timeout=vrt,
                                wrapper_timeout=vrt * 2,
-                               thread_count=0)
+                               thread_count=0,
+                               extra_options="--metrics-brief")
         retval = retval | test_object.run()
         print(test_object.results)
     for stressor in ltc_stressors:
         test_object = StressNg(stressors=stressor.split(),
                                sng_timeout=vrt,
                                wrapper_timeout=vrt * 2,
-                               thread_count=8)  # throttle to 8 threads
+                               thread_count=8,  # throttle to 8 threads
+                               extra_options="--metrics-brief")
         retval = retval | test_object.run()
         print(test_object.results)
     if my_swap is not None and args.keep_swap is False:
@@ -295,7 +316,8 @@ def stress_disk(args):
         if not args.simulate:
             for stressor in disk_stressors:
                 disk_options = "--temp-path {} ".format(test_disk.test_dir) + \
-                    "--hdd-opts dsync --readahead-bytes 16M -k"
+                    "--hdd-opts dsync --readahead-bytes 16M -k " + \
+                    "--metrics-brief"
                 test_object = StressNg(stressors=stressor.split(),
                                        sng_timeout=args.base_time,
                                        wrapper_timeout=args.base_time * 5,
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Stand-in for smartctl, to run disk_smart.py without disks.
+
+Install it as smartctl in the PATH. The disks are listed in the
+FAKE_SMARTCTL_DISKS environment variable, RAID elements as the device and
+the -d argument of smartctl, e.g. "/dev/sda /dev/bus/0,megaraid,0". The
+self-tests last FAKE_SMARTCTL_DURATION seconds (default: 1) and fail on
+the disks of FAKE_SMARTCTL_FAILING. Their logs are kept in the
+FAKE_SMARTCTL_DIR directory.
+"""
+import json
+import os
+import sys
+import time
+
+HEADER = ('Num  Test_Description    Status                  Remaining  '
+          'LifeTime(hours)  LBA_of_first_error')
+
+
+def load_log(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def entry_status(start_time, next_start_time, failing):
+    duration = float(os.environ.get('FAKE_SMARTCTL_DURATION', 1))
+    end_time = start_time + duration
+    if next_start_time is not None and next_start_time < end_time:
+        return 'Aborted by host', '00%'
+    if time.time() < end_time:
+        return 'Self-test routine in progress', '90%'
+    if failing:
+        return 'Completed: read failure', '90%'
+    return 'Completed without error', '00%'
+
+
+def main(argv):
+    disks = os.environ.get('FAKE_SMARTCTL_DISKS', '').split()
+    if '--scan' in argv:
+        for disk in disks:
+            device, _, device_type = disk.partition(',')
+            print('{} -d {} # {}, fake device'.format(
+                device, device_type or 'sat', device))
+        return 0
+    args = iter(argv)
+    device = device_type = None
+    options = []
+    for arg in args:
+        if arg == '-d':
+            device_type = next(args)
+        elif arg in ('-l', '-s', '-t'):
+            options.append((arg, next(args)))
+        elif arg.startswith('-'):
+            options.append((arg, None))
+        else:
+            device = arg
+    disk = device if device_type in (None, 'sat') else '{},{}'.format(
+        device, device_type)
+    if disk not in disks:
+        if ('-i', None) in options and any(
+                d.startswith(device + ',') for d in disks):
+            print("Please specify device type with the -d option.")
+            print("Use smartctl -h to get a usage summary")
+            print("Try adding '-d megaraid,N'")
+        print('Smartctl open device: {} failed'.format(disk))
+        return 2
+    log_path = os.path.join(
+        os.environ['FAKE_SMARTCTL_DIR'], disk.replace('/', '_') + '.json')
+    log = load_log(log_path)
+    failing = disk in os.environ.get('FAKE_SMARTCTL_FAILING', '').split()
+    for option, value in options:
+        if option == '-i':
+            print('=== START OF INFORMATION SECTION ===')
+            print('Device Model:     Fake Disk')
+            print('SMART support is: Available - device has SMART capability.')
+            print('SMART support is: Enabled')
+        elif option == '-t' and value != 'force':
+            log.append(time.time())
+            with open(log_path, 'w') as f:
+                json.dump(log, f)
+            print('Testing has begun.')
+        elif option == '-l':
+            print('=== START OF READ SMART DATA SECTION ===')
+            if not log:
+                print('No self-tests have been logged.')
+                return 0
+            print('SMART Self-test log structure revision number 1')
+            print(HEADER)
+            returncode = 0
+            next_start_times = log[1:] + [None]
+            entries = list(zip(log, next_start_times))
+            for number, (start, next_start) in enumerate(reversed(entries)):
+                status, remaining = entry_status(start, next_start, failing)
+                if status.startswith('Completed:'):
+                    returncode = 128
+                print('{:<5}{:<20}{:<29}{:>4}  {:<17}{}'.format(
+                    '# {}'.format(number + 1), 'Short offline', status,
+                    remaining, 1234, '-'))
+            return returncode
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3,
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from argparse import ArgumentTypeError, Namespace
+from unittest import mock
+
+from disk_smart import (SmartTest, get_smart_tests, positive_int,
+                        run_smart_tests, scan_disks)
+
+FAKE_SMARTCTL = os.path.join(os.path.dirname(__file__), 'fake_smartctl.py')
+
+
+class RecordingSmartTest(SmartTest):
+
+    """SmartTest recording when it starts and finishes."""
+
+    def __init__(self, events, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = events
+
+    def start(self):
+        self.events.append(('start', str(self)))
+        return super().start()
+
+    def _finish(self, status, returncode):
+        self.events.append(('finish', str(self)))
+        super()._finish(status, returncode)
+
+
+def max_running(events):
+    """Return the largest number of tests running at the same time."""
+    running = largest = 0
+    for event, _ in events:
+        running += 1 if event == 'start' else -1
+        largest = max(largest, running)
+    return largest
+
+
+class MultiDiskTests(unittest.TestCase):
+
+    """Tests for the SMART tests of many disks, using a fake smartctl."""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        os.symlink(FAKE_SMARTCTL, os.path.join(tmp_dir.name, 'smartctl'))
+        patcher = mock.patch.dict(os.environ, {
+            'PATH': tmp_dir.name + os.pathsep + os.environ['PATH'],
+            'FAKE_SMARTCTL_DIR': tmp_dir.name,
+            'FAKE_SMARTCTL_DISKS': '/dev/sda /dev/sdb '
+                                   '/dev/bus/0,megaraid,0 '
+                                   '/dev/bus/0,megaraid,1',
+            'FAKE_SMARTCTL_DURATION': '0.5',
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.args = Namespace(sleep=0.1, timeout=None, max_per_controller=4)
+
+    def test_scan_disks(self):
+        self.assertEqual(scan_disks(), [
+            ('/dev/sda', -1, 'none'),
+            ('/dev/sdb', -1, 'none'),
+            ('/dev/bus/0', 0, 'megaraid'),
+            ('/dev/bus/0', 1, 'megaraid'),
+        ])
+
+    @mock.patch('disk_smart.get_controller', lambda disk: '0000:00:17.0')
+    def test_get_smart_tests(self):
+        tests = get_smart_tests(scan_disks())
+        self.assertEqual(
+            [str(test) for test in tests],
+            ['/dev/sda', '/dev/sdb', '/dev/bus/0, element 0',
+             '/dev/bus/0, element 1'])
+        self.assertEqual(
+            [test.controller for test in tests],
+            ['0000:00:17.0', '0000:00:17.0', '/dev/bus/0', '/dev/bus/0'])
+
+    def test_concurrent(self):
+        events = []
+        tests = [RecordingSmartTest(events, '/dev/sda'),
+                 RecordingSmartTest(events, '/dev/sdb'),
+                 RecordingSmartTest(events, '/dev/bus/0', 0, 'megaraid'),
+                 RecordingSmartTest(events, '/dev/bus/0', 1, 'megaraid')]
+        self.assertTrue(run_smart_tests(self.args, tests))
+        # all the tests start before any of them finishes
+        self.assertEqual([event for event, _ in events[:4]], ['start'] * 4)
+        self.assertEqual(max_running(events), 4)
+        for test in tests:
+            self.assertEqual(test.status, 'Completed without error')
+            self.assertEqual(test.returncode, 0)
+
+    def test_max_per_controller(self):
+        self.args.max_per_controller = 1
+        events = []
+        tests = [RecordingSmartTest(events, '/dev/sda', controller='ahci'),
+                 RecordingSmartTest(events, '/dev/sdb', controller='ahci')]
+        self.assertTrue(run_smart_tests(self.args, tests))
+        self.assertEqual(events, [
+            ('start', '/dev/sda'), ('finish', '/dev/sda'),
+            ('start', '/dev/sdb'), ('finish', '/dev/sdb')])
+
+    def test_max_per_controller_shared(self):
+        self.args.max_per_controller = 2
+        events = []
+        tests = [RecordingSmartTest(events, '/dev/sda', controller='ahci'),
+                 RecordingSmartTest(events, '/dev/sdb', controller='ahci'),
+                 RecordingSmartTest(events, '/dev/sdc', controller='ahci'),
+                 RecordingSmartTest(events, '/dev/bus/0', 0, 'megaraid'),
+                 RecordingSmartTest(events, '/dev/bus/0', 1, 'megaraid')]
+        with mock.patch.dict(os.environ, {
+                'FAKE_SMARTCTL_DISKS': '/dev/sda /dev/sdb /dev/sdc '
+                                       '/dev/bus/0,megaraid,0 '
+                                       '/dev/bus/0,megaraid,1'}):
+            self.assertTrue(run_smart_tests(self.args, tests))
+        # /dev/sdc waits for a disk of its controller, not for the others
+        self.assertEqual(max_running(events), 4)
+        self.assertLess(events.index(('finish', '/dev/sda')),
+                        events.index(('start', '/dev/sdc')))
+
+    def test_positive_int(self):
+        self.assertEqual(positive_int('2'), 2)
+        for value in ('0', '-1', 'two'):
+            with self.assertRaises(ArgumentTypeError):
+                positive_int(value)
+
+    def test_failure(self):
+        tests = [SmartTest('/dev/sda'), SmartTest('/dev/sdb')]
+        with mock.patch.dict(
+                os.environ, {'FAKE_SMARTCTL_FAILING': '/dev/sdb'}):
+            self.assertFalse(run_smart_tests(self.args, tests))
+        self.assertTrue(tests[0].passed)
+        self.assertFalse(tests[1].passed)
+        self.assertEqual(tests[1].status, 'Completed: read failure')
+
+    def test_timeout(self):
+        self.args.timeout = 0.2
+        tests = [SmartTest('/dev/sda')]
+        self.assertFalse(run_smart_tests(self.args, tests))
+        self.assertEqual(tests[0].status, 'Polling timed out')
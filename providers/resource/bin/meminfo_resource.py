@@ -19,26 +19,11 @@
 #
 import sys
 
-from checkbox_support.parsers.meminfo import MeminfoParser
-
-# Filename where meminfo is stored.
-MEMINFO_FILENAME = "/proc/meminfo"
-
-
-class MeminfoResult:
-
-    def setMemory(self, memory):
-        for key, value in sorted(memory.items()):
-            print("%s: %s" % (key, value))
+from checkbox_support.collectors import collect_meminfo, print_records
 
 
 def main():
-    stream = open(MEMINFO_FILENAME)
-    parser = MeminfoParser(stream)
-
-    result = MeminfoResult()
-    parser.run(result)
-
+    print_records(collect_meminfo())
     return 0
 
 
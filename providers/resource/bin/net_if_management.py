@@ -24,7 +24,7 @@ import subprocess as sp
 import sys
 
 from checkbox_support.parsers.netplan import Netplan
-from checkbox_support.parsers.udevadm import UdevadmParser
+from checkbox_support.udev_snapshot import get_udev_snapshot
 
 
 def log(msg):
@@ -35,15 +35,10 @@ def log(msg):
 
 def get_network_interfaces(category):
     names = []
-    cmd = 'udevadm info --export-db'
-    output = sp.check_output(cmd, shell=True).decode(
-        sys.stdout.encoding, errors='ignore')
-    udev = UdevadmParser(output)
-    for device in udev.run():
-        if category == getattr(device, "category", None):
-            p = getattr(device, "interface", None)
-            if p is not None:
-                names.append(p)
+    for device in get_udev_snapshot().filter(category=category):
+        p = getattr(device, "interface", None)
+        if p is not None:
+            names.append(p)
     return names
 
 
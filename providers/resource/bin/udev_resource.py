@@ -24,20 +24,18 @@ from collections import OrderedDict
 from subprocess import check_output, CalledProcessError
 
 from checkbox_support.parsers.udevadm import UdevadmParser
+from checkbox_support.udev_snapshot import ATTRIBUTES as attributes
+from checkbox_support.udev_snapshot import UDEVADM_COMMAND, LSBLK_COMMAND
+from checkbox_support.udev_snapshot import get_udev_snapshot
 
 categories = ("ACCELEROMETER", "AUDIO", "BLUETOOTH", "CAPTURE", "CARDREADER",
               "CDROM", "DISK", "KEYBOARD", "INFINIBAND", "MMAL", "MOUSE",
               "NETWORK", "TPU", "OTHER", "PARTITION", "TOUCHPAD",
               "TOUCHSCREEN", "USB", "VIDEO", "WATCHDOG", "WIRELESS", "WWAN")
 
-attributes = ("path", "name", "bus", "category", "driver", "product_id",
-              "vendor_id", "subproduct_id", "subvendor_id", "product",
-              "vendor", "interface", "mac", "product_slug", "vendor_slug",
-              "symlink_uuid")
 
-
-def dump_udev_db(udev):
-    for device in udev.run():
+def dump_udev_db(devices):
+    for device in devices:
         for attribute in attributes:
             value = getattr(device, attribute)
             if value is not None:
@@ -45,9 +43,9 @@ def dump_udev_db(udev):
         print()
 
 
-def filter_by_categories(udev, categories):
+def filter_by_categories(devices, categories):
     count = 0
-    for device in udev.run():
+    for device in devices:
         c = getattr(device, "category", None)
         if c in categories:
             count += 1
@@ -59,12 +57,12 @@ def filter_by_categories(udev, categories):
     return count
 
 
-def display_by_categories(udev, categories, short=False):
+def display_by_categories(devices, categories, short=False):
     count = 0
     data = OrderedDict()
     for category in categories:
         data[category] = []
-    for device in udev.run():
+    for device in devices:
         c = getattr(device, "category", None)
         if c in categories:
             count += 1
@@ -92,11 +90,11 @@ def display_by_categories(udev, categories, short=False):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-c", "--command", action='store', type=str,
-                        default="udevadm info --export-db",
+                        default=" ".join(UDEVADM_COMMAND),
                         help="""Command to execute to get udevadm information.
                               Only change it if you know what you're doing.""")
     parser.add_argument("-d", "--lsblkcommand", action='store', type=str,
-                        default="lsblk -i -n -P -o KNAME,TYPE,MOUNTPOINT",
+                        default=" ".join(LSBLK_COMMAND),
                         help="""Command to execute to get lsblk information.
                               Only change it if you know what you're doing.""")
     parser.add_argument('-l', '--list', nargs='+', choices=categories,
@@ -112,28 +110,39 @@ def main():
                         Acceptable categories to list are:
                         {}""".format(', '.join(categories)))
     parser.add_argument('-s', '--short', action='store_true')
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="""Do not reuse the session udev snapshot, always
+                        query and parse the udev database.""")
     args = parser.parse_args()
-    try:
-        output = check_output(shlex.split(args.command))
-        lsblk = check_output(shlex.split(args.lsblkcommand))
-    except CalledProcessError as exc:
-        raise SystemExit(exc)
-    # Set the error policy to 'ignore' in order to let tests depending on this
-    # resource to properly match udev properties
-    output = output.decode("UTF-8", errors='ignore')
-    lsblk = lsblk.decode("UTF-8", errors='ignore')
     list_partitions = False
     if 'PARTITION' in args.list or 'PARTITION' in args.filter:
         list_partitions = True
-    udev = UdevadmParser(output, lsblk=lsblk, list_partitions=list_partitions)
+    use_snapshot = (
+        not args.no_snapshot and
+        shlex.split(args.command) == UDEVADM_COMMAND and
+        shlex.split(args.lsblkcommand) == LSBLK_COMMAND)
+    try:
+        if use_snapshot:
+            devices = get_udev_snapshot(list_partitions).devices
+        else:
+            output = check_output(shlex.split(args.command))
+            lsblk = check_output(shlex.split(args.lsblkcommand))
+            # Set the error policy to 'ignore' in order to let tests depending
+            # on this resource to properly match udev properties
+            output = output.decode("UTF-8", errors='ignore')
+            lsblk = lsblk.decode("UTF-8", errors='ignore')
+            devices = UdevadmParser(
+                output, lsblk=lsblk, list_partitions=list_partitions).run()
+    except CalledProcessError as exc:
+        raise SystemExit(exc)
     if args.list:
-        if display_by_categories(udev, args.list, args.short) == 0:
+        if display_by_categories(devices, args.list, args.short) == 0:
             raise SystemExit("No devices found")
     elif args.filter:
-        if filter_by_categories(udev, args.filter) == 0:
+        if filter_by_categories(devices, args.filter) == 0:
             raise SystemExit("No devices found")
     else:
-        dump_udev_db(udev)
+        dump_udev_db(devices)
 
 
 if __name__ == "__main__":
@@ -17,21 +17,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Checkbox.  If not, see <http://www.gnu.org/licenses/>.
 #
-import os
 import sys
 
-
-def get_uname():
-    keys = ("name", "node", "release", "version", "machine")
-    values = os.uname()
-    return dict(list(zip(keys, values)))
+from checkbox_support.collectors import collect_uname, print_records
 
 
 def main():
-    uname = get_uname()
-    for key, value in uname.items():
-        print("%s: %s" % (key, value))
-
+    print_records(collect_uname())
     return 0
 
 